@@ -0,0 +1,207 @@
+"""
+Image serving for the RAG server.
+Content-hash ETags, immutable caching for content-addressed files, conditional
+GETs, and on-demand WebP thumbnails cached on disk under a size cap.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Extracted images are stored as {sha256[:32]}.{ext} (see ingestion/extractor.py)
+_CONTENT_ADDRESSED_RE = re.compile(r"^([0-9a-f]{32})\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class ImageService:
+    """Resolves, fingerprints and resizes images for HTTP serving."""
+
+    def __init__(
+        self,
+        image_dir: str,
+        thumbnail_dir: str,
+        max_cache_bytes: int = 512 * 1024 * 1024,
+        width_buckets: Tuple[int, ...] = (160, 320, 640, 1280),
+        webp_quality: int = 80
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            image_dir: Directory of extracted images
+            thumbnail_dir: Directory for cached thumbnails
+            max_cache_bytes: Size cap of the thumbnail cache (oldest evicted first)
+            width_buckets: Allowed thumbnail widths; requests round up to the next bucket
+            webp_quality: WebP encoder quality
+        """
+        self.image_dir = image_dir
+        self.thumbnail_dir = thumbnail_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.width_buckets = tuple(sorted(width_buckets))
+        self.webp_quality = webp_quality
+        self._hashes: Dict[str, Tuple[float, int, str]] = {}  # path -> (mtime, size, sha256)
+        self._lock = threading.Lock()
+
+        os.makedirs(thumbnail_dir, exist_ok=True)
+        self._cache_bytes = sum(size for _, size, _ in self._thumbnail_files())
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """
+        Map a requested filename to an image path.
+
+        Args:
+            filename: Requested file name (no directories allowed)
+
+        Returns:
+            Absolute path, or None if it does not exist or is not a plain filename
+        """
+        if os.path.basename(filename) != filename or filename.startswith("."):
+            return None
+        path = os.path.join(self.image_dir, filename)
+        return path if os.path.isfile(path) else None
+
+    def content_hash(self, path: str) -> str:
+        """
+        Content hash of an image (from the filename when content-addressed, else hashed and memoized).
+
+        Args:
+            path: Image path
+
+        Returns:
+            Hex digest identifying the file's content
+        """
+        match = _CONTENT_ADDRESSED_RE.match(os.path.basename(path))
+        if match:
+            return match.group(1)
+
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()[:32]
+        with self._lock:
+            self._hashes[path] = (stat.st_mtime, stat.st_size, sha256)
+        return sha256
+
+    @staticmethod
+    def cache_control(path: str) -> str:
+        """Immutable caching for content-addressed files; revalidation for anything else."""
+        if _CONTENT_ADDRESSED_RE.match(os.path.basename(path)):
+            return IMMUTABLE_CACHE_CONTROL
+        return REVALIDATE_CACHE_CONTROL
+
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """
+        Evaluate an If-None-Match header against a strong ETag.
+
+        Args:
+            if_none_match: Raw header value (may list several tags, or '*')
+            etag: Quoted ETag of the representation
+
+        Returns:
+            True if the client's copy is current (respond 304)
+        """
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+    def bucket_width(self, width: int) -> int:
+        """Round a requested width up to the nearest bucket (capped at the largest)."""
+        for bucket in self.width_buckets:
+            if width <= bucket:
+                return bucket
+        return self.width_buckets[-1]
+
+    def thumbnail(self, path: str, width: int) -> Tuple[str, str]:
+        """
+        Get (creating if needed) a WebP thumbnail of an image.
+
+        Args:
+            path: Source image path
+            width: Requested width in pixels
+
+        Returns:
+            (thumbnail path, its ETag); the original path and ETag if the image
+            is already no wider than the bucket
+        """
+        sha256 = self.content_hash(path)
+        bucket = self.bucket_width(width)
+        thumb_path = os.path.join(self.thumbnail_dir, f"{sha256}_w{bucket}.webp")
+        etag = f'"{sha256}-w{bucket}"'
+
+        if os.path.exists(thumb_path):
+            # Refresh mtime so eviction is least-recently-used
+            os.utime(thumb_path, None)
+            return thumb_path, etag
+
+        with Image.open(path) as img:
+            if img.width <= bucket:
+                return path, f'"{sha256}"'
+            img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+            height = max(1, round(img.height * bucket / img.width))
+            resized = img.resize((bucket, height), Image.LANCZOS)
+
+            tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            resized.save(tmp_path, "WEBP", quality=self.webp_quality, method=4)
+        os.replace(tmp_path, thumb_path)
+
+        with self._lock:
+            self._cache_bytes += os.path.getsize(thumb_path)
+            over_cap = self._cache_bytes > self.max_cache_bytes
+        if over_cap:
+            self._evict()
+
+        return thumb_path, etag
+
+    def _thumbnail_files(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every cached thumbnail."""
+        files = []
+        for name in os.listdir(self.thumbnail_dir):
+            if not name.endswith(".webp"):
+                continue
+            path = os.path.join(self.thumbnail_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self):
+        """Delete least-recently-used thumbnails until the cache is under 90% of its cap."""
+        with self._lock:
+            files = sorted(self._thumbnail_files())
+            total = sum(size for _, size, _ in files)
+            target = int(self.max_cache_bytes * 0.9)
+            removed = 0
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._cache_bytes = total
+        logger.info(f"Evicted {removed} thumbnails, cache now {total / (1024 * 1024):.1f} MB")
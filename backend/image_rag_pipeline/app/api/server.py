@@ -4,19 +4,25 @@ Provides endpoints for PDF ingestion and image/text search.
 """
 import os
 import logging
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from collections import OrderedDict
 import shutil
 
 from ..db.vector_store import VectorStore
 from ..ingestion.loader import IngestionPipeline
 from ..ingestion.embedder import Embedder
 from ..retrieval.query import ImageRetriever
+from ..retrieval.lexical_index import LexicalIndexManager
+from .image_service import ImageService
 from ..chatbot.chain import ConversationManager
+from ..chatbot.memory_store import create_session_store
+from ..chatbot.contextualizer import contextualization_stats
 from ..utils.config import Config
 
 # Set logging level from config
@@ -47,6 +53,9 @@ IMAGE_DIR = os.path.join(DATA_DIR, "images")
 PDF_DIR = os.path.join(DATA_DIR, "pdfs")
 # Use Config for vector DB path, but resolve relative to BASE_DIR if relative
 VECTOR_DB_PATH = Config.QDRANT_PATH if os.path.isabs(Config.QDRANT_PATH) else os.path.join(BASE_DIR, Config.QDRANT_PATH)
+LEXICAL_INDEX_PATH = Config.LEXICAL_INDEX_PATH if os.path.isabs(Config.LEXICAL_INDEX_PATH) else os.path.join(BASE_DIR, Config.LEXICAL_INDEX_PATH)
+THUMBNAIL_DIR = Config.THUMBNAIL_CACHE_DIR if os.path.isabs(Config.THUMBNAIL_CACHE_DIR) else os.path.join(BASE_DIR, Config.THUMBNAIL_CACHE_DIR)
+SESSION_DB_PATH = Config.SESSION_DB_PATH if os.path.isabs(Config.SESSION_DB_PATH) else os.path.join(BASE_DIR, Config.SESSION_DB_PATH)
 
 # Ensure directories exist
 os.makedirs(IMAGE_DIR, exist_ok=True)
@@ -58,7 +67,10 @@ _vector_store = None
 _embedder = None
 _ingestion_pipeline = None
 _retriever = None
-_conversation_managers = {}  # Store conversation managers per course
+_lexical_indexes = None
+_session_store = None
+_image_service = None
+_conversation_managers = OrderedDict()  # LRU of conversation managers per course/lecture
 
 
 def get_vector_store():
@@ -84,6 +96,14 @@ def get_embedder():
     return _embedder
 
 
+def get_lexical_indexes():
+    """Get or create the per-course lexical index manager (None if hybrid retrieval is disabled)."""
+    global _lexical_indexes
+    if _lexical_indexes is None and Config.HYBRID_RETRIEVAL:
+        _lexical_indexes = LexicalIndexManager(LEXICAL_INDEX_PATH)
+    return _lexical_indexes
+
+
 def get_ingestion_pipeline():
     """Get or create ingestion pipeline instance."""
     global _ingestion_pipeline
@@ -92,7 +112,8 @@ def get_ingestion_pipeline():
             image_output_dir=IMAGE_DIR,
             vector_store=get_vector_store(),
             embedder=get_embedder(),
-            chunk_size=Config.CHUNK_SIZE
+            chunk_size=Config.CHUNK_SIZE,
+            lexical_indexes=get_lexical_indexes()
         )
     return _ingestion_pipeline
 
@@ -103,11 +124,40 @@ def get_retriever():
     if _retriever is None:
         _retriever = ImageRetriever(
             vector_store=get_vector_store(),
-            embedder=get_embedder()
+            embedder=get_embedder(),
+            lexical_indexes=get_lexical_indexes()
         )
     return _retriever
 
 
+def get_image_service():
+    """Get or create the image serving helper (ETags, thumbnails)."""
+    global _image_service
+    if _image_service is None:
+        _image_service = ImageService(
+            image_dir=IMAGE_DIR,
+            thumbnail_dir=THUMBNAIL_DIR,
+            max_cache_bytes=Config.THUMBNAIL_CACHE_MAX_MB * 1024 * 1024,
+            width_buckets=Config.THUMBNAIL_WIDTHS
+        )
+    return _image_service
+
+
+def get_session_store():
+    """Get or create the shared chat session store."""
+    global _session_store
+    if _session_store is None:
+        _session_store = create_session_store(
+            backend=Config.SESSION_STORE,
+            sqlite_path=SESSION_DB_PATH,
+            mongodb_url=Config.MONGODB_URL,
+            database_name=Config.DATABASE_NAME,
+            max_sessions=Config.SESSION_CACHE_SIZE,
+            ttl_seconds=Config.SESSION_TTL_SECONDS
+        )
+    return _session_store
+
+
 def extract_lecture_id_from_session(session_id: str, course_id: str) -> str:
     """
     Extract lecture_id from session_id.
@@ -155,7 +205,9 @@ def get_conversation_manager(course_id: str, lecture_id: str) -> ConversationMan
     # Use course_id + lecture_id as key for the manager
     manager_key = f"{course_id}_{lecture_id}"
     
-    if manager_key not in _conversation_managers:
+    if manager_key in _conversation_managers:
+        _conversation_managers.move_to_end(manager_key)
+    else:
         logger.info(f"Creating conversation manager for {course_id}/{lecture_id}")
         _conversation_managers[manager_key] = ConversationManager(
             course_id=course_id,
@@ -166,8 +218,15 @@ def get_conversation_manager(course_id: str, lecture_id: str) -> ConversationMan
             llm_temperature=float(os.getenv("LLM_TEMPERATURE", "0.5")),
             top_k=int(os.getenv("CHAT_TOP_K", "5")),
             max_history_messages=int(os.getenv("CHAT_MAX_HISTORY", "6")),  # Updated to 6 (PILLAR 2)
-            max_token_limit=int(os.getenv("CHAT_TOKEN_LIMIT", "1500"))  # Updated to 1500 (PILLAR 2)
+            max_token_limit=int(os.getenv("CHAT_TOKEN_LIMIT", "1500")),  # Updated to 1500 (PILLAR 2)
+            session_store=get_session_store(),
+            speculative_retrieval=Config.SPECULATIVE_RETRIEVAL,
+            lexical_indexes=get_lexical_indexes()
         )
+        # Managers hold no session state, so evicting one only costs a chain rebuild
+        while len(_conversation_managers) > Config.MAX_CONVERSATION_MANAGERS:
+            evicted_key, _ = _conversation_managers.popitem(last=False)
+            logger.info(f"Evicted conversation manager {evicted_key}")
     
     return _conversation_managers[manager_key]
 
@@ -178,6 +237,23 @@ class SearchRequest(BaseModel):
     top_k: Optional[int] = 5
 
 
+class BatchQuery(BaseModel):
+    query: str
+    top_k: Optional[int] = None
+    lecture_id: Optional[str] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery]
+    top_k: Optional[int] = 5
+    hybrid: bool = True
+
+
+class BatchSearchResponse(BaseModel):
+    course_id: str
+    results: list
+
+
 class IngestResponse(BaseModel):
     success: bool
     message: str
@@ -186,6 +262,7 @@ class IngestResponse(BaseModel):
     text_chunks: int
     images: int
     total_items: int
+    chunk_stats: Optional[dict] = None
 
 
 class SearchResponse(BaseModel):
@@ -304,7 +381,7 @@ async def search_text(course_id: str, request: SearchRequest):
     """
     try:
         retriever = get_retriever()
-        results = retriever.query_text_to_text(
+        results = retriever.query_text_hybrid(
             query=request.query,
             course_id=course_id,
             top_k=request.top_k
@@ -316,23 +393,79 @@ async def search_text(course_id: str, request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/search-text-batch/{course_id}", response_model=BatchSearchResponse)
+async def search_text_batch(course_id: str, request: BatchSearchRequest):
+    """
+    Search text chunks for many queries in one round trip.
+    
+    Queries are embedded together and searched with one batched vector-store
+    request (used by offline evaluation and related-concept prefetching).
+    
+    Args:
+        course_id: Course identifier
+        request: Queries (each with optional top_k / lecture_id), default top_k, hybrid flag
+        
+    Returns:
+        One result list per query, in request order
+    """
+    if len(request.queries) > Config.MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries ({len(request.queries)}), max is {Config.MAX_BATCH_QUERIES}"
+        )
+    
+    try:
+        retriever = get_retriever()
+        results = retriever.query_text_batch(
+            queries=[query.model_dump() for query in request.queries],
+            course_id=course_id,
+            top_k=request.top_k,
+            hybrid=request.hybrid
+        )
+        return BatchSearchResponse(**results)
+    
+    except Exception as e:
+        logger.error(f"Batch text search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/images/{filename}")
-async def get_image(filename: str):
+async def get_image(filename: str, request: Request, w: Optional[int] = None):
     """
-    Serve an image file.
+    Serve an image file, or a WebP thumbnail of it.
+    
+    Responses carry a content-hash ETag; content-addressed images are cached
+    as immutable. A matching If-None-Match gets a 304.
     
     Args:
         filename: Image filename
+        request: Incoming request (for conditional headers)
+        w: Optional display width; returns a WebP thumbnail rounded up to a width bucket
         
     Returns:
-        Image file
+        Image file, thumbnail, or 304 Not Modified
     """
-    image_path = os.path.join(IMAGE_DIR, filename)
+    images = get_image_service()
+    image_path = images.resolve(filename)
     
-    if not os.path.exists(image_path):
+    if image_path is None:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    return FileResponse(image_path)
+    if w is not None and w <= 0:
+        raise HTTPException(status_code=400, detail="Width must be positive")
+    
+    # Hashing a non-content-addressed file and thumbnailing are blocking; keep them off the event loop
+    if w is None:
+        path, etag = image_path, f'"{await run_in_threadpool(images.content_hash, image_path)}"'
+    else:
+        path, etag = await run_in_threadpool(images.thumbnail, image_path, w)
+    
+    headers = {"ETag": etag, "Cache-Control": images.cache_control(image_path)}
+    if images.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    media_type = "image/webp" if path != image_path else None
+    return FileResponse(path, headers=headers, media_type=media_type)
 
 
 # ============================================================================
@@ -479,7 +612,9 @@ async def health_check():
             "vector_store": _vector_store is not None,
             "embedder": _embedder is not None,
             "ingestion_pipeline": _ingestion_pipeline is not None,
-            "retriever": _retriever is not None
+            "retriever": _retriever is not None,
+            "session_store": _session_store is not None,
+            "conversation_managers": len(_conversation_managers)
         },
         "directories": {
             "images": os.path.exists(IMAGE_DIR),
@@ -489,6 +624,17 @@ async def health_check():
     }
 
 
+@app.get("/metrics/contextualization")
+async def contextualization_metrics():
+    """
+    Report how often question contextualization skipped the LLM.
+    
+    Returns:
+        Counters per path (no_history, fast_path, cache_hit, llm) and rates
+    """
+    return contextualization_stats.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=Config.API_HOST, port=Config.API_PORT)
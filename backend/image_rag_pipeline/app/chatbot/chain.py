@@ -3,17 +3,20 @@ Conversational chain implementation with memory.
 Enhanced with ConversationSummaryBufferMemory to prevent context drift.
 """
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from operator import itemgetter
 
-from langchain_core.runnables import RunnablePassthrough, RunnableBranch
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationSummaryBufferMemory
+from langchain.memory import ConversationSummaryBufferMemory, ChatMessageHistory
 
 from .prompts import create_contextualize_question_prompt, create_answer_prompt
-from .retrievers import CourseTextRetriever
+from .retrievers import CourseTextRetriever, merge_documents
+from .contextualizer import QuestionContextualizer, needs_contextualization, contextualization_stats
+from .memory_store import SessionMemoryStore, SessionRecord, InMemorySessionStore, TieredSessionStore
 from ..db.vector_store import VectorStore
 from ..ingestion.embedder import Embedder
 from ..utils.lecture_metadata import load_lecture_metadata, create_foundational_context
@@ -21,6 +24,9 @@ from ..utils.lecture_metadata import load_lecture_metadata, create_foundational_
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Runs speculative retrievals while the contextualization LLM call is in flight
+_speculation_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-retrieval")
+
 
 def format_docs(docs) -> str:
     """
@@ -57,7 +63,10 @@ def create_conversational_chain(
     embedder: Embedder,
     llm_model: str = "gemini-1.5-flash-001",
     llm_temperature: float = 0.5,
-    top_k: int = 5
+    top_k: int = 5,
+    speculative_retrieval: bool = True,
+    speculation_similarity_threshold: float = 0.9,
+    lexical_indexes=None
 ):
     """
     Create a conversational RAG chain with history awareness and foundational context.
@@ -68,6 +77,13 @@ def create_conversational_chain(
     3. Retrieves relevant documents from the vector store
     4. Generates an answer using the LLM with the context
     
+    In speculative mode, when a follow-up needs LLM reformulation, retrieval
+    on the raw message starts in parallel with the reformulation. If the
+    reformulated question embeds close to the raw one the speculative results
+    are reused; otherwise a second retrieval runs, its results rank first and
+    the speculative results only fill leftover slots. Cached reformulations
+    skip the speculative retrieval.
+    
     Args:
         course_id: Course identifier (e.g., "MS5260")
         lecture_id: Lecture identifier (e.g., "MIS_lec_1-3")
@@ -76,9 +92,14 @@ def create_conversational_chain(
         llm_model: LLM model name (default: gemini-1.5-flash-001, also try gemini-2.0-flash or gemini-1.5-pro-001)
         llm_temperature: LLM temperature (default: 0.5 for engaging explanations)
         top_k: Number of documents to retrieve
+        speculative_retrieval: Overlap retrieval with question contextualization
+        speculation_similarity_threshold: Cosine similarity above which the speculative
+            results are reused for the reformulated question
+        lexical_indexes: LexicalIndexManager for hybrid BM25 + vector retrieval (optional)
         
     Returns:
-        Runnable chain that takes {"input": str, "chat_history": List} and returns answer
+        Runnable chain that takes {"input": str, "chat_history": List, "session_id": Optional[str]}
+        and returns answer
     """
     logger.info(f"Creating conversational chain for {course_id}/{lecture_id} with model {llm_model}")
     
@@ -122,7 +143,8 @@ def create_conversational_chain(
         lecture_id=lecture_id,
         vector_store=vector_store,
         embedder=embedder,
-        top_k=top_k
+        top_k=top_k,
+        lexical_indexes=lexical_indexes
     )
     
     # Create a chain that contextualizes the question
@@ -132,6 +154,9 @@ def create_conversational_chain(
     contextualize_question_prompt = create_contextualize_question_prompt(foundational_context)
     contextualize_question_chain = contextualize_question_prompt | llm | StrOutputParser()
     
+    # Standalone questions skip the LLM round trip entirely (local classifier + cache)
+    contextualizer = QuestionContextualizer(reformulate=contextualize_question_chain.invoke)
+    
     # Helper function to log contextualization (PILLAR 3: Enhanced Logging)
     def contextualize_with_logging(x):
         """
@@ -141,11 +166,19 @@ def create_conversational_chain(
         original_input = x.get("input", "")
         chat_history = x.get("chat_history", [])
         
+        # No history: nothing to resolve against, use the question as-is
+        if not chat_history:
+            return contextualizer.contextualize(original_input, chat_history)
+        
         logger.info(f"🔄 REFORMULATION STEP")
         logger.info(f"   Original question: '{original_input}'")
         logger.info(f"   Chat history length: {len(chat_history)} messages")
         
-        contextualized = contextualize_question_chain.invoke(x)
+        contextualized = contextualizer.contextualize(
+            original_input,
+            chat_history,
+            session_id=x.get("session_id")
+        )
         
         if original_input != contextualized:
             logger.info(f"   ✅ Reformulated to: '{contextualized}'")
@@ -155,20 +188,62 @@ def create_conversational_chain(
         
         return contextualized
     
-    # Branch: If there's chat history, contextualize the question. Otherwise, use it as-is.
-    contextualized_question = RunnableBranch(
-        # If chat_history is not empty, contextualize the question
-        (
-            lambda x: bool(x.get("chat_history")),
-            contextualize_with_logging
-        ),
-        # Otherwise, just pass through the input
-        itemgetter("input")
-    )
+    # Contextualize the question (pass-through when there's no chat history or it's already standalone)
+    contextualized_question = RunnableLambda(contextualize_with_logging)
+    
+    def retrieve_speculatively(x):
+        """
+        Retrieve on the raw message while the question is being contextualized.
+        """
+        original_input = x.get("input", "")
+        chat_history = x.get("chat_history", [])
+        
+        # Nothing to overlap when no LLM reformulation will happen (or it is already cached)
+        if (
+            not chat_history
+            or not needs_contextualization(original_input)
+            or contextualizer.cached(original_input, chat_history, x.get("session_id")) is not None
+        ):
+            return retriever.search(contextualize_with_logging(x))
+        
+        start = time.perf_counter()
+        raw_embedding = embedder.embed_text(original_input)[0]
+        speculative_future = _speculation_executor.submit(retriever.search, original_input, raw_embedding)
+        
+        contextualized = contextualize_with_logging(x)
+        
+        if contextualized.strip() == original_input.strip():
+            contextualization_stats.record("speculative_reuse")
+            documents = speculative_future.result()
+        else:
+            reformulated_embedding = embedder.embed_text(contextualized)[0]
+            # Embeddings are L2-normalized, so the dot product is the cosine similarity
+            similarity = sum(a * b for a, b in zip(raw_embedding, reformulated_embedding))
+            speculative_documents = speculative_future.result()
+            
+            if similarity >= speculation_similarity_threshold:
+                contextualization_stats.record("speculative_reuse")
+                logger.info(f"   ⚡ Reusing speculative retrieval (similarity {similarity:.3f})")
+                documents = speculative_documents
+            else:
+                contextualization_stats.record("speculative_miss")
+                logger.info(f"   🔁 Reformulation diverged (similarity {similarity:.3f}), retrieving again")
+                # Reformulated hits rank first; raw-message hits only fill leftover slots
+                documents = merge_documents(
+                    retriever.search(contextualized, reformulated_embedding),
+                    speculative_documents,
+                    top_k=top_k
+                )
+        
+        logger.info(f"   ⏱️  Context ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return documents
     
     # Create the retrieval chain
     # This takes the contextualized question and retrieves relevant documents
-    retrieval_chain = contextualized_question | retriever
+    if speculative_retrieval:
+        retrieval_chain = RunnableLambda(retrieve_speculatively)
+    else:
+        retrieval_chain = contextualized_question | retriever
     
     # Create the final answer chain
     # This uses the retrieved documents and chat history to generate an answer
@@ -201,6 +276,10 @@ class ConversationManager:
     - Keeps recent messages in full detail (PILLAR 2: Hybrid Memory)
     - Summarizes older messages to preserve important context
     - Prevents hallucination when conversations get long
+    
+    Session state (buffered messages + rolling summary) lives in a
+    SessionMemoryStore, so it is bounded in process memory, survives
+    restarts and is shared between workers.
     """
     
     def __init__(
@@ -213,7 +292,10 @@ class ConversationManager:
         llm_temperature: float = 0.5,
         top_k: int = 5,
         max_history_messages: int = 6,  # PILLAR 2: Keep last 6 messages in full detail (3 user + 3 AI)
-        max_token_limit: int = 1500  # PILLAR 2: Larger buffer for better context retention
+        max_token_limit: int = 1500,  # PILLAR 2: Larger buffer for better context retention
+        session_store: Optional[SessionMemoryStore] = None,
+        speculative_retrieval: bool = True,
+        lexical_indexes=None
     ):
         """
         Initialize the conversation manager.
@@ -228,6 +310,9 @@ class ConversationManager:
             top_k: Number of documents to retrieve
             max_history_messages: Number of recent messages to keep in full detail
             max_token_limit: Token limit before older messages are summarized
+            session_store: Store for session memory (defaults to a process-local store)
+            speculative_retrieval: Overlap retrieval with question contextualization
+            lexical_indexes: LexicalIndexManager for hybrid retrieval (optional)
         """
         self.course_id = course_id
         self.lecture_id = lecture_id
@@ -251,11 +336,13 @@ class ConversationManager:
             embedder=embedder,
             llm_model=llm_model,
             llm_temperature=llm_temperature,
-            top_k=top_k
+            top_k=top_k,
+            speculative_retrieval=speculative_retrieval,
+            lexical_indexes=lexical_indexes
         )
         
-        # Store conversation memories by session_id (using LangChain's memory)
-        self.session_memories: Dict[str, ConversationSummaryBufferMemory] = {}
+        # Conversation memories are persisted per session_id in the session store
+        self.session_store = session_store or TieredSessionStore(InMemorySessionStore())
     
     def get_or_create_memory(self, session_id: str) -> ConversationSummaryBufferMemory:
         """
@@ -267,21 +354,56 @@ class ConversationManager:
         - Summarizes older messages when token limit (1500) is exceeded
         - Prevents context drift in long conversations
         
+        The memory is rebuilt from the stored record, including the persisted
+        summary, so no summarization call is made on load.
+        
         Args:
             session_id: Unique session identifier
             
         Returns:
             ConversationSummaryBufferMemory instance for the session
         """
-        if session_id not in self.session_memories:
+        record = self.session_store.load(session_id)
+        if record is None:
             logger.info(f"Creating new memory for session {session_id} with summarization")
-            self.session_memories[session_id] = ConversationSummaryBufferMemory(
-                llm=self.llm,
-                max_token_limit=self.max_token_limit,
-                return_messages=True,
-                memory_key="chat_history"
-            )
-        return self.session_memories[session_id]
+            record = SessionRecord(session_id=session_id)
+        
+        messages: List[BaseMessage] = []
+        for msg in record.messages:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            else:
+                messages.append(AIMessage(content=msg["content"]))
+        
+        return ConversationSummaryBufferMemory(
+            llm=self.llm,
+            max_token_limit=self.max_token_limit,
+            return_messages=True,
+            memory_key="chat_history",
+            chat_memory=ChatMessageHistory(messages=messages),
+            moving_summary_buffer=record.summary
+        )
+    
+    def save_memory(self, session_id: str, memory: ConversationSummaryBufferMemory):
+        """
+        Persist a session's buffered messages and rolling summary.
+        
+        Args:
+            session_id: Unique session identifier
+            memory: Memory after save_context (already pruned/summarized)
+        """
+        messages = []
+        for msg in memory.chat_memory.messages:
+            if isinstance(msg, HumanMessage):
+                messages.append({"role": "user", "content": msg.content})
+            elif isinstance(msg, AIMessage):
+                messages.append({"role": "assistant", "content": msg.content})
+        
+        self.session_store.save(SessionRecord(
+            session_id=session_id,
+            messages=messages,
+            summary=memory.moving_summary_buffer
+        ))
     
     def chat(
         self,
@@ -337,7 +459,8 @@ class ConversationManager:
         logger.info(f"\n🚀 INVOKING CHAIN...")
         response = self.chain.invoke({
             "input": message,
-            "chat_history": chat_history
+            "chat_history": chat_history,
+            "session_id": session_id
         })
         
         logger.info(f"\n✅ RESPONSE GENERATED")
@@ -350,6 +473,7 @@ class ConversationManager:
             {"input": message},
             {"output": response}
         )
+        self.save_memory(session_id, memory)
         logger.info(f"💾 Interaction saved to memory")
         logger.info(f"{'='*70}\n")
         
@@ -393,7 +517,8 @@ class ConversationManager:
         # Use the chain's stream method
         for chunk in self.chain.stream({
             "input": message,
-            "chat_history": chat_history
+            "chat_history": chat_history,
+            "session_id": session_id
         }):
             full_response += chunk
             yield chunk
@@ -403,6 +528,7 @@ class ConversationManager:
             {"input": message},
             {"output": full_response}
         )
+        self.save_memory(session_id, memory)
         logger.info(f"💾 Stream complete. Saved full response ({len(full_response)} chars) to memory")
     
     def clear_session(self, session_id: str):
@@ -412,10 +538,8 @@ class ConversationManager:
         Args:
             session_id: Session identifier to clear
         """
-        if session_id in self.session_memories:
-            # Clear the memory
-            self.session_memories[session_id].clear()
-            logger.info(f"Cleared memory for session {session_id}")
+        self.session_store.delete(session_id)
+        logger.info(f"Cleared memory for session {session_id}")
     
     def get_session_history(self, session_id: str) -> List[Dict[str, str]]:
         """
@@ -0,0 +1,238 @@
+"""
+Question contextualization with a local fast path.
+
+Reformulating a follow-up into a standalone question costs a full LLM round
+trip. Most questions students type are already standalone ("What is MIS?"),
+so a cheap local classifier decides first: only questions that look like
+vague follow-ups (the patterns from the few-shot examples in prompts.py, or
+questions leaning on pronouns/anaphora) are sent to the LLM. Reformulations
+are cached per session so a retried message never pays twice.
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Follow-up phrasings that only make sense with the chat history
+# (mirrors the few-shot rules in CONTEXTUALIZE_QUESTION_SYSTEM_PROMPT)
+VAGUE_FOLLOW_UP_PATTERNS = [
+    r"^(next|another)( one| concept| topic| point)?\b",
+    r"\btell me more\b",
+    r"\bmore (details?|info|information|examples?)\b",
+    r"^what else\b",
+    r"^what about\b",
+    r"^how so\b",
+    r"^(and|so|but|also|then)\b",
+    r"^(continue|go on|keep going|elaborate|expand|why|how come|really|example|examples)\W*$",
+    r"\b(give|show|provide)( me| us)? (an?|some|another|more)( \w+)? examples?\b",
+    r"^(any|an|some) (\w+ )?examples?\W*$",
+    r"^(what are )?(the )?(pros and cons|advantages and disadvantages|benefits and drawbacks|"
+    r"strengths and weaknesses)\W*$",
+    r"\b(focus|elaborate|expand) on\b",
+    r"\bthe (difference|relationship|connection|link)\b(?!.*\bbetween\b)",
+    r"\b(the )?(former|latter|above|previous|last) (one|point|concept|answer|example)\b",
+    r"\b(same|similar) (thing|one|concept|idea)\b",
+    r"\bin (simpler|simple|other) (terms|words)\b",
+]
+
+# Follow-ups that hinge on a pronoun. These are matched case-sensitively (the
+# surrounding words use inline (?i:...)) so an acronym such as "IT" in
+# "How is IT used in banking?" is not mistaken for "it".
+ANAPHORIC_FOLLOW_UP_PATTERNS = [
+    r"\b(?i:explain) (that|this|it|them|those|these)\b",
+    r"\b(?i:what does) (that|this|it) (?i:mean)\b",
+    r"\b(?i:(how|why) (is|are|was|were|does|do)) (it|they|that|this|these|those)\b",
+]
+
+# Words that usually refer back to something said earlier
+ANAPHORIC_WORDS = {
+    "it", "its", "itself", "they", "them", "their", "theirs", "themselves",
+    "that", "this", "these", "those", "he", "she", "him", "her", "his",
+    "former", "latter", "such", "there",
+}
+
+# Demonstratives followed by one of these nouns point at the lecture, not the history
+SELF_CONTAINED_DEMONSTRATIVE_TARGETS = {"lecture", "course", "class", "module", "chapter", "subject", "topic"}
+
+_COMPILED_PATTERNS = (
+    [re.compile(p, re.IGNORECASE) for p in VAGUE_FOLLOW_UP_PATTERNS]
+    + [re.compile(p) for p in ANAPHORIC_FOLLOW_UP_PATTERNS]
+)
+_TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z'\-]*")
+
+
+def needs_contextualization(question: str) -> bool:
+    """
+    Decide whether a question depends on the chat history.
+
+    Args:
+        question: The user's latest message
+
+    Returns:
+        True if the question should be reformulated by the LLM
+    """
+    text = question.strip()
+    if not text:
+        return False
+
+    for pattern in _COMPILED_PATTERNS:
+        if pattern.search(text):
+            return True
+
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return True
+
+    for i, token in enumerate(tokens):
+        lower = token.lower()
+        if lower not in ANAPHORIC_WORDS:
+            continue
+        # "IT" (information technology) is an acronym, not a pronoun
+        if token.isupper() and len(token) > 1:
+            continue
+        if lower in ("this", "that", "these", "those") and i + 1 < len(tokens):
+            if tokens[i + 1].lower() in SELF_CONTAINED_DEMONSTRATIVE_TARGETS:
+                continue
+        # "that" as a relative pronoun mid-sentence ("algorithms that sort") is not anaphoric
+        if lower == "that" and 0 < i < len(tokens) - 1:
+            continue
+        return True
+
+    # Very short messages with no substantial word ("why?", "and then?") lean on the history
+    content_words = [t for t in tokens if len(t) > 3]
+    if len(tokens) <= 3 and not content_words:
+        return True
+
+    return False
+
+
+class ContextualizationStats:
+    """Thread-safe counters for how often each contextualization path fires."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"no_history": 0, "fast_path": 0, "llm": 0, "cache_hit": 0}
+
+    def record(self, path: str):
+        """Increment the counter for a path."""
+        with self._lock:
+            self._counts[path] = self._counts.get(path, 0) + 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return current counts plus the fast-path rate among messages with history."""
+        with self._lock:
+            counts = dict(self._counts)
+        with_history = counts["fast_path"] + counts["llm"] + counts["cache_hit"]
+        counts["with_history"] = with_history
+        counts["fast_path_rate"] = round(counts["fast_path"] / with_history, 4) if with_history else 0.0
+        counts["llm_calls_avoided_rate"] = (
+            round((counts["fast_path"] + counts["cache_hit"]) / with_history, 4) if with_history else 0.0
+        )
+        return counts
+
+
+# Shared across conversation managers so metrics survive manager eviction
+contextualization_stats = ContextualizationStats()
+
+
+class QuestionContextualizer:
+    """
+    Turns follow-up questions into standalone questions, calling the LLM only when needed.
+    """
+
+    def __init__(
+        self,
+        reformulate: Callable[[Dict], str],
+        cache_size: int = 2048,
+        stats: Optional[ContextualizationStats] = None
+    ):
+        """
+        Initialize the contextualizer.
+
+        Args:
+            reformulate: LLM reformulation callable taking {"input", "chat_history"}
+            cache_size: Maximum number of cached reformulations
+            stats: Stats collector (defaults to the shared module-level one)
+        """
+        self.reformulate = reformulate
+        self.cache_size = cache_size
+        self.stats = stats or contextualization_stats
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(session_id: Optional[str], question: str, chat_history: List[BaseMessage]) -> str:
+        """
+        Key a reformulation by session and message.
+
+        The last history message is folded in because "Tell me more" means
+        something different after every answer.
+        """
+        last_turn = chat_history[-1].content if chat_history else ""
+        raw = f"{session_id or ''}\x00{question.strip()}\x00{len(chat_history)}\x00{last_turn}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def cached(
+        self,
+        question: str,
+        chat_history: List[BaseMessage],
+        session_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Return the cached reformulation of a question, or None (does not record stats)."""
+        key = self._cache_key(session_id, question, chat_history)
+        with self._lock:
+            return self._cache.get(key)
+
+    def contextualize(
+        self,
+        question: str,
+        chat_history: List[BaseMessage],
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        Return a standalone version of the question.
+
+        Args:
+            question: The user's latest message
+            chat_history: Prior Human/AI messages
+            session_id: Session identifier (used for caching)
+
+        Returns:
+            Standalone question suitable for vector search
+        """
+        if not chat_history:
+            self.stats.record("no_history")
+            return question
+
+        if not needs_contextualization(question):
+            self.stats.record("fast_path")
+            logger.info("   ⚡ Fast path: question is already standalone, skipping LLM reformulation")
+            return question
+
+        key = self._cache_key(session_id, question, chat_history)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            self.stats.record("cache_hit")
+            logger.info("   ♻️  Using cached reformulation")
+            return cached
+
+        self.stats.record("llm")
+        reformulated = self.reformulate({"input": question, "chat_history": chat_history}).strip() or question
+
+        with self._lock:
+            self._cache[key] = reformulated
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return reformulated
@@ -0,0 +1,394 @@
+"""
+Session memory storage for the conversational chatbot.
+
+Chat history used to live in a per-process dict of LangChain memory objects,
+which grew forever, was lost on restart and diverged across workers. Sessions
+are now plain records kept in a bounded in-process hot tier (LRU + TTL) that
+writes through to a durable tier (local SQLite file or MongoDB).
+
+The rolling summary produced by ConversationSummaryBufferMemory is stored with
+the record, so it is computed once and reloaded instead of being re-summarized.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SessionRecord:
+    """Serializable state of one chat session."""
+
+    session_id: str
+    messages: List[Dict[str, str]] = field(default_factory=list)  # [{"role": "user"|"assistant", "content": str}]
+    summary: str = ""  # Rolling summary of messages pruned from the buffer
+    version: int = 0  # Incremented on every save, used to detect stale hot-tier entries
+    updated_at: float = 0.0
+
+
+class SessionMemoryStore:
+    """Interface for session memory backends."""
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        """Load a session record, or None if the session is unknown."""
+        raise NotImplementedError
+
+    def save(self, record: SessionRecord) -> SessionRecord:
+        """Persist a session record and return it with its new version."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """Remove a session and its history."""
+        raise NotImplementedError
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Return the stored version of a session (cheap staleness check)."""
+        record = self.load(session_id)
+        return record.version if record else None
+
+
+class InMemorySessionStore(SessionMemoryStore):
+    """Process-local durable tier (no persistence). Useful for tests and single-worker dev."""
+
+    def __init__(self):
+        self._records: Dict[str, SessionRecord] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None:
+                return None
+            return SessionRecord(
+                session_id=record.session_id,
+                messages=list(record.messages),
+                summary=record.summary,
+                version=record.version,
+                updated_at=record.updated_at
+            )
+
+    def save(self, record: SessionRecord) -> SessionRecord:
+        with self._lock:
+            current = self._records.get(record.session_id)
+            record.version = (current.version if current else 0) + 1
+            record.updated_at = time.time()
+            self._records[record.session_id] = SessionRecord(
+                session_id=record.session_id,
+                messages=list(record.messages),
+                summary=record.summary,
+                version=record.version,
+                updated_at=record.updated_at
+            )
+        return record
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._records.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionMemoryStore):
+    """Durable tier backed by a local SQLite file (safe to share between workers on one host)."""
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the SQLite store.
+
+        Args:
+            db_path: Path to the SQLite database file (created if missing)
+        """
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        logger.info(f"Session store ready at SQLite file: {db_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return a per-thread connection (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            # WAL lets readers in other workers proceed while one worker writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        row = self._connect().execute(
+            "SELECT messages, summary, version, updated_at FROM chat_sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return SessionRecord(
+            session_id=session_id,
+            messages=json.loads(row[0]),
+            summary=row[1],
+            version=row[2],
+            updated_at=row[3]
+        )
+
+    def save(self, record: SessionRecord) -> SessionRecord:
+        conn = self._connect()
+        record.updated_at = time.time()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO chat_sessions (session_id, messages, summary, version, updated_at)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    messages = excluded.messages,
+                    summary = excluded.summary,
+                    version = chat_sessions.version + 1,
+                    updated_at = excluded.updated_at
+                """,
+                (record.session_id, json.dumps(record.messages), record.summary, record.updated_at)
+            )
+            row = conn.execute(
+                "SELECT version FROM chat_sessions WHERE session_id = ?",
+                (record.session_id,)
+            ).fetchone()
+        record.version = row[0]
+        return record
+
+    def delete(self, session_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        row = self._connect().execute(
+            "SELECT version FROM chat_sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+
+class MongoSessionStore(SessionMemoryStore):
+    """
+    Durable tier backed by MongoDB.
+
+    Each session is one document in `tutor_session_state` holding the buffered
+    messages, the rolling summary and the version, so a save is a single atomic
+    upsert: a crash or a concurrent save can never leave a half-replaced history.
+    """
+
+    def __init__(self, mongodb_url: str, database_name: str):
+        """
+        Initialize the MongoDB store.
+
+        Args:
+            mongodb_url: MongoDB connection string
+            database_name: Database that holds the tutor collections
+        """
+        # pymongo is only needed when this backend is selected
+        from pymongo import ASCENDING, MongoClient
+
+        self.client = MongoClient(mongodb_url)
+        db = self.client[database_name]
+        self.state_collection = db.tutor_session_state
+
+        self.state_collection.create_index(
+            [("session_id", ASCENDING)],
+            unique=True,
+            name="session_id_unique"
+        )
+        logger.info(f"Session store ready at MongoDB database: {database_name}")
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        state = self.state_collection.find_one({"session_id": session_id})
+        if state is None:
+            return None
+
+        return SessionRecord(
+            session_id=session_id,
+            messages=[
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in state.get("messages", [])
+            ],
+            summary=state.get("summary", ""),
+            version=state.get("version", 0),
+            updated_at=state.get("updated_at", 0.0)
+        )
+
+    def save(self, record: SessionRecord) -> SessionRecord:
+        from pymongo import ReturnDocument
+
+        record.updated_at = time.time()
+
+        # Replace the buffered messages; pruned messages only survive through the summary
+        state = self.state_collection.find_one_and_update(
+            {"session_id": record.session_id},
+            {
+                "$set": {
+                    "messages": [
+                        {"role": msg["role"], "content": msg["content"]}
+                        for msg in record.messages
+                    ],
+                    "summary": record.summary,
+                    "updated_at": record.updated_at,
+                    "last_saved": datetime.now(timezone.utc)
+                },
+                "$inc": {"version": 1}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        record.version = state["version"]
+        return record
+
+    def delete(self, session_id: str):
+        self.state_collection.delete_one({"session_id": session_id})
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        state = self.state_collection.find_one(
+            {"session_id": session_id},
+            projection={"_id": 0, "version": 1}
+        )
+        return state.get("version", 0) if state else None
+
+
+class TieredSessionStore(SessionMemoryStore):
+    """
+    Bounded hot tier (LRU + TTL) in front of a durable store.
+
+    Writes go through to the durable tier immediately. Reads are served from
+    the hot tier when the cached version still matches the durable version, so
+    a worker never answers from history another worker has since extended.
+    """
+
+    def __init__(
+        self,
+        durable: SessionMemoryStore,
+        max_sessions: int = 1000,
+        ttl_seconds: float = 1800,
+        revalidate: bool = True
+    ):
+        """
+        Initialize the tiered store.
+
+        Args:
+            durable: Durable backing store
+            max_sessions: Maximum number of sessions kept in process memory
+            ttl_seconds: Seconds after last access before a hot entry expires
+            revalidate: Check the durable version before serving a hot entry
+        """
+        self.durable = durable
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.revalidate = revalidate
+        self._hot: "OrderedDict[str, tuple]" = OrderedDict()  # session_id -> (record, last_access)
+        self._lock = threading.Lock()
+
+    def _get_hot(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            entry = self._hot.get(session_id)
+            if entry is None:
+                return None
+            record, last_access = entry
+            if time.monotonic() - last_access > self.ttl_seconds:
+                del self._hot[session_id]
+                return None
+            self._hot[session_id] = (record, time.monotonic())
+            self._hot.move_to_end(session_id)
+            return record
+
+    def _put_hot(self, record: SessionRecord):
+        with self._lock:
+            self._hot[record.session_id] = (record, time.monotonic())
+            self._hot.move_to_end(record.session_id)
+            while len(self._hot) > self.max_sessions:
+                evicted_id, _ = self._hot.popitem(last=False)
+                logger.debug(f"Evicted session {evicted_id} from hot tier")
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._get_hot(session_id)
+        if record is not None:
+            if not self.revalidate or self.durable.get_version(session_id) == record.version:
+                return record
+            logger.info(f"Hot entry for session {session_id} is stale, reloading")
+
+        record = self.durable.load(session_id)
+        if record is not None:
+            self._put_hot(record)
+        return record
+
+    def save(self, record: SessionRecord) -> SessionRecord:
+        record = self.durable.save(record)
+        self._put_hot(record)
+        return record
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._hot.pop(session_id, None)
+        self.durable.delete(session_id)
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        return self.durable.get_version(session_id)
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+
+def create_session_store(
+    backend: str = "sqlite",
+    sqlite_path: Optional[str] = None,
+    mongodb_url: Optional[str] = None,
+    database_name: Optional[str] = None,
+    max_sessions: int = 1000,
+    ttl_seconds: float = 1800
+) -> TieredSessionStore:
+    """
+    Build a tiered session store for the configured durable backend.
+
+    Args:
+        backend: 'sqlite', 'mongo' or 'memory'
+        sqlite_path: SQLite file path (required for 'sqlite')
+        mongodb_url: MongoDB connection string (required for 'mongo')
+        database_name: MongoDB database name (required for 'mongo')
+        max_sessions: Hot-tier capacity
+        ttl_seconds: Hot-tier TTL
+
+    Returns:
+        TieredSessionStore wrapping the durable backend
+    """
+    backend = (backend or "sqlite").lower()
+
+    if backend == "mongo":
+        if not mongodb_url or not database_name:
+            raise ValueError("MongoDB session store requires MONGODB_URL and DATABASE_NAME")
+        durable = MongoSessionStore(mongodb_url, database_name)
+    elif backend == "sqlite":
+        if not sqlite_path:
+            raise ValueError("SQLite session store requires a database path")
+        durable = SQLiteSessionStore(sqlite_path)
+    elif backend == "memory":
+        durable = InMemorySessionStore()
+    else:
+        raise ValueError(f"Unknown session store backend: {backend}")
+
+    logger.info(f"Using '{backend}' session store (hot tier: {max_sessions} sessions, TTL {ttl_seconds}s)")
+    return TieredSessionStore(durable, max_sessions=max_sessions, ttl_seconds=ttl_seconds)
@@ -3,7 +3,7 @@ LangChain retriever integration for the Image-RAG pipeline.
 Wraps our existing ImageRetriever to work with LangChain's ecosystem.
 """
 import logging
-from typing import List, Optional
+from typing import Any, List, Optional
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
@@ -29,6 +29,7 @@ class CourseTextRetriever(BaseRetriever):
     embedder: Embedder
     top_k: int = 5
     lecture_id: Optional[str] = None
+    lexical_indexes: Optional[Any] = None  # LexicalIndexManager; enables hybrid search
     
     class Config:
         """Pydantic config."""
@@ -41,6 +42,7 @@ class CourseTextRetriever(BaseRetriever):
         embedder: Embedder,
         top_k: int = 5,
         lecture_id: Optional[str] = None,
+        lexical_indexes: Optional[Any] = None,
         **kwargs
     ):
         """
@@ -51,6 +53,8 @@ class CourseTextRetriever(BaseRetriever):
             vector_store: Vector store instance
             embedder: Embedder instance
             top_k: Number of results to retrieve
+            lecture_id: Optional lecture filter
+            lexical_indexes: LexicalIndexManager for hybrid BM25 + vector search (optional)
         """
         super().__init__(
             course_id=course_id,
@@ -58,6 +62,7 @@ class CourseTextRetriever(BaseRetriever):
             embedder=embedder,
             top_k=top_k,
             lecture_id=lecture_id,
+            lexical_indexes=lexical_indexes,
             **kwargs
         )
         # Store lecture_id separately (not handled by BaseRetriever/Pydantic automatically)
@@ -78,6 +83,19 @@ class CourseTextRetriever(BaseRetriever):
             query: User's question
             run_manager: LangChain callback manager
             
+        Returns:
+            List of LangChain Document objects
+        """
+        return self.search(query)
+    
+    def search(self, query: str, query_embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Retrieve relevant documents, optionally reusing a precomputed query embedding.
+        
+        Args:
+            query: User's question
+            query_embedding: Embedding of the query (computed if None)
+            
         Returns:
             List of LangChain Document objects
         """
@@ -86,14 +104,16 @@ class CourseTextRetriever(BaseRetriever):
         # Create retriever on-the-fly (avoids Pydantic attribute issues)
         retriever = ImageRetriever(
             vector_store=self.vector_store,
-            embedder=self.embedder
+            embedder=self.embedder,
+            lexical_indexes=self.lexical_indexes
         )
         
-        results = retriever.query_text_to_text(
+        results = retriever.query_text_hybrid(
             query=query,
             course_id=self.course_id,
             top_k=self.top_k,
-            lecture_id=self.lecture_id
+            lecture_id=self.lecture_id,
+            query_embedding=query_embedding
         )
         
         # Convert to LangChain Document format
@@ -127,3 +147,30 @@ class CourseTextRetriever(BaseRetriever):
         logger.info(f"Retrieved {len(documents)} documents")
         return documents
 
+
+def merge_documents(*document_lists: List[Document], top_k: int = 5) -> List[Document]:
+    """
+    Merge several retrieval results in priority order, deduplicating by flashcard_id.
+    
+    The first list keeps its own ranking; each later list only tops up the
+    slots left over, so fallback results never displace the preferred ones.
+    
+    Args:
+        document_lists: Lists of Documents from separate retrievals, best source first
+        top_k: Maximum number of documents to return
+        
+    Returns:
+        Deduplicated list of at most top_k Documents
+    """
+    merged: List[Document] = []
+    seen = set()
+    for documents in document_lists:
+        for doc in documents:
+            if len(merged) >= top_k:
+                return merged
+            key = doc.metadata.get("flashcard_id") or doc.page_content
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(doc)
+    return merged
@@ -5,7 +5,11 @@ Manages course-specific collections for storing and retrieving embeddings.
 import logging
 from typing import List, Dict, Any, Optional
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.models import (
+    Distance, VectorParams, VectorParamsDiff, PointStruct, Filter, FieldCondition, MatchValue,
+    PointIdsList, PayloadSchemaType, HnswConfigDiff, SearchParams, ScalarQuantization,
+    ScalarQuantizationConfig, ScalarType, QuantizationSearchParams, QueryRequest, Disabled
+)
 
 try:
     from ..utils.config import Config
@@ -15,15 +19,36 @@ except ImportError:
         QDRANT_HOST = "localhost"
         QDRANT_PORT = 6333
         QDRANT_PATH = "data/embeddings"
+        QDRANT_HNSW_M = 16
+        QDRANT_HNSW_EF_CONSTRUCT = 100
+        QDRANT_SEARCH_EF = 128
+        QDRANT_QUANTIZATION = "none"
+        QDRANT_QUANTIZATION_RESCORE = True
+        QDRANT_QUANTIZATION_OVERSAMPLING = 2.0
+        QDRANT_ON_DISK_VECTORS = False
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Payload fields every search filters on
+PAYLOAD_INDEX_FIELDS = ("type", "lecture_id", "flashcard_id")
+
+
 class VectorStore:
     """Wrapper for Qdrant vector database operations."""
     
-    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, path: Optional[str] = None):
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        path: Optional[str] = None,
+        hnsw_m: Optional[int] = None,
+        hnsw_ef_construct: Optional[int] = None,
+        search_ef: Optional[int] = None,
+        quantization: Optional[str] = None,
+        on_disk_vectors: Optional[bool] = None
+    ):
         """
         Initialize Qdrant client.
         
@@ -31,6 +56,11 @@ class VectorStore:
             host: Qdrant server host (defaults to Config.QDRANT_HOST)
             port: Qdrant server port (defaults to Config.QDRANT_PORT)
             path: Path for local persistence (defaults to Config.QDRANT_PATH, if None uses host:port)
+            hnsw_m: HNSW graph degree (defaults to Config.QDRANT_HNSW_M)
+            hnsw_ef_construct: HNSW build-time beam width (defaults to Config.QDRANT_HNSW_EF_CONSTRUCT)
+            search_ef: HNSW search-time beam width (defaults to Config.QDRANT_SEARCH_EF)
+            quantization: 'none' or 'int8' scalar quantization (defaults to Config.QDRANT_QUANTIZATION)
+            on_disk_vectors: Keep original vectors on disk (defaults to Config.QDRANT_ON_DISK_VECTORS)
         """
         # Use Config defaults if not provided
         if path is None:
@@ -40,13 +70,27 @@ class VectorStore:
         if port is None:
             port = Config.QDRANT_PORT
         
+        # m=0 is meaningful (disables the HNSW graph), so only None means "use the default"
+        self.hnsw_m = Config.QDRANT_HNSW_M if hnsw_m is None else hnsw_m
+        self.hnsw_ef_construct = Config.QDRANT_HNSW_EF_CONSTRUCT if hnsw_ef_construct is None else hnsw_ef_construct
+        self.search_ef = Config.QDRANT_SEARCH_EF if search_ef is None else search_ef
+        self.quantization = (quantization or Config.QDRANT_QUANTIZATION).lower()
+        self.on_disk_vectors = Config.QDRANT_ON_DISK_VECTORS if on_disk_vectors is None else on_disk_vectors
+        if self.quantization not in ("none", "int8"):
+            raise ValueError(f"Unsupported quantization: {self.quantization} (expected 'none' or 'int8')")
+        
         # Prefer local path if provided, otherwise use host/port
         if path and not path.startswith("http"):
             self.client = QdrantClient(path=path)
+            self.is_local = True
             logger.info(f"Connected to Qdrant at local path: {path}")
         else:
             self.client = QdrantClient(host=host, port=port)
+            self.is_local = False
             logger.info(f"Connected to Qdrant at {host}:{port}")
+        
+        # Collections known to exist (avoids a get_collections() round trip per ingestion)
+        self._known_collections = set()
     
     def create_collection(self, course_id: str, vector_size: int = 512):
         """
@@ -58,24 +102,128 @@ class VectorStore:
         """
         collection_name = f"course_{course_id}"
         
+        if collection_name in self._known_collections:
+            return
+        
         # Check if collection already exists
         collections = self.client.get_collections().collections
         if any(col.name == collection_name for col in collections):
             logger.info(f"Collection {collection_name} already exists")
+            self._known_collections.add(collection_name)
             return
         
         self.client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
+            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE, on_disk=self.on_disk_vectors),
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config()
         )
+        self._create_payload_indexes(collection_name)
+        self._known_collections.add(collection_name)
         logger.info(f"Created collection: {collection_name}")
     
+    def _hnsw_config(self) -> HnswConfigDiff:
+        """HNSW build parameters for course collections."""
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+    
+    def _quantization_config(self) -> Optional[ScalarQuantization]:
+        """int8 scalar quantization (quantized vectors kept in RAM), or None."""
+        if self.quantization != "int8":
+            return None
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    
+    def _search_params(self) -> SearchParams:
+        """Search-time HNSW beam width, plus rescoring when vectors are quantized."""
+        quantization = None
+        if self.quantization == "int8":
+            quantization = QuantizationSearchParams(
+                rescore=Config.QDRANT_QUANTIZATION_RESCORE,
+                oversampling=Config.QDRANT_QUANTIZATION_OVERSAMPLING
+            )
+        return SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
+    
+    def _create_payload_indexes(self, collection_name: str):
+        """
+        Create keyword indexes on the payload fields searches filter by.
+        
+        Skipped for the local (path) client, which has no payload indexes.
+        """
+        if self.is_local:
+            return
+        for field_name in PAYLOAD_INDEX_FIELDS:
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+    
+    def list_course_collections(self) -> List[str]:
+        """Return the course IDs of all course_* collections."""
+        return sorted(
+            col.name[len("course_"):]
+            for col in self.client.get_collections().collections
+            if col.name.startswith("course_")
+        )
+    
+    def apply_schema(self, course_id: str) -> Dict[str, Any]:
+        """
+        Bring an existing course collection up to the configured schema:
+        payload indexes, HNSW parameters, quantization and on-disk vectors.
+        
+        Args:
+            course_id: Course identifier
+            
+        Returns:
+            Summary of what was applied
+        """
+        collection_name = f"course_{course_id}"
+        
+        if self.is_local:
+            # Local mode runs exact search in-process: indexes, HNSW and
+            # quantization settings do not apply, so there is nothing to migrate
+            logger.info(f"{collection_name}: local Qdrant storage, schema settings not applicable")
+            return {"collection": collection_name, "applied": False, "reason": "local storage"}
+        
+        info = self.client.get_collection(collection_name)
+        existing_indexes = set((info.payload_schema or {}).keys())
+        missing_indexes = [field for field in PAYLOAD_INDEX_FIELDS if field not in existing_indexes]
+        for field_name in missing_indexes:
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+        
+        # None would leave existing quantization in place, so switching it off needs an explicit disable
+        self.client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": VectorParamsDiff(on_disk=self.on_disk_vectors)},
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config() or Disabled.DISABLED
+        )
+        
+        summary = {
+            "collection": collection_name,
+            "applied": True,
+            "points": info.points_count,
+            "created_payload_indexes": missing_indexes,
+            "hnsw": {"m": self.hnsw_m, "ef_construct": self.hnsw_ef_construct},
+            "quantization": self.quantization,
+            "on_disk_vectors": self.on_disk_vectors
+        }
+        logger.info(f"Applied schema to {collection_name}: {summary}")
+        return summary
+    
     def insert_embeddings(
         self,
         course_id: str,
         embeddings: List[List[float]],
         metadata: List[Dict[str, Any]],
-        ids: List[Any]  # Accept both int and str IDs
+        ids: List[Any],  # Accept both int and str IDs
+        batch_size: int = 256,
+        wait: bool = True
     ):
         """
         Insert embeddings with metadata into a course collection.
@@ -85,6 +233,8 @@ class VectorStore:
             embeddings: List of embedding vectors
             metadata: List of metadata dictionaries (must include 'type': 'text' or 'image')
             ids: List of unique IDs for each embedding
+            batch_size: Points per upsert request
+            wait: Wait for each upsert to be applied (False lets the server apply it asynchronously)
         """
         collection_name = f"course_{course_id}"
         
@@ -97,11 +247,32 @@ class VectorStore:
             for id_val, embedding, meta in zip(ids, embeddings, metadata)
         ]
         
-        self.client.upsert(
+        for start in range(0, len(points), batch_size):
+            self.client.upsert(
+                collection_name=collection_name,
+                points=points[start:start + batch_size],
+                wait=wait
+            )
+        logger.info(f"Inserted {len(points)} embeddings into {collection_name}")
+    
+    def delete_points(self, course_id: str, ids: List[Any], wait: bool = True):
+        """
+        Delete points by ID from a course collection.
+        
+        Args:
+            course_id: Course identifier
+            ids: Point IDs to delete
+            wait: Wait for the deletion to be applied
+        """
+        if not ids:
+            return
+        collection_name = f"course_{course_id}"
+        self.client.delete(
             collection_name=collection_name,
-            points=points
+            points_selector=PointIdsList(points=list(ids)),
+            wait=wait
         )
-        logger.info(f"Inserted {len(points)} embeddings into {collection_name}")
+        logger.info(f"Deleted {len(ids)} points from {collection_name}")
     
     def search(
         self,
@@ -119,13 +290,59 @@ class VectorStore:
             query_vector: Query embedding vector
             filter_type: Filter by 'type' field ('text' or 'image')
             top_k: Number of results to return
+            lecture_id: Optional lecture filter
             
         Returns:
             List of search results with scores and metadata
         """
         collection_name = f"course_{course_id}"
         
-        # Build filter if specified
+        response = self.client.query_points(
+            collection_name=collection_name,
+            query=query_vector,
+            query_filter=self._build_filter(filter_type, lecture_id),
+            search_params=None if self.is_local else self._search_params(),
+            limit=top_k
+        )
+        
+        return self._format_points(response.points)
+    
+    def search_batch(self, course_id: str, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Run several searches against a course collection in one round trip.
+        
+        Args:
+            course_id: Course identifier
+            requests: One dict per query with 'query_vector' and optional
+                      'filter_type', 'lecture_id' and 'top_k' (default 5)
+            
+        Returns:
+            One result list per request, in request order (same shape as search)
+        """
+        if not requests:
+            return []
+        collection_name = f"course_{course_id}"
+        search_params = None if self.is_local else self._search_params()
+        
+        query_requests = [
+            QueryRequest(
+                query=request["query_vector"],
+                filter=self._build_filter(request.get("filter_type"), request.get("lecture_id")),
+                params=search_params,
+                limit=request.get("top_k", 5),
+                with_payload=True
+            )
+            for request in requests
+        ]
+        responses = self.client.query_batch_points(
+            collection_name=collection_name,
+            requests=query_requests
+        )
+        return [self._format_points(response.points) for response in responses]
+    
+    @staticmethod
+    def _build_filter(filter_type: Optional[str] = None, lecture_id: Optional[str] = None) -> Optional[Filter]:
+        """Build the payload filter for a search (None when unfiltered)."""
         must_conditions = []
         
         if filter_type:
@@ -144,29 +361,42 @@ class VectorStore:
                 )
             )
         
-        query_filter = Filter(must=must_conditions) if must_conditions else None
-        
-        response = self.client.query_points(
-            collection_name=collection_name,
-            query=query_vector,
-            query_filter=query_filter,
-            limit=top_k
-        )
-        
-        results = response.points
-        
+        return Filter(must=must_conditions) if must_conditions else None
+    
+    @staticmethod
+    def _format_points(points) -> List[Dict[str, Any]]:
+        """Convert scored points to result dicts."""
         return [
             {
                 "id": result.id,
                 "score": result.score,
                 "metadata": result.payload
             }
-            for result in results
+            for result in points
         ]
     
+    def count_points(self, course_id: str, filter_type: Optional[str] = None) -> int:
+        """
+        Count points in a course collection.
+        
+        Args:
+            course_id: Course identifier
+            filter_type: Only count points with this 'type' (e.g. 'text', 'text_facet')
+            
+        Returns:
+            Exact number of matching points
+        """
+        collection_name = f"course_{course_id}"
+        return self.client.count(
+            collection_name=collection_name,
+            count_filter=self._build_filter(filter_type),
+            exact=True
+        ).count
+    
     def delete_collection(self, course_id: str):
         """Delete a course collection."""
         collection_name = f"course_{course_id}"
         self.client.delete_collection(collection_name=collection_name)
+        self._known_collections.discard(collection_name)
         logger.info(f"Deleted collection: {collection_name}")
 
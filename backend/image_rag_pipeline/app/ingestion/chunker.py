@@ -1,13 +1,28 @@
 """
 Text chunking module.
 Splits extracted text into manageable chunks for embedding.
+
+TokenAwareChunker sizes chunks with the embedder's own tokenizer (CLIP sees
+77 tokens) and never crosses the '--- Page N ---' slide boundaries that
+PDFExtractor emits. TextChunker is the original character-based splitter.
 """
 import logging
-from typing import List, Dict
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Page separator written by PDFExtractor / IngestionPipeline.ingest_pdf
+PAGE_MARKER_RE = re.compile(r"\n--- Page (\d+) ---\n")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough token count (words + punctuation) for when no tokenizer is available."""
+    return len(_APPROX_TOKEN_RE.findall(text))
+
 
 class TextChunker:
     """Split text into chunks with metadata."""
@@ -35,38 +50,253 @@ class TextChunker:
         Returns:
             List of chunk dictionaries with text and metadata
         """
-        chunks = []
-        start = 0
-        chunk_index = 0
+        chunks = list(self.chunk_stream([text], pdf_id, pdf_path))
+        logger.info(f"Created {len(chunks)} chunks from text")
+        return chunks
+    
+    def chunk_stream(self, texts: Iterable[str], pdf_id: str, pdf_path: str) -> Iterator[Dict]:
+        """
+        Chunk a stream of text pieces (e.g. pages) without materializing the full text.
         
-        while start < len(text):
-            end = start + self.chunk_size
-            chunk_text = text[start:end]
-            
-            # Try to break at sentence or word boundary
-            if end < len(text) and not text[end].isspace():
-                # Look for last period or space
-                last_period = chunk_text.rfind('.')
-                last_space = chunk_text.rfind(' ')
-                break_point = max(last_period, last_space)
-                
-                if break_point > self.chunk_size // 2:  # Only break if we're past halfway
-                    chunk_text = chunk_text[:break_point + 1]
-                    end = start + break_point + 1
+        Produces exactly the chunks chunk() would for the concatenated pieces,
+        buffering only the text not yet emitted.
+        
+        Args:
+            texts: Text pieces in document order
+            pdf_id: PDF identifier
+            pdf_path: Path to source PDF
             
-            # Skip empty chunks
+        Yields:
+            Chunk dictionaries with text and metadata
+        """
+        buffer = ""
+        start = 0  # Chunk start, relative to buffer
+        chunk_index = 0
+        
+        for piece in texts:
+            buffer = buffer[start:] + piece
+            start = 0
+            # A chunk can be cut once the character after it is known
+            while start + self.chunk_size < len(buffer):
+                chunk_text, end = self._next_chunk(buffer, start)
+                if chunk_text.strip():
+                    yield self._make_chunk(chunk_text, chunk_index, pdf_id, pdf_path)
+                    chunk_index += 1
+                start = end - self.overlap
+        
+        # End of stream: the rest of the buffer is the tail of the text
+        while start < len(buffer):
+            chunk_text, end = self._next_chunk(buffer, start)
             if chunk_text.strip():
-                chunks.append({
-                    "id": f"{pdf_id}_chunk_{chunk_index}",
-                    "text": chunk_text.strip(),
-                    "pdf_id": pdf_id,
-                    "pdf_path": pdf_path,
-                    "chunk_index": chunk_index
-                })
+                yield self._make_chunk(chunk_text, chunk_index, pdf_id, pdf_path)
                 chunk_index += 1
-            
             start = end - self.overlap
+    
+    def _next_chunk(self, text: str, start: int) -> Tuple[str, int]:
+        """Cut one chunk starting at start; returns its text and end offset."""
+        end = start + self.chunk_size
+        chunk_text = text[start:end]
         
-        logger.info(f"Created {len(chunks)} chunks from text")
-        return chunks
+        # Try to break at sentence or word boundary
+        if end < len(text) and not text[end].isspace():
+            # Look for last period or space
+            last_period = chunk_text.rfind('.')
+            last_space = chunk_text.rfind(' ')
+            break_point = max(last_period, last_space)
+            
+            if break_point > self.chunk_size // 2:  # Only break if we're past halfway
+                chunk_text = chunk_text[:break_point + 1]
+                end = start + break_point + 1
+        
+        return chunk_text, end
+    
+    @staticmethod
+    def _make_chunk(chunk_text: str, chunk_index: int, pdf_id: str, pdf_path: str) -> Dict:
+        """Build a chunk dictionary."""
+        return {
+            "id": f"{pdf_id}_chunk_{chunk_index}",
+            "text": chunk_text.strip(),
+            "pdf_id": pdf_id,
+            "pdf_path": pdf_path,
+            "chunk_index": chunk_index
+        }
+
 
+class TokenAwareChunker:
+    """
+    Pack whole lines/sentences of each page into chunks that fit the embedder's context.
+    
+    Each unit (a line, or a sentence of a long line) is tokenized once and
+    units are packed greedily, so chunking is linear in the text length.
+    Token counts of whitespace-separated units add up under CLIP's BPE
+    tokenizer, so the packed count equals the count of the joined chunk.
+    """
+    
+    def __init__(
+        self,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        max_tokens: int = 75,
+        overlap_tokens: int = 0
+    ):
+        """
+        Initialize chunker.
+        
+        Args:
+            count_tokens: Token counter of the embedding model (defaults to an approximation)
+            max_tokens: Maximum tokens per chunk (CLIP: 77 minus start/end tokens)
+            overlap_tokens: Trailing units of up to this many tokens repeated at the next chunk's start
+        """
+        self.count_tokens = count_tokens or approximate_token_count
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.last_stats: Dict = {}
+    
+    def chunk(self, text: str, pdf_id: str, pdf_path: str) -> List[Dict]:
+        """
+        Split text into chunks.
+        
+        Args:
+            text: Full text to chunk (may contain page markers)
+            pdf_id: PDF identifier
+            pdf_path: Path to source PDF
+            
+        Returns:
+            List of chunk dictionaries with text, page_number, token_count and metadata
+        """
+        return list(self.chunk_stream([text], pdf_id, pdf_path))
+    
+    def chunk_stream(self, texts: Iterable[str], pdf_id: str, pdf_path: str) -> Iterator[Dict]:
+        """
+        Chunk a stream of text pieces, one page at a time.
+        
+        Only the current page is buffered. Statistics of the run are
+        available in last_stats once the stream is exhausted.
+        
+        Args:
+            texts: Text pieces in document order (e.g. one per page, with page markers)
+            pdf_id: PDF identifier
+            pdf_path: Path to source PDF
+            
+        Yields:
+            Chunk dictionaries with text, page_number, token_count and metadata
+        """
+        stats = {"pages": 0, "chunks": 0, "tokens": 0, "max_chunk_tokens": 0, "oversized_units": 0}
+        chunk_index = 0
+        buffer = ""
+        page_number = None
+        
+        for piece in texts:
+            buffer += piece
+            while True:
+                # A marker at the start opens a page
+                match = PAGE_MARKER_RE.match(buffer)
+                if match:
+                    page_number = int(match.group(1))
+                    buffer = buffer[match.end():]
+                    continue
+                # Any later marker closes the page before it
+                match = PAGE_MARKER_RE.search(buffer, 1)
+                if match is None:
+                    break
+                page_text, buffer = buffer[:match.start()], buffer[match.start():]
+                for chunk in self._chunk_page(page_text, page_number, stats):
+                    yield self._make_chunk(chunk, chunk_index, pdf_id, pdf_path)
+                    chunk_index += 1
+        
+        for chunk in self._chunk_page(buffer, page_number, stats):
+            yield self._make_chunk(chunk, chunk_index, pdf_id, pdf_path)
+            chunk_index += 1
+        
+        stats["mean_chunk_tokens"] = round(stats["tokens"] / stats["chunks"], 1) if stats["chunks"] else 0.0
+        stats["fill_ratio"] = round(stats["mean_chunk_tokens"] / self.max_tokens, 3)
+        self.last_stats = stats
+        logger.info(f"Created {stats['chunks']} chunks from {stats['pages']} pages: {stats}")
+    
+    def _chunk_page(self, page_text: str, page_number: Optional[int], stats: Dict) -> Iterator[Dict]:
+        """Pack one page's units into chunks."""
+        units = list(self._units(page_text, stats))
+        if not units:
+            return
+        stats["pages"] += 1
+        
+        current: List[Tuple[str, str, int]] = []  # (joiner, text, tokens)
+        current_tokens = 0
+        for unit in units:
+            if current and current_tokens + unit[2] > self.max_tokens:
+                yield self._emit(current, current_tokens, page_number, stats)
+                current, current_tokens = self._overlap(current)
+                # Drop carried context that would not leave room for this unit
+                while current and current_tokens + unit[2] > self.max_tokens:
+                    current_tokens -= current.pop(0)[2]
+            current.append(unit)
+            current_tokens += unit[2]
+        if current:
+            yield self._emit(current, current_tokens, page_number, stats)
+    
+    def _units(self, page_text: str, stats: Dict) -> Iterator[Tuple[str, str, int]]:
+        """Split a page into (joiner, text, tokens) units no longer than max_tokens where possible."""
+        for line in page_text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            tokens = self.count_tokens(line)
+            if tokens <= self.max_tokens:
+                yield ("\n", line, tokens)
+                continue
+            joiner = "\n"
+            for sentence in _SENTENCE_SPLIT_RE.split(line):
+                sentence_tokens = self.count_tokens(sentence)
+                if sentence_tokens <= self.max_tokens:
+                    yield (joiner, sentence, sentence_tokens)
+                else:
+                    yield from self._split_words(joiner, sentence, stats)
+                joiner = " "
+    
+    def _split_words(self, joiner: str, sentence: str, stats: Dict) -> Iterator[Tuple[str, str, int]]:
+        """Split an over-long sentence into word runs that fit max_tokens."""
+        words: List[str] = []
+        tokens = 0
+        for word in sentence.split():
+            word_tokens = self.count_tokens(word)
+            if words and tokens + word_tokens > self.max_tokens:
+                yield (joiner, " ".join(words), tokens)
+                joiner, words, tokens = " ", [], 0
+            if word_tokens > self.max_tokens:
+                stats["oversized_units"] += 1  # e.g. a long URL; the embedder truncates it
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            yield (joiner, " ".join(words), tokens)
+    
+    def _overlap(self, units: List[Tuple[str, str, int]]) -> Tuple[List[Tuple[str, str, int]], int]:
+        """Trailing units (up to overlap_tokens) carried into the next chunk."""
+        carried: List[Tuple[str, str, int]] = []
+        tokens = 0
+        for unit in reversed(units):
+            if tokens + unit[2] > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+            tokens += unit[2]
+        return carried, tokens
+    
+    @staticmethod
+    def _emit(units: List[Tuple[str, str, int]], tokens: int, page_number: Optional[int], stats: Dict) -> Dict:
+        """Join units into a chunk and update statistics."""
+        text = units[0][1] + "".join(joiner + unit_text for joiner, unit_text, _ in units[1:])
+        stats["chunks"] += 1
+        stats["tokens"] += tokens
+        stats["max_chunk_tokens"] = max(stats["max_chunk_tokens"], tokens)
+        return {"text": text, "page_number": page_number, "token_count": tokens}
+    
+    @staticmethod
+    def _make_chunk(chunk: Dict, chunk_index: int, pdf_id: str, pdf_path: str) -> Dict:
+        """Build a chunk dictionary."""
+        return {
+            "id": f"{pdf_id}_chunk_{chunk_index}",
+            "text": chunk["text"],
+            "pdf_id": pdf_id,
+            "pdf_path": pdf_path,
+            "chunk_index": chunk_index,
+            "page_number": chunk["page_number"],
+            "token_count": chunk["token_count"]
+        }
@@ -42,15 +42,17 @@ class Embedder:
         self.tokenizer = open_clip.get_tokenizer(model_name)
         self.model = self.model.to(self.device)
         self.model.eval()
+        self._embedding_dim: Optional[int] = None
         
         logger.info(f"Model loaded on device: {self.device}")
     
-    def embed_text(self, texts: Union[str, List[str]]) -> List[List[float]]:
+    def embed_text(self, texts: Union[str, List[str]], batch_size: int = 256) -> List[List[float]]:
         """
         Generate embeddings for text.
         
         Args:
             texts: Single text string or list of text strings
+            batch_size: Maximum texts per forward pass
             
         Returns:
             List of embedding vectors
@@ -58,21 +60,24 @@ class Embedder:
         if isinstance(texts, str):
             texts = [texts]
         
+        embeddings = []
         with torch.no_grad():
-            text_tokens = self.tokenizer(texts).to(self.device)
-            text_features = self.model.encode_text(text_tokens)
-            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+            for start in range(0, len(texts), batch_size):
+                text_tokens = self.tokenizer(texts[start:start + batch_size]).to(self.device)
+                text_features = self.model.encode_text(text_tokens)
+                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+                embeddings.extend(text_features.cpu().numpy().tolist())
         
-        embeddings = text_features.cpu().numpy().tolist()
         logger.info(f"Generated embeddings for {len(texts)} text(s)")
         return embeddings
     
-    def embed_image(self, image_paths: Union[str, List[str]]) -> List[List[float]]:
+    def embed_image(self, image_paths: Union[str, List[str]], batch_size: int = 64) -> List[List[float]]:
         """
         Generate embeddings for images.
         
         Args:
             image_paths: Single image path or list of image paths
+            batch_size: Maximum images per forward pass
             
         Returns:
             List of embedding vectors
@@ -80,29 +85,56 @@ class Embedder:
         if isinstance(image_paths, str):
             image_paths = [image_paths]
         
-        images = []
-        for path in image_paths:
-            try:
-                img = Image.open(path).convert("RGB")
-                images.append(self.preprocess(img))
-            except Exception as e:
-                logger.error(f"Failed to load image {path}: {e}")
-                # Create a zero embedding for failed images
-                images.append(torch.zeros(3, 224, 224))
-        
-        with torch.no_grad():
-            image_input = torch.stack(images).to(self.device)
-            image_features = self.model.encode_image(image_input)
-            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        embeddings = []
+        for start in range(0, len(image_paths), batch_size):
+            images = []
+            for path in image_paths[start:start + batch_size]:
+                try:
+                    img = Image.open(path).convert("RGB")
+                    images.append(self.preprocess(img))
+                except Exception as e:
+                    logger.error(f"Failed to load image {path}: {e}")
+                    # Create a zero embedding for failed images
+                    images.append(torch.zeros(3, 224, 224))
+            
+            with torch.no_grad():
+                image_input = torch.stack(images).to(self.device)
+                image_features = self.model.encode_image(image_input)
+                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            embeddings.extend(image_features.cpu().numpy().tolist())
         
-        embeddings = image_features.cpu().numpy().tolist()
         logger.info(f"Generated embeddings for {len(image_paths)} image(s)")
         return embeddings
     
+    @property
+    def context_length(self) -> int:
+        """Maximum tokens the text encoder sees, including start/end tokens (77 for CLIP)."""
+        return getattr(self.tokenizer, "context_length", 77)
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens the text encoder would see for a text (without start/end tokens, before truncation).
+        
+        Args:
+            text: Text to measure
+            
+        Returns:
+            Token count
+        """
+        encode = getattr(self.tokenizer, "encode", None)
+        if encode is not None:
+            return len(encode(text))
+        hf_tokenizer = getattr(self.tokenizer, "tokenizer", None)
+        if hf_tokenizer is not None:
+            return len(hf_tokenizer(text, add_special_tokens=False)["input_ids"])
+        return len(text.split())
+    
     def get_embedding_dim(self) -> int:
-        """Get the dimension of embedding vectors."""
-        with torch.no_grad():
-            dummy_text = self.tokenizer(["test"]).to(self.device)
-            features = self.model.encode_text(dummy_text)
-        return features.shape[-1]
+        """Get the dimension of embedding vectors (computed once, then cached)."""
+        if self._embedding_dim is None:
+            with torch.no_grad():
+                dummy_text = self.tokenizer(["test"]).to(self.device)
+                features = self.model.encode_text(dummy_text)
+            self._embedding_dim = features.shape[-1]
+        return self._embedding_dim
 
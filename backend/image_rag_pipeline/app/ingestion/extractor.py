@@ -1,39 +1,182 @@
 """
 PDF extraction module.
 Extracts text and images from PDF files using PyMuPDF.
+
+Pages are streamed: `PDFExtractor.iter_pages` yields one page at a time
+(optionally extracting page ranges in a process pool), and images are stored
+content-addressed by SHA-256, so a logo or figure shared by several lectures
+is written to disk once.
 """
+import hashlib
 import os
 import logging
-from typing import Dict, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
 import fitz  # PyMuPDF
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _store_image(image_bytes: bytes, ext: str, output_dir: str) -> Dict:
+    """
+    Write image bytes under a content-addressed filename (no-op if already stored).
+
+    Args:
+        image_bytes: Raw image data
+        ext: File extension reported by PyMuPDF
+        output_dir: Image directory
+
+    Returns:
+        Dictionary with sha256, filename and path
+    """
+    sha256 = hashlib.sha256(image_bytes).hexdigest()
+    filename = f"{sha256[:32]}.{ext}"
+    path = os.path.join(output_dir, filename)
+
+    if not os.path.exists(path):
+        # Write-then-rename so concurrent workers never expose a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as img_file:
+            img_file.write(image_bytes)
+        os.replace(tmp_path, path)
+
+    return {"sha256": sha256, "filename": filename, "path": path}
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, output_dir: str, images_only: bool) -> List[Dict]:
+    """
+    Extract pages [start, stop) of a PDF (process-pool entry point; opens its own document).
+
+    Returns:
+        One dict per page with page_number, text and images
+    """
+    pages = []
+    processed_xrefs = set()  # Keep track of processed image cross-reference numbers
+
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, min(stop, len(doc))):
+            page = doc[page_num]
+            page_images = []
+
+            for img_index, img_info in enumerate(page.get_images(full=True)):
+                xref = img_info[0]
+
+                # If we have already processed this image, skip it
+                if xref in processed_xrefs:
+                    continue
+                processed_xrefs.add(xref)
+
+                base_image = doc.extract_image(xref)
+                stored = _store_image(base_image["image"], base_image["ext"], output_dir)
+                stored["page_number"] = page_num + 1
+                stored["image_index"] = img_index + 1
+                page_images.append(stored)
+
+            pages.append({
+                "page_number": page_num + 1,
+                "text": "" if images_only else page.get_text(),
+                "images": page_images
+            })
+
+    return pages
+
+
 class PDFExtractor:
     """Extract text and images from PDF files."""
-    
-    def __init__(self, output_dir: str, images_only: bool = False):
+
+    def __init__(
+        self,
+        output_dir: str,
+        images_only: bool = False,
+        workers: int = 1,
+        pages_per_task: int = 8
+    ):
         """
         Initialize extractor.
-        
+
         Args:
             output_dir: Directory to save extracted images
             images_only: If True, only extract images (skip text extraction)
+            workers: Processes extracting page ranges in parallel (1 = in-process)
+            pages_per_task: Pages per worker task
         """
         self.output_dir = output_dir
         self.images_only = images_only
+        self.workers = max(1, workers)
+        self.pages_per_task = max(1, pages_per_task)
         os.makedirs(output_dir, exist_ok=True)
-    
+
+    def iter_pages(self, pdf_path: str, pdf_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream a PDF page by page, in page order.
+
+        Images are deduplicated by content within the PDF (the first page an
+        image appears on keeps it) and stored content-addressed, so their ids
+        and files are shared across re-ingestions and lectures.
+
+        Args:
+            pdf_path: Path to the PDF file
+            pdf_id: Unique identifier for the PDF (defaults to filename)
+
+        Yields:
+            Dictionaries with page_number, text and images (each with id, path,
+            filename, page_number and sha256)
+        """
+        if pdf_id is None:
+            pdf_id = os.path.splitext(os.path.basename(pdf_path))[0]
+
+        with fitz.open(pdf_path) as doc:
+            num_pages = len(doc)
+        ranges = [(start, start + self.pages_per_task) for start in range(0, num_pages, self.pages_per_task)]
+
+        seen_hashes = set()
+        for pages in self._iter_ranges(pdf_path, ranges):
+            for page in pages:
+                unique_images = []
+                for img in page["images"]:
+                    if img["sha256"] in seen_hashes:
+                        continue
+                    seen_hashes.add(img["sha256"])
+                    img["id"] = f"{pdf_id}_img_{img['sha256'][:16]}"
+                    unique_images.append(img)
+                page["images"] = unique_images
+                yield page
+
+    def _iter_ranges(self, pdf_path: str, ranges: List[tuple]) -> Iterator[List[Dict]]:
+        """Extract page ranges in order, keeping at most 2 * workers ranges in flight."""
+        if self.workers == 1 or len(ranges) <= 1:
+            for start, stop in ranges:
+                yield _extract_page_range(pdf_path, start, stop, self.output_dir, self.images_only)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            remaining = iter(ranges)
+            for start, stop in remaining:
+                pending.append(executor.submit(
+                    _extract_page_range, pdf_path, start, stop, self.output_dir, self.images_only
+                ))
+                if len(pending) >= self.workers * 2:
+                    break
+            while pending:
+                pages = pending.popleft().result()
+                next_range = next(remaining, None)
+                if next_range is not None:
+                    pending.append(executor.submit(
+                        _extract_page_range, pdf_path, next_range[0], next_range[1], self.output_dir, self.images_only
+                    ))
+                yield pages
+
     def extract(self, pdf_path: str, pdf_id: str = None) -> Dict:
         """
         Extract text and images from a PDF.
-        
+
         Args:
             pdf_path: Path to the PDF file
             pdf_id: Unique identifier for the PDF (defaults to filename)
-            
+
         Returns:
             Dictionary containing:
                 - text: Full extracted text
@@ -43,72 +186,29 @@ class PDFExtractor:
         """
         if pdf_id is None:
             pdf_id = os.path.splitext(os.path.basename(pdf_path))[0]
-        
+
         logger.info(f"Extracting content from: {pdf_path}")
-        
-        doc = fitz.open(pdf_path)
-        full_text = ""
-        images = []
-        processed_xrefs = set()  # Keep track of processed image cross-reference numbers
 
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Extract text (unless images_only mode)
+        text_parts = []
+        images = []
+        num_pages = 0
+        for page in self.iter_pages(pdf_path, pdf_id=pdf_id):
+            num_pages += 1
             if not self.images_only:
-                page_text = page.get_text()
-                full_text += f"\n--- Page {page_num + 1} ---\n{page_text}"
-            
-            # Extract images
-            image_list = page.get_images(full=True)
-            
-            for img_index, img_info in enumerate(image_list):
-                xref = img_info[0]
-
-                # If we have already processed this image, skip it
-                if xref in processed_xrefs:
-                    continue
-
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                
-                # Save image
-                image_filename = f"{pdf_id}_page{page_num + 1}_img{img_index + 1}.{image_ext}"
-                image_path = os.path.join(self.output_dir, image_filename)
-                
-                with open(image_path, "wb") as img_file:
-                    img_file.write(image_bytes)
-                
-                images.append({
-                    "id": f"{pdf_id}_p{page_num + 1}_i{img_index + 1}",
-                    "path": image_path,
-                    "page_number": page_num + 1,
-                    "filename": image_filename
-                })
-
-                # Mark this image as processed
-                processed_xrefs.add(xref)
+                text_parts.append(f"\n--- Page {page['page_number']} ---\n{page['text']}")
+            images.extend(page["images"])
+        full_text = "".join(text_parts)
 
-                # Log periodically to avoid spam (every 50 images)
-                if len(images) % 50 == 0:
-                    logger.debug(f"Extracted {len(images)} unique images so far...")
-        
-        # Save page count before closing document
-        num_pages = len(doc)
-        doc.close()
-        
         result = {
             "text": full_text,
             "images": images,
             "pdf_path": pdf_path,
             "pdf_id": pdf_id
         }
-        
+
         if self.images_only:
             logger.info(f"Extraction complete (images only): {len(images)} unique images from {num_pages} pages")
         else:
             logger.info(f"Extraction complete: {len(images)} images from {num_pages} pages, {len(full_text)} chars of text")
-        
-        return result
 
+        return result
@@ -41,6 +41,7 @@ class FlashcardJSONExtractor:
         Returns:
             Dictionary containing:
                 - text_blocks: List of text content blocks with metadata
+                  (each also lists its labelled parts under 'facets')
                 - metadata: Overall file metadata
                 - source_path: Original JSON path
                 - source_id: Source identifier
@@ -72,6 +73,8 @@ class FlashcardJSONExtractor:
             
             # Build a comprehensive text block for this flashcard
             text_parts = [f"Question: {question}"]
+            # Each part on its own, for multi-vector indexing (CLIP sees only 77 tokens)
+            facets = [{"facet": "question", "text": text_parts[0]}]
             
             # Extract all answer variants
             answers = card.get('answers', {})
@@ -79,32 +82,39 @@ class FlashcardJSONExtractor:
                 # Concise answer
                 if 'concise' in answers and answers['concise']:
                     text_parts.append(f"Answer: {answers['concise'].strip()}")
+                    facets.append({"facet": "answer", "text": text_parts[-1]})
                 
                 # Analogy
                 if 'analogy' in answers and answers['analogy']:
                     text_parts.append(f"Analogy: {answers['analogy'].strip()}")
+                    facets.append({"facet": "analogy", "text": text_parts[-1]})
                 
                 # ELI5 (Explain Like I'm 5)
                 if 'eli5' in answers and answers['eli5']:
                     text_parts.append(f"Simple Explanation: {answers['eli5'].strip()}")
+                    facets.append({"facet": "eli5", "text": text_parts[-1]})
                 
                 # Real world use case
                 if 'real_world_use_case' in answers and answers['real_world_use_case']:
                     text_parts.append(f"Real-world Example: {answers['real_world_use_case'].strip()}")
+                    facets.append({"facet": "real_world_use_case", "text": text_parts[-1]})
                 
                 # Common mistakes
                 if 'common_mistakes' in answers and answers['common_mistakes']:
                     text_parts.append(f"Common Mistakes: {answers['common_mistakes'].strip()}")
+                    facets.append({"facet": "common_mistakes", "text": text_parts[-1]})
             
             # Extract example (if different from answers)
             example = card.get('example', '').strip()
             if example:
                 text_parts.append(f"Example: {example}")
+                facets.append({"facet": "example", "text": text_parts[-1]})
             
             # Extract context
             context = card.get('context', '').strip()
             if context:
                 text_parts.append(f"Context: {context}")
+                facets.append({"facet": "context", "text": text_parts[-1]})
             
             # Combine into one text block
             combined_text = "\n\n".join(text_parts)
@@ -123,6 +133,7 @@ class FlashcardJSONExtractor:
             
             text_blocks.append({
                 'text': combined_text,
+                'facets': facets,
                 'metadata': block_metadata
             })
         
@@ -0,0 +1,98 @@
+"""
+Lecture extraction jobs.
+Kept free of model imports so extraction can run in worker processes
+while the parent process embeds and uploads.
+"""
+import logging
+import os
+from typing import Dict, Optional
+
+from .extractor import PDFExtractor
+from .json_extractor import FlashcardJSONExtractor
+from .manifest import content_sha256, file_sha256
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def lecture_fingerprint(
+    pdf_path: Optional[str],
+    json_path: Optional[str],
+    lecture_metadata: Optional[Dict] = None,
+    skip_images: bool = False
+) -> str:
+    """
+    Fingerprint a lecture's ingestion inputs.
+
+    Args:
+        pdf_path: Source PDF (ignored when skip_images or missing)
+        json_path: Flashcard JSON (optional)
+        lecture_metadata: Metadata copied into every payload
+        skip_images: Whether PDF images are skipped
+
+    Returns:
+        Hash that changes whenever any input that affects the stored points changes
+    """
+    pdf_hash = file_sha256(pdf_path) if pdf_path and not skip_images and os.path.exists(pdf_path) else None
+    json_hash = file_sha256(json_path) if json_path and os.path.exists(json_path) else None
+    return content_sha256(pdf_hash, json_hash, lecture_metadata or {}, skip_images)
+
+
+def extract_lecture_sources(
+    pdf_path: str,
+    json_path: str,
+    image_output_dir: str,
+    skip_images: bool = False
+) -> Dict:
+    """
+    Extract images from the PDF and text blocks from the flashcard JSON.
+
+    Args:
+        pdf_path: Path to the lecture PDF
+        json_path: Path to the flashcard JSON
+        image_output_dir: Directory for extracted images
+        skip_images: If True, skip PDF image extraction
+
+    Returns:
+        Dictionary with pdf_id, images (each with a content 'sha256') and text_blocks
+    """
+    pdf_id = os.path.splitext(os.path.basename(pdf_path))[0]
+
+    images = []
+    if not skip_images and os.path.exists(pdf_path):
+        # Lectures already run in parallel, so pages are extracted in-process
+        extractor = PDFExtractor(output_dir=image_output_dir, images_only=True, workers=1)
+        images = extractor.extract(pdf_path, pdf_id=pdf_id)["images"]
+
+    json_extraction = FlashcardJSONExtractor().extract(json_path, source_id=pdf_id)
+
+    return {
+        "pdf_id": pdf_id,
+        "pdf_path": pdf_path,
+        "json_path": json_path,
+        "images": images,
+        "text_blocks": json_extraction["text_blocks"]
+    }
+
+
+def run_extraction_job(job: Dict) -> Dict:
+    """
+    Process-pool entry point: extract one lecture described by a job dict.
+
+    Args:
+        job: Dict with pdf_path, json_path, image_output_dir, skip_images
+
+    Returns:
+        The job dict with an 'extraction' key (or 'error' on failure)
+    """
+    try:
+        job["extraction"] = extract_lecture_sources(
+            pdf_path=job["pdf_path"],
+            json_path=job["json_path"],
+            image_output_dir=job["image_output_dir"],
+            skip_images=job.get("skip_images", False)
+        )
+    except Exception as e:
+        logger.error(f"Extraction failed for {job.get('json_path') or job.get('pdf_path')}: {e}")
+        job["error"] = str(e)
+    return job
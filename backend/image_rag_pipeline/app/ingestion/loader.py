@@ -5,12 +5,16 @@ Coordinates the extraction, chunking, embedding, and storage pipeline.
 import logging
 import os
 import hashlib
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional
 from .extractor import PDFExtractor
 from .json_extractor import FlashcardJSONExtractor
-from .chunker import TextChunker
+from .chunker import TextChunker, TokenAwareChunker
 from .embedder import Embedder
+from .lecture_extraction import extract_lecture_sources, lecture_fingerprint
+from .manifest import IngestionManifest, content_sha256
 from ..db.vector_store import VectorStore
+from ..retrieval.lexical_index import LexicalIndexManager
 
 from ..utils.config import Config
 
@@ -46,7 +50,14 @@ class IngestionPipeline:
         vector_store: VectorStore,
         embedder: Optional[Embedder] = None,
         chunk_size: Optional[int] = None,
-        chunk_overlap: Optional[int] = None
+        chunk_overlap: Optional[int] = None,
+        lexical_indexes: Optional[LexicalIndexManager] = None,
+        embed_batch_size: int = 256,
+        upsert_batch_size: int = 256,
+        multi_vector: Optional[bool] = None,
+        facets: Optional[List[str]] = None,
+        extract_workers: Optional[int] = None,
+        image_cache_size: int = 4096
     ):
         """
         Initialize ingestion pipeline.
@@ -55,19 +66,54 @@ class IngestionPipeline:
             image_output_dir: Directory to save extracted images
             vector_store: Vector store instance
             embedder: Embedder instance (created if None)
-            chunk_size: Size of text chunks (defaults to Config.CHUNK_SIZE)
-            chunk_overlap: Overlap between chunks (defaults to Config.CHUNK_OVERLAP)
+            chunk_size: Size of text chunks in characters (character chunker only, defaults to Config.CHUNK_SIZE)
+            chunk_overlap: Overlap between chunks (character chunker only, defaults to Config.CHUNK_OVERLAP)
+            lexical_indexes: Per-course BM25 indexes to update alongside the vectors (optional)
+            embed_batch_size: Items embedded (and checkpointed in the manifest) per batch
+            upsert_batch_size: Points per Qdrant upsert request
+            multi_vector: Also index each flashcard facet as its own point
+                         (defaults to Config.MULTI_VECTOR_INDEXING)
+            facets: Facets to index in multi-vector mode (defaults to Config.MULTI_VECTOR_FACETS)
+            extract_workers: Processes extracting PDF page ranges (defaults to Config.PDF_EXTRACT_WORKERS)
+            image_cache_size: Image embeddings kept by content hash for reuse across lectures
         """
-        self.pdf_extractor = PDFExtractor(output_dir=image_output_dir)
+        self.pdf_extractor = PDFExtractor(
+            output_dir=image_output_dir,
+            workers=Config.PDF_EXTRACT_WORKERS if extract_workers is None else extract_workers
+        )
         self.json_extractor = FlashcardJSONExtractor()
-        chunk_size = chunk_size or Config.CHUNK_SIZE
-        chunk_overlap = chunk_overlap or Config.CHUNK_OVERLAP
-        self.chunker = TextChunker(chunk_size=chunk_size, overlap=chunk_overlap)
         self.embedder = embedder if embedder else Embedder()
+        if Config.CHUNKER == "token":
+            # Chunks sized to what the text encoder actually sees
+            self.chunker = TokenAwareChunker(
+                count_tokens=self.embedder.count_tokens,
+                max_tokens=Config.CHUNK_MAX_TOKENS or self.embedder.context_length - 2,
+                overlap_tokens=Config.CHUNK_OVERLAP_TOKENS
+            )
+        else:
+            chunk_size = chunk_size or Config.CHUNK_SIZE
+            chunk_overlap = chunk_overlap or Config.CHUNK_OVERLAP
+            self.chunker = TextChunker(chunk_size=chunk_size, overlap=chunk_overlap)
         self.vector_store = vector_store
         self.image_output_dir = image_output_dir
+        self.lexical_indexes = lexical_indexes
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.multi_vector = Config.MULTI_VECTOR_INDEXING if multi_vector is None else multi_vector
+        self.facets = facets or Config.MULTI_VECTOR_FACETS
+        self.image_cache_size = image_cache_size
+        self._image_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        # Sources whose completion waits for the next flush() (see ingest_extracted_lecture)
+        self._pending_sources: List[tuple] = []
     
-    def ingest_pdf(self, pdf_path: str, course_id: str, pdf_metadata: Optional[Dict] = None) -> Dict:
+    def ingest_pdf(
+        self,
+        pdf_path: str,
+        course_id: str,
+        pdf_metadata: Optional[Dict] = None,
+        manifest: Optional[IngestionManifest] = None,
+        force: bool = False
+    ) -> Dict:
         """
         Run the full ingestion pipeline for a PDF.
         
@@ -75,101 +121,207 @@ class IngestionPipeline:
             pdf_path: Path to PDF file
             course_id: Course identifier
             pdf_metadata: Additional metadata about the PDF
+            manifest: Ingestion manifest; an unchanged PDF is skipped (optional)
+            force: Re-ingest even if the manifest says the PDF is current
             
         Returns:
             Dictionary with ingestion statistics
         """
         logger.info(f"Starting ingestion for {pdf_path} into course {course_id}")
         
+        pdf_id = os.path.splitext(os.path.basename(pdf_path))[0]
+        fingerprint = None
+        if manifest is not None:
+            fingerprint = lecture_fingerprint(pdf_path, None, pdf_metadata)
+            if not force and manifest.is_current(course_id, pdf_id, fingerprint):
+                logger.info(f"Skipping {pdf_id}: unchanged since last ingestion")
+                return {
+                    "pdf_path": pdf_path,
+                    "course_id": course_id,
+                    "text_chunks": 0,
+                    "images": 0,
+                    "total_items": 0,
+                    "skipped": True
+                }
+            manifest.begin_source(course_id, pdf_id, fingerprint)
+        
         # Ensure collection exists
         embedding_dim = self.embedder.get_embedding_dim()
         self.vector_store.create_collection(course_id, vector_size=embedding_dim)
         
-        # Extract text and images
-        pdf_id = os.path.splitext(os.path.basename(pdf_path))[0]
-        extraction_result = self.pdf_extractor.extract(pdf_path, pdf_id=pdf_id)
+        # Stream pages: text feeds the chunker, images queue up for embedding
+        pending_images = []
         
-        # Chunk text
-        text_chunks = self.chunker.chunk(
-            text=extraction_result["text"],
-            pdf_id=pdf_id,
-            pdf_path=pdf_path
-        )
+        def page_texts():
+            for page in self.pdf_extractor.iter_pages(pdf_path, pdf_id=pdf_id):
+                pending_images.extend(page["images"])
+                yield f"\n--- Page {page['page_number']} ---\n{page['text']}"
         
-        # Embed and store text chunks
-        if text_chunks:
-            logger.info("Embedding text chunks...")
-            text_embeddings = self.embedder.embed_text([chunk["text"] for chunk in text_chunks])
-            
-            text_metadata = [
-                {
-                    "type": "text",
-                    "pdf_id": chunk["pdf_id"],
-                    "pdf_path": chunk["pdf_path"],
-                    "chunk_index": chunk["chunk_index"],
-                    "text": chunk["text"][:500],  # Store first 500 chars for preview
-                    **(pdf_metadata or {})
-                }
-                for chunk in text_chunks
-            ]
-            
-            # Convert string IDs to integer IDs for Qdrant
-            text_ids = [string_to_int_id(chunk["id"]) for chunk in text_chunks]
-            
-            self.vector_store.insert_embeddings(
-                course_id=course_id,
-                embeddings=text_embeddings,
-                metadata=text_metadata,
-                ids=text_ids
-            )
+        pending_chunks = []
+        chunk_count = 0
+        image_count = 0
+        for chunk in self.chunker.chunk_stream(page_texts(), pdf_id=pdf_id, pdf_path=pdf_path):
+            pending_chunks.append(chunk)
+            if len(pending_chunks) >= self.embed_batch_size:
+                chunk_count += self._store_pdf_chunks(course_id, pending_chunks, pdf_metadata)
+                pending_chunks = []
+            if len(pending_images) >= self.embed_batch_size:
+                image_count += self._store_pdf_images(course_id, pdf_id, pdf_path, pending_images, pdf_metadata)
+                pending_images.clear()
         
-        # Embed and store images
-        images = extraction_result["images"]
-        if images:
-            logger.info("Embedding images...")
-            image_embeddings = self.embedder.embed_image([img["path"] for img in images])
-            
-            image_metadata = [
-                {
-                    "type": "image",
-                    "pdf_id": pdf_id,
-                    "pdf_path": pdf_path,
-                    "page_number": img["page_number"],
-                    "image_path": img["path"],
-                    "filename": img["filename"],
-                    **(pdf_metadata or {})
-                }
-                for img in images
-            ]
-            
-            # Convert string IDs to integer IDs for Qdrant
-            image_ids = [string_to_int_id(img["id"]) for img in images]
-            
-            self.vector_store.insert_embeddings(
-                course_id=course_id,
-                embeddings=image_embeddings,
-                metadata=image_metadata,
-                ids=image_ids
-            )
+        chunk_count += self._store_pdf_chunks(course_id, pending_chunks, pdf_metadata)
+        image_count += self._store_pdf_images(course_id, pdf_id, pdf_path, pending_images, pdf_metadata)
         
         result = {
             "pdf_path": pdf_path,
             "course_id": course_id,
-            "text_chunks": len(text_chunks),
-            "images": len(images),
-            "total_items": len(text_chunks) + len(images)
+            "text_chunks": chunk_count,
+            "images": image_count,
+            "total_items": chunk_count + image_count,
+            "chunk_stats": getattr(self.chunker, "last_stats", {})
         }
         
+        # One lexical index save per PDF rather than per chunk batch
+        if self.lexical_indexes is not None:
+            self.lexical_indexes.flush()
+        if manifest is not None:
+            manifest.complete_source(course_id, pdf_id)
+        
         logger.info(f"Ingestion complete: {result}")
         return result
     
+    def _store_pdf_chunks(self, course_id: str, chunks: List[Dict], pdf_metadata: Optional[Dict]) -> int:
+        """Embed and store one batch of PDF text chunks; returns the number stored."""
+        if not chunks:
+            return 0
+        
+        logger.info(f"Embedding {len(chunks)} text chunks...")
+        text_embeddings = self.embedder.embed_text([chunk["text"] for chunk in chunks])
+        
+        text_metadata = [
+            {
+                "type": "text",
+                "pdf_id": chunk["pdf_id"],
+                "pdf_path": chunk["pdf_path"],
+                "chunk_index": chunk["chunk_index"],
+                "page_number": chunk.get("page_number"),
+                "token_count": chunk.get("token_count"),
+                "text": chunk["text"][:500],  # Store first 500 chars for preview
+                **(pdf_metadata or {})
+            }
+            for chunk in chunks
+        ]
+        
+        # Convert string IDs to integer IDs for Qdrant
+        text_ids = [string_to_int_id(chunk["id"]) for chunk in chunks]
+        
+        self.vector_store.insert_embeddings(
+            course_id=course_id,
+            embeddings=text_embeddings,
+            metadata=text_metadata,
+            ids=text_ids,
+            batch_size=self.upsert_batch_size,
+            wait=False
+        )
+        
+        if self.lexical_indexes is not None:
+            self.lexical_indexes.add_documents(
+                course_id,
+                doc_ids=[chunk["id"] for chunk in chunks],
+                texts=[chunk["text"] for chunk in chunks],
+                payloads=text_metadata,
+                save=False
+            )
+        return len(chunks)
+    
+    def _store_pdf_images(
+        self,
+        course_id: str,
+        pdf_id: str,
+        pdf_path: str,
+        images: List[Dict],
+        pdf_metadata: Optional[Dict]
+    ) -> int:
+        """Embed and store one batch of extracted PDF images; returns the number stored."""
+        if not images:
+            return 0
+        
+        logger.info(f"Embedding {len(images)} images...")
+        image_embeddings = self._embed_images(images)
+        
+        image_metadata = [
+            {
+                "type": "image",
+                "pdf_id": pdf_id,
+                "pdf_path": pdf_path,
+                "page_number": img["page_number"],
+                "image_path": img["path"],
+                "filename": img["filename"],
+                "image_sha256": img["sha256"],
+                **(pdf_metadata or {})
+            }
+            for img in images
+        ]
+        
+        # Convert string IDs to integer IDs for Qdrant
+        image_ids = [string_to_int_id(img["id"]) for img in images]
+        
+        self.vector_store.insert_embeddings(
+            course_id=course_id,
+            embeddings=image_embeddings,
+            metadata=image_metadata,
+            ids=image_ids,
+            batch_size=self.upsert_batch_size,
+            wait=False
+        )
+        return len(images)
+    
+    def _embed_images(self, images: List[Dict]) -> List[List[float]]:
+        """
+        Embed images, reusing embeddings of identical images (by content hash)
+        already embedded by this pipeline, e.g. a logo on every lecture.
+        
+        Args:
+            images: Dicts with 'path' and (optionally) 'sha256'
+            
+        Returns:
+            One embedding per image, in order
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(images)
+        to_embed = {}  # sha256 (or path) -> indexes needing that embedding
+        for i, img in enumerate(images):
+            key = img.get("sha256") or img["path"]
+            cached = self._image_embeddings.get(key)
+            if cached is not None:
+                self._image_embeddings.move_to_end(key)
+                embeddings[i] = cached
+            else:
+                to_embed.setdefault(key, []).append(i)
+        
+        if to_embed:
+            keys = list(to_embed)
+            fresh = self.embedder.embed_image([images[to_embed[key][0]]["path"] for key in keys])
+            for key, embedding in zip(keys, fresh):
+                for i in to_embed[key]:
+                    embeddings[i] = embedding
+                self._image_embeddings[key] = embedding
+            while len(self._image_embeddings) > self.image_cache_size:
+                self._image_embeddings.popitem(last=False)
+        
+        reused = len(images) - len(to_embed)
+        if reused:
+            logger.info(f"Reused {reused} image embeddings for identical images")
+        return embeddings
+    
     def ingest_lecture_hybrid(
         self,
         pdf_path: str,
         json_path: str,
         course_id: str,
         lecture_metadata: Optional[Dict] = None,
-        skip_images: bool = False
+        skip_images: bool = False,
+        manifest: Optional[IngestionManifest] = None,
+        force: bool = False
     ) -> Dict:
         """
         Run hybrid ingestion: images from PDF, text from flashcard JSON.
@@ -178,116 +330,272 @@ class IngestionPipeline:
         flashcard JSON files are available, as it provides cleaner, more
         focused text embeddings by excluding diagram code and math visualizations.
         
+        With a manifest, a lecture whose inputs are unchanged is skipped
+        without extraction, and inside a changed lecture only new or changed
+        text blocks and images are embedded.
+        
         Args:
             pdf_path: Path to PDF file (for images, optional if skip_images=True)
             json_path: Path to flashcard JSON file (for text)
             course_id: Course identifier
             lecture_metadata: Additional metadata about the lecture
             skip_images: If True, skip PDF image extraction
+            manifest: Ingestion manifest for content-hash deduplication (optional)
+            force: Re-ingest everything even if the manifest says it is current
             
         Returns:
             Dictionary with ingestion statistics
         """
         logger.info(f"Starting hybrid ingestion for {pdf_path} (images) and {json_path} (text) into course {course_id}")
         
-        # Ensure collection exists
-        embedding_dim = self.embedder.get_embedding_dim()
-        self.vector_store.create_collection(course_id, vector_size=embedding_dim)
-        
         pdf_id = os.path.splitext(os.path.basename(pdf_path))[0]
+        fingerprint = lecture_fingerprint(pdf_path, json_path, lecture_metadata, skip_images)
         
-        images = []
-        # 1. Extract images from PDF (images-only mode)
-        if not skip_images and os.path.exists(pdf_path):
-            logger.info("Extracting images from PDF...")
-            pdf_extractor_images_only = PDFExtractor(
-                output_dir=self.image_output_dir,
-                images_only=True
-            )
-            pdf_extraction = pdf_extractor_images_only.extract(pdf_path, pdf_id=pdf_id)
-            images = pdf_extraction["images"]
-        else:
+        if manifest is not None and not force and manifest.is_current(course_id, pdf_id, fingerprint):
+            logger.info(f"Skipping {pdf_id}: unchanged since last ingestion")
+            return self._hybrid_result(pdf_path, json_path, course_id, 0, 0, skipped=True)
+        
+        if skip_images or not os.path.exists(pdf_path):
             logger.info("Skipping image extraction (skip_images=True or PDF not found)")
         
-        # 2. Extract text from flashcard JSON
-        logger.info("Extracting text from flashcard JSON...")
-        json_extraction = self.json_extractor.extract(json_path, source_id=pdf_id)
-        text_blocks = json_extraction["text_blocks"]
+        extraction = extract_lecture_sources(
+            pdf_path=pdf_path,
+            json_path=json_path,
+            image_output_dir=self.image_output_dir,
+            skip_images=skip_images
+        )
         
-        # 3. Embed and store text blocks (no chunking needed - already well-structured)
-        text_count = 0
-        if text_blocks:
-            logger.info(f"Embedding {len(text_blocks)} flashcard text blocks...")
-            
-            texts_to_embed = [block["text"] for block in text_blocks]
-            text_embeddings = self.embedder.embed_text(texts_to_embed)
+        return self.ingest_extracted_lecture(
+            extraction=extraction,
+            course_id=course_id,
+            lecture_metadata=lecture_metadata,
+            fingerprint=fingerprint,
+            manifest=manifest,
+            force=force
+        )
+    
+    def ingest_extracted_lecture(
+        self,
+        extraction: Dict,
+        course_id: str,
+        lecture_metadata: Optional[Dict] = None,
+        fingerprint: Optional[str] = None,
+        manifest: Optional[IngestionManifest] = None,
+        force: bool = False,
+        defer_commit: bool = False
+    ) -> Dict:
+        """
+        Embed and store an already-extracted lecture (see extract_lecture_sources).
+        
+        The lexical index is rewritten whole on every save, so batch runs pass
+        defer_commit=True and call flush() once at the end: the index is saved
+        once and only then are the lectures marked complete in the manifest. A
+        run that dies first leaves them in progress, and the next run re-indexes
+        their text lexically (cheap, no embeddings) while skipping unchanged vectors.
+        
+        Args:
+            extraction: Output of extract_lecture_sources
+            course_id: Course identifier
+            lecture_metadata: Additional metadata about the lecture
+            fingerprint: Lecture fingerprint to record in the manifest
+            manifest: Ingestion manifest (optional)
+            force: Ignore known item hashes and re-embed everything
+            defer_commit: Leave the lexical save and manifest completion to flush()
             
-            text_metadata = [
-                {
-                    "type": "text",
-                    "source": "flashcard",
-                    "flashcard_id": block["metadata"]["flashcard_id"],
-                    "flashcard_type": block["metadata"]["type"],
-                    "context": block["metadata"]["context"],
-                    "tags": block["metadata"]["tags"],
-                    "relevance_score": block["metadata"]["relevance_score"],
-                    "source_id": pdf_id,
-                    "source_path": json_path,
-                    "text": block["text"][:500],  # Preview
-                    **(lecture_metadata or {})
-                }
-                for block in text_blocks
-            ]
+        Returns:
+            Dictionary with ingestion statistics
+        """
+        pdf_id = extraction["pdf_id"]
+        pdf_path = extraction["pdf_path"]
+        json_path = extraction["json_path"]
+        text_blocks = extraction["text_blocks"]
+        images = extraction["images"]
+        
+        # Ensure collection exists (both calls are cached after the first lecture)
+        embedding_dim = self.embedder.get_embedding_dim()
+        self.vector_store.create_collection(course_id, vector_size=embedding_dim)
+        
+        known_items: Dict[str, str] = {}
+        if manifest is not None:
+            known_items = manifest.begin_source(course_id, pdf_id, fingerprint or "")
+            if force:
+                known_items = {}
+        
+        # 1. Build text items (no chunking needed - already well-structured)
+        text_items = []
+        for block in text_blocks:
+            payload = {
+                "type": "text",
+                "source": "flashcard",
+                "flashcard_id": block["metadata"]["flashcard_id"],
+                "flashcard_type": block["metadata"]["type"],
+                "context": block["metadata"]["context"],
+                "tags": block["metadata"]["tags"],
+                "relevance_score": block["metadata"]["relevance_score"],
+                "source_id": pdf_id,
+                "source_path": json_path,
+                "text": block["text"][:500],  # Preview
+                **(lecture_metadata or {})
+            }
+            text_items.append({
+                "item_id": f"text:{block['metadata']['flashcard_id']}",
+                "point_id": string_to_int_id(block["metadata"]["flashcard_id"]),
+                "doc_id": block["metadata"]["flashcard_id"],
+                "text": block["text"],
+                "payload": payload,
+                "hash": content_sha256(block["text"], payload)
+            })
             
-            # Convert string IDs to integer IDs
-            text_ids = [string_to_int_id(block["metadata"]["flashcard_id"]) for block in text_blocks]
+            # Facet points share the flashcard's payload; only the embedded text differs
+            if self.multi_vector:
+                for facet in block.get("facets", []):
+                    if facet["facet"] not in self.facets:
+                        continue
+                    facet_key = f"{block['metadata']['flashcard_id']}#{facet['facet']}"
+                    facet_payload = {
+                        **payload,
+                        "type": "text_facet",
+                        "facet": facet["facet"],
+                        "facet_text": facet["text"][:500]
+                    }
+                    text_items.append({
+                        "item_id": f"facet:{facet_key}",
+                        "point_id": string_to_int_id(facet_key),
+                        "text": facet["text"],
+                        "payload": facet_payload,
+                        "hash": content_sha256(facet["text"], facet_payload)
+                    })
+        
+        # 2. Build image items
+        image_items = []
+        for img in images:
+            payload = {
+                "type": "image",
+                "source_id": pdf_id,
+                "source_path": pdf_path,
+                "page_number": img["page_number"],
+                "image_path": img["path"],
+                "filename": img["filename"],
+                "image_sha256": img.get("sha256"),
+                **(lecture_metadata or {})
+            }
+            image_items.append({
+                "item_id": f"image:{img['id']}",
+                "point_id": string_to_int_id(img["id"]),
+                "image": img,
+                "payload": payload,
+                "hash": content_sha256(img.get("sha256") or img["path"], payload)
+            })
+        
+        changed_text = [item for item in text_items if known_items.get(item["item_id"]) != item["hash"]]
+        changed_images = [item for item in image_items if known_items.get(item["item_id"]) != item["hash"]]
+        logger.info(
+            f"{pdf_id}: {len(changed_text)}/{len(text_items)} text blocks/facets and "
+            f"{len(changed_images)}/{len(image_items)} images new or changed"
+        )
+        
+        # 3. Embed and store changed text blocks, recording progress per batch
+        for start in range(0, len(changed_text), self.embed_batch_size):
+            batch = changed_text[start:start + self.embed_batch_size]
+            logger.info(f"Embedding {len(batch)} flashcard text blocks/facets...")
+            text_embeddings = self.embedder.embed_text([item["text"] for item in batch])
             
             self.vector_store.insert_embeddings(
                 course_id=course_id,
                 embeddings=text_embeddings,
-                metadata=text_metadata,
-                ids=text_ids
+                metadata=[item["payload"] for item in batch],
+                ids=[item["point_id"] for item in batch],
+                batch_size=self.upsert_batch_size,
+                wait=False
             )
-            text_count = len(text_blocks)
-        
-        # 4. Embed and store images
-        image_count = 0
-        if images:
-            logger.info(f"Embedding {len(images)} images...")
-            image_embeddings = self.embedder.embed_image([img["path"] for img in images])
-            
-            image_metadata = [
-                {
-                    "type": "image",
-                    "source_id": pdf_id,
-                    "source_path": pdf_path,
-                    "page_number": img["page_number"],
-                    "image_path": img["path"],
-                    "filename": img["filename"],
-                    **(lecture_metadata or {})
-                }
-                for img in images
-            ]
             
-            # Convert string IDs to integer IDs
-            image_ids = [string_to_int_id(img["id"]) for img in images]
+            if manifest is not None:
+                manifest.record_items(course_id, pdf_id, {item["item_id"]: item["hash"] for item in batch})
+        
+        # 4. Embed and store changed images
+        for start in range(0, len(changed_images), self.embed_batch_size):
+            batch = changed_images[start:start + self.embed_batch_size]
+            logger.info(f"Embedding {len(batch)} images...")
+            image_embeddings = self._embed_images([item["image"] for item in batch])
             
             self.vector_store.insert_embeddings(
                 course_id=course_id,
                 embeddings=image_embeddings,
-                metadata=image_metadata,
-                ids=image_ids
+                metadata=[item["payload"] for item in batch],
+                ids=[item["point_id"] for item in batch],
+                batch_size=self.upsert_batch_size,
+                wait=False
             )
-            image_count = len(images)
+            
+            if manifest is not None:
+                manifest.record_items(course_id, pdf_id, {item["item_id"]: item["hash"] for item in batch})
         
-        result = {
+        # Index the full text of every block lexically (the vector only sees the first
+        # 77 tokens); unchanged blocks too, since an interrupted run may not have saved them
+        blocks = [item for item in text_items if "doc_id" in item]
+        if self.lexical_indexes is not None and blocks:
+            self.lexical_indexes.add_documents(
+                course_id,
+                doc_ids=[item["doc_id"] for item in blocks],
+                texts=[item["text"] for item in blocks],
+                payloads=[item["payload"] for item in blocks],
+                save=False
+            )
+        
+        # 5. Remove points for flashcards/images that no longer exist in the source
+        if manifest is not None:
+            current_ids = {item["item_id"] for item in text_items + image_items}
+            stale_ids = [item_id for item_id in known_items if item_id not in current_ids]
+            if stale_ids:
+                logger.info(f"Removing {len(stale_ids)} stale items from {pdf_id}")
+                self.vector_store.delete_points(
+                    course_id,
+                    [string_to_int_id(item_id.split(":", 1)[1]) for item_id in stale_ids]
+                )
+                if self.lexical_indexes is not None:
+                    self.lexical_indexes.remove_documents(
+                        course_id,
+                        [item_id.split(":", 1)[1] for item_id in stale_ids if item_id.startswith("text:")],
+                        save=False
+                    )
+                manifest.forget_items(course_id, pdf_id, stale_ids)
+            self._pending_sources.append((manifest, course_id, pdf_id))
+        if not defer_commit:
+            self.flush()
+        
+        block_count = sum(1 for item in text_items if "doc_id" in item)
+        result = self._hybrid_result(pdf_path, json_path, course_id, block_count, len(image_items))
+        result["facet_points"] = len(text_items) - block_count
+        result["embedded_items"] = len(changed_text) + len(changed_images)
+        
+        logger.info(f"Hybrid ingestion complete: {result}")
+        return result
+    
+    def flush(self):
+        """Save lexical index changes, then mark the lectures they belong to as complete."""
+        if self.lexical_indexes is not None:
+            self.lexical_indexes.flush()
+        pending, self._pending_sources = self._pending_sources, []
+        for manifest, course_id, pdf_id in pending:
+            manifest.complete_source(course_id, pdf_id)
+    
+    @staticmethod
+    def _hybrid_result(
+        pdf_path: str,
+        json_path: str,
+        course_id: str,
+        text_count: int,
+        image_count: int,
+        skipped: bool = False
+    ) -> Dict:
+        """Build the statistics dictionary returned by hybrid ingestion."""
+        return {
             "pdf_path": pdf_path,
             "json_path": json_path,
             "course_id": course_id,
             "flashcard_blocks": text_count,
             "images": image_count,
-            "total_items": text_count + image_count
+            "total_items": text_count + image_count,
+            "embedded_items": 0,
+            "skipped": skipped
         }
-        
-        logger.info(f"Hybrid ingestion complete: {result}")
-        return result
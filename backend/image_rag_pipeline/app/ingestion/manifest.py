@@ -0,0 +1,160 @@
+"""
+Ingestion manifest.
+Records content hashes of ingested sources and items so unchanged work is
+skipped and interrupted runs resume where they stopped.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash a file's content.
+
+    Args:
+        path: File path
+        chunk_size: Read size in bytes
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_sha256(*parts: Any) -> str:
+    """
+    Hash arbitrary content (strings, bytes or JSON-serializable values).
+
+    Args:
+        parts: Values that together define the content
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            digest.update(part)
+        elif isinstance(part, str):
+            digest.update(part.encode("utf-8"))
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """
+    JSON manifest of what has been ingested into each course collection.
+
+    Layout:
+        {
+          "version": 1,
+          "sources": {
+            "<course_id>/<source_id>": {
+              "fingerprint": "<hash of source files + lecture metadata>",
+              "status": "in_progress" | "done",
+              "items": {"<item_id>": "<content hash>"},
+              "updated_at": <unix time>
+            }
+          }
+        }
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        """
+        Initialize the manifest, loading it if it exists.
+
+        Args:
+            path: JSON file path
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self.data: Dict[str, Any] = {"version": self.VERSION, "sources": {}}
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if loaded.get("version") == self.VERSION:
+                    self.data = loaded
+                else:
+                    logger.warning(f"Ignoring manifest with unknown version at {path}")
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning(f"Could not read manifest {path} ({e}), starting fresh")
+
+    @staticmethod
+    def _key(course_id: str, source_id: str) -> str:
+        return f"{course_id}/{source_id}"
+
+    def get_source(self, course_id: str, source_id: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for a source, if any."""
+        with self._lock:
+            return self.data["sources"].get(self._key(course_id, source_id))
+
+    def is_current(self, course_id: str, source_id: str, fingerprint: str) -> bool:
+        """Whether a source was fully ingested with exactly this fingerprint."""
+        entry = self.get_source(course_id, source_id)
+        return bool(entry) and entry.get("status") == "done" and entry.get("fingerprint") == fingerprint
+
+    def begin_source(self, course_id: str, source_id: str, fingerprint: str) -> Dict[str, str]:
+        """
+        Mark a source as in progress and return its known item hashes.
+
+        Item hashes are kept across fingerprint changes so unchanged items
+        inside a changed source are still skipped.
+        """
+        with self._lock:
+            entry = self.data["sources"].setdefault(self._key(course_id, source_id), {"items": {}})
+            entry["fingerprint"] = fingerprint
+            entry["status"] = "in_progress"
+            entry["updated_at"] = time.time()
+            return dict(entry["items"])
+
+    def record_items(self, course_id: str, source_id: str, item_hashes: Dict[str, str], save: bool = True):
+        """Record ingested item hashes (persisted immediately so a crash loses at most one batch)."""
+        with self._lock:
+            entry = self.data["sources"].setdefault(self._key(course_id, source_id), {"items": {}})
+            entry["items"].update(item_hashes)
+            entry["updated_at"] = time.time()
+        if save:
+            self.save()
+
+    def forget_items(self, course_id: str, source_id: str, item_ids):
+        """Drop items that no longer exist in the source."""
+        with self._lock:
+            entry = self.data["sources"].get(self._key(course_id, source_id))
+            if entry:
+                for item_id in item_ids:
+                    entry["items"].pop(item_id, None)
+
+    def complete_source(self, course_id: str, source_id: str):
+        """Mark a source as fully ingested and persist."""
+        with self._lock:
+            entry = self.data["sources"][self._key(course_id, source_id)]
+            entry["status"] = "done"
+            entry["updated_at"] = time.time()
+        self.save()
+
+    def save(self):
+        """Write the manifest atomically."""
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=1)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,302 @@
+"""
+Local BM25 lexical index per course.
+
+CLIP text embeddings truncate at 77 tokens and are weak on long technical
+text, so flashcard blocks are also indexed lexically. Each course gets an
+inverted index built from the same text blocks FlashcardJSONExtractor emits,
+persisted as JSON next to the vector store (data/lexical_index/).
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for",
+    "from", "has", "have", "how", "i", "if", "in", "into", "is", "it", "its", "me", "of",
+    "on", "or", "so", "such", "than", "that", "the", "their", "them", "then", "there",
+    "these", "they", "this", "to", "was", "we", "were", "what", "when", "where", "which",
+    "who", "why", "will", "with", "you", "your", "about", "explain", "question", "answer",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase, split on non-alphanumerics and drop stopwords.
+
+    Args:
+        text: Raw text
+
+    Returns:
+        List of index terms
+    """
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index, persisted as a JSON file."""
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize the index.
+
+        Args:
+            path: JSON file to load from / save to (None for a purely in-memory index)
+            k1: Term-frequency saturation parameter
+            b: Length normalization parameter
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Dict[str, Any]] = {}  # doc_id -> {"length": int, "terms": list, "payload": dict}
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {doc_id: term frequency}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, doc_id: str, text: str, payload: Optional[Dict[str, Any]] = None):
+        """
+        Add or replace a document.
+
+        Args:
+            doc_id: Unique document identifier (flashcard_id for flashcard blocks)
+            text: Full text to index
+            payload: Metadata returned with search hits
+        """
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            length = sum(terms.values())
+            self.docs[doc_id] = {"length": length, "terms": list(terms), "payload": payload or {}}
+            self.total_length += length
+
+    def remove(self, doc_id: str):
+        """Remove a document if present."""
+        with self._lock:
+            doc = self.docs.pop(doc_id, None)
+            if doc is None:
+                return
+            self.total_length -= doc["length"]
+            for term in doc["terms"]:
+                docs = self.postings.get(term)
+                if docs is None:
+                    continue
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score documents against the query with BM25.
+
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            filters: Exact-match payload filters (e.g. {"lecture_id": "DAA_lec_1"})
+
+        Returns:
+            List of {"id", "score", "metadata"} dicts, best first
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self.docs)
+            if n_docs == 0:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores: Dict[str, float] = {}
+            for term in query_terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    length = self.docs[doc_id]["length"]
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+
+            if filters:
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if all(self.docs[doc_id]["payload"].get(k) == v for k, v in filters.items() if v is not None)
+                }
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [
+                {"id": doc_id, "score": score, "metadata": self.docs[doc_id]["payload"]}
+                for doc_id, score in ranked
+            ]
+
+    def save(self):
+        """Persist the index atomically (write to a temp file, then rename)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "k1": self.k1,
+                "b": self.b,
+                "docs": self.docs,
+                "postings": self.postings,
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        logger.info(f"Saved lexical index ({len(self.docs)} docs, {len(self.postings)} terms) to {self.path}")
+
+    def load(self):
+        """Load the index from its JSON file."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self.k1 = data.get("k1", self.k1)
+            self.b = data.get("b", self.b)
+            self.docs = data.get("docs", {})
+            self.postings = data.get("postings", {})
+            self.total_length = sum(doc["length"] for doc in self.docs.values())
+        logger.info(f"Loaded lexical index ({len(self.docs)} docs) from {self.path}")
+
+
+class LexicalIndexManager:
+    """Loads, caches and persists one BM25 index per course collection."""
+
+    def __init__(self, index_dir: str):
+        """
+        Initialize the manager.
+
+        Args:
+            index_dir: Directory holding course_{course_id}.json index files
+        """
+        self.index_dir = index_dir
+        self._indexes: Dict[str, BM25Index] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._dirty: Set[str] = set()  # Courses with unsaved changes (see flush)
+        self._lock = threading.Lock()
+
+    def index_path(self, course_id: str) -> str:
+        """Path of the index file for a course."""
+        return os.path.join(self.index_dir, f"course_{course_id}.json")
+
+    def exists(self, course_id: str) -> bool:
+        """Whether a persisted index exists for the course."""
+        return course_id in self._indexes or os.path.exists(self.index_path(course_id))
+
+    def get(self, course_id: str) -> BM25Index:
+        """
+        Get the index for a course, reloading it if the file changed on disk.
+
+        Args:
+            course_id: Course identifier
+
+        Returns:
+            BM25Index (empty if none has been built yet)
+        """
+        path = self.index_path(course_id)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+        with self._lock:
+            index = self._indexes.get(course_id)
+            # Unsaved changes win over the file until flush() writes them
+            stale = mtime > self._mtimes.get(course_id, 0.0) and course_id not in self._dirty
+            if index is None or stale:
+                index = BM25Index(path=path)
+                self._indexes[course_id] = index
+                self._mtimes[course_id] = mtime
+            return index
+
+    def add_documents(
+        self,
+        course_id: str,
+        doc_ids: List[str],
+        texts: List[str],
+        payloads: List[Dict[str, Any]],
+        save: bool = True
+    ):
+        """
+        Index documents for a course and persist the index.
+
+        Args:
+            course_id: Course identifier
+            doc_ids: Document identifiers (flashcard_id, or the chunk id for PDF chunks)
+            texts: Full texts to index
+            payloads: Payload stored per document (same as the vector store payload)
+            save: Persist now; with False the index is only marked dirty until flush()
+        """
+        index = self.get(course_id)
+        for doc_id, text, payload in zip(doc_ids, texts, payloads):
+            index.add(doc_id, text, payload)
+        self._persist(course_id, index, save)
+
+    def remove_documents(self, course_id: str, doc_ids: List[str], save: bool = True):
+        """
+        Remove documents from a course index and persist it.
+
+        Args:
+            course_id: Course identifier
+            doc_ids: Document identifiers to remove
+            save: Persist now; with False the index is only marked dirty until flush()
+        """
+        if not doc_ids or not self.exists(course_id):
+            return
+        index = self.get(course_id)
+        for doc_id in doc_ids:
+            index.remove(doc_id)
+        self._persist(course_id, index, save)
+
+    def flush(self):
+        """Persist every index changed with save=False (each index is written once)."""
+        with self._lock:
+            dirty = list(self._dirty)
+        for course_id in dirty:
+            self._persist(course_id, self._indexes[course_id], save=True)
+
+    def _persist(self, course_id: str, index: BM25Index, save: bool):
+        """Save an index (re-serializing it whole) or defer the save to flush()."""
+        if not save:
+            with self._lock:
+                self._dirty.add(course_id)
+            return
+        index.save()
+        with self._lock:
+            self._dirty.discard(course_id)
+            self._mtimes[course_id] = os.path.getmtime(index.path)
+
+
+def document_key(metadata: Dict[str, Any]) -> str:
+    """
+    Stable key shared by vector and lexical hits for the same text block.
+
+    Args:
+        metadata: Point payload
+
+    Returns:
+        flashcard_id for flashcard blocks, '{pdf_id}_chunk_{n}' for PDF chunks
+    """
+    if metadata.get("flashcard_id"):
+        return metadata["flashcard_id"]
+    return f"{metadata.get('pdf_id') or metadata.get('source_id')}_chunk_{metadata.get('chunk_index')}"
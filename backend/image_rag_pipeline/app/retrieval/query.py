@@ -2,27 +2,100 @@
 Retrieval module for text-to-image search.
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from ..db.vector_store import VectorStore
 from ..ingestion.embedder import Embedder
+from .lexical_index import LexicalIndexManager, document_key
+from ..utils.config import Config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Lexical search runs here while the vector search runs on the calling thread
+_lexical_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lexical-search")
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict]], k: int = 60) -> List[Dict]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion.
+    
+    Args:
+        ranked_lists: Lists of {"score", "metadata"} hits, each best first
+        k: RRF damping constant (60 is the value from the original paper)
+        
+    Returns:
+        Fused hits {"score", "metadata", "ranks"} ordered by fused score
+    """
+    fused: Dict[str, Dict] = {}
+    for list_index, hits in enumerate(ranked_lists):
+        for rank, hit in enumerate(hits, 1):
+            key = document_key(hit["metadata"])
+            entry = fused.setdefault(key, {"score": 0.0, "metadata": hit["metadata"], "ranks": {}})
+            entry["score"] += 1.0 / (k + rank)
+            entry["ranks"][list_index] = rank
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+def aggregate_facet_hits(hits: List[Dict], aggregation: str = "max") -> List[Dict]:
+    """
+    Collapse facet hits into one hit per flashcard.
+    
+    Args:
+        hits: Facet hits {"score", "metadata"} (metadata carries flashcard_id and facet)
+        aggregation: 'max' (best facet wins) or 'sum' (cards matching on several facets rank higher)
+        
+    Returns:
+        One hit per flashcard {"score", "metadata", "facets"}, best first;
+        'facets' maps each matched facet to its score
+    """
+    if aggregation not in ("max", "sum"):
+        raise ValueError(f"Unknown facet aggregation: {aggregation}")
+    
+    grouped: Dict[str, Dict] = {}
+    for hit in hits:
+        key = document_key(hit["metadata"])
+        facet = hit["metadata"].get("facet")
+        entry = grouped.get(key)
+        if entry is None:
+            grouped[key] = {"score": hit["score"], "metadata": hit["metadata"], "facets": {facet: hit["score"]}}
+            continue
+        entry["facets"][facet] = hit["score"]
+        if aggregation == "sum":
+            entry["score"] += hit["score"]
+        elif hit["score"] > entry["score"]:
+            entry["score"] = hit["score"]
+            entry["metadata"] = hit["metadata"]
+    return sorted(grouped.values(), key=lambda entry: entry["score"], reverse=True)
+
 
 class ImageRetriever:
     """Retrieve images based on text queries."""
     
-    def __init__(self, vector_store: VectorStore, embedder: Embedder = None):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embedder: Embedder = None,
+        lexical_indexes: Optional[LexicalIndexManager] = None,
+        multi_vector: Optional[bool] = None,
+        facet_aggregation: Optional[str] = None
+    ):
         """
         Initialize retriever.
         
         Args:
             vector_store: Vector store instance
             embedder: Embedder instance (created if None)
+            lexical_indexes: Per-course BM25 indexes (enables hybrid text search)
+            multi_vector: Search flashcard facet points and aggregate per flashcard
+                         (defaults to Config.MULTI_VECTOR_RETRIEVAL)
+            facet_aggregation: 'max' or 'sum' (defaults to Config.MULTI_VECTOR_AGGREGATION)
         """
         self.vector_store = vector_store
         self.embedder = embedder if embedder else Embedder()
+        self.lexical_indexes = lexical_indexes
+        self.multi_vector = Config.MULTI_VECTOR_RETRIEVAL if multi_vector is None else multi_vector
+        self.facet_aggregation = facet_aggregation or Config.MULTI_VECTOR_AGGREGATION
     
     def query_text_to_image(
         self,
@@ -82,7 +155,8 @@ class ImageRetriever:
         query: str,
         course_id: str,
         top_k: int = 5,
-        lecture_id: Optional[str] = None
+        lecture_id: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> Dict:
         """
         Search for text chunks using text query.
@@ -91,50 +165,26 @@ class ImageRetriever:
             query: Text query
             course_id: Course identifier
             top_k: Number of results to return
+            lecture_id: Optional lecture filter
+            query_embedding: Precomputed query embedding (skips embedding the query)
             
         Returns:
             Dictionary with query and results
         """
         logger.info(f"Querying text '{query}' in course {course_id}")
         
-        # Embed query
-        query_embedding = self.embedder.embed_text(query)[0]
+        # Embed query (unless the caller already did)
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_text(query)[0]
         
         # Search for text only
-        results = self.vector_store.search(
-            course_id=course_id,
-            query_vector=query_embedding,
-            filter_type="text",
-            top_k=top_k,
-            lecture_id=lecture_id
-        )
+        results = self._search_text_vectors(course_id, query_embedding, top_k, lecture_id)
         
         # Format results - include all metadata for richer context
-        formatted_results = []
-        for result in results:
-            meta = result["metadata"]
-            formatted_result = {
-                "score": result["score"],
-                "text": meta.get("text", ""),
-                "chunk_index": meta.get("chunk_index"),
-                "block_index": meta.get("block_index"),
-                "pdf_id": meta.get("pdf_id"),
-                "source_id": meta.get("source_id"),
-                "pdf_path": meta.get("pdf_path"),
-                "source_path": meta.get("source_path"),
-            }
-            
-            # Add flashcard-specific metadata if available
-            if "flashcard_id" in meta:
-                formatted_result.update({
-                    "flashcard_id": meta.get("flashcard_id"),
-                    "flashcard_type": meta.get("flashcard_type"),
-                    "context": meta.get("context"),
-                    "tags": meta.get("tags", []),
-                    "relevance_score": meta.get("relevance_score"),
-                })
-            
-            formatted_results.append(formatted_result)
+        formatted_results = [
+            self._format_text_result(result["score"], result["metadata"])
+            for result in results
+        ]
         
         logger.info(f"Found {len(formatted_results)} text results")
         
@@ -143,4 +193,241 @@ class ImageRetriever:
             "course_id": course_id,
             "results": formatted_results
         }
+    
+    def query_text_hybrid(
+        self,
+        query: str,
+        course_id: str,
+        top_k: int = 5,
+        lecture_id: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+        candidate_k: Optional[int] = None,
+        rrf_k: int = 60
+    ) -> Dict:
+        """
+        Search text with BM25 and vectors concurrently, fused by reciprocal rank.
+        
+        Falls back to vector-only search when the course has no lexical index.
+        
+        Args:
+            query: Text query
+            course_id: Course identifier
+            top_k: Number of results to return
+            lecture_id: Optional lecture filter
+            query_embedding: Precomputed query embedding (skips embedding the query)
+            candidate_k: Candidates fetched from each retriever (defaults to 4 * top_k)
+            rrf_k: RRF damping constant
+            
+        Returns:
+            Dictionary with query and results (same shape as query_text_to_text)
+        """
+        if self.lexical_indexes is None or not self.lexical_indexes.exists(course_id):
+            return self.query_text_to_text(
+                query=query,
+                course_id=course_id,
+                top_k=top_k,
+                lecture_id=lecture_id,
+                query_embedding=query_embedding
+            )
+        
+        logger.info(f"Hybrid querying text '{query}' in course {course_id}")
+        candidate_k = candidate_k or top_k * 4
+        
+        lexical_future = _lexical_executor.submit(
+            self.lexical_indexes.get(course_id).search,
+            query,
+            candidate_k,
+            {"type": "text", "lecture_id": lecture_id}
+        )
+        
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_text(query)[0]
+        vector_hits = self._search_text_vectors(course_id, query_embedding, candidate_k, lecture_id)
+        lexical_hits = lexical_future.result()
+        
+        formatted_results = self._fuse_hybrid_hits(vector_hits, lexical_hits, top_k, rrf_k)
+        
+        logger.info(
+            f"Found {len(formatted_results)} hybrid text results "
+            f"({len(vector_hits)} vector / {len(lexical_hits)} lexical candidates)"
+        )
+        
+        return {
+            "query": query,
+            "course_id": course_id,
+            "results": formatted_results
+        }
+    
+    def query_text_batch(
+        self,
+        queries: List[Dict],
+        course_id: str,
+        top_k: int = 5,
+        hybrid: bool = True,
+        rrf_k: int = 60
+    ) -> Dict:
+        """
+        Search text for many queries at once.
+        
+        All queries are embedded in one forward pass and searched in one
+        batched vector-store request; lexical search (when hybrid and the
+        course has an index) runs concurrently and is fused per query.
+        
+        Args:
+            queries: One dict per query with 'query' and optional 'top_k' and 'lecture_id'
+            course_id: Course identifier
+            top_k: Default number of results per query
+            hybrid: Fuse with BM25 results when a lexical index exists
+            rrf_k: RRF damping constant
+            
+        Returns:
+            Dictionary with course_id and one {"query", "lecture_id", "results"} entry per query
+        """
+        if not queries:
+            return {"course_id": course_id, "results": []}
+        
+        logger.info(f"Batch querying {len(queries)} texts in course {course_id}")
+        use_lexical = hybrid and self.lexical_indexes is not None and self.lexical_indexes.exists(course_id)
+        limits = [item.get("top_k") or top_k for item in queries]
+        candidate_ks = [limit * 4 if use_lexical else limit for limit in limits]
+        lecture_ids = [item.get("lecture_id") for item in queries]
+        
+        lexical_futures = []
+        if use_lexical:
+            index = self.lexical_indexes.get(course_id)
+            lexical_futures = [
+                _lexical_executor.submit(index.search, item["query"], candidate_k, {"type": "text", "lecture_id": lecture_id})
+                for item, candidate_k, lecture_id in zip(queries, candidate_ks, lecture_ids)
+            ]
+        
+        query_embeddings = self.embedder.embed_text([item["query"] for item in queries])
+        vector_hits = self._search_text_vectors_batch(course_id, query_embeddings, candidate_ks, lecture_ids)
+        
+        batch_results = []
+        for i, item in enumerate(queries):
+            if use_lexical:
+                formatted_results = self._fuse_hybrid_hits(vector_hits[i], lexical_futures[i].result(), limits[i], rrf_k)
+            else:
+                formatted_results = [
+                    self._format_text_result(hit["score"], hit["metadata"])
+                    for hit in vector_hits[i][:limits[i]]
+                ]
+            batch_results.append({
+                "query": item["query"],
+                "lecture_id": lecture_ids[i],
+                "results": formatted_results
+            })
+        
+        return {
+            "course_id": course_id,
+            "results": batch_results
+        }
+    
+    def _search_text_vectors(
+        self,
+        course_id: str,
+        query_embedding: List[float],
+        top_k: int,
+        lecture_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Vector search over text for one query (see _search_text_vectors_batch)."""
+        return self._search_text_vectors_batch(course_id, [query_embedding], [top_k], [lecture_id])[0]
+    
+    def _search_text_vectors_batch(
+        self,
+        course_id: str,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        lecture_ids: List[Optional[str]]
+    ) -> List[List[Dict]]:
+        """
+        Vector search over text, one hit per text block, for several queries.
+        
+        In multi-vector mode, facet points are searched and aggregated per
+        flashcard. Queries with no facet hits (collections ingested without
+        facets) fall back to the single-vector layout.
+        """
+        results: List[Optional[List[Dict]]] = [None] * len(query_embeddings)
+        
+        if self.multi_vector:
+            facet_hits = self.vector_store.search_batch(course_id, [
+                {
+                    "query_vector": embedding,
+                    "filter_type": "text_facet",
+                    "top_k": top_k * len(Config.MULTI_VECTOR_FACETS),
+                    "lecture_id": lecture_id
+                }
+                for embedding, top_k, lecture_id in zip(query_embeddings, top_ks, lecture_ids)
+            ])
+            for i, hits in enumerate(facet_hits):
+                if hits:
+                    results[i] = aggregate_facet_hits(hits, self.facet_aggregation)[:top_ks[i]]
+        
+        pending = [i for i, hits in enumerate(results) if hits is None]
+        if pending:
+            if self.multi_vector:
+                logger.info(f"No facet points in course {course_id}, using single-vector search")
+            single_hits = self.vector_store.search_batch(course_id, [
+                {
+                    "query_vector": query_embeddings[i],
+                    "filter_type": "text",
+                    "top_k": top_ks[i],
+                    "lecture_id": lecture_ids[i]
+                }
+                for i in pending
+            ])
+            for i, hits in zip(pending, single_hits):
+                results[i] = hits
+        
+        return results
+    
+    def _fuse_hybrid_hits(
+        self,
+        vector_hits: List[Dict],
+        lexical_hits: List[Dict],
+        top_k: int,
+        rrf_k: int = 60
+    ) -> List[Dict]:
+        """Fuse vector and lexical hits by RRF and format them, keeping both raw scores."""
+        fused = reciprocal_rank_fusion([vector_hits, lexical_hits], k=rrf_k)[:top_k]
+        
+        vector_scores = {document_key(hit["metadata"]): hit["score"] for hit in vector_hits}
+        lexical_scores = {document_key(hit["metadata"]): hit["score"] for hit in lexical_hits}
+        
+        formatted_results = []
+        for entry in fused:
+            formatted_result = self._format_text_result(entry["score"], entry["metadata"])
+            key = document_key(entry["metadata"])
+            formatted_result["vector_score"] = vector_scores.get(key)
+            formatted_result["lexical_score"] = lexical_scores.get(key)
+            formatted_results.append(formatted_result)
+        return formatted_results
+    
+    @staticmethod
+    def _format_text_result(score: float, meta: Dict) -> Dict:
+        """Shape a text hit payload into the API result format."""
+        formatted_result = {
+            "score": score,
+            "text": meta.get("text", ""),
+            "chunk_index": meta.get("chunk_index"),
+            "block_index": meta.get("block_index"),
+            "pdf_id": meta.get("pdf_id"),
+            "source_id": meta.get("source_id"),
+            "pdf_path": meta.get("pdf_path"),
+            "source_path": meta.get("source_path"),
+        }
+        
+        # Add flashcard-specific metadata if available
+        if "flashcard_id" in meta:
+            formatted_result.update({
+                "flashcard_id": meta.get("flashcard_id"),
+                "flashcard_type": meta.get("flashcard_type"),
+                "context": meta.get("context"),
+                "tags": meta.get("tags", []),
+                "relevance_score": meta.get("relevance_score"),
+            })
+            if "facet" in meta:
+                formatted_result["matched_facet"] = meta.get("facet")
+        
+        return formatted_result
 
@@ -16,17 +16,65 @@ class Config:
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
     QDRANT_PATH = os.getenv("QDRANT_PATH", "data/embeddings")
     
+    # Collection schema (applied on creation; migrate existing collections with
+    # scripts/migrate_collections.py)
+    QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", 16))
+    QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+    QDRANT_SEARCH_EF = int(os.getenv("QDRANT_SEARCH_EF", 128))
+    QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")  # none | int8
+    QDRANT_QUANTIZATION_RESCORE = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() == "true"
+    QDRANT_QUANTIZATION_OVERSAMPLING = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", 2.0))
+    QDRANT_ON_DISK_VECTORS = os.getenv("QDRANT_ON_DISK_VECTORS", "false").lower() == "true"
+    
+    # Lexical (BM25) index, stored next to the vector store
+    LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "data/lexical_index")
+    HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+    
+    # Multi-vector flashcard indexing: one extra point per flashcard facet,
+    # scores aggregated per flashcard at query time (max | sum)
+    MULTI_VECTOR_INDEXING = os.getenv("MULTI_VECTOR_INDEXING", "false").lower() == "true"
+    MULTI_VECTOR_RETRIEVAL = os.getenv("MULTI_VECTOR_RETRIEVAL", "false").lower() == "true"
+    MULTI_VECTOR_FACETS = [
+        f.strip() for f in os.getenv(
+            "MULTI_VECTOR_FACETS",
+            "question,answer,analogy,eli5,real_world_use_case,common_mistakes,example,context"
+        ).split(",") if f.strip()
+    ]
+    MULTI_VECTOR_AGGREGATION = os.getenv("MULTI_VECTOR_AGGREGATION", "max")
+    
     # OpenCLIP Model
     CLIP_MODEL = os.getenv("CLIP_MODEL", "ViT-B-32")
     CLIP_PRETRAINED = os.getenv("CLIP_PRETRAINED", "laion2b_s34b_b79k")
     
+    # PDF extraction (processes extracting page ranges in parallel)
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", 4))
+    
     # Text Chunking
-    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 400))
-    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 50))
+    CHUNKER = os.getenv("CHUNKER", "token")  # token | char
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0))  # 0 = text encoder context minus start/end tokens
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 0))
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 400))  # char chunker only
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 50))  # char chunker only
     
     # API
     API_HOST = os.getenv("API_HOST", "0.0.0.0")
     API_PORT = int(os.getenv("API_PORT", 8001))
+    MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", 64))
+    
+    # Image serving: on-demand WebP thumbnails, cached on disk
+    THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "data/thumbnails")
+    THUMBNAIL_CACHE_MAX_MB = int(os.getenv("THUMBNAIL_CACHE_MAX_MB", 512))
+    THUMBNAIL_WIDTHS = tuple(int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "160,320,640,1280").split(","))
+    
+    # Chat session memory
+    SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")  # sqlite | mongo | memory
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions/chat_sessions.sqlite")
+    SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 1000))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 1800))
+    MONGODB_URL = os.getenv("MONGODB_URL")
+    DATABASE_NAME = os.getenv("DATABASE_NAME", "study_analytics")
+    MAX_CONVERSATION_MANAGERS = int(os.getenv("MAX_CONVERSATION_MANAGERS", 32))
+    SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
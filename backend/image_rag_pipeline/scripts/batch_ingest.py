@@ -5,6 +5,7 @@ import json
 import os
 import sys
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Optional
 
 # Add parent directory to path
@@ -13,6 +14,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from app.ingestion.loader import IngestionPipeline
 from app.db.vector_store import VectorStore
 from app.ingestion.embedder import Embedder
+from app.retrieval.lexical_index import LexicalIndexManager
+from app.ingestion.lecture_extraction import lecture_fingerprint, run_extraction_job
+from app.ingestion.manifest import IngestionManifest
 from app.utils.config import Config
 
 logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
@@ -22,16 +26,27 @@ logger = logging.getLogger(__name__)
 def ingest_all_courses(
     courses_json_path: Optional[str] = None,
     course_id: Optional[str] = None,
-    lecture_number: Optional[str] = None
+    lecture_number: Optional[str] = None,
+    jobs: int = 4,
+    force: bool = False,
+    manifest_path: Optional[str] = None
 ):
     """
     Ingest courses from courses.json.
     
+    Lectures whose inputs are unchanged (per the ingestion manifest) are
+    skipped. The rest are extracted in a process pool while the main process
+    embeds and uploads finished extractions; progress is checkpointed in the
+    manifest so an interrupted run resumes where it stopped.
+    
     Args:
         courses_json_path: Path to courses.json (defaults to project root)
         course_id: Optional course ID to filter (if None, processes all courses)
         lecture_number: Optional lecture number to filter (if None, processes all lectures)
                        Only used if course_id is also provided
+        jobs: Number of extraction worker processes (1 = extract inline)
+        force: Re-ingest everything, ignoring the manifest
+        manifest_path: Manifest file (defaults to data/ingestion_manifest.json)
     """
     # Default path to courses.json
     if courses_json_path is None:
@@ -76,10 +91,17 @@ def ingest_all_courses(
         vector_store=vector_store,
         embedder=embedder,
         chunk_size=Config.CHUNK_SIZE,
-        chunk_overlap=Config.CHUNK_OVERLAP
+        chunk_overlap=Config.CHUNK_OVERLAP,
+        lexical_indexes=LexicalIndexManager(
+            Config.LEXICAL_INDEX_PATH if os.path.isabs(Config.LEXICAL_INDEX_PATH)
+            else os.path.join(base_dir, Config.LEXICAL_INDEX_PATH)
+        ) if Config.HYBRID_RETRIEVAL else None
     )
     logger.info("Ingestion pipeline initialized")
     
+    manifest = IngestionManifest(manifest_path or os.path.join(data_dir, "ingestion_manifest.json"))
+    logger.info(f"Using ingestion manifest: {manifest.path}")
+    
     # Load courses
     with open(courses_json_path) as f:
         courses = json.load(f)
@@ -98,6 +120,11 @@ def ingest_all_courses(
     total_processed = 0
     total_failed = 0
     total_skipped = 0
+    total_unchanged = 0
+    
+    # Lectures to ingest, planned first so extraction can run in parallel
+    hybrid_jobs = []
+    pdf_only_jobs = []
     
     # Ingest each course
     for course in courses:
@@ -218,45 +245,110 @@ def ingest_all_courses(
                 total_skipped += 1
                 continue
             
-            try:
-                logger.info(f"\n  Processing: {lecture['lecture_name']}")
-                
-                # Use hybrid ingestion if JSON exists
-                if json_path:
-                    logger.info(f"  Using hybrid ingestion (PDF + JSON)")
-                    if should_process_pdf:
-                        logger.info(f"    - Images from: {os.path.basename(pdf_path)}")
-                    else:
-                        logger.info(f"    - Skipping PDF images (hasPDF=false or file missing)")
-                    logger.info(f"    - Text from: {os.path.basename(json_path)}")
-                    
-                    result = pipeline.ingest_lecture_hybrid(
-                        pdf_path=pdf_path,
-                        json_path=json_path,
-                        course_id=current_course_id,
-                        lecture_metadata=metadata,
-                        skip_images=not should_process_pdf
-                    )
-                    logger.info(f"  ✓ Success: {result['total_items']} items "
-                              f"({result['flashcard_blocks']} flashcard blocks, {result['images']} images)")
-                # Otherwise fallback to PDF-only if valid
-                elif should_process_pdf:
-                    logger.info(f"  Using PDF-only ingestion (no flashcard JSON found)")
-                    result = pipeline.ingest_pdf(pdf_path, current_course_id, metadata)
-                    logger.info(f"  ✓ Success: {result['total_items']} items "
-                              f"({result['text_chunks']} chunks, {result['images']} images)")
-                else:
-                    # This case should be caught by the check above, but just in case
-                    logger.warning("  Skipping: conditions not met for ingestion")
-                    total_skipped += 1
+            if json_path:
+                fingerprint = lecture_fingerprint(pdf_path, json_path, metadata, not should_process_pdf)
+                if not force and manifest.is_current(current_course_id, pdf_basename, fingerprint):
+                    logger.info(f"  Unchanged since last run, skipping: {lecture.get('lecture_name')}")
+                    total_unchanged += 1
                     continue
-                
-                total_processed += 1
-            except Exception as e:
-                logger.error(f"  ✗ Failed: {e}")
-                import traceback
-                logger.debug(traceback.format_exc())
-                total_failed += 1
+                hybrid_jobs.append({
+                    "lecture_name": lecture.get("lecture_name", "Unknown"),
+                    "course_id": current_course_id,
+                    "pdf_path": pdf_path,
+                    "json_path": json_path,
+                    "image_output_dir": pipeline.image_output_dir,
+                    "skip_images": not should_process_pdf,
+                    "metadata": metadata,
+                    "fingerprint": fingerprint
+                })
+            elif should_process_pdf:
+                pdf_only_jobs.append({
+                    "lecture_name": lecture.get("lecture_name", "Unknown"),
+                    "course_id": current_course_id,
+                    "pdf_path": pdf_path,
+                    "metadata": metadata
+                })
+            else:
+                # This case should be caught by the check above, but just in case
+                logger.warning("  Skipping: conditions not met for ingestion")
+                total_skipped += 1
+    
+    logger.info(
+        f"\nPlanned {len(hybrid_jobs)} hybrid and {len(pdf_only_jobs)} PDF-only lectures "
+        f"({total_unchanged} unchanged, skipped)"
+    )
+    
+    def ingest_extracted(job):
+        """Embed and upload one extracted lecture in the main process."""
+        logger.info(f"\n  Processing: {job['lecture_name']} (hybrid: PDF images + flashcard JSON text)")
+        result = pipeline.ingest_extracted_lecture(
+            extraction=job["extraction"],
+            course_id=job["course_id"],
+            lecture_metadata=job["metadata"],
+            fingerprint=job["fingerprint"],
+            manifest=manifest,
+            force=force,
+            defer_commit=True
+        )
+        logger.info(f"  ✓ Success: {result['total_items']} items "
+                  f"({result['flashcard_blocks']} flashcard blocks, {result['images']} images, "
+                  f"{result['embedded_items']} embedded)")
+    
+    # Hybrid lectures: extract in worker processes, embed/upload as each finishes.
+    # Lexical index saves and manifest completion are deferred to one flush at the end.
+    try:
+        if hybrid_jobs:
+            if jobs > 1:
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    futures = {executor.submit(run_extraction_job, job): job for job in hybrid_jobs}
+                    for future in as_completed(futures):
+                        job = futures[future]
+                        try:
+                            # A crashed worker (e.g. BrokenProcessPool) fails only this job
+                            job = future.result()
+                            if "error" in job:
+                                raise RuntimeError(job["error"])
+                            ingest_extracted(job)
+                            total_processed += 1
+                        except Exception as e:
+                            logger.error(f"  ✗ Failed: {job['lecture_name']}: {e}")
+                            total_failed += 1
+            else:
+                for job in hybrid_jobs:
+                    try:
+                        job = run_extraction_job(job)
+                        if "error" in job:
+                            raise RuntimeError(job["error"])
+                        ingest_extracted(job)
+                        total_processed += 1
+                    except Exception as e:
+                        logger.error(f"  ✗ Failed: {job['lecture_name']}: {e}")
+                        total_failed += 1
+    finally:
+        pipeline.flush()
+    
+    # PDF-only lectures (no flashcard JSON found)
+    for job in pdf_only_jobs:
+        try:
+            logger.info(f"\n  Processing: {job['lecture_name']} (PDF-only, no flashcard JSON found)")
+            result = pipeline.ingest_pdf(
+                job["pdf_path"],
+                job["course_id"],
+                job["metadata"],
+                manifest=manifest,
+                force=force
+            )
+            if result.get("skipped"):
+                total_unchanged += 1
+                continue
+            logger.info(f"  ✓ Success: {result['total_items']} items "
+                      f"({result['text_chunks']} chunks, {result['images']} images)")
+            total_processed += 1
+        except Exception as e:
+            logger.error(f"  ✗ Failed: {e}")
+            import traceback
+            logger.debug(traceback.format_exc())
+            total_failed += 1
     
     # Print summary
     logger.info(f"\n{'='*60}")
@@ -265,6 +357,7 @@ def ingest_all_courses(
     logger.info(f"Total lectures processed: {total_processed}")
     logger.info(f"Total failed: {total_failed}")
     logger.info(f"Total skipped: {total_skipped}")
+    logger.info(f"Total unchanged (already ingested): {total_unchanged}")
     logger.info(f"{'='*60}\n")
 
 
@@ -284,6 +377,9 @@ Examples:
   
   # Process a specific lecture from a specific course
   python scripts/batch_ingest.py --course-id MS5260 --lecture-number 4
+  
+  # Re-ingest everything with 8 extraction workers, ignoring the manifest
+  python scripts/batch_ingest.py --jobs 8 --force
         """
     )
     parser.add_argument(
@@ -306,10 +402,31 @@ Examples:
              "Only used if --course-id is also provided. If provided, only processes this lecture."
     )
     
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of worker processes for PDF/JSON extraction (default: 4, 1 = no pool)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-ingest everything, ignoring the ingestion manifest"
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Path to the ingestion manifest (defaults to data/ingestion_manifest.json)"
+    )
+    
     args = parser.parse_args()
     ingest_all_courses(
         courses_json_path=args.courses_json,
         course_id=args.course_id,
-        lecture_number=args.lecture_number
+        lecture_number=args.lecture_number,
+        jobs=args.jobs,
+        force=args.force,
+        manifest_path=args.manifest
     )
 
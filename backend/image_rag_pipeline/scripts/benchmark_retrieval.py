@@ -0,0 +1,437 @@
+"""
+Retrieval benchmark: recall@k and latency for vector, multi-vector, lexical (BM25)
+and hybrid search.
+
+Queries are held out from the index: they are the quiz questions in
+courses/*/quiz, which are written separately from the flashcards and name
+their source flashcard (source_flashcard_id) as the single relevant result.
+Query types follow the quiz level (level_1 recall questions through level_4
+scenario questions), so lexical overlap with the indexed text is what a
+student's own wording would give, not a copy of it.
+
+Vector, multivector and hybrid modes search the ingested Qdrant collection
+(run scripts/batch_ingest.py first, with MULTI_VECTOR_INDEXING=true for the
+multivector mode), or with --fresh-index a temporary collection built from the
+flashcards holding both layouts, so single- and multi-vector search are compared
+on identical data. Lexical mode needs no models or database.
+"""
+import glob
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.ingestion.json_extractor import FlashcardJSONExtractor
+from app.retrieval.lexical_index import BM25Index, LexicalIndexManager
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+DEFAULT_KS = (1, 3, 5, 10)
+
+
+def load_flashcard_corpus(courses_dir: str, course_id: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    Extract flashcard text blocks for every course, exactly as ingestion does.
+
+    Args:
+        courses_dir: Directory containing {course_id}/cognitive_flashcards/...
+        course_id: Optional course filter
+
+    Returns:
+        Mapping course_id -> list of text blocks (with lecture_id and raw card fields)
+    """
+    extractor = FlashcardJSONExtractor()
+    corpus: Dict[str, List[Dict]] = {}
+    pattern = os.path.join(courses_dir, course_id or "*", "cognitive_flashcards", "*", "*_cognitive_flashcards_only.json")
+
+    for json_path in sorted(glob.glob(pattern)):
+        current_course = os.path.normpath(json_path).split(os.sep)[-4]
+        lecture_id = os.path.basename(os.path.dirname(json_path))
+        extraction = extractor.extract(json_path, source_id=lecture_id)
+
+        with open(json_path, "r", encoding="utf-8") as f:
+            cards = json.load(f).get("flashcards", [])
+        cards_by_id = {card.get("flashcard_id"): card for card in cards}
+
+        for block in extraction["text_blocks"]:
+            block["lecture_id"] = lecture_id
+            block["card"] = cards_by_id.get(block["metadata"]["flashcard_id"], {})
+            corpus.setdefault(current_course, []).append(block)
+
+    return corpus
+
+
+def load_quiz_questions(courses_dir: str, course_id: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    Load quiz questions that name their source flashcard.
+
+    Args:
+        courses_dir: Directory containing {course_id}/quiz/*_level_N_quiz.json
+        course_id: Optional course filter
+
+    Returns:
+        Mapping course_id -> list of {"level", "question", "flashcard_id"} dicts
+    """
+    questions: Dict[str, List[Dict]] = {}
+    pattern = os.path.join(courses_dir, course_id or "*", "quiz", "*_level_*_quiz.json")
+
+    for json_path in sorted(glob.glob(pattern)):
+        current_course = os.path.normpath(json_path).split(os.sep)[-3]
+        match = re.search(r"_level_(\d+)_quiz\.json$", json_path)
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        for question in data.get("questions", []):
+            text = (question.get("question_text") or "").strip()
+            flashcard_id = question.get("source_flashcard_id")
+            if text and flashcard_id:
+                questions.setdefault(current_course, []).append({
+                    "level": int(match.group(1)) if match else 0,
+                    "question": text,
+                    "flashcard_id": flashcard_id
+                })
+
+    return questions
+
+
+def generate_queries(
+    blocks: List[Dict],
+    quiz_questions: List[Dict],
+    seed: int = 42,
+    max_per_type: Optional[int] = None
+) -> List[Dict]:
+    """
+    Build held-out query sets from quiz questions, with the source flashcard as ground truth.
+
+    Questions whose source flashcard is not in the indexed blocks are dropped.
+
+    Args:
+        blocks: Text blocks of one course
+        quiz_questions: Quiz questions of the same course (see load_quiz_questions)
+        seed: Random seed for sampling
+        max_per_type: Cap on queries per query type (None = every quiz question)
+
+    Returns:
+        List of {"type", "query", "flashcard_id", "lecture_id"} dicts
+    """
+    lectures = {block["metadata"]["flashcard_id"]: block["lecture_id"] for block in blocks}
+
+    queries: Dict[str, List[Dict]] = {}
+    seen = set()
+    for question in quiz_questions:
+        flashcard_id = question["flashcard_id"]
+        key = (question["question"], flashcard_id)
+        if flashcard_id not in lectures or key in seen:
+            continue
+        seen.add(key)
+        query_type = f"level_{question['level']}"
+        queries.setdefault(query_type, []).append({
+            "type": query_type,
+            "query": question["question"],
+            "flashcard_id": flashcard_id,
+            "lecture_id": lectures[flashcard_id]
+        })
+
+    rng = random.Random(seed)
+    selected = []
+    for query_type in sorted(queries):
+        items = queries[query_type]
+        if max_per_type and len(items) > max_per_type:
+            items = rng.sample(items, max_per_type)
+        selected.extend(items)
+    return selected
+
+
+def evaluate(
+    search_fn: Callable[[str], List[str]],
+    queries: List[Dict],
+    ks=DEFAULT_KS
+) -> Dict[str, Dict]:
+    """
+    Run every query and compute recall@k, MRR and latency per query type.
+
+    Args:
+        search_fn: Function mapping a query string to ranked flashcard_ids
+        queries: Generated queries
+        ks: Cutoffs for recall@k
+
+    Returns:
+        Mapping query type (plus 'all') -> metrics dict
+    """
+    per_type: Dict[str, Dict[str, list]] = {}
+    for item in queries:
+        start = time.perf_counter()
+        ranked_ids = search_fn(item["query"])
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        rank = ranked_ids.index(item["flashcard_id"]) + 1 if item["flashcard_id"] in ranked_ids else None
+        for bucket in (item["type"], "all"):
+            stats = per_type.setdefault(bucket, {"ranks": [], "latencies": []})
+            stats["ranks"].append(rank)
+            stats["latencies"].append(latency_ms)
+
+    report = {}
+    for bucket, stats in per_type.items():
+        ranks = stats["ranks"]
+        latencies = sorted(stats["latencies"])
+        metrics = {
+            "queries": len(ranks),
+            "mrr": round(sum(1.0 / r for r in ranks if r) / len(ranks), 4),
+            "latency_p50_ms": round(statistics.median(latencies), 2),
+            "latency_p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        }
+        for k in ks:
+            metrics[f"recall@{k}"] = round(sum(1 for r in ranks if r and r <= k) / len(ranks), 4)
+        report[bucket] = metrics
+    return report
+
+
+def build_lexical_index(blocks: List[Dict], path: Optional[str] = None) -> BM25Index:
+    """Build a BM25 index over a course's blocks (optionally persisted to path)."""
+    index = BM25Index(path=path)
+    for block in blocks:
+        index.add(
+            block["metadata"]["flashcard_id"],
+            block["text"],
+            {"type": "text", "flashcard_id": block["metadata"]["flashcard_id"], "lecture_id": block["lecture_id"]}
+        )
+    if path:
+        index.save()
+    return index
+
+
+def create_vector_components(fresh_index_dir: Optional[str] = None):
+    """
+    Create the vector store and embedder from Config (requires torch/open_clip/qdrant).
+
+    Args:
+        fresh_index_dir: Use an empty local Qdrant store here instead of the configured one
+    """
+    from app.db.vector_store import VectorStore
+    from app.ingestion.embedder import Embedder
+    from app.utils.config import Config
+
+    base_dir = os.path.join(os.path.dirname(__file__), "..")
+    if fresh_index_dir:
+        vector_store = VectorStore(path=fresh_index_dir)
+    elif Config.QDRANT_PATH and not Config.QDRANT_PATH.startswith("http"):
+        vector_db_path = Config.QDRANT_PATH if os.path.isabs(Config.QDRANT_PATH) else os.path.join(base_dir, Config.QDRANT_PATH)
+        vector_store = VectorStore(path=vector_db_path)
+    else:
+        vector_store = VectorStore(host=Config.QDRANT_HOST, port=Config.QDRANT_PORT)
+    embedder = Embedder(model_name=Config.CLIP_MODEL, pretrained=Config.CLIP_PRETRAINED)
+    return vector_store, embedder
+
+
+def build_vector_index(vector_store, embedder, course_id: str, blocks: List[Dict], facets: List[str]):
+    """
+    Index a course's blocks in both layouts: one 'text' point per flashcard
+    plus one 'text_facet' point per facet (same ids and payloads as ingestion).
+    """
+    from app.ingestion.loader import string_to_int_id
+
+    vector_store.create_collection(course_id, vector_size=embedder.get_embedding_dim())
+    ids, texts, payloads = [], [], []
+    for block in blocks:
+        flashcard_id = block["metadata"]["flashcard_id"]
+        payload = {"type": "text", "flashcard_id": flashcard_id, "lecture_id": block["lecture_id"],
+                   "text": block["text"][:500]}
+        ids.append(string_to_int_id(flashcard_id))
+        texts.append(block["text"])
+        payloads.append(payload)
+        for facet in block.get("facets", []):
+            if facet["facet"] in facets:
+                ids.append(string_to_int_id(f"{flashcard_id}#{facet['facet']}"))
+                texts.append(facet["text"])
+                payloads.append({**payload, "type": "text_facet", "facet": facet["facet"]})
+    vector_store.insert_embeddings(course_id, embedder.embed_text(texts), payloads, ids)
+
+
+def index_size(vector_store, course_id: str) -> Dict[str, int]:
+    """Points per text layout in a course collection."""
+    return {
+        "single_vector_points": vector_store.count_points(course_id, "text"),
+        "facet_points": vector_store.count_points(course_id, "text_facet"),
+    }
+
+
+def print_report(title: str, report: Dict[str, Dict]):
+    """Print one mode's metrics as a table."""
+    print(f"\n{title}")
+    print("-" * len(title))
+    columns = [c for c in next(iter(report.values())).keys() if c != "queries"]
+    print(f"{'query type':<10} {'n':>5} " + " ".join(f"{c:>15}" for c in columns))
+    for bucket in sorted(report, key=lambda b: (b == "all", b)):
+        metrics = report[bucket]
+        print(f"{bucket:<10} {metrics['queries']:>5} " + " ".join(f"{metrics[c]:>15}" for c in columns))
+
+
+def run_benchmark(
+    courses_dir: str,
+    modes: List[str],
+    course_id: Optional[str] = None,
+    top_k: int = 10,
+    max_queries: Optional[int] = None,
+    output: Optional[str] = None,
+    aggregation: str = "max",
+    fresh_index: bool = False
+) -> Dict:
+    """
+    Benchmark the selected retrieval modes on every course.
+
+    Args:
+        courses_dir: Directory containing course flashcards
+        modes: Any of 'vector', 'multivector', 'lexical', 'hybrid'
+        course_id: Optional course filter
+        top_k: Results retrieved per query (must be >= the largest recall cutoff)
+        max_queries: Cap on queries per query type per course
+        output: Optional path for a JSON report
+        aggregation: Facet score aggregation for multivector mode ('max' or 'sum')
+        fresh_index: Build a temporary vector collection with both layouts from the flashcards
+
+    Returns:
+        Nested report {course_id: {mode: {query_type: metrics}}}
+    """
+    corpus = load_flashcard_corpus(courses_dir, course_id)
+    if not corpus:
+        print(f"No flashcards found under {courses_dir}")
+        return {}
+    quiz_questions = load_quiz_questions(courses_dir, course_id)
+
+    full_report = {}
+    with tempfile.TemporaryDirectory() as index_dir:
+        lexical_indexes = LexicalIndexManager(os.path.join(index_dir, "lexical"))
+
+        vector_store = embedder = None
+        if any(mode in ("vector", "multivector", "hybrid") for mode in modes):
+            vector_store, embedder = create_vector_components(
+                os.path.join(index_dir, "qdrant") if fresh_index else None
+            )
+
+        for current_course, blocks in corpus.items():
+            queries = generate_queries(blocks, quiz_questions.get(current_course, []), max_per_type=max_queries)
+            if not queries:
+                print(f"\n=== {current_course}: no quiz questions reference these flashcards, skipping ===")
+                continue
+            print(f"\n=== {current_course}: {len(blocks)} flashcards, {len(queries)} queries ===")
+            index = build_lexical_index(blocks, path=lexical_indexes.index_path(current_course))
+            course_report = {}
+
+            if vector_store is not None:
+                from app.utils.config import Config
+
+                if fresh_index:
+                    build_vector_index(vector_store, embedder, current_course, blocks, Config.MULTI_VECTOR_FACETS)
+                course_report["index_size"] = index_size(vector_store, current_course)
+                print(f"Index size: {course_report['index_size']}")
+
+            if "lexical" in modes:
+                course_report["lexical"] = evaluate(
+                    lambda q: [hit["id"] for hit in index.search(q, top_k=top_k)],
+                    queries
+                )
+
+            if vector_store is not None:
+                from app.retrieval.query import ImageRetriever
+
+                vector_retriever = ImageRetriever(vector_store=vector_store, embedder=embedder, multi_vector=False)
+                multi_retriever = ImageRetriever(
+                    vector_store=vector_store,
+                    embedder=embedder,
+                    multi_vector=True,
+                    facet_aggregation=aggregation
+                )
+                hybrid_retriever = ImageRetriever(
+                    vector_store=vector_store,
+                    embedder=embedder,
+                    lexical_indexes=lexical_indexes
+                )
+
+                if "vector" in modes:
+                    course_report["vector"] = evaluate(
+                        lambda q: [r.get("flashcard_id") for r in vector_retriever.query_text_to_text(
+                            query=q, course_id=current_course, top_k=top_k)["results"]],
+                        queries
+                    )
+                if "multivector" in modes:
+                    if not course_report["index_size"]["facet_points"]:
+                        print("No facet points in this collection (ingest with MULTI_VECTOR_INDEXING=true "
+                              "or pass --fresh-index); skipping multivector")
+                    else:
+                        course_report[f"multivector_{aggregation}"] = evaluate(
+                            lambda q: [r.get("flashcard_id") for r in multi_retriever.query_text_to_text(
+                                query=q, course_id=current_course, top_k=top_k)["results"]],
+                            queries
+                        )
+                if "hybrid" in modes:
+                    course_report["hybrid"] = evaluate(
+                        lambda q: [r.get("flashcard_id") for r in hybrid_retriever.query_text_hybrid(
+                            query=q, course_id=current_course, top_k=top_k)["results"]],
+                        queries
+                    )
+
+            for mode, report in course_report.items():
+                if mode != "index_size":
+                    print_report(f"{current_course} / {mode}", report)
+            full_report[current_course] = course_report
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(full_report, f, indent=2)
+        print(f"\nReport written to {output}")
+
+    return full_report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark vector, multi-vector, lexical and hybrid text retrieval")
+    parser.add_argument(
+        "--courses-dir",
+        type=str,
+        default=os.path.join(PROJECT_ROOT, "courses"),
+        help="Directory containing course flashcards (defaults to <project root>/courses)"
+    )
+    parser.add_argument("--course-id", type=str, default=None, help="Only benchmark this course")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["vector", "multivector", "lexical", "hybrid"],
+        default=["vector", "multivector", "lexical", "hybrid"],
+        help="Retrieval modes to benchmark (all but lexical need an ingested collection or --fresh-index)"
+    )
+    parser.add_argument(
+        "--aggregation",
+        choices=["max", "sum"],
+        default="max",
+        help="Per-flashcard facet score aggregation for multivector mode"
+    )
+    parser.add_argument(
+        "--fresh-index",
+        action="store_true",
+        help="Embed the flashcards into a temporary collection (both layouts) instead of using the ingested one"
+    )
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--max-queries", type=int, default=None, help="Max queries per query type per course")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON report here")
+
+    args = parser.parse_args()
+    run_benchmark(
+        courses_dir=args.courses_dir,
+        modes=args.modes,
+        course_id=args.course_id,
+        top_k=args.top_k,
+        max_queries=args.max_queries,
+        output=args.output,
+        aggregation=args.aggregation,
+        fresh_index=args.fresh_index
+    )
@@ -0,0 +1,106 @@
+"""
+Apply the configured collection schema to existing course_* collections.
+
+Creates keyword payload indexes on type / lecture_id / flashcard_id and
+updates HNSW parameters, int8 scalar quantization and on-disk vector storage
+from Config (QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT, QDRANT_QUANTIZATION,
+QDRANT_ON_DISK_VECTORS). New collections get the same schema on creation.
+
+With local-path storage (QDRANT_PATH) search is exact and in-process, so the
+settings have no effect there and collections are reported as not applicable.
+"""
+import json
+import os
+import sys
+import logging
+from typing import List, Optional
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.vector_store import VectorStore
+from app.utils.config import Config
+
+logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
+logger = logging.getLogger(__name__)
+
+
+def migrate_collections(course_ids: Optional[List[str]] = None, dry_run: bool = False) -> List[dict]:
+    """
+    Apply the configured schema to course collections.
+
+    Args:
+        course_ids: Courses to migrate (defaults to every course_* collection)
+        dry_run: Only list the collections and the settings that would be applied
+
+    Returns:
+        One summary per collection
+    """
+    base_dir = os.path.join(os.path.dirname(__file__), "..")
+
+    # Initialize vector store using Config
+    if Config.QDRANT_PATH and not Config.QDRANT_PATH.startswith("http"):
+        vector_db_path = Config.QDRANT_PATH if os.path.isabs(Config.QDRANT_PATH) else os.path.join(base_dir, Config.QDRANT_PATH)
+        vector_store = VectorStore(path=vector_db_path)
+    else:
+        vector_store = VectorStore(host=Config.QDRANT_HOST, port=Config.QDRANT_PORT)
+
+    existing = vector_store.list_course_collections()
+    targets = course_ids or existing
+
+    summaries = []
+    for course_id in targets:
+        if course_id not in existing:
+            logger.warning(f"Collection course_{course_id} does not exist, skipping")
+            continue
+
+        if dry_run:
+            summaries.append({
+                "collection": f"course_{course_id}",
+                "points": vector_store.count_points(course_id),
+                "hnsw": {"m": vector_store.hnsw_m, "ef_construct": vector_store.hnsw_ef_construct},
+                "quantization": vector_store.quantization,
+                "on_disk_vectors": vector_store.on_disk_vectors,
+                "dry_run": True
+            })
+            continue
+
+        try:
+            summaries.append(vector_store.apply_schema(course_id))
+        except Exception as e:
+            logger.error(f"Failed to migrate course_{course_id}: {e}")
+            summaries.append({"collection": f"course_{course_id}", "applied": False, "error": str(e)})
+
+    return summaries
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Apply payload indexes, HNSW, quantization and on-disk settings to course collections",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Migrate every course collection
+  python scripts/migrate_collections.py
+
+  # Enable int8 quantization for one course
+  QDRANT_QUANTIZATION=int8 python scripts/migrate_collections.py --course-id MS5260
+        """
+    )
+    parser.add_argument(
+        "--course-id",
+        action="append",
+        default=None,
+        help="Course to migrate (repeatable; defaults to all course_* collections)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would be applied without changing anything"
+    )
+
+    args = parser.parse_args()
+    results = migrate_collections(course_ids=args.course_id, dry_run=args.dry_run)
+    print(json.dumps(results, indent=2))
@@ -3,12 +3,16 @@ Async Cognitive Flashcard Generator - Batched AI generation logic.
 """
 
 import os
-import json
-import asyncio
-from typing import Dict, List, Any, Optional
+import itertools
+from typing import AsyncContextManager, Callable, Dict, List, Any, Optional
 
 from config import Config
+from cognitive_flashcard_generator.json_stream import JSONObjectStream, collect_items_async, parse_json_items
 from cognitive_flashcard_generator.llm_client import LLMClient
+from cognitive_flashcard_generator.split_retry import split_and_retry_async, split_text
+
+# Content at or below this size is not split further
+MIN_SPLIT_CHARS = 1500
 
 
 class AsyncCognitiveFlashcardGenerator:
@@ -51,6 +55,8 @@ class AsyncCognitiveFlashcardGenerator:
         self.course_name = course_name
         self.textbook_reference = textbook_reference
         self._prompt_template = None
+        # Content pieces that produced no flashcards even after splitting, by task_id
+        self.uncovered_content: Dict[str, List[str]] = {}
     
     def load_prompt_template(self) -> str:
         """Load the generic prompt template (cached)."""
@@ -69,7 +75,9 @@ class AsyncCognitiveFlashcardGenerator:
         return self._prompt_template
     
     async def generate_flashcards_async(self, content: str, source_name: str = "", 
-                                       chunk_info: str = "", task_id: str = "") -> Dict[str, Any]:
+                                       chunk_info: str = "", task_id: str = "",
+                                       on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                       request_slot: Optional[Callable[[], AsyncContextManager[Any]]] = None) -> Dict[str, Any]:
         """
         Generate cognitive flashcards asynchronously.
         
@@ -78,6 +86,10 @@ class AsyncCognitiveFlashcardGenerator:
             source_name: Name of the source (e.g., lecture name)
             chunk_info: Optional info about which chunk this is
             task_id: Unique identifier for this task
+            on_item: Called with each validated flashcard as soon as it is parsed
+                from the streamed response
+            request_slot: Returns an async context manager held around each
+                API request (see split_and_retry_async)
             
         Returns:
             Dictionary with task_id, flashcards, and metadata
@@ -85,13 +97,16 @@ class AsyncCognitiveFlashcardGenerator:
         print(f"🚀 [Task {task_id}] Starting async generation for {source_name} {chunk_info}")
         
         try:
-            flashcards = await self._generate_with_retry_async(content, source_name, chunk_info, task_id)
+            flashcards = await self._generate_with_retry_async(
+                content, source_name, chunk_info, task_id, on_item, request_slot
+            )
             
             return {
                 'task_id': task_id,
                 'source_name': source_name,
                 'chunk_info': chunk_info,
                 'flashcards': flashcards,
+                'uncovered_content': self.uncovered_content.get(task_id, []),
                 'success': len(flashcards) > 0,
                 'error': None
             }
@@ -108,169 +123,84 @@ class AsyncCognitiveFlashcardGenerator:
     
     async def _generate_with_retry_async(self, content: str, source_name: str = "", 
                                         chunk_info: str = "", task_id: str = "",
-                                        max_retries: int = 3) -> List[Dict[str, Any]]:
+                                        on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                        request_slot: Optional[Callable[[], AsyncContextManager[Any]]] = None) -> List[Dict[str, Any]]:
         """
-        Generate flashcards with retry logic asynchronously.
+        Generate flashcards, bisecting the content and retrying both halves concurrently on failure.
+
+        Content that still yields nothing is recorded in self.uncovered_content[task_id].
         """
-        original_content = content
-        
-        for attempt in range(max_retries):
-            try:
-                # Reduce content size on each retry
-                if attempt > 0:
-                    reduction_factor = 0.7 ** attempt
-                    max_chars = int(len(original_content) * reduction_factor)
-                    content = original_content[:max_chars]
-                    print(f"🔄 [Task {task_id}] Retry {attempt + 1}/{max_retries}: Reduced to {len(content):,} chars")
-                
-                # Load and populate template
-                prompt_template = self.load_prompt_template()
-                prompt = prompt_template.replace("{{COURSE_NAME}}", self.course_name)
-                prompt = prompt.replace("{{TEXTBOOK_REFERENCE}}", self.textbook_reference)
-                prompt = prompt.replace("{{CONTENT_PLACEHOLDER}}", content)
-                
-                # Configure generation
-                base_tokens = 25000
-                max_tokens = max(4096, int(base_tokens * (0.8 ** attempt)))
-                temperature = 0.7
-                
-                # Run the blocking API call in a thread pool
-                loop = asyncio.get_event_loop()
-                result_text = await loop.run_in_executor(
-                    None,
-                    lambda: self.llm_client.generate_text(
-                        prompt,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                    ),
-                )
-                
-                result_text = result_text.strip()
-                
-                # Parse JSON response
-                flashcards = self._parse_flashcard_response(result_text)
-                
-                if flashcards:
-                    print(f"✅ [Task {task_id}] Generated {len(flashcards)} flashcards")
-                    return flashcards
-                else:
-                    if attempt < max_retries - 1:
-                        print(f"⚠️  [Task {task_id}] No flashcards on attempt {attempt + 1}, retrying...")
-                        await asyncio.sleep(1)  # Brief delay before retry
-                        continue
-                    
-            except Exception as e:
-                print(f"❌ [Task {task_id}] Error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2)  # Longer delay on error
-                    continue
-                else:
-                    raise
-        
-        return []
+        flashcards, failed = await split_and_retry_async(
+            content,
+            lambda piece, label: self._request_flashcards_async(piece, label, on_item),
+            label=f"[Task {task_id}]",
+            split=split_text,
+            min_size=MIN_SPLIT_CHARS,
+            slot=request_slot,
+        )
+        if failed:
+            self.uncovered_content[task_id] = failed
+            print(f"⚠️  [Task {task_id}] {sum(len(piece) for piece in failed):,} of {len(content):,} chars produced no flashcards")
+        return flashcards
     
-    def _parse_flashcard_response(self, response_text: str) -> List[Dict[str, Any]]:
-        """Parse the AI response into structured flashcards."""
-        # Remove code fences if present
-        if response_text.startswith('```'):
-            parts = response_text.split('```')
-            if len(parts) >= 2:
-                response_text = parts[1]
-                if response_text.startswith('json'):
-                    response_text = response_text[4:].strip()
-        
-        # Find the JSON array
-        start_idx = response_text.find('[')
-        if start_idx != -1:
-            response_text = response_text[start_idx:]
-        
-        # Try to parse JSON
-        flashcards = self._try_parse_json_with_fixes(response_text)
-        
-        if not flashcards or not isinstance(flashcards, list):
-            return []
-        
-        # Validate and normalize each flashcard
-        valid_flashcards = []
-        for i, card in enumerate(flashcards, 1):
-            if self._validate_flashcard(card, i):
-                # Ensure optional fields exist
-                if 'example' not in card:
-                    card['example'] = ""
-                if 'plantuml_diagrams' not in card:
-                    card['plantuml_diagrams'] = {}
-                if 'mermaid_diagrams' not in card:
-                    card['mermaid_diagrams'] = {}
-                if 'math_visualizations' not in card:
-                    card['math_visualizations'] = {}
-                
-                diagram_types = ['concise', 'analogy', 'eli5', 'real_world_use_case', 'common_mistakes', 'example']
-                for diagram_type in diagram_types:
-                    if diagram_type not in card['plantuml_diagrams']:
-                        card['plantuml_diagrams'][diagram_type] = ""
-                    if diagram_type not in card['mermaid_diagrams']:
-                        card['mermaid_diagrams'][diagram_type] = ""
-                    if diagram_type not in card['math_visualizations']:
-                        card['math_visualizations'][diagram_type] = ""
-                
-                valid_flashcards.append(card)
-        
-        return valid_flashcards
+    async def _request_flashcards_async(self, content: str, label: str = "",
+                                        on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """One generation request; returns [] (and evicts the cached response) if unusable."""
+        # Load and populate template
+        prompt_template = self.load_prompt_template()
+        prompt = prompt_template.replace("{{COURSE_NAME}}", self.course_name)
+        prompt = prompt.replace("{{TEXTBOOK_REFERENCE}}", self.textbook_reference)
+        prompt = prompt.replace("{{CONTENT_PLACEHOLDER}}", content)
+        
+        # Configure generation
+        max_tokens = 25000
+        temperature = 0.7
+        
+        # Stream the completion and validate each flashcard as soon as it closes,
+        # paced by the provider's shared rate limiter
+        stream = JSONObjectStream(validate=self._flashcard_validator(), on_item=on_item)
+        flashcards, _ = await collect_items_async(
+            self.llm_client.stream_text_async(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+            ),
+            stream,
+        )
+        
+        if flashcards:
+            print(f"✅ {label} Generated {len(flashcards)} flashcards from {len(content):,} chars")
+        else:
+            # Don't replay an unusable response from the cache on the next run
+            self.llm_client.forget(prompt, max_tokens=max_tokens, temperature=temperature)
+            print(f"⚠️  {label} No flashcards from {len(content):,} chars")
+        return flashcards
     
-    def _try_parse_json_with_fixes(self, json_text: str) -> List[Dict[str, Any]]:
-        """Try to parse JSON with multiple fallback strategies."""
-        import re
+    def _flashcard_validator(self) -> Callable[[Dict[str, Any]], bool]:
+        """Per-response validator for JSONObjectStream: validates and normalizes flashcards as they arrive."""
+        card_numbers = itertools.count(1)
         
-        # Strategy 1: Try parsing as-is
-        try:
-            return json.loads(json_text)
-        except json.JSONDecodeError:
-            pass
-        
-        # Strategy 2: Fix common JSON issues
-        fixed_json = json_text
-        
-        # Remove trailing commas
-        try:
-            fixed_json = re.sub(r',(\s*[}\]])', r'\1', fixed_json)
-        except Exception:
-            pass
-        
-        # Try parsing the fixed JSON
-        try:
-            return json.loads(fixed_json)
-        except json.JSONDecodeError:
-            pass
-        
-        # Strategy 3: Extract partial valid JSON objects
-        try:
-            objects = []
-            brace_count = 0
-            start_pos = -1
-            
-            for i, char in enumerate(fixed_json):
-                if char == '{' and brace_count == 0:
-                    start_pos = i
-                    brace_count = 1
-                elif char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0 and start_pos != -1:
-                        obj_text = fixed_json[start_pos:i+1]
-                        try:
-                            obj = json.loads(obj_text)
-                            objects.append(obj)
-                        except json.JSONDecodeError:
-                            pass
-                        start_pos = -1
+        def accept(card: Dict[str, Any]) -> bool:
+            if not self._validate_flashcard(card, next(card_numbers)):
+                return False
+            # Ensure optional fields exist
+            card.setdefault('example', "")
+            for field in ('plantuml_diagrams', 'mermaid_diagrams', 'math_visualizations'):
+                if not isinstance(card.get(field), dict):
+                    card[field] = {}
             
-            if objects:
-                return objects
-        except Exception:
-            pass
-        
-        return []
+            diagram_types = ['concise', 'analogy', 'eli5', 'real_world_use_case', 'common_mistakes', 'example']
+            for diagram_type in diagram_types:
+                card['plantuml_diagrams'].setdefault(diagram_type, "")
+                card['mermaid_diagrams'].setdefault(diagram_type, "")
+                card['math_visualizations'].setdefault(diagram_type, "")
+            return True
+        
+        return accept
+    
+    def _parse_flashcard_response(self, response_text: str) -> List[Dict[str, Any]]:
+        """Parse a complete AI response into validated flashcards."""
+        return parse_json_items(response_text, validate=self._flashcard_validator())
     
     def _validate_flashcard(self, card: Dict[str, Any], card_num: int) -> bool:
         """Validate a single flashcard has all required fields."""
@@ -4,11 +4,12 @@ Async Quiz Generator - Generates multi-level quiz questions with batching suppor
 
 import os
 import json
-import asyncio
-from typing import Dict, List, Any, Optional
+from typing import AsyncContextManager, Callable, Dict, List, Any, Optional
 
 from config import Config
+from cognitive_flashcard_generator.json_stream import JSONObjectStream, collect_items_async, parse_json_items
 from cognitive_flashcard_generator.llm_client import LLMClient
+from cognitive_flashcard_generator.split_retry import coverage_report, format_coverage, split_and_retry_async
 
 
 class AsyncQuizGenerator:
@@ -70,7 +71,9 @@ class AsyncQuizGenerator:
     
     async def generate_quiz_questions_async(self, flashcards_chunk: List[Dict[str, Any]], 
                                            level: int, chunk_info: str = "", 
-                                           task_id: str = "") -> Dict[str, Any]:
+                                           task_id: str = "",
+                                           on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                           request_slot: Optional[Callable[[], AsyncContextManager[Any]]] = None) -> Dict[str, Any]:
         """
         Generate quiz questions asynchronously.
         
@@ -79,6 +82,10 @@ class AsyncQuizGenerator:
             level: Difficulty level (1-4)
             chunk_info: Optional info about which chunk this is
             task_id: Unique identifier for this task
+            on_item: Called with each validated question as soon as it is parsed
+                from the streamed response
+            request_slot: Returns an async context manager held around each
+                API request (see split_and_retry_async)
             
         Returns:
             Dictionary with task_id, questions, and metadata
@@ -87,14 +94,18 @@ class AsyncQuizGenerator:
         
         try:
             questions = await self._generate_with_retry_async(
-                flashcards_chunk, level, chunk_info, task_id
+                flashcards_chunk, level, chunk_info, task_id, on_item, request_slot
             )
+            coverage = coverage_report(flashcards_chunk, questions)
+            if coverage['missing_flashcard_ids']:
+                print(f"📊 [Task {task_id}] Coverage: {format_coverage(coverage)}")
             
             return {
                 'task_id': task_id,
                 'level': level,
                 'chunk_info': chunk_info,
                 'questions': questions,
+                'coverage': coverage,
                 'success': len(questions) > 0,
                 'error': None
             }
@@ -105,135 +116,67 @@ class AsyncQuizGenerator:
                 'level': level,
                 'chunk_info': chunk_info,
                 'questions': [],
+                'coverage': coverage_report(flashcards_chunk, []),
                 'success': False,
                 'error': str(e)
             }
     
     async def _generate_with_retry_async(self, flashcards_chunk: List[Dict[str, Any]], 
                                         level: int, chunk_info: str = "", 
-                                        task_id: str = "", max_retries: int = 3) -> List[Dict[str, Any]]:
+                                        task_id: str = "",
+                                        on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                        request_slot: Optional[Callable[[], AsyncContextManager[Any]]] = None) -> List[Dict[str, Any]]:
         """
-        Generate quiz questions with retry logic asynchronously.
+        Generate quiz questions, bisecting the chunk and retrying both halves concurrently on failure.
         """
-        original_chunk = flashcards_chunk
+        questions, _ = await split_and_retry_async(
+            flashcards_chunk,
+            lambda cards, label: self._request_questions_async(cards, level, label, on_item),
+            label=f"[Task {task_id}]",
+            slot=request_slot,
+        )
+        return questions
+    
+    async def _request_questions_async(self, flashcards_chunk: List[Dict[str, Any]],
+                                       level: int, label: str = "",
+                                       on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """One generation request; returns [] (and evicts the cached response) if unusable."""
+        # Convert flashcards to JSON string
+        flashcards_json = json.dumps(flashcards_chunk, indent=2, ensure_ascii=False)
         
-        for attempt in range(max_retries):
-            try:
-                # Reduce chunk size on each retry
-                if attempt > 0:
-                    reduction_factor = 0.7 ** attempt
-                    max_cards = max(1, int(len(original_chunk) * reduction_factor))
-                    flashcards_chunk = original_chunk[:max_cards]
-                    print(f"🔄 [Task {task_id}] Retry {attempt + 1}/{max_retries}: Reduced to {len(flashcards_chunk)} flashcards")
-                
-                # Convert flashcards to JSON string
-                flashcards_json = json.dumps(flashcards_chunk, indent=2, ensure_ascii=False)
-                
-                # Load and populate template
-                prompt_template = self._load_quiz_prompt_template(level)
-                prompt = prompt_template.replace("{{COURSE_NAME}}", self.course_name)
-                prompt = prompt.replace("{{TEXTBOOK_REFERENCE}}", self.textbook_reference)
-                prompt = prompt + f"\n\n## Input Flashcards:\n\n```json\n{flashcards_json}\n```\n\nGenerate the quiz questions now."
-                
-                # Configure generation with progressive token limit reduction.
-                # With GPT-5.1 we can safely target larger completions again.
-                base_tokens = 50000
-                max_tokens = max(4096, int(base_tokens * (0.8 ** attempt)))
-                temperature = 0.7
-                
-                # Run the blocking API call in a thread pool
-                loop = asyncio.get_event_loop()
-                result_text = await loop.run_in_executor(
-                    None,
-                    lambda: self.llm_client.generate_text(
-                        prompt,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                    ),
-                )
-                
-                result_text = result_text.strip()
-                
-                # Parse JSON response
-                questions = self._parse_quiz_response(result_text)
-                
-                if questions:
-                    print(f"✅ [Task {task_id}] Generated {len(questions)} questions")
-                    return questions
-                else:
-                    if attempt < max_retries - 1:
-                        print(f"⚠️  [Task {task_id}] No questions on attempt {attempt + 1}, retrying...")
-                        await asyncio.sleep(1)
-                        continue
-                    
-            except Exception as e:
-                # Log the full error to see the root cause
-                print(f"❌ [Task {task_id}] API Error on attempt {attempt + 1}: {type(e).__name__} - {e}")
-                
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2)
-                    continue
-                else:
-                    raise
+        # Load and populate template
+        prompt_template = self._load_quiz_prompt_template(level)
+        prompt = prompt_template.replace("{{COURSE_NAME}}", self.course_name)
+        prompt = prompt.replace("{{TEXTBOOK_REFERENCE}}", self.textbook_reference)
+        prompt = prompt + f"\n\n## Input Flashcards:\n\n```json\n{flashcards_json}\n```\n\nGenerate the quiz questions now."
         
-        return []
-    
-    def _parse_quiz_response(self, response_text: str) -> List[Dict[str, Any]]:
-        """Parse the AI response into structured quiz questions."""
-        # Remove code fences if present
-        if response_text.startswith('```'):
-            parts = response_text.split('```')
-            if len(parts) >= 2:
-                response_text = parts[1]
-                if response_text.startswith('json'):
-                    response_text = response_text[4:].strip()
+        # With GPT-5.1 we can safely target larger completions again.
+        max_tokens = 50000
+        temperature = 0.7
         
-        # Find the JSON array
-        start_idx = response_text.find('[')
-        if start_idx != -1:
-            response_text = response_text[start_idx:]
+        # Stream the completion and validate each question as soon as it closes,
+        # paced by the provider's shared rate limiter
+        stream = JSONObjectStream(validate=self._validate_question, on_item=on_item)
+        questions, _ = await collect_items_async(
+            self.llm_client.stream_text_async(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+            ),
+            stream,
+        )
         
-        # Try to parse JSON
-        try:
-            questions = json.loads(response_text)
-            
-            if not isinstance(questions, list):
-                return []
-            
-            # Validate each question
-            valid_questions = []
-            for q in questions:
-                if self._validate_question(q):
-                    valid_questions.append(q)
-            
-            return valid_questions
-            
-        except json.JSONDecodeError:
-            # Try to extract partial valid JSON objects
-            import re
-            objects = []
-            brace_count = 0
-            start_pos = -1
-            
-            for i, char in enumerate(response_text):
-                if char == '{' and brace_count == 0:
-                    start_pos = i
-                    brace_count = 1
-                elif char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0 and start_pos != -1:
-                        obj_text = response_text[start_pos:i+1]
-                        try:
-                            obj = json.loads(obj_text)
-                            if self._validate_question(obj):
-                                objects.append(obj)
-                        except json.JSONDecodeError:
-                            pass
-                        start_pos = -1
-            
-            return objects
+        if questions:
+            print(f"✅ {label} Generated {len(questions)} questions from {len(flashcards_chunk)} flashcard(s)")
+        else:
+            # Don't replay an unusable response from the cache on the next run
+            self.llm_client.forget(prompt, max_tokens=max_tokens, temperature=temperature)
+            print(f"⚠️  {label} No questions from {len(flashcards_chunk)} flashcard(s)")
+        return questions
+    
+    def _parse_quiz_response(self, response_text: str) -> List[Dict[str, Any]]:
+        """Parse a complete AI response into validated quiz questions."""
+        return parse_json_items(response_text, validate=self._validate_question)
     
     def _validate_question(self, question: Dict[str, Any]) -> bool:
         """Validate a single quiz question has all required fields."""
@@ -1,13 +1,64 @@
 """
 Batch Coordinator - Manages concurrent API calls for flashcard and quiz generation.
+
+Concurrency is capped per coordinator; request and token throughput is paced
+by the provider's shared adaptive rate limiter inside LLMClient.
+
+stream_course pipelines a course per lecture: as soon as a lecture's
+flashcards are done and saved, its quiz tasks join the shared queue ahead of
+the remaining flashcard tasks, so total time approaches the longest
+lecture's flashcards → quizzes chain instead of the sum of the phases.
 """
 
 import asyncio
-from typing import List, Dict, Any, Tuple
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from .async_generator import AsyncCognitiveFlashcardGenerator
 from .async_quiz_generator import AsyncQuizGenerator
+from .rate_limiter import estimate_tokens, get_rate_limiter
+from .split_retry import coverage_report, missing_flashcards
+
+
+# Slot priorities (lower runs first): quiz work unlocked by finished lectures
+# goes ahead of flashcard chunks still waiting in the queue
+PRIORITY_QUIZ = 0
+PRIORITY_FLASHCARDS = 1
+
+
+class PrioritySemaphore:
+    """Counting semaphore whose waiters are woken by priority, then in arrival order."""
+    
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+    
+    async def acquire(self, priority: int = 0):
+        """Wait for a slot."""
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Slot was handed over just as we were cancelled
+            raise
+    
+    def release(self):
+        """Hand the slot to the highest-priority waiter, or return it to the pool."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
 
 
 class BatchCoordinator:
@@ -18,15 +69,51 @@ class BatchCoordinator:
         Initialize the batch coordinator.
         
         Args:
-            max_concurrent_requests: Maximum number of concurrent API requests
+            max_concurrent_requests: Maximum number of in-flight API requests
         """
         self.max_concurrent_requests = max_concurrent_requests
-        self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self._semaphore: Optional[PrioritySemaphore] = None
+        self._semaphore_loop = None
     
-    async def _rate_limited_task(self, coro):
-        """Execute a coroutine with rate limiting."""
-        async with self.semaphore:
-            return await coro
+    @property
+    def semaphore(self) -> PrioritySemaphore:
+        """Concurrency cap, created on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = PrioritySemaphore(self.max_concurrent_requests)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    def _request_slot(self, priority: int = PRIORITY_QUIZ) -> Callable[[], AsyncContextManager[None]]:
+        """
+        Slot factory for generator requests: each API request (including every
+        split-and-retry half) holds its own slot under the concurrency cap, so the
+        cap bounds in-flight requests rather than tasks (the LLM client paces throughput).
+        """
+        @asynccontextmanager
+        async def slot():
+            semaphore = self.semaphore
+            await semaphore.acquire(priority)
+            try:
+                yield
+            finally:
+                semaphore.release()
+        
+        return slot
+    
+    @staticmethod
+    def _rate_limit_summary(generator) -> str:
+        """Describe the shared rate limiter used by a generator's LLM client."""
+        provider = getattr(getattr(generator, "llm_client", None), "provider", "gemini")
+        return f"{provider}: {get_rate_limiter(provider).describe()}"
+    
+    @staticmethod
+    def _task_tokens(task: Dict[str, Any]) -> int:
+        """Input token estimate for a flashcard task, from its chunk manifest when present."""
+        manifest = task.get('manifest')
+        if manifest:
+            return manifest['tokens']
+        return estimate_tokens("gemini", len(task['content']))
     
     async def batch_generate_flashcards(
         self,
@@ -43,6 +130,7 @@ class BatchCoordinator:
                    - source_name: str
                    - chunk_info: str
                    - task_id: str
+                   - manifest: optional chunk manifest (see chunking.pack_chunks)
         
         Returns:
             List of result dictionaries
@@ -51,26 +139,32 @@ class BatchCoordinator:
         print(f"🚀 BATCH FLASHCARD GENERATION")
         print(f"{'='*80}")
         print(f"📊 Total tasks: {len(tasks)}")
+        estimated_tokens = sum(self._task_tokens(task) for task in tasks)
+        print(f"🧮 Estimated input tokens: ~{estimated_tokens:,}")
         print(f"⚡ Max concurrent requests: {self.max_concurrent_requests}")
+        print(f"🚦 Rate limit ({self._rate_limit_summary(generator)})")
         print(f"{'='*80}\n")
         
         start_time = datetime.now()
         
-        # Create coroutines for all tasks
-        coroutines = [
-            self._rate_limited_task(
+        # Start the largest chunks first so a long request doesn't trail at the end;
+        # results are still gathered in task order
+        order = sorted(range(len(tasks)), key=lambda i: self._task_tokens(tasks[i]), reverse=True)
+        futures: Dict[int, asyncio.Future] = {}
+        for i in order:
+            task = tasks[i]
+            futures[i] = asyncio.ensure_future(
                 generator.generate_flashcards_async(
                     content=task['content'],
                     source_name=task['source_name'],
                     chunk_info=task['chunk_info'],
-                    task_id=task['task_id']
+                    task_id=task['task_id'],
+                    request_slot=self._request_slot(PRIORITY_FLASHCARDS)
                 )
             )
-            for task in tasks
-        ]
         
         # Execute all tasks concurrently
-        results = await asyncio.gather(*coroutines, return_exceptions=True)
+        results = await asyncio.gather(*(futures[i] for i in range(len(tasks))), return_exceptions=True)
         
         # Process results
         successful = 0
@@ -105,10 +199,54 @@ class BatchCoordinator:
         
         return processed_results
     
+    async def _requeue_missing_flashcards(
+        self,
+        generator: AsyncQuizGenerator,
+        tasks: List[Dict[str, Any]],
+        results: List[Any]
+    ):
+        """
+        Re-run quiz generation for exactly the flashcards that produced no questions.
+
+        New questions are merged into the original results (whose coverage is recomputed),
+        so results stay aligned with tasks.
+        """
+        requeue = []
+        for task, result in zip(tasks, results):
+            if not isinstance(result, dict):
+                continue
+            cards = missing_flashcards(task['flashcards_chunk'], result.get('coverage'))
+            if cards:
+                requeue.append((task, result, cards))
+        
+        if not requeue:
+            return
+        
+        print(f"\n🔁 Re-queueing {sum(len(cards) for _, _, cards in requeue)} flashcard(s) "
+              f"with no questions from {len(requeue)} task(s)\n")
+        
+        retried = await asyncio.gather(*[
+            generator.generate_quiz_questions_async(
+                flashcards_chunk=cards,
+                level=task['level'],
+                chunk_info=f"{task['chunk_info']} (re-queued)",
+                task_id=f"{task['task_id']}_requeue",
+                request_slot=self._request_slot(PRIORITY_QUIZ)
+            )
+            for task, _, cards in requeue
+        ], return_exceptions=True)
+        
+        for (task, result, _), retry in zip(requeue, retried):
+            if isinstance(retry, dict) and retry['questions']:
+                result['questions'].extend(retry['questions'])
+                result['coverage'] = coverage_report(task['flashcards_chunk'], result['questions'])
+                result['success'] = True
+    
     async def batch_generate_quizzes(
         self,
         generator: AsyncQuizGenerator,
-        tasks: List[Dict[str, Any]]
+        tasks: List[Dict[str, Any]],
+        requeue_missing: bool = True
     ) -> List[Dict[str, Any]]:
         """
         Generate quiz questions for multiple chunks and levels concurrently.
@@ -120,28 +258,29 @@ class BatchCoordinator:
                    - level: int
                    - chunk_info: str
                    - task_id: str
+            requeue_missing: Re-run, once, the flashcards a task's coverage report lists as missing
         
         Returns:
-            List of result dictionaries
+            List of result dictionaries (each with a 'coverage' report)
         """
         print(f"\n{'='*80}")
         print(f"🚀 BATCH QUIZ GENERATION")
         print(f"{'='*80}")
         print(f"📊 Total tasks: {len(tasks)}")
         print(f"⚡ Max concurrent requests: {self.max_concurrent_requests}")
+        print(f"🚦 Rate limit ({self._rate_limit_summary(generator)})")
         print(f"{'='*80}\n")
         
         start_time = datetime.now()
         
         # Create coroutines for all tasks
         coroutines = [
-            self._rate_limited_task(
-                generator.generate_quiz_questions_async(
-                    flashcards_chunk=task['flashcards_chunk'],
-                    level=task['level'],
-                    chunk_info=task['chunk_info'],
-                    task_id=task['task_id']
-                )
+            generator.generate_quiz_questions_async(
+                flashcards_chunk=task['flashcards_chunk'],
+                level=task['level'],
+                chunk_info=task['chunk_info'],
+                task_id=task['task_id'],
+                request_slot=self._request_slot(PRIORITY_QUIZ)
             )
             for task in tasks
         ]
@@ -149,10 +288,14 @@ class BatchCoordinator:
         # Execute all tasks concurrently
         results = await asyncio.gather(*coroutines, return_exceptions=True)
         
+        if requeue_missing:
+            await self._requeue_missing_flashcards(generator, tasks, results)
+        
         # Process results
         successful = 0
         failed = 0
         total_questions = 0
+        missing_ids = []
         
         processed_results = []
         for result in results:
@@ -161,6 +304,8 @@ class BatchCoordinator:
                 failed += 1
             elif isinstance(result, dict):
                 processed_results.append(result)
+                missing_ids.extend(f"{card_id} (L{result['level']})"
+                                   for card_id in result.get('coverage', {}).get('missing_flashcard_ids', []))
                 if result['success']:
                     successful += 1
                     total_questions += len(result['questions'])
@@ -177,6 +322,8 @@ class BatchCoordinator:
         print(f"✅ Successful: {successful}/{len(tasks)}")
         print(f"❌ Failed: {failed}/{len(tasks)}")
         print(f"📝 Total questions generated: {total_questions}")
+        if missing_ids:
+            print(f"⚠️  Flashcards with no questions ({len(missing_ids)}): {', '.join(missing_ids)}")
         print(f"⚡ Average speed: {len(tasks)/duration:.2f} tasks/second")
         print(f"{'='*80}\n")
         
@@ -232,6 +379,157 @@ class BatchCoordinator:
         print(f"{'='*80}\n")
         
         return flashcard_results, quiz_results
+    
+    async def stream_course(
+        self,
+        flashcard_generator: AsyncCognitiveFlashcardGenerator,
+        quiz_generator: AsyncQuizGenerator,
+        lectures: List[Dict[str, Any]],
+        finish_flashcards: Callable[[str, List[Dict[str, Any]]], List[Dict[str, Any]]],
+        quiz_tasks_for: Callable[[str, List[Dict[str, Any]]], List[Dict[str, Any]]],
+        finish_quiz_level: Callable[[str, int, List[Dict[str, Any]]], None],
+        requeue_missing: bool = True
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate flashcards and quizzes for several lectures as one pipeline.
+        
+        Each lecture's flashcard tasks run under the shared concurrency cap; when
+        they are all done, finish_flashcards saves them (on a worker thread, so
+        diagram rendering and file writes overlap other lectures' requests) and the
+        lecture's quiz tasks are queued at a higher priority than pending flashcard
+        tasks. Each quiz level is saved as soon as its tasks are done.
+        
+        Args:
+            flashcard_generator: AsyncCognitiveFlashcardGenerator instance
+            quiz_generator: AsyncQuizGenerator instance
+            lectures: Dicts with lecture_name and flashcard_tasks (see batch_generate_flashcards)
+            finish_flashcards: (lecture_name, results aligned with its tasks) -> saved flashcards
+            quiz_tasks_for: (lecture_name, flashcards) -> quiz tasks (see batch_generate_quizzes)
+            finish_quiz_level: (lecture_name, level, results of that level's tasks) -> None
+            requeue_missing: Re-run, once, flashcards a quiz task's coverage lists as missing
+        
+        Returns:
+            Per-lecture summary: flashcards, questions (per level), finished_after (seconds)
+        """
+        print(f"\n{'='*80}")
+        print(f"🚀 STREAMING GENERATION - FLASHCARDS → QUIZZES")
+        print(f"{'='*80}")
+        print(f"📊 Lectures: {len(lectures)}")
+        print(f"📊 Flashcard tasks: {sum(len(lecture['flashcard_tasks']) for lecture in lectures)}")
+        print(f"⚡ Max concurrent requests: {self.max_concurrent_requests}")
+        print(f"🚦 Rate limit ({self._rate_limit_summary(flashcard_generator)})")
+        print(f"{'='*80}\n")
+        
+        start_time = datetime.now()
+        summaries: Dict[str, Dict[str, Any]] = {}
+        
+        def elapsed() -> float:
+            return (datetime.now() - start_time).total_seconds()
+        
+        async def gather_tasks(coroutines, tasks, empty_key):
+            results = await asyncio.gather(*coroutines, return_exceptions=True)
+            normalized = []
+            for task, result in zip(tasks, results):
+                if isinstance(result, Exception):
+                    print(f"❌ Task {task['task_id']} failed with exception: {result}")
+                    result = {'task_id': task['task_id'], empty_key: [], 'success': False, 'error': str(result)}
+                normalized.append(result)
+            return normalized
+        
+        async def run_level(lecture_name: str, level: int, tasks: List[Dict[str, Any]]) -> int:
+            results = await gather_tasks([
+                quiz_generator.generate_quiz_questions_async(
+                    flashcards_chunk=task['flashcards_chunk'],
+                    level=level,
+                    chunk_info=task['chunk_info'],
+                    task_id=task['task_id'],
+                    request_slot=self._request_slot(PRIORITY_QUIZ)
+                )
+                for task in tasks
+            ], tasks, 'questions')
+            if requeue_missing:
+                await self._requeue_missing_flashcards(quiz_generator, tasks, results)
+            await asyncio.to_thread(finish_quiz_level, lecture_name, level, results)
+            return sum(len(result['questions']) for result in results if result['success'])
+        
+        async def run_lecture(lecture: Dict[str, Any]):
+            lecture_name = lecture['lecture_name']
+            tasks = lecture['flashcard_tasks']
+            results = await gather_tasks([
+                flashcard_generator.generate_flashcards_async(
+                    content=task['content'],
+                    source_name=task['source_name'],
+                    chunk_info=task['chunk_info'],
+                    task_id=task['task_id'],
+                    request_slot=self._request_slot(PRIORITY_FLASHCARDS)
+                )
+                for task in tasks
+            ], tasks, 'flashcards')
+            
+            flashcards = await asyncio.to_thread(finish_flashcards, lecture_name, results)
+            summary = summaries[lecture_name] = {'flashcards': len(flashcards), 'questions': {}}
+            print(f"📬 {lecture_name}: flashcards done after {elapsed():.1f}s, queueing quizzes")
+            
+            if flashcards:
+                by_level: Dict[int, List[Dict[str, Any]]] = {}
+                for task in quiz_tasks_for(lecture_name, flashcards):
+                    by_level.setdefault(task['level'], []).append(task)
+                levels = sorted(by_level)
+                counts = await asyncio.gather(*(run_level(lecture_name, level, by_level[level]) for level in levels))
+                summary['questions'] = dict(zip(levels, counts))
+            
+            summary['finished_after'] = elapsed()
+            print(f"🏁 {lecture_name}: complete after {summary['finished_after']:.1f}s")
+        
+        # Longest lectures first: their chains bound the total time
+        ordered = sorted(
+            lectures,
+            key=lambda lecture: sum(self._task_tokens(task) for task in lecture['flashcard_tasks']),
+            reverse=True
+        )
+        outcomes = await asyncio.gather(*(run_lecture(lecture) for lecture in ordered), return_exceptions=True)
+        for lecture, outcome in zip(ordered, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"❌ {lecture['lecture_name']}: {type(outcome).__name__} - {outcome}")
+        
+        duration = elapsed()
+        print(f"\n{'='*80}")
+        print(f"✅ STREAMING GENERATION COMPLETE")
+        print(f"{'='*80}")
+        print(f"⏱️  Duration: {duration:.2f} seconds")
+        print(f"📝 Flashcards: {sum(summary['flashcards'] for summary in summaries.values())}")
+        print(f"📝 Quiz questions: {sum(sum(summary['questions'].values()) for summary in summaries.values())}")
+        print(f"{'='*80}\n")
+        
+        return summaries
+
+
+def run_streaming_generation(
+    flashcard_generator: AsyncCognitiveFlashcardGenerator,
+    quiz_generator: AsyncQuizGenerator,
+    lectures: List[Dict[str, Any]],
+    finish_flashcards: Callable[[str, List[Dict[str, Any]]], List[Dict[str, Any]]],
+    quiz_tasks_for: Callable[[str, List[Dict[str, Any]]], List[Dict[str, Any]]],
+    finish_quiz_level: Callable[[str, int, List[Dict[str, Any]]], None],
+    max_concurrent: int = 10
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Convenience function to run BatchCoordinator.stream_course in a synchronous context.
+    
+    Returns:
+        Per-lecture summary (see BatchCoordinator.stream_course)
+    """
+    coordinator = BatchCoordinator(max_concurrent_requests=max_concurrent)
+    return asyncio.run(
+        coordinator.stream_course(
+            flashcard_generator,
+            quiz_generator,
+            lectures,
+            finish_flashcards,
+            quiz_tasks_for,
+            finish_quiz_level
+        )
+    )
 
 
 def run_batch_generation(
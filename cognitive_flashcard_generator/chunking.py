@@ -0,0 +1,234 @@
+"""
+Token-budgeted chunking of generation input.
+
+Content is split into units at slide headers (slide analyses) or section
+headings (textbook text), and whole units are packed greedily into chunks up
+to a budget measured in model tokens for the configured provider. Boundaries
+are found in one regex pass and consumed with a single forward pointer, so
+chunking is linear in the content length. A unit larger than the budget is
+split at paragraph breaks.
+
+Each chunk comes with a manifest (unit range, slide labels, character span,
+token count) that the batch coordinator uses to estimate cost and schedule
+work.
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Pattern
+
+from config import Config
+
+# Slide headers written by extract_content_from_structured_json
+SLIDE_BOUNDARY_RE = re.compile(r'\n={60}\nSLIDE (\S+)\n={60}\n')
+# Markdown headings and === rules in textbook content
+SECTION_BOUNDARY_RE = re.compile(r'\n(?:#{1,3}|={3,})\s')
+_PARAGRAPH_BREAK_RE = re.compile(r'\n\s*\n')
+
+CHARS_PER_TOKEN = 4
+_tokenizers: Dict[str, Optional[Callable[[str], int]]] = {}
+
+
+def _load_tokenizer(provider: str) -> Optional[Callable[[str], int]]:
+    """Exact token counter for the provider, if one is available locally."""
+    if provider == "openai":
+        try:
+            import tiktoken
+        except ImportError:
+            return None
+        try:
+            encoding = tiktoken.encoding_for_model(Config.OPENAI_MODEL)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    # Gemini only counts tokens over the network; use the character estimate
+    return None
+
+
+def count_tokens(text: str, provider: Optional[str] = None) -> int:
+    """
+    Count (or estimate) the model tokens in text.
+
+    Uses tiktoken for OpenAI when installed, otherwise ~4 characters per token
+    (the same estimate the rate limiter uses).
+
+    Args:
+        text: Text to measure
+        provider: "gemini" or "openai" (defaults to Config.LLM_PROVIDER)
+
+    Returns:
+        Token count
+    """
+    provider = (provider or Config.LLM_PROVIDER).lower()
+    if provider not in _tokenizers:
+        _tokenizers[provider] = _load_tokenizer(provider)
+    tokenizer = _tokenizers[provider]
+    if tokenizer is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return tokenizer(text)
+
+
+def split_units(content: str, boundary: Pattern = SLIDE_BOUNDARY_RE) -> List[Dict[str, Any]]:
+    """
+    Split content into units starting at each boundary match.
+
+    Text before the first boundary becomes its own unit.
+
+    Args:
+        content: Full text content
+        boundary: Regex marking the start of a unit; its first group (if any) labels the unit
+
+    Returns:
+        Units with start, end (character offsets) and label
+    """
+    starts = []
+    for match in boundary.finditer(content):
+        label = match.group(1) if match.re.groups else None
+        starts.append((match.start(), label))
+
+    if not starts or starts[0][0] > 0:
+        starts.insert(0, (0, None))
+
+    units = []
+    for i, (start, label) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(content)
+        if content[start:end].strip():
+            units.append({'start': start, 'end': end, 'label': label})
+    return units
+
+
+def _split_oversized(content: str, unit: Dict[str, Any], max_tokens: int, provider: str) -> List[Dict[str, Any]]:
+    """Split a unit over the budget at paragraph breaks (hard-cut paragraphs that are still too big)."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    cuts = [unit['start']]
+    for match in _PARAGRAPH_BREAK_RE.finditer(content, unit['start'], unit['end']):
+        cuts.append(match.end())
+    cuts.append(unit['end'])
+
+    pieces = []
+    piece_start = unit['start']
+    piece_tokens = 0
+    for para_start, para_end in zip(cuts, cuts[1:]):
+        para_tokens = count_tokens(content[para_start:para_end], provider)
+        if piece_tokens and piece_tokens + para_tokens > max_tokens:
+            pieces.append((piece_start, para_start, piece_tokens))
+            piece_start, piece_tokens = para_start, 0
+        if para_tokens > max_tokens:
+            for cut in range(para_start, para_end, max_chars):
+                cut_end = min(cut + max_chars, para_end)
+                pieces.append((cut, cut_end, count_tokens(content[cut:cut_end], provider)))
+            piece_start, piece_tokens = para_end, 0
+            continue
+        piece_tokens += para_tokens
+    if piece_start < unit['end']:
+        pieces.append((piece_start, unit['end'], piece_tokens))
+
+    return [
+        {'start': start, 'end': end, 'label': unit['label'], 'tokens': tokens, 'partial': True}
+        for start, end, tokens in pieces
+        if end > start
+    ]
+
+
+def pack_chunks(
+    content: str,
+    max_tokens: int,
+    provider: Optional[str] = None,
+    boundary: Pattern = SLIDE_BOUNDARY_RE,
+) -> List[Dict[str, Any]]:
+    """
+    Pack whole units greedily into chunks of at most max_tokens.
+
+    Args:
+        content: Full text content
+        max_tokens: Token budget per chunk
+        provider: Provider whose tokenizer measures the budget (defaults to Config.LLM_PROVIDER)
+        boundary: Unit boundary regex (SLIDE_BOUNDARY_RE or SECTION_BOUNDARY_RE)
+
+    Returns:
+        Chunk manifests with keys index, text, start, end, units (first, last unit
+        index), slides (unit labels), tokens, chars and split_unit (a unit was cut)
+    """
+    provider = (provider or Config.LLM_PROVIDER).lower()
+    max_tokens = max(1, max_tokens)
+
+    # Measure every unit once, splitting those that could never fit
+    pieces = []
+    for unit_index, unit in enumerate(split_units(content, boundary)):
+        tokens = count_tokens(content[unit['start']:unit['end']], provider)
+        if tokens > max_tokens:
+            parts = _split_oversized(content, unit, max_tokens, provider)
+        else:
+            parts = [dict(unit, tokens=tokens, partial=False)]
+        for part in parts:
+            part['unit'] = unit_index
+            pieces.append(part)
+
+    chunks: List[Dict[str, Any]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+
+    def flush():
+        first, last = current[0], current[-1]
+        labels = []
+        for piece in current:
+            if piece['label'] is not None and (not labels or labels[-1] != piece['label']):
+                labels.append(piece['label'])
+        chunks.append({
+            'index': len(chunks) + 1,
+            'text': content[first['start']:last['end']],
+            'start': first['start'],
+            'end': last['end'],
+            'units': (first['unit'], last['unit']),
+            'slides': labels,
+            'tokens': current_tokens,
+            'chars': last['end'] - first['start'],
+            'split_unit': any(piece['partial'] for piece in current),
+        })
+
+    for piece in pieces:
+        if current and current_tokens + piece['tokens'] > max_tokens:
+            flush()
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece['tokens']
+    if current:
+        flush()
+
+    return chunks
+
+
+def chunk_content(
+    content: str,
+    max_tokens: Optional[int] = None,
+    provider: Optional[str] = None,
+    boundary: Pattern = SLIDE_BOUNDARY_RE,
+) -> List[str]:
+    """
+    Split content into chunk texts (see pack_chunks).
+
+    Args:
+        content: Full text content
+        max_tokens: Token budget per chunk (defaults to Config.SLIDE_CHUNK_MAX_TOKENS)
+        provider: Provider whose tokenizer measures the budget
+        boundary: Unit boundary regex
+
+    Returns:
+        A list of content strings (chunks)
+    """
+    if max_tokens is None:
+        max_tokens = Config.SLIDE_CHUNK_MAX_TOKENS
+    return [chunk['text'] for chunk in pack_chunks(content, max_tokens, provider, boundary)]
+
+
+def describe_chunk(manifest: Dict[str, Any]) -> str:
+    """One-line summary of a chunk manifest."""
+    slides = manifest['slides']
+    if not slides:
+        span = f"units {manifest['units'][0] + 1}-{manifest['units'][1] + 1}"
+    elif len(slides) == 1:
+        span = f"slide {slides[0]}"
+    else:
+        span = f"slides {slides[0]}-{slides[-1]}"
+    if manifest['split_unit']:
+        span += " (split)"
+    return f"{span}, ~{manifest['tokens']:,} tokens, {manifest['chars']:,} chars"
@@ -6,17 +6,23 @@ from both slide-based and textbook-based content sources.
 """
 
 import json
-import re
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 from config import Config
+from cognitive_flashcard_generator.chunking import (
+    SECTION_BOUNDARY_RE,
+    SLIDE_BOUNDARY_RE,
+    describe_chunk,
+    pack_chunks
+)
 from cognitive_flashcard_generator.generator import CognitiveFlashcardGenerator
 from cognitive_flashcard_generator.llm_client import LLMClient
+from cognitive_flashcard_generator.output_writer import write_course_json
 from cognitive_flashcard_generator.quiz_generator import QuizGenerator
 from cognitive_flashcard_generator.validate_quiz_consistency import (
     validate_flashcard_quiz_consistency,
@@ -24,62 +30,6 @@ from cognitive_flashcard_generator.validate_quiz_consistency import (
 )
 
 
-def chunk_content(content: str, max_chunk_size: int = 25000, overlap: int = 500) -> List[str]:
-    """
-    Splits the large content string into smaller chunks with an overlap.
-    
-    Args:
-        content: The full text content.
-        max_chunk_size: Maximum size of a chunk (default: 25000 for textbook content).
-        overlap: Overlap size to provide context to the next chunk (default: 500).
-        
-    Returns:
-        A list of content strings (chunks).
-    """
-    chunks = []
-    current_position = 0
-    total_length = len(content)
-    
-    # Find all section boundaries (marked by "##" or "===")
-    section_boundaries = []
-    section_pattern = re.compile(r'\n(#{1,3}|={3,})\s')
-    for match in section_pattern.finditer(content):
-        section_boundaries.append(match.start())
-    
-    while current_position < total_length:
-        # Determine the end of the chunk (max size from current position)
-        end_position = min(current_position + max_chunk_size, total_length)
-        
-        # Try to find a natural boundary (section break) near the end
-        if end_position < total_length:
-            # Look for section boundaries within the last 20% of the chunk
-            search_start = int(end_position - max_chunk_size * 0.2)
-            nearby_boundaries = [b for b in section_boundaries if search_start <= b < end_position]
-            
-            if nearby_boundaries:
-                # Use the last section boundary as the split point
-                end_position = nearby_boundaries[-1]
-        
-        # Extract chunk
-        chunk = content[current_position:end_position].strip()
-        if chunk:
-            chunks.append(chunk)
-        
-        # Move to the next position with overlap (but ensure we're progressing)
-        if end_position >= total_length:
-            break
-        
-        next_position = end_position - overlap
-        
-        # Ensure we're making progress (advance at least half the chunk size)
-        if next_position <= current_position:
-            next_position = current_position + (max_chunk_size // 2)
-        
-        current_position = next_position
-    
-    return chunks
-
-
 class ContentOrchestrator:
     """Orchestrates flashcard and quiz generation from various content sources."""
     
@@ -285,27 +235,28 @@ class ContentOrchestrator:
             llm_client=flashcard_llm,
         )
         
-        # Determine chunk size based on content type
-        # Slide-based content is more structured/dense, needs smaller chunks to stay within 5-6 card limit
-        # Textbook-based content: use similar size to slide-based to avoid timeouts
+        # Determine the chunk budget based on content type: slide analyses are packed
+        # whole slides at a time, textbook text whole sections at a time
         if self.is_slide_based(lecture):
-            max_chunk_size = 10000  # Smaller chunks for slide-based content (aims for 5-6 cards per chunk)
-            overlap = 200  # Smaller overlap for slide-based content
+            max_tokens = Config.SLIDE_CHUNK_MAX_TOKENS
+            boundary = SLIDE_BOUNDARY_RE
             content_source = "slide-based"
         else:
-            max_chunk_size = 12000  # Conservative size for textbook-based to avoid 504 timeouts
-            overlap = 300
+            max_tokens = Config.TEXTBOOK_CHUNK_MAX_TOKENS
+            boundary = SECTION_BOUNDARY_RE
             content_source = "textbook-based"
         
         print(f"🔍 Content type: {content_source}")
-        print(f"📏 Chunk size: {max_chunk_size:,} characters (overlap: {overlap})\n")
+        print(f"📏 Chunk budget: {max_tokens:,} tokens ({flashcard_llm.provider})\n")
         
         # Chunk the content
-        chunks = chunk_content(
+        manifests = pack_chunks(
             master_content,
-            max_chunk_size=max_chunk_size,
-            overlap=overlap
+            max_tokens,
+            provider=flashcard_llm.provider,
+            boundary=boundary
         )
+        chunks = [manifest['text'] for manifest in manifests]
         
         print(f"📊 Content chunked into {len(chunks)} chunk(s)\n")
         
@@ -315,7 +266,7 @@ class ContentOrchestrator:
         
         for idx, chunk in enumerate(chunks, 1):
             chunk_info = f"Chunk {idx}/{len(chunks)}"
-            print(f"Processing {chunk_info}...")
+            print(f"Processing {chunk_info} ({describe_chunk(manifests[idx - 1])})...")
             
             flashcards = generator.generate_flashcards(
                 content=chunk,
@@ -379,8 +330,7 @@ class ContentOrchestrator:
         output_dir.mkdir(parents=True, exist_ok=True)
         output_path = output_dir / f"{course_code}_lec_{lecture_number}_cognitive_flashcards_only.json"
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        write_course_json(output_path, output_data)
         
         print(f"\n✓ Flashcards saved to: {output_path}")
         print(f"  Total cards: {len(all_flashcards)}\n")
@@ -488,8 +438,7 @@ class ContentOrchestrator:
                 "questions": all_quiz_questions
             }
             
-            with open(quiz_path, 'w', encoding='utf-8') as f:
-                json.dump(quiz_data, f, indent=2, ensure_ascii=False)
+            write_course_json(quiz_path, quiz_data)
             
             quiz_paths[f"level_{level}"] = quiz_path
             print(f"✓ Level {level} quiz saved: {len(all_quiz_questions)} question(s) total\n")
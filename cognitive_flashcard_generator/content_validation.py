@@ -0,0 +1,610 @@
+"""
+Validation suite for generated course content.
+
+Walks the course trees once, parses every quiz, flashcard and hard-question
+file exactly once (across a process pool), and runs all registered rules over
+the parsed objects:
+
+- the file's structure (an object with a questions / flashcards list) is
+  checked first, so rules can rely on it;
+- document rules see the whole parsed file;
+- item rules see each question / flashcard, all in a single pass per file;
+- cross rules run afterwards in the parent process over small per-file facts
+  (flashcard IDs, cited source_flashcard_ids, quiz levels), so checks that
+  span files never re-read them.
+
+Per-file results are cached by content hash (a size/mtime match skips even
+reading the file), and the run can be written out as a JSON report. The exit
+status is non-zero when errors are found, so it can gate a deploy:
+
+    python -m cognitive_flashcard_generator.content_validation --report validation_report.json
+
+New checks are added with the register_rule / register_cross_rule decorators
+in this module. Worker processes only see rules that are registered when the
+module is imported, since under the spawn start method (macOS, Windows) they
+import it afresh instead of inheriting the parent's state.
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+ERROR = "error"
+WARNING = "warning"
+
+QUIZ = "quiz"
+FLASHCARDS = "flashcards"
+HARD_QUESTIONS = "hard_questions"
+
+QUIZ_LEVELS = (1, 2, 3, 4)
+QUESTION_TYPES = ("mcq", "mca")
+
+# Where each kind of file lives inside a course directory
+FILE_PATTERNS = (
+    (QUIZ, "quiz/*_quiz.json"),
+    (FLASHCARDS, "cognitive_flashcards/*/*_cognitive_flashcards_only.json"),
+    (HARD_QUESTIONS, "cognitive_flashcards/*/*_hard_questions.json"),
+)
+# Field holding the list of items, per kind
+ITEMS_FIELD = {QUIZ: "questions", FLASHCARDS: "flashcards", HARD_QUESTIONS: "questions"}
+
+_QUIZ_NAME_RE = re.compile(r'^(?P<lecture>.+)_level_(?P<level>\d+)_quiz\.json$')
+
+# Issue: (location, message); location is "" for the whole file or e.g. "Q3"
+Issue = Tuple[str, str]
+
+
+class Rule:
+    """A named check over one kind of file."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        check: Callable[..., Iterable[Issue]],
+        severity: str = ERROR,
+        scope: str = "item",
+    ):
+        """
+        Args:
+            name: Rule identifier used in reports (e.g. "quiz.correct_answer")
+            kind: File kind the rule applies to (QUIZ, FLASHCARDS, HARD_QUESTIONS)
+            check: For scope "item", check(item, index) -> issues for that item;
+                for scope "document", check(data) -> issues for the file
+            severity: ERROR or WARNING
+            scope: "item" or "document"
+        """
+        self.name = name
+        self.kind = kind
+        self.check = check
+        self.severity = severity
+        self.scope = scope
+
+
+class CrossRule:
+    """A check over the facts of all files of each lecture."""
+
+    def __init__(self, name: str, check: Callable[[Dict[str, Any]], Iterable[Tuple[str, str, str]]],
+                 severity: str = ERROR):
+        """
+        Args:
+            name: Rule identifier used in reports
+            check: check(lecture) -> (path, location, message) issues, where lecture
+                holds 'flashcard_ids' (set or None) and 'quizzes' ({level: facts})
+            severity: ERROR or WARNING
+        """
+        self.name = name
+        self.check = check
+        self.severity = severity
+
+
+RULES: List[Rule] = []
+CROSS_RULES: List[CrossRule] = []
+
+
+def register_rule(name: str, kind: str, severity: str = ERROR, scope: str = "item"):
+    """Decorator registering a per-file rule (see Rule)."""
+    def decorator(check):
+        RULES.append(Rule(name, kind, check, severity, scope))
+        return check
+    return decorator
+
+
+def register_cross_rule(name: str, severity: str = ERROR):
+    """Decorator registering a cross-file rule (see CrossRule)."""
+    def decorator(check):
+        CROSS_RULES.append(CrossRule(name, check, severity))
+        return check
+    return decorator
+
+
+# ==================== Per-file rules ====================
+
+@register_rule("quiz.required_fields", QUIZ)
+def check_quiz_fields(question: Dict[str, Any], index: int) -> Iterable[Issue]:
+    for field in ("type", "question_text", "options", "correct_answer", "explanation"):
+        if not question.get(field):
+            yield f"Q{index}", f"Missing {field}"
+
+
+@register_rule("quiz.type", QUIZ)
+def check_quiz_type(question: Dict[str, Any], index: int) -> Iterable[Issue]:
+    question_type = question.get("type")
+    if question_type and question_type not in QUESTION_TYPES:
+        yield f"Q{index}", f"Unknown question type '{question_type}'"
+
+
+@register_rule("quiz.correct_answer", QUIZ)
+def check_correct_answer(question: Dict[str, Any], index: int) -> Iterable[Issue]:
+    """correct_answer must be an array of option keys: one for MCQ, several for MCA."""
+    answer = question.get("correct_answer")
+    options = question.get("options")
+    question_type = question.get("type", "mcq")
+    location = f"Q{index}"
+
+    if not answer:
+        return
+    if not isinstance(answer, list):
+        if isinstance(answer, str) and "," in answer:
+            yield location, f"{question_type.upper()} has comma-separated string '{answer}' - should be array"
+        else:
+            yield location, f"{question_type.upper()} has {type(answer).__name__} correct_answer - should be array"
+        return
+
+    if isinstance(options, dict):
+        unknown = [key for key in answer if key not in options]
+        if unknown:
+            yield location, f"correct_answer {unknown} not among option keys {sorted(options)}"
+    if question_type == "mcq" and len(answer) != 1:
+        yield location, f"MCQ has {len(answer)} answers {answer} - should be MCA type"
+    elif question_type == "mca" and len(answer) < 2:
+        yield location, f"MCA has a single answer {answer}"
+
+
+@register_rule("quiz.options", QUIZ)
+def check_options(question: Dict[str, Any], index: int) -> Iterable[Issue]:
+    options = question.get("options")
+    if options is None:
+        return
+    if not isinstance(options, dict):
+        yield f"Q{index}", f"options is {type(options).__name__}, expected an object"
+    elif len(options) < 2:
+        yield f"Q{index}", f"Only {len(options)} option(s)"
+    elif any(not str(text).strip() for text in options.values()):
+        yield f"Q{index}", "Empty option text"
+
+
+@register_rule("quiz.source_flashcard_id", QUIZ)
+def check_source_flashcard_id(question: Dict[str, Any], index: int) -> Iterable[Issue]:
+    if not question.get("source_flashcard_id"):
+        yield f"Q{index}", "Missing source_flashcard_id"
+
+
+@register_rule("flashcards.flashcard_id", FLASHCARDS)
+def check_flashcard_id(card: Dict[str, Any], index: int) -> Iterable[Issue]:
+    if not card.get("flashcard_id"):
+        yield f"Card {index}", "Missing flashcard_id"
+
+
+@register_rule("flashcards.unique_ids", FLASHCARDS, scope="document")
+def check_unique_flashcard_ids(data: Dict[str, Any]) -> Iterable[Issue]:
+    counts = Counter(card.get("flashcard_id") for card in data["flashcards"] if isinstance(card, dict))
+    for card_id, count in counts.items():
+        if card_id and count > 1:
+            yield "", f"flashcard_id '{card_id}' used by {count} cards"
+
+
+@register_rule("flashcards.answers", FLASHCARDS, severity=WARNING)
+def check_flashcard_answers(card: Dict[str, Any], index: int) -> Iterable[Issue]:
+    if not card.get("question"):
+        yield f"Card {index}", "Missing question"
+    if not (card.get("answers") or {}).get("concise"):
+        yield f"Card {index}", "Missing concise answer"
+
+
+@register_rule("hard_questions.fields", HARD_QUESTIONS, severity=WARNING)
+def check_hard_question_fields(question: Dict[str, Any], index: int) -> Iterable[Issue]:
+    if not (question.get("question_text") or question.get("question")):
+        yield f"Q{index}", "Missing question text"
+    if not question.get("type"):
+        yield f"Q{index}", "Missing type"
+
+
+# ==================== Cross-file rules ====================
+
+@register_cross_rule("quiz.flashcard_consistency")
+def check_flashcard_consistency(lecture: Dict[str, Any]) -> Iterable[Tuple[str, str, str]]:
+    """Every quiz question must cite a flashcard of its lecture."""
+    flashcard_ids = lecture["flashcard_ids"]
+    for level, quiz in sorted(lecture["quizzes"].items()):
+        if flashcard_ids is None:
+            yield quiz["path"], "", "No flashcard file found for this lecture"
+            continue
+        for index, source_id in enumerate(quiz["source_ids"], 1):
+            if source_id and source_id not in flashcard_ids:
+                yield quiz["path"], f"Q{index}", f"Invalid source_flashcard_id '{source_id}' (not in flashcard IDs)"
+
+
+@register_cross_rule("quiz.levels", severity=WARNING)
+def check_quiz_levels(lecture: Dict[str, Any]) -> Iterable[Tuple[str, str, str]]:
+    quizzes = lecture["quizzes"]
+    if not quizzes:
+        return
+    missing = [level for level in QUIZ_LEVELS if level not in quizzes]
+    if missing:
+        first = quizzes[min(quizzes)]["path"]
+        yield first, "", f"Lecture has no quiz for level(s) {', '.join(map(str, missing))}"
+
+
+# ==================== Engine ====================
+
+def rules_digest() -> str:
+    """
+    Changes whenever a rule is added, removed or edited (invalidates the cache).
+
+    The module source is hashed too, so edits to the helpers and constants the
+    rules call (and to the engine itself) also invalidate cached results.
+    """
+    digest = hashlib.sha256()
+    try:
+        digest.update(Path(__file__).read_bytes())
+    except OSError:
+        pass
+    for rule in RULES:
+        digest.update(f"{rule.name}|{rule.kind}|{rule.severity}|{rule.scope}|".encode("utf-8"))
+        try:
+            digest.update(inspect.getsource(rule.check).encode("utf-8"))
+        except (OSError, TypeError):
+            digest.update(rule.check.__qualname__.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _file_facts(kind: str, data: Any) -> Dict[str, Any]:
+    """The little each cross rule needs from a file."""
+    if not isinstance(data, dict):
+        return {}
+    items = data.get(ITEMS_FIELD[kind])
+    if not isinstance(items, list):
+        return {}
+    items = [item for item in items if isinstance(item, dict)]
+    if kind == FLASHCARDS:
+        return {"flashcard_ids": [item["flashcard_id"] for item in items if item.get("flashcard_id")]}
+    if kind == QUIZ:
+        return {"source_ids": [item.get("source_flashcard_id") or "" for item in items]}
+    return {}
+
+
+def validate_data(kind: str, data: Any) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Run every rule for kind over a parsed file.
+
+    Returns:
+        (issues as dicts with rule, severity, location, message; number of items)
+    """
+    issues: List[Dict[str, str]] = []
+
+    def add(rule, found):
+        for location, message in found:
+            issues.append({"rule": rule.name, "severity": rule.severity, "location": location, "message": message})
+
+    # Structure is checked first: rules may assume an object with an items list
+    field = ITEMS_FIELD[kind]
+    items = data.get(field) if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        found = type(data).__name__ if not isinstance(data, dict) else f"no '{field}' list"
+        issues.append({"rule": "structure", "severity": ERROR, "location": "",
+                       "message": f"Expected an object with a '{field}' list, found {found}"})
+        return issues, 0
+    if not items:
+        issues.append({"rule": "structure", "severity": WARNING, "location": "", "message": "File has no items"})
+
+    rules = [rule for rule in RULES if rule.kind == kind]
+    for rule in rules:
+        if rule.scope == "document":
+            add(rule, rule.check(data))
+
+    item_rules = [rule for rule in rules if rule.scope == "item"]
+    for index, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            issues.append({"rule": "structure", "severity": ERROR, "location": f"#{index}",
+                           "message": f"Item is {type(item).__name__}, expected an object"})
+            continue
+        for rule in item_rules:
+            add(rule, rule.check(item, index))
+    return issues, len(items)
+
+
+def validate_file(task: Tuple[str, str, Optional[str]]) -> Dict[str, Any]:
+    """
+    Read, hash, parse and check one file (runs in a worker process).
+
+    Args:
+        task: (path, kind, hash of the cached result or None)
+
+    Returns:
+        Result with path, kind, hash, size, mtime_ns, and either unchanged=True
+        (content matches the cached hash) or items, issues and facts
+    """
+    path_str, kind, cached_hash = task
+    path = Path(path_str)
+    try:
+        stat = path.stat()
+        raw = path.read_bytes()
+    except OSError as e:
+        # Deleted or unreadable since discovery: report it rather than abort the run.
+        # The -1 size never matches a later stat, so the file is re-read next time.
+        return {"path": path_str, "kind": kind, "hash": "", "size": -1, "mtime_ns": -1,
+                "items": 0, "facts": {}, "issues": [
+                    {"rule": "read", "severity": ERROR, "location": "", "message": f"Cannot read file: {e}"}
+                ]}
+    content_hash = hashlib.sha256(raw).hexdigest()
+    result = {"path": path_str, "kind": kind, "hash": content_hash,
+              "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if content_hash == cached_hash:
+        result["unchanged"] = True
+        return result
+
+    try:
+        data = json.loads(raw)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        result.update(items=0, facts={}, issues=[
+            {"rule": "json", "severity": ERROR, "location": "", "message": f"Invalid JSON: {e}"}
+        ])
+        return result
+
+    issues, items = validate_data(kind, data)
+    result.update(items=items, issues=issues, facts=_file_facts(kind, data))
+    return result
+
+
+def discover_files(roots: Iterable[Path]) -> List[Tuple[Path, str]]:
+    """(path, kind) of every content file under the course roots."""
+    files = []
+    seen = set()
+    for root in roots:
+        if not root.is_dir():
+            continue
+        for course_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+            for kind, pattern in FILE_PATTERNS:
+                for path in sorted(course_dir.glob(pattern)):
+                    if path not in seen:
+                        seen.add(path)
+                        files.append((path, kind))
+    return files
+
+
+def _load_cache(path: Path, digest: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if cache.get("rules") != digest:
+        return {}
+    return cache.get("files", {})
+
+
+def _save_cache(path: Path, digest: str, entries: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"rules": digest, "files": entries}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _lecture_key(path: Path, kind: str) -> Optional[Tuple[str, str]]:
+    """(course directory, lecture name) a file belongs to."""
+    if kind == QUIZ:
+        match = _QUIZ_NAME_RE.match(path.name)
+        return (str(path.parent.parent), match.group("lecture")) if match else None
+    return str(path.parent.parent.parent), path.parent.name
+
+
+def run_cross_rules(results: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Group file facts by lecture and run the cross-file rules.
+
+    Returns:
+        (path, issue) pairs
+    """
+    lectures: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for result in results:
+        key = _lecture_key(Path(result["path"]), result["kind"])
+        if key is None or result["kind"] == HARD_QUESTIONS:
+            continue
+        lecture = lectures.setdefault(key, {"flashcard_ids": None, "quizzes": {}})
+        facts = result.get("facts", {})
+        if result["kind"] == FLASHCARDS:
+            ids = lecture["flashcard_ids"] if lecture["flashcard_ids"] is not None else set()
+            ids.update(facts.get("flashcard_ids", []))
+            lecture["flashcard_ids"] = ids
+        else:
+            level = int(_QUIZ_NAME_RE.match(Path(result["path"]).name).group("level"))
+            lecture["quizzes"][level] = {"path": result["path"], "source_ids": facts.get("source_ids", [])}
+
+    found = []
+    for key in sorted(lectures):
+        for rule in CROSS_RULES:
+            for path, location, message in rule.check(lectures[key]):
+                found.append((path, {"rule": rule.name, "severity": rule.severity,
+                                     "location": location, "message": message}))
+    return found
+
+
+def validate_courses(
+    roots: Iterable[Path],
+    workers: Optional[int] = None,
+    cache_path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Validate every content file under the course roots.
+
+    Args:
+        roots: Directories containing course directories (e.g. courses/, backend/courses/)
+        workers: Worker processes (defaults to Config.VALIDATION_WORKERS)
+        cache_path: Per-file result cache (None disables caching)
+
+    Returns:
+        Machine-readable report (see build_report)
+    """
+    start = time.monotonic()
+    roots = [Path(root) for root in roots]
+    workers = max(1, workers or Config.VALIDATION_WORKERS)
+    digest = rules_digest()
+    cache = _load_cache(cache_path, digest) if cache_path else {}
+
+    results: List[Dict[str, Any]] = []
+    tasks = []
+    for path, kind in discover_files(roots):
+        entry = cache.get(str(path))
+        try:
+            stat = path.stat()
+        except OSError:
+            stat = None  # validate_file reports it
+        if entry and stat and entry.get("kind") == kind and entry["size"] == stat.st_size \
+                and entry["mtime_ns"] == stat.st_mtime_ns:
+            results.append(entry)  # Unchanged since the cached run; not even read
+        else:
+            tasks.append((str(path), kind, entry["hash"] if entry else None))
+
+    if len(tasks) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            fresh = list(executor.map(validate_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        fresh = [validate_file(task) for task in tasks]
+
+    for result in fresh:
+        if result.pop("unchanged", False):
+            # Touched but identical: reuse the cached result with the new stat
+            result = dict(cache[result["path"]], size=result["size"], mtime_ns=result["mtime_ns"])
+        results.append(result)
+    results.sort(key=lambda r: r["path"])
+
+    if cache_path:
+        _save_cache(cache_path, digest, {r["path"]: r for r in results})
+
+    cross_issues = run_cross_rules(results)
+    return build_report(roots, results, cross_issues, len(results) - len(tasks), time.monotonic() - start)
+
+
+def build_report(
+    roots: List[Path],
+    results: List[Dict[str, Any]],
+    cross_issues: List[Tuple[str, Dict[str, str]]],
+    cached: int,
+    elapsed: float,
+) -> Dict[str, Any]:
+    """Combine per-file and cross-file issues into the report dictionary."""
+    issues_by_path: Dict[str, List[Dict[str, str]]] = {r["path"]: list(r.get("issues", [])) for r in results}
+    for path, issue in cross_issues:
+        issues_by_path.setdefault(path, []).append(issue)
+
+    severities: Counter = Counter()
+    by_rule: Counter = Counter()
+    files = []
+    for result in results:
+        issues = issues_by_path[result["path"]]
+        for issue in issues:
+            severities[issue["severity"]] += 1
+            by_rule[issue["rule"]] += 1
+        files.append({
+            "path": result["path"],
+            "kind": result["kind"],
+            "hash": result["hash"],
+            "items": result.get("items", 0),
+            "errors": sum(1 for issue in issues if issue["severity"] == ERROR),
+            "warnings": sum(1 for issue in issues if issue["severity"] == WARNING),
+            "issues": issues,
+        })
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "roots": [str(root) for root in roots],
+        "summary": {
+            "files": len(results),
+            "files_from_cache": cached,
+            "items": sum(f["items"] for f in files),
+            "files_with_errors": sum(1 for f in files if f["errors"]),
+            "errors": severities[ERROR],
+            "warnings": severities[WARNING],
+            "by_rule": dict(sorted(by_rule.items())),
+            "elapsed_seconds": round(elapsed, 3),
+        },
+        "files": files,
+    }
+
+
+def print_report(report: Dict[str, Any], max_issues: int = 5):
+    """Human-readable summary of a report."""
+    summary = report["summary"]
+    for entry in report["files"]:
+        if not entry["issues"]:
+            continue
+        icon = "❌" if entry["errors"] else "⚠️ "
+        print(f"{icon} {entry['path']}: {entry['errors']} error(s), {entry['warnings']} warning(s)")
+        for issue in entry["issues"][:max_issues]:
+            location = f"{issue['location']}: " if issue["location"] else ""
+            print(f"     - [{issue['rule']}] {location}{issue['message']}")
+        if len(entry["issues"]) > max_issues:
+            print(f"     ... and {len(entry['issues']) - max_issues} more")
+
+    print(f"\n{'='*70}")
+    print(f"📊 Validated {summary['files']} file(s), {summary['items']:,} item(s) "
+          f"in {summary['elapsed_seconds']:.2f}s ({summary['files_from_cache']} from cache)")
+    print(f"   Errors: {summary['errors']}  Warnings: {summary['warnings']}  "
+          f"Files with errors: {summary['files_with_errors']}")
+    for rule, count in summary["by_rule"].items():
+        print(f"   • {rule}: {count}")
+    print(f"{'='*70}")
+
+
+def main():
+    """CLI: validate all courses and optionally write a JSON report."""
+    parser = argparse.ArgumentParser(description="Validate generated quizzes, flashcards and hard questions")
+    parser.add_argument("roots", nargs="*", default=["courses", "backend/courses"],
+                        help="Directories containing course directories (default: courses backend/courses)")
+    parser.add_argument("--report", help="Write the JSON report to this path ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=Config.VALIDATION_WORKERS, help="Worker processes")
+    parser.add_argument("--no-cache", action="store_true", help="Re-validate every file")
+    parser.add_argument("--strict", action="store_true", help="Exit non-zero on warnings too")
+    args = parser.parse_args()
+
+    cache_path = None if args.no_cache else Path(Config.VALIDATION_CACHE_PATH)
+    report = validate_courses([Path(root) for root in args.roots], args.workers, cache_path)
+
+    if args.report == "-":
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        print_report(report)
+        if args.report:
+            Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=1)
+            print(f"💾 Report saved: {args.report}")
+
+    summary = report["summary"]
+    if summary["errors"] or (args.strict and summary["warnings"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,574 @@
+"""
+Course Build Orchestrator - Incremental, resumable builds of a course's learning materials.
+
+Replaces the per-course shell scripts. Each lecture is modelled as a small
+dependency graph of stages, each run as the existing CLI in a subprocess:
+
+    analyze (slides) / enrich (textbook) → flashcards → quizzes
+                                                      → ingest (RAG)
+    analyze → hard_questions
+    analyze → condense (optional)
+
+Every stage has a content-hash fingerprint over its input files, prompt
+templates (or the source holding an inline prompt), parameters and model
+settings. A stage is rebuilt only when its fingerprint changed or an output is
+missing. Independent lectures and stages run concurrently, and stage state is
+saved after every stage, so an interrupted build resumes where it stopped.
+
+Usage:
+    python -m cognitive_flashcard_generator.course_build MS5031
+    python -m cognitive_flashcard_generator.course_build MS5031 --lectures 5 6 7 --jobs 6
+    python -m cognitive_flashcard_generator.course_build MS5031 --stages flashcards quizzes --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import Config
+from .utils import get_course_by_id, load_courses
+
+STATE_VERSION = 1
+STAGE_NAMES = ("analyze", "enrich", "condense", "flashcards", "quizzes", "hard_questions", "ingest")
+DEFAULT_STAGES = ("analyze", "enrich", "flashcards", "quizzes", "hard_questions", "ingest")
+QUIZ_LEVELS = (1, 2, 3, 4)
+
+# Rate-limit budgets split between concurrently running stage processes
+_RATE_BUDGET_KEYS = (
+    "GEMINI_REQUESTS_PER_MINUTE",
+    "GEMINI_TOKENS_PER_MINUTE",
+    "OPENAI_REQUESTS_PER_MINUTE",
+    "OPENAI_TOKENS_PER_MINUTE",
+)
+
+
+class Stage:
+    """One build step for one lecture."""
+
+    def __init__(
+        self,
+        lecture: str,
+        name: str,
+        command: List[str],
+        inputs: Sequence[Path] = (),
+        templates: Sequence[Path] = (),
+        outputs: Sequence[Path] = (),
+        deps: Sequence[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        cwd: Optional[Path] = None,
+    ):
+        """
+        Args:
+            lecture: Lecture key (PDF stem or lecture id)
+            name: Stage name (see STAGE_NAMES)
+            command: Command line to run
+            inputs: Files the stage reads (produced upstream or source files)
+            templates: Prompt templates and prompt-bearing source files
+            outputs: Files the stage must (re)write
+            deps: Names of upstream stages of the same lecture
+            params: Extra values that change the result (lecture metadata, model, ...)
+            cwd: Working directory (defaults to the project root)
+        """
+        self.lecture = lecture
+        self.name = name
+        self.key = f"{lecture}:{name}"
+        self.command = command
+        self.inputs = list(inputs)
+        self.templates = list(templates)
+        self.outputs = list(outputs)
+        self.deps = [f"{lecture}:{dep}" for dep in deps]
+        self.params = params or {}
+        self.cwd = cwd
+
+
+def _llm_params() -> Dict[str, str]:
+    settings = Config.get_llm_settings()
+    return {'provider': settings['provider'], 'model': settings['model']}
+
+
+def lecture_stages(
+    course: Dict[str, Any],
+    lecture: Dict[str, Any],
+    lecture_index: int,
+    min_cards: int = 5,
+) -> List[Stage]:
+    """
+    Build the stage graph of one lecture.
+
+    Args:
+        course: Course dictionary from courses.json
+        lecture: Lecture entry (from lecture_slides)
+        lecture_index: 1-based position of the lecture in lecture_slides
+        min_cards: --min-cards passed to flashcard generation
+
+    Returns:
+        Stages of the lecture (all of STAGE_NAMES that apply)
+    """
+    python = sys.executable
+    course_id = course['course_id']
+    course_code = course.get('course_code', course_id)
+    number = str(lecture.get('lecture_number', lecture_index))
+    course_dir = Path("courses") / course_id
+    prompts = Path(Config.PROMPTS_DIR)
+    pdf_path = lecture.get('pdf_path')
+    slide_based = bool(pdf_path) and lecture.get('hasPDF') is not False
+
+    # learning_materials_cli names flashcard and quiz files after the course code
+    prefix = f"{course_code}_lec_{number}"
+    flashcards_path = course_dir / "cognitive_flashcards" / prefix / f"{prefix}_cognitive_flashcards_only.json"
+    lecture_params = {'lecture': lecture, 'course_name': course.get('course_name'),
+                      'reference_textbooks': course.get('reference_textbooks', [])}
+    stages = []
+
+    if slide_based:
+        key = Path(pdf_path).stem
+        analysis_path = course_dir / "slide_analysis" / f"{key}_structured_analysis.json"
+        source_stage = "analyze"
+        source_path = analysis_path
+        stages.append(Stage(
+            key, "analyze",
+            [python, "-m", "pdf_slide_processor.main", course_id, key],
+            inputs=[Path(pdf_path)],
+            templates=[Path("pdf_slide_processor") / name for name in ("analyzer.py", "extractor.py")],
+            outputs=[analysis_path],
+            params=dict(lecture_params, gemini_model=Config.GEMINI_MODEL,
+                        image_format=Config.SLIDE_IMAGE_FORMAT, max_pixels=Config.SLIDE_MAX_PIXELS),
+        ))
+        stages.append(Stage(
+            key, "condense",
+            [python, "-m", "pdf_slide_processor.slide_content_condenser", course_id, str(lecture_index)],
+            inputs=[analysis_path],
+            templates=[Path("pdf_slide_processor") / "slide_content_condenser.py"],
+            outputs=[course_dir / "slide_analysis" / f"{key}_structured_analysis_condensed.json"],
+            deps=["analyze"],
+            params={'gemini_model': Config.GEMINI_MODEL},
+        ))
+        hard_questions_path = course_dir / "cognitive_flashcards" / key / f"{key}_hard_questions.json"
+        stages.append(Stage(
+            key, "hard_questions",
+            [python, "generate_hard_questions.py", course_id, key, "--force"],
+            inputs=[analysis_path],
+            templates=[prompts / "hard_questions_prompt.txt"],
+            outputs=[hard_questions_path],
+            deps=["analyze"],
+            params={'gemini_model': Config.GEMINI_MODEL},
+        ))
+    else:
+        key = f"{course_id}_lecture_{number}"
+        source_stage = "enrich"
+        source_path = Path("enriched_content") / course_id / f"{key}_enhanced.txt"
+        stages.append(Stage(
+            key, "enrich",
+            [python, "-m", "cognitive_flashcard_generator.textbook_enrichment",
+             "--course", course_id, "--lecture", number],
+            templates=[prompts / "textbook_content_synthesis_prompt.txt",
+                       prompts / "textbook_content_batch_synthesis_prompt.txt"],
+            outputs=[source_path],
+            params=dict(lecture_params, gemini_model=Config.GEMINI_MODEL),
+        ))
+
+    stages.append(Stage(
+        key, "flashcards",
+        [python, "-m", "cognitive_flashcard_generator.learning_materials_cli", "generate-flashcards",
+         "--course", course_id, "--lecture", number, "--min-cards", str(min_cards)],
+        inputs=[source_path],
+        templates=[prompts / "intelligent_flashcard_only_prompt_v2.txt"],
+        outputs=[flashcards_path],
+        deps=[source_stage],
+        params=dict(lecture_params, llm=_llm_params(), min_cards=min_cards,
+                    slide_chunk_tokens=Config.SLIDE_CHUNK_MAX_TOKENS,
+                    textbook_chunk_tokens=Config.TEXTBOOK_CHUNK_MAX_TOKENS),
+    ))
+    stages.append(Stage(
+        key, "quizzes",
+        [python, "-m", "cognitive_flashcard_generator.learning_materials_cli", "generate-quizzes",
+         "--course", course_id, "--lecture", number],
+        inputs=[flashcards_path],
+        templates=[prompts / f"level_{level}_quiz_prompt.txt" for level in QUIZ_LEVELS],
+        outputs=[course_dir / "quiz" / f"{prefix}_level_{level}_quiz.json" for level in QUIZ_LEVELS],
+        deps=["flashcards"],
+        params={'llm': _llm_params()},
+    ))
+    stages.append(Stage(
+        key, "ingest",
+        [python, "scripts/batch_ingest.py", "--course-id", course_id, "--lecture-number", number],
+        inputs=[flashcards_path] + ([Path(pdf_path)] if slide_based else []),
+        deps=["flashcards"],
+        cwd=Path("backend") / "image_rag_pipeline",
+    ))
+    return stages
+
+
+class BuildState:
+    """Persisted stage fingerprints and file hashes of one course build."""
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: State file (JSON), created on first save
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.files: Dict[str, List[Any]] = {}
+        if path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == STATE_VERSION:
+                    self.stages = data.get('stages', {})
+                    self.files = data.get('files', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable build state {path}: {e}")
+
+    def file_hash(self, path: Path) -> str:
+        """SHA-256 of a file, reusing the stored hash while size and mtime are unchanged."""
+        stat = path.stat()
+        key = str(path)
+        with self._lock:
+            cached = self.files.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        value = digest.hexdigest()
+        with self._lock:
+            self.files[key] = [stat.st_size, stat.st_mtime_ns, value]
+        return value
+
+    def record(self, key: str, **entry):
+        """Store the result of a stage and save the state file."""
+        with self._lock:
+            self.stages[key] = entry
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {'version': STATE_VERSION, 'stages': self.stages, 'files': self.files}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class CourseBuilder:
+    """Runs the stage graphs of a course's lectures with incremental rebuilds."""
+
+    def __init__(
+        self,
+        course: Dict[str, Any],
+        stages: List[Stage],
+        jobs: int = 4,
+        force: bool = False,
+        state_path: Optional[Path] = None,
+        log_dir: Optional[Path] = None,
+    ):
+        """
+        Initialize the builder.
+
+        Args:
+            course: Course dictionary
+            stages: Stages to build (dependencies on stages not in this list are ignored)
+            jobs: Stages run concurrently
+            force: Rebuild every stage regardless of fingerprints
+            state_path: Build state file (default: courses/<course_id>/.build_state.json)
+            log_dir: Directory for per-stage logs (default: Config.BUILD_LOG_DIR/<course_id>)
+        """
+        course_id = course['course_id']
+        self.course = course
+        self.jobs = max(1, jobs)
+        self.force = force
+        self.stages = {stage.key: stage for stage in stages}
+        for stage in stages:
+            stage.deps = [dep for dep in stage.deps if dep in self.stages]
+        self.state = BuildState(state_path or Path("courses") / course_id / ".build_state.json")
+        self.log_dir = log_dir or Path(Config.BUILD_LOG_DIR) / course_id
+        self._env = self._stage_env()
+
+    def _stage_env(self) -> Dict[str, str]:
+        """Environment for stage processes: each gets an equal share of the rate-limit budgets."""
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        root = str(Path.cwd())
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+        for name in _RATE_BUDGET_KEYS:
+            budget = getattr(Config, name)
+            if budget > 0:
+                env[name] = str(max(1, budget // self.jobs))
+        return env
+
+    def fingerprint(self, stage: Stage) -> str:
+        """Content hash of everything that determines a stage's outputs."""
+        manifest = {
+            'stage': stage.name,
+            'command': stage.command[1:],  # Not the interpreter path
+            'inputs': {str(path): self.state.file_hash(path) for path in stage.inputs},
+            'templates': {str(path): self.state.file_hash(path) for path in stage.templates if path.exists()},
+            'params': stage.params,
+        }
+        encoded = json.dumps(manifest, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def stale_reason(self, stage: Stage) -> Optional[str]:
+        """Why a stage must be rebuilt, or None if it is up to date (inputs must exist)."""
+        if self.force:
+            return "forced"
+        record = self.state.stages.get(stage.key)
+        if not record or record.get('status') != 'done':
+            return "never built" if not record else f"last run {record.get('status')}"
+        missing = [path for path in stage.outputs if not path.exists()]
+        if missing:
+            return f"output missing: {missing[0]}"
+        if record.get('fingerprint') != self.fingerprint(stage):
+            return "inputs changed"
+        return None
+
+    def plan(self) -> Dict[str, str]:
+        """
+        Decide what a build would do without running anything.
+
+        Returns:
+            Stage key -> "up to date", "rebuild (<reason>)", "rebuild (after upstream)" or "blocked (...)"
+        """
+        decisions: Dict[str, str] = {}
+        for key in self._topological_order():
+            stage = self.stages[key]
+            if any(decisions[dep].startswith("blocked") for dep in stage.deps):
+                decisions[key] = "blocked (upstream)"
+                continue
+            if any(decisions[dep] != "up to date" for dep in stage.deps):
+                decisions[key] = "rebuild (after upstream)"
+                continue
+            missing = [path for path in stage.inputs if not path.exists()]
+            if missing:
+                decisions[key] = f"blocked (missing input: {missing[0]})"
+                continue
+            reason = self.stale_reason(stage)
+            decisions[key] = "up to date" if reason is None else f"rebuild ({reason})"
+        return decisions
+
+    def _topological_order(self) -> List[str]:
+        order, seen = [], set()
+
+        def visit(key: str):
+            if key in seen:
+                return
+            seen.add(key)
+            for dep in self.stages[key].deps:
+                visit(dep)
+            order.append(key)
+
+        for key in self.stages:
+            visit(key)
+        return order
+
+    def run_stage(self, stage: Stage) -> str:
+        """
+        Build one stage if it is stale.
+
+        Returns:
+            "skipped", "built" or "failed"
+        """
+        missing = [path for path in stage.inputs if not path.exists()]
+        if missing:
+            print(f"❌ {stage.key}: missing input {missing[0]}")
+            return "failed"
+
+        reason = self.stale_reason(stage)
+        if reason is None:
+            print(f"✓  {stage.key}: up to date")
+            return "skipped"
+
+        fingerprint = self.fingerprint(stage)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        log_path = self.log_dir / f"{stage.lecture}.{stage.name}.log"
+        print(f"🔨 {stage.key}: building ({reason}) → {log_path}")
+
+        started = time.time()
+        with open(log_path, 'w', encoding='utf-8') as log:
+            log.write(f"$ {' '.join(stage.command)}\n\n")
+            log.flush()
+            try:
+                returncode = subprocess.run(
+                    stage.command,
+                    cwd=stage.cwd,
+                    env=self._env,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                ).returncode
+            except OSError as e:
+                log.write(f"\n{type(e).__name__}: {e}\n")
+                returncode = -1
+        duration = time.time() - started
+
+        # The stage CLIs report some failures only on stdout, so also require fresh outputs
+        error = None
+        if returncode != 0:
+            error = f"exit code {returncode}"
+        else:
+            for path in stage.outputs:
+                if not path.exists() or path.stat().st_mtime < started - 1:
+                    error = f"output not written: {path}"
+                    break
+
+        if error:
+            print(f"❌ {stage.key}: {error} after {duration:.0f}s (see {log_path})")
+            self.state.record(stage.key, status="failed", error=error,
+                              finished_at=datetime.now().isoformat(), duration=round(duration, 1))
+            return "failed"
+
+        self.state.record(stage.key, status="done", fingerprint=fingerprint,
+                          outputs={str(path): self.state.file_hash(path) for path in stage.outputs},
+                          finished_at=datetime.now().isoformat(), duration=round(duration, 1))
+        print(f"✅ {stage.key}: built in {duration:.0f}s")
+        return "built"
+
+    def run(self) -> Dict[str, str]:
+        """
+        Build all stages, running each as soon as its upstream stages are done.
+
+        A failed stage blocks its downstream stages; other lectures carry on.
+
+        Returns:
+            Stage key -> "skipped", "built", "failed" or "blocked"
+        """
+        waiting = {key: len(stage.deps) for key, stage in self.stages.items()}
+        dependents: Dict[str, List[str]] = {key: [] for key in self.stages}
+        for key, stage in self.stages.items():
+            for dep in stage.deps:
+                dependents[dep].append(key)
+
+        ready = [key for key, count in waiting.items() if count == 0]
+        results: Dict[str, str] = {}
+
+        def release(key: str):
+            for child in dependents[key]:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    ready.append(child)
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            running = {}
+            while ready or running:
+                while ready:
+                    key = ready.pop(0)
+                    stage = self.stages[key]
+                    if any(results[dep] in ("failed", "blocked") for dep in stage.deps):
+                        print(f"⏭️  {key}: blocked by a failed upstream stage")
+                        results[key] = "blocked"
+                        release(key)
+                        continue
+                    running[executor.submit(self.run_stage, stage)] = key
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        results[key] = future.result()
+                    except Exception as e:
+                        print(f"❌ {key}: {type(e).__name__} - {e}")
+                        results[key] = "failed"
+                    release(key)
+
+        return results
+
+
+def select_lectures(course: Dict[str, Any], identifiers: Optional[Sequence[str]]) -> List[tuple]:
+    """
+    Pick lectures by lecture_number or PDF stem.
+
+    Returns:
+        (1-based index, lecture) pairs, all lectures when identifiers is empty
+    """
+    lectures = list(enumerate(course.get('lecture_slides', []), 1))
+    if not identifiers:
+        return lectures
+    wanted = {str(identifier).lower() for identifier in identifiers}
+    selected = []
+    for index, lecture in lectures:
+        stem = Path(lecture.get('pdf_path') or '').stem.lower()
+        if str(lecture.get('lecture_number', '')).lower() in wanted or (stem and stem in wanted):
+            selected.append((index, lecture))
+    return selected
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Main execution function."""
+    parser = argparse.ArgumentParser(
+        description="Incrementally build a course's slide analyses, flashcards, quizzes, hard questions and RAG index",
+    )
+    parser.add_argument("course_id", help="Course ID from courses.json (e.g., MS5031)")
+    parser.add_argument("--lectures", nargs="*", help="Lecture numbers or PDF stems (default: all)")
+    parser.add_argument("--stages", nargs="*", choices=STAGE_NAMES,
+                        help=f"Stages to build (default: {' '.join(DEFAULT_STAGES)})")
+    parser.add_argument("--jobs", type=int, default=Config.BUILD_JOBS,
+                        help=f"Stages run concurrently (default: {Config.BUILD_JOBS})")
+    parser.add_argument("--min-cards", type=int, default=5, help="Minimum flashcards per lecture (default: 5)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every selected stage")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be rebuilt and exit")
+    args = parser.parse_args(argv)
+
+    print("🏗️  Course Build Orchestrator\n")
+
+    courses = load_courses()
+    course = get_course_by_id(args.course_id, courses)
+    if not course:
+        print(f"❌ Course '{args.course_id}' not found in courses.json")
+        return 1
+
+    lectures = select_lectures(course, args.lectures)
+    if not lectures:
+        print(f"⚠️  No matching lectures in {args.course_id}")
+        return 1
+
+    selected = set(args.stages or DEFAULT_STAGES)
+    stages = [
+        stage
+        for index, lecture in lectures
+        for stage in lecture_stages(course, lecture, index, min_cards=args.min_cards)
+        if stage.name in selected
+    ]
+
+    builder = CourseBuilder(course, stages, jobs=args.jobs, force=args.force)
+    print(f"📚 {course.get('course_name', args.course_id)}: {len(lectures)} lecture(s), "
+          f"{len(stages)} stage(s), {builder.jobs} job(s)\n")
+
+    if args.dry_run:
+        for key, decision in builder.plan().items():
+            print(f"  • {key}: {decision}")
+        return 0
+
+    start_time = datetime.now()
+    results = builder.run()
+    duration = (datetime.now() - start_time).total_seconds()
+
+    counts = {status: sum(1 for value in results.values() if value == status)
+              for status in ("built", "skipped", "failed", "blocked")}
+    print(f"\n{'='*80}")
+    print(f"🏁 BUILD {'FAILED' if counts['failed'] else 'COMPLETE'}: {args.course_id} in {duration:.0f}s")
+    print(f"   Built: {counts['built']} | Up to date: {counts['skipped']} | "
+          f"Failed: {counts['failed']} | Blocked: {counts['blocked']}")
+    print(f"{'='*80}")
+    return 1 if counts['failed'] or counts['blocked'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
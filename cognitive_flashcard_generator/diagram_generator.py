@@ -378,9 +378,16 @@ class DiagramGenerator:
         Returns:
             SVG string or empty string if rendering fails
         """
+        # Prefer the shared render service (pooled subprocesses + render cache)
+        from .render_service import get_render_service
+        service = get_render_service()
+        if service.graphviz_available():
+            svg_bytes = service.render_graphviz(dot_code, image_format='svg')
+            return svg_bytes.decode('utf-8') if svg_bytes else ""
+
         if not GRAPHVIZ_AVAILABLE:
             return ""
-        
+
         try:
             graph = graphviz.Source(dot_code)
             svg_data = graph.pipe(format='svg').decode('utf-8')
@@ -3,10 +3,11 @@ Cognitive Flashcard Generator - Core AI generation logic.
 """
 
 import os
-import json
+import itertools
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
 from config import Config
+from cognitive_flashcard_generator.json_stream import JSONObjectStream, collect_items, parse_json_items
 from cognitive_flashcard_generator.llm_client import LLMClient
 
 
@@ -121,11 +122,15 @@ class CognitiveFlashcardGenerator:
                 print(f"   📊 Content size: {len(content):,} characters")
                 print(f"   📊 Max output tokens: {max_tokens:,}")
 
-                result_text = self.llm_client.generate_text(
-                    prompt,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                ).strip()
+                # Stream the completion; each flashcard is validated as soon as it closes
+                flashcards, result_text = collect_items(
+                    self.llm_client.stream_text(
+                        prompt,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                    ),
+                    JSONObjectStream(validate=self._flashcard_validator()),
+                )
 
                 # Always log the raw LLM output so it can be inspected later,
                 # regardless of whether parsing/validation succeeds.
@@ -142,9 +147,6 @@ class CognitiveFlashcardGenerator:
                     f.write("\n=== RESPONSE TEXT ===\n")
                     f.write(result_text)
 
-                # Parse JSON response
-                flashcards = self._parse_flashcard_response(result_text)
-                
                 if flashcards:
                     print(f"✅ Generated {len(flashcards)} flashcards")
                     
@@ -180,6 +182,8 @@ class CognitiveFlashcardGenerator:
                     
                     return flashcards
                 else:
+                    # Don't replay an unusable response from the cache on the next run
+                    self.llm_client.forget(prompt, max_tokens=max_tokens, temperature=temperature)
                     print(f"⚠️  No flashcards generated on attempt {attempt + 1}")
                     print(f"   📝 Raw response saved to: {log_file}")
                     if attempt < max_retries - 1:
@@ -215,183 +219,31 @@ class CognitiveFlashcardGenerator:
         print("⚠️  No flashcards generated from this chunk after all retries")
         return []
     
-    def _parse_flashcard_response(self, response_text: str) -> List[Dict[str, Any]]:
-        """Parse the AI response into structured flashcards with robust error handling."""
-        # Remove code fences if present
-        if response_text.startswith('```'):
-            parts = response_text.split('```')
-            if len(parts) >= 2:
-                response_text = parts[1]
-                if response_text.startswith('json'):
-                    response_text = response_text[4:].strip()
-        
-        # Find the JSON array
-        start_idx = response_text.find('[')
-        if start_idx != -1:
-            response_text = response_text[start_idx:]
-        
-        # Try to parse JSON with multiple fallback strategies
-        flashcards = self._try_parse_json_with_fixes(response_text)
+    def _flashcard_validator(self) -> Callable[[Dict[str, Any]], bool]:
+        """Per-response validator for JSONObjectStream: validates and normalizes flashcards as they arrive."""
+        card_numbers = itertools.count(1)
         
-        if not flashcards:
-            return []
-        
-        # Validate structure
-        if not isinstance(flashcards, list):
-            print("⚠️  Response is not a JSON array")
-            return []
-        
-        # Validate and normalize each flashcard
-        valid_flashcards = []
-        for i, card in enumerate(flashcards, 1):
-            if self._validate_flashcard(card, i):
-                # Ensure optional fields exist
-                if 'example' not in card:
-                    card['example'] = ""
-                # Ensure all diagram container fields exist (already validated above, but ensure they're strings)
-                if 'plantuml_diagrams' not in card:
-                    card['plantuml_diagrams'] = {}
-                if 'mermaid_diagrams' not in card:
-                    card['mermaid_diagrams'] = {}
-                if 'math_visualizations' not in card:
-                    card['math_visualizations'] = {}
-                diagram_types = ['concise', 'analogy', 'eli5', 'real_world_use_case', 'common_mistakes', 'example']
-                for diagram_type in diagram_types:
-                    if diagram_type not in card['plantuml_diagrams']:
-                        card['plantuml_diagrams'][diagram_type] = ""
-                    if diagram_type not in card['mermaid_diagrams']:
-                        card['mermaid_diagrams'][diagram_type] = ""
-                    if diagram_type not in card['math_visualizations']:
-                        card['math_visualizations'][diagram_type] = ""
-                valid_flashcards.append(card)
-        
-        return valid_flashcards
+        def accept(card: Dict[str, Any]) -> bool:
+            if not self._validate_flashcard(card, next(card_numbers)):
+                return False
+            # Ensure optional fields exist
+            card.setdefault('example', "")
+            # Ensure all diagram container fields exist
+            for field in ('plantuml_diagrams', 'mermaid_diagrams', 'math_visualizations'):
+                if not isinstance(card.get(field), dict):
+                    card[field] = {}
+            diagram_types = ['concise', 'analogy', 'eli5', 'real_world_use_case', 'common_mistakes', 'example']
+            for diagram_type in diagram_types:
+                card['plantuml_diagrams'].setdefault(diagram_type, "")
+                card['mermaid_diagrams'].setdefault(diagram_type, "")
+                card['math_visualizations'].setdefault(diagram_type, "")
+            return True
+        
+        return accept
     
-    def _try_parse_json_with_fixes(self, json_text: str) -> List[Dict[str, Any]]:
-        """
-        Try to parse JSON with multiple fallback strategies to handle common AI generation errors.
-        """
-        import re
-        
-        # Strategy 1: Try parsing as-is
-        try:
-            return json.loads(json_text)
-        except json.JSONDecodeError as e:
-            print(f"🔧 Initial JSON parse failed: {e}")
-            print(f"   Attempting to fix common JSON errors...")
-        
-        # Strategy 2: Fix common JSON issues
-        fixed_json = json_text
-        
-        # Fix 1: Handle unterminated strings by finding the last quote and closing it
-        try:
-            # Find unterminated strings (quotes that aren't properly closed)
-            quote_pattern = r'"([^"\\]*(\\.[^"\\]*)*)'
-            matches = list(re.finditer(quote_pattern, fixed_json))
-            if matches:
-                last_match = matches[-1]
-                if not fixed_json[last_match.end():].strip().startswith('"'):
-                    # Add closing quote if missing
-                    fixed_json = fixed_json[:last_match.end()] + '"' + fixed_json[last_match.end():]
-                    print("   🔧 Fixed unterminated string")
-        except Exception:
-            pass
-        
-        # Fix 2: Handle missing commas between objects
-        try:
-            fixed_json = re.sub(r'}\s*{', '},{', fixed_json)
-            print("   🔧 Fixed missing commas between objects")
-        except Exception:
-            pass
-        
-        # Fix 3: Remove trailing commas
-        try:
-            fixed_json = re.sub(r',(\s*[}\]])', r'\1', fixed_json)
-            print("   🔧 Removed trailing commas")
-        except Exception:
-            pass
-        
-        # Fix 4: Handle incomplete JSON by finding the last complete object
-        try:
-            # Find the last complete closing bracket for the array
-            last_bracket = fixed_json.rfind(']')
-            if last_bracket == -1:
-                # No closing bracket found, try to add one
-                # First, find the last complete object
-                brace_count = 0
-                last_complete_pos = -1
-                for i, char in enumerate(fixed_json):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            last_complete_pos = i
-                
-                if last_complete_pos > 0:
-                    fixed_json = fixed_json[:last_complete_pos + 1] + ']'
-                    print("   🔧 Added missing closing bracket")
-        except Exception:
-            pass
-        
-        # Strategy 3: Try parsing the fixed JSON
-        try:
-            result = json.loads(fixed_json)
-            print("   ✅ Successfully parsed JSON after fixes")
-            return result
-        except json.JSONDecodeError as e:
-            print(f"   ⚠️  JSON still invalid after fixes: {e}")
-        
-        # Strategy 4: Try to extract partial valid JSON objects
-        try:
-            # Find individual complete JSON objects within the text
-            objects = []
-            brace_count = 0
-            start_pos = -1
-            
-            for i, char in enumerate(fixed_json):
-                if char == '{' and brace_count == 0:
-                    start_pos = i
-                    brace_count = 1
-                elif char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0 and start_pos != -1:
-                        # Found a complete object
-                        obj_text = fixed_json[start_pos:i+1]
-                        try:
-                            obj = json.loads(obj_text)
-                            objects.append(obj)
-                        except json.JSONDecodeError:
-                            pass  # Skip invalid objects
-                        start_pos = -1
-            
-            if objects:
-                print(f"   🔧 Extracted {len(objects)} valid objects from partial JSON")
-                return objects
-        except Exception:
-            pass
-        
-        # Strategy 5: Last resort - try to find any valid JSON array in the text
-        try:
-            # Look for patterns like [{"key": "value"}] in the text
-            array_pattern = r'\[[\s\S]*?\]'
-            matches = re.findall(array_pattern, fixed_json)
-            
-            for match in matches:
-                try:
-                    result = json.loads(match)
-                    if isinstance(result, list) and len(result) > 0:
-                        print(f"   🔧 Found valid JSON array with {len(result)} items")
-                        return result
-                except json.JSONDecodeError:
-                    continue
-        except Exception:
-            pass
-        
-        print("   ❌ All JSON parsing strategies failed")
-        return []
+    def _parse_flashcard_response(self, response_text: str) -> List[Dict[str, Any]]:
+        """Parse a complete AI response into validated flashcards (tolerates fences and truncation)."""
+        return parse_json_items(response_text, validate=self._flashcard_validator())
     
     def _validate_flashcard(self, card: Dict[str, Any], card_num: int) -> bool:
         """Validate a single flashcard has all required fields."""
@@ -0,0 +1,252 @@
+"""
+Incremental JSON parsing of LLM responses.
+
+Generators ask the model for a JSON array of objects (flashcards, quiz
+questions, diagram updates) or an object wrapping such an array
+(`{"questions": [...]}`). JSONObjectStream consumes the response as it
+streams in and emits each array element as soon as its closing brace
+arrives, so callers can validate and save items before the completion ends,
+and a truncated response still yields every complete item.
+
+The scanner only looks at brackets, quotes and backslashes (found with a
+regex, not a per-character Python loop) and keeps just the text of the item
+currently open, so parsing is linear in the response length.
+"""
+
+import json
+import re
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Optional, Tuple
+
+_SPECIAL_RE = re.compile(r'[\[\]{}"\\]')
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+
+
+def _load_object(text: str) -> Optional[Dict[str, Any]]:
+    """json.loads one object, retrying once with trailing commas removed."""
+    for candidate in (text, None):
+        if candidate is None:
+            candidate = _TRAILING_COMMA_RE.sub(r'\1', text)
+            if candidate == text:
+                return None
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+
+class JSONObjectStream:
+    """
+    Emits the objects of a streamed JSON array one at a time.
+
+    Items are the objects directly inside the first array of objects in the
+    response, whether it is top level (`[{...}, ...]`) or wrapped
+    (`{"questions": [{...}, ...]}`). Text before the first bracket (prose,
+    code fences) is ignored. If the response has no such array, each
+    top-level object is emitted instead.
+    """
+
+    def __init__(
+        self,
+        validate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """
+        Args:
+            validate: Called on each parsed object; objects it rejects are dropped
+                (it may also normalize the object in place)
+            on_item: Called with each accepted object as soon as it is complete
+        """
+        self.validate = validate
+        self.on_item = on_item
+        self.items: List[Dict[str, Any]] = []
+        self.rejected = 0   # Parsed objects that failed validation
+        self.malformed = 0  # Complete objects that were not valid JSON
+
+        self._buf = ""
+        self._pos = 0               # Next index in _buf to scan
+        self._escaped = -1          # Index in _buf escaped by a preceding backslash
+        self._in_string = False
+        self._stack: List[str] = []
+        self._items_depth: Optional[int] = None  # Stack depth of the item array
+        self._items_locked = False               # An item array has produced objects
+        self._item_start = -1       # Start of the open item in _buf
+        self._top_start = -1        # Start of the open top-level value in _buf
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the text fed so far ends inside an unfinished JSON value."""
+        return bool(self._stack)
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Consume the next piece of the response.
+
+        Returns:
+            Objects completed (and accepted) by this piece
+        """
+        if not text:
+            return []
+        self._buf += text
+        buf = self._buf
+        emitted: List[Dict[str, Any]] = []
+
+        for match in _SPECIAL_RE.finditer(buf, self._pos):
+            i = match.start()
+            ch = buf[i]
+            if self._in_string:
+                if i == self._escaped:
+                    continue
+                if ch == '\\':
+                    self._escaped = i + 1
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if not self._stack:
+                if ch not in '[{':
+                    continue  # Prose or code fences around the JSON
+                self._top_start = i
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '[{':
+                self._stack.append(ch)
+                depth = len(self._stack)
+                if ch == '[' and self._items_depth is None:
+                    self._items_depth = depth
+                elif ch == '{' and self._items_depth is not None and depth == self._items_depth + 1:
+                    self._item_start = i
+            elif ch in ']}':
+                if not self._stack:
+                    continue
+                depth = len(self._stack)
+                self._stack.pop()
+                if ch == '}' and self._item_start >= 0 and depth == (self._items_depth or 0) + 1:
+                    self._emit(buf[self._item_start:i + 1], emitted)
+                    self._item_start = -1
+                elif ch == ']' and depth == self._items_depth:
+                    # An array without objects (e.g. tags): keep looking for the item array.
+                    # Once the item array has closed, later arrays are not items.
+                    self._items_depth = -1 if self._items_locked else None
+                elif not self._stack and ch == '}' and self._items_depth is None:
+                    self._emit(buf[self._top_start:i + 1], emitted)
+                if not self._stack:
+                    self._top_start = -1
+                    if not self._items_locked:
+                        self._items_depth = None
+
+        self._compact()
+        return emitted
+
+    def _compact(self):
+        """Drop text that can no longer be part of an emitted object."""
+        if self._top_start >= 0 and not self._items_locked:
+            keep = self._top_start  # May still be emitted as a top-level object
+        elif self._item_start >= 0:
+            keep = self._item_start
+        else:
+            keep = len(self._buf)
+        self._pos = len(self._buf) - keep
+        if keep <= 0:
+            return
+        self._buf = self._buf[keep:]
+        self._escaped -= keep
+        if self._item_start >= 0:
+            self._item_start -= keep
+        self._top_start = self._top_start - keep if self._top_start >= keep else -1
+
+    def _emit(self, text: str, emitted: List[Dict[str, Any]]):
+        obj = _load_object(text)
+        if obj is None:
+            self.malformed += 1
+            return
+        if self._items_depth is not None:
+            self._items_locked = True
+        if self.validate is not None and not self.validate(obj):
+            self.rejected += 1
+            return
+        self.items.append(obj)
+        emitted.append(obj)
+        if self.on_item is not None:
+            self.on_item(obj)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish the stream (an unfinished trailing item is dropped).
+
+        Returns:
+            All accepted objects
+        """
+        if self.truncated and self.items:
+            print(f"   ✂️  Response was truncated; kept {len(self.items)} complete item(s)")
+        self._buf = ""
+        self._pos = 0
+        self._item_start = -1
+        return self.items
+
+
+def parse_json_items(
+    text: str,
+    validate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Parse every complete item of a (possibly fenced, wrapped or truncated) JSON response.
+
+    Args:
+        text: Full response text
+        validate: Optional per-item validator (see JSONObjectStream)
+
+    Returns:
+        Accepted items in order
+    """
+    stream = JSONObjectStream(validate=validate)
+    stream.feed(text)
+    return stream.close()
+
+
+def _interrupted(stream: JSONObjectStream, error: Exception) -> bool:
+    """Whether to keep the items already parsed from a stream that failed part-way."""
+    if not stream.items:
+        return False
+    print(f"   ⚠️  Stream interrupted ({type(error).__name__}: {error}); "
+          f"keeping {len(stream.items)} complete item(s)")
+    return True
+
+
+def collect_items(chunks: Iterable[str], stream: JSONObjectStream) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Feed streamed text chunks into a JSONObjectStream until the stream ends.
+
+    A stream that fails after yielding complete items is treated like a
+    truncated response; one that fails before any item re-raises.
+
+    Returns:
+        (accepted items, raw response text)
+    """
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            stream.feed(chunk)
+    except Exception as e:
+        if not _interrupted(stream, e):
+            raise
+    return stream.close(), "".join(parts)
+
+
+async def collect_items_async(
+    chunks: AsyncIterable[str],
+    stream: JSONObjectStream,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """Async variant of collect_items."""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            stream.feed(chunk)
+    except Exception as e:
+        if not _interrupted(stream, e):
+            raise
+    return stream.close(), "".join(parts)
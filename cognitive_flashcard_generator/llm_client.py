@@ -1,10 +1,28 @@
 """
 Provider-agnostic LLM client used by flashcard and quiz generators.
+
+Every call goes through the provider's shared rate limiter (see
+rate_limiter.py) and is retried with jittered backoff on 429s and transient
+errors. Responses are served from and stored in the persistent response cache
+(see response_cache.py) unless a call opts out; only completions the provider
+reports as finished normally are cached, never ones cut off at max_tokens or
+stopped by a safety filter. `generate_text_async` uses the providers' native
+async APIs so batch generation does not tie up a thread per in-flight request.
+`stream_text` and `stream_text_async` yield the completion as it is produced,
+for incremental parsing (see json_stream.py).
 """
 
 from __future__ import annotations
 
-from typing import Optional
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from cognitive_flashcard_generator.rate_limiter import (
+    call_with_backoff,
+    call_with_backoff_async,
+    estimate_tokens,
+)
+from cognitive_flashcard_generator.response_cache import cache_key, gemini_completed, get_response_cache
 
 
 class LLMClient:
@@ -26,6 +44,8 @@ class LLMClient:
         self._gemini_api_key = gemini_api_key
 
         self._openai_client = None
+        self._async_openai_client = None
+        self._async_openai_loop = None
         self._gemini_model = None
 
     def generate_text(
@@ -35,29 +55,222 @@ class LLMClient:
         max_tokens: int,
         temperature: float = 0.7,
         model: Optional[str] = None,
+        prompt_version: str = "",
+        use_cache: bool = True,
     ) -> str:
         """
         Generate text from the configured provider.
+
+        `prompt_version` tags the prompt template in the cache key; pass
+        `use_cache=False` to always call the provider.
         """
         target_model = model or self.model
 
         if self.provider == "openai":
-            return self._generate_openai(
+            generate = self._generate_openai
+        elif self.provider == "gemini":
+            generate = self._generate_gemini
+        else:
+            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+
+        cache, key = self._cache_lookup(use_cache, prompt, target_model, temperature, max_tokens, prompt_version)
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        text, completed = call_with_backoff(
+            self.provider,
+            lambda: generate(
                 prompt,
                 max_tokens=max_tokens,
                 temperature=temperature,
                 model=target_model,
-            )
+            ),
+            estimated_tokens=estimate_tokens(self.provider, len(prompt), max_tokens),
+        )
+        if key is not None and text and completed:
+            cache.put(key, text)
+        return text
+
+    async def generate_text_async(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        prompt_version: str = "",
+        use_cache: bool = True,
+    ) -> str:
+        """
+        Async variant of generate_text using the providers' native async clients.
+        """
+        target_model = model or self.model
+
+        if self.provider == "openai":
+            generate = self._generate_openai_async
         elif self.provider == "gemini":
-            return self._generate_gemini(
+            generate = self._generate_gemini_async
+        else:
+            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+
+        cache, key = self._cache_lookup(use_cache, prompt, target_model, temperature, max_tokens, prompt_version)
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        text, completed = await call_with_backoff_async(
+            self.provider,
+            lambda: generate(
                 prompt,
                 max_tokens=max_tokens,
                 temperature=temperature,
                 model=target_model,
-            )
+            ),
+            estimated_tokens=estimate_tokens(self.provider, len(prompt), max_tokens),
+        )
+        if key is not None and text and completed:
+            cache.put(key, text)
+        return text
+
+    def stream_text(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        prompt_version: str = "",
+        use_cache: bool = True,
+    ) -> Iterator[str]:
+        """
+        Stream generated text in chunks as the provider produces it.
+
+        A cached response is yielded as a single chunk. Errors opening the
+        stream are retried like generate_text; an error mid-stream propagates
+        to the caller. The full text is cached only once the stream completes
+        and the provider reports a normal finish.
+        """
+        target_model = model or self.model
+
+        if self.provider == "openai":
+            open_stream = self._stream_openai
+        elif self.provider == "gemini":
+            open_stream = self._stream_gemini
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
 
+        cache, key = self._cache_lookup(use_cache, prompt, target_model, temperature, max_tokens, prompt_version)
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        finish: Dict[str, bool] = {}
+        chunks = call_with_backoff(
+            self.provider,
+            lambda: open_stream(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                model=target_model,
+                finish=finish,
+            ),
+            estimated_tokens=estimate_tokens(self.provider, len(prompt), max_tokens),
+        )
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+
+        text = "".join(parts).strip()
+        if key is not None and text and finish.get("completed"):
+            cache.put(key, text)
+
+    async def stream_text_async(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        prompt_version: str = "",
+        use_cache: bool = True,
+    ) -> AsyncIterator[str]:
+        """
+        Async variant of stream_text.
+        """
+        target_model = model or self.model
+
+        if self.provider == "openai":
+            open_stream = self._stream_openai_async
+        elif self.provider == "gemini":
+            open_stream = self._stream_gemini_async
+        else:
+            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+
+        cache, key = self._cache_lookup(use_cache, prompt, target_model, temperature, max_tokens, prompt_version)
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        finish: Dict[str, bool] = {}
+        chunks = await call_with_backoff_async(
+            self.provider,
+            lambda: open_stream(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                model=target_model,
+                finish=finish,
+            ),
+            estimated_tokens=estimate_tokens(self.provider, len(prompt), max_tokens),
+        )
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+
+        text = "".join(parts).strip()
+        if key is not None and text and finish.get("completed"):
+            cache.put(key, text)
+
+    def forget(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        prompt_version: str = "",
+    ) -> None:
+        """
+        Drop a cached response, e.g. one the caller could not parse, so a
+        rerun asks the provider again instead of replaying it.
+        """
+        cache, key = self._cache_lookup(True, prompt, model or self.model, temperature, max_tokens, prompt_version)
+        if key is not None:
+            cache.delete(key)
+
+    def _cache_lookup(self, use_cache, prompt, model, temperature, max_tokens, prompt_version):
+        cache = get_response_cache() if use_cache else None
+        if cache is None:
+            return None, None
+        key = cache_key(
+            self.provider,
+            model,
+            prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            prompt_version=prompt_version,
+        )
+        return cache, key
+
     # ------------------------------------------------------------------
     # OpenAI
     # ------------------------------------------------------------------
@@ -73,9 +286,29 @@ class LLMClient:
             if not self._openai_api_key:
                 raise ValueError("OPENAI_API_KEY is not configured.")
 
-            self._openai_client = OpenAI(api_key=self._openai_api_key)
+            # Retries are handled by call_with_backoff so 429s reach the shared limiter
+            self._openai_client = OpenAI(api_key=self._openai_api_key, max_retries=0)
         return self._openai_client
 
+    def _ensure_async_openai_client(self):
+        # The async client's connection pool is bound to the event loop that
+        # created it, so it is reused within a loop and rebuilt for a new one.
+        loop = asyncio.get_running_loop()
+        if self._async_openai_client is None or self._async_openai_loop is not loop:
+            try:
+                from openai import AsyncOpenAI
+            except ImportError as exc:
+                raise ImportError(
+                    "openai package not installed. Please run `pip install openai`."
+                ) from exc
+
+            if not self._openai_api_key:
+                raise ValueError("OPENAI_API_KEY is not configured.")
+
+            self._async_openai_client = AsyncOpenAI(api_key=self._openai_api_key, max_retries=0)
+            self._async_openai_loop = loop
+        return self._async_openai_client
+
     def _generate_openai(
         self,
         prompt: str,
@@ -83,7 +316,7 @@ class LLMClient:
         max_tokens: int,
         temperature: float,
         model: str,
-    ) -> str:
+    ) -> Tuple[str, bool]:
         client = self._ensure_openai_client()
         # Use the Responses API for modern models like gpt-5.1
         response = client.responses.create(
@@ -92,7 +325,94 @@ class LLMClient:
             temperature=temperature,
             max_output_tokens=max_tokens,
         )
+        return self._openai_response_text(response), self._openai_completed(response)
+
+    async def _generate_openai_async(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        model: str,
+    ) -> Tuple[str, bool]:
+        client = self._ensure_async_openai_client()
+        response = await client.responses.create(
+            model=model,
+            input=prompt,
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+        )
+        return self._openai_response_text(response), self._openai_completed(response)
+
+    def _stream_openai(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        model: str,
+        finish: Dict[str, bool],
+    ) -> Iterator[str]:
+        client = self._ensure_openai_client()
+        # The request is sent here, so connection errors and 429s reach call_with_backoff
+        events = client.responses.create(
+            model=model,
+            input=prompt,
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+            stream=True,
+        )
+
+        def deltas():
+            for event in events:
+                delta = self._openai_event_delta(event, finish)
+                if delta:
+                    yield delta
+
+        return deltas()
+
+    async def _stream_openai_async(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        model: str,
+        finish: Dict[str, bool],
+    ) -> AsyncIterator[str]:
+        client = self._ensure_async_openai_client()
+        events = await client.responses.create(
+            model=model,
+            input=prompt,
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+            stream=True,
+        )
+
+        async def deltas():
+            async for event in events:
+                delta = self._openai_event_delta(event, finish)
+                if delta:
+                    yield delta
 
+        return deltas()
+
+    @staticmethod
+    def _openai_completed(response) -> bool:
+        # "incomplete" means the output was cut off (max_output_tokens, content filter)
+        return getattr(response, "status", None) == "completed"
+
+    @classmethod
+    def _openai_event_delta(cls, event, finish: Dict[str, bool]) -> str:
+        event_type = getattr(event, "type", "")
+        if event_type == "response.output_text.delta":
+            return event.delta
+        if event_type == "response.completed":
+            finish["completed"] = cls._openai_completed(event.response)
+        return ""
+
+    @staticmethod
+    def _openai_response_text(response) -> str:
         # Prefer the convenience helper when available
         text = getattr(response, "output_text", None)
         if text:
@@ -134,7 +454,7 @@ class LLMClient:
         max_tokens: int,
         temperature: float,
         model: str,
-    ) -> str:
+    ) -> Tuple[str, bool]:
         gemini_model = self._ensure_gemini_model(model)
         response = gemini_model.generate_content(
             prompt,
@@ -144,5 +464,91 @@ class LLMClient:
             },
         )
         text = getattr(response, "text", "") or ""
-        return text.strip()
+        return text.strip(), self._gemini_completed(response)
+
+    async def _generate_gemini_async(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        model: str,
+    ) -> Tuple[str, bool]:
+        gemini_model = self._ensure_gemini_model(model)
+        response = await gemini_model.generate_content_async(
+            prompt,
+            generation_config={
+                "max_output_tokens": max_tokens,
+                "temperature": temperature,
+            },
+        )
+        text = getattr(response, "text", "") or ""
+        return text.strip(), self._gemini_completed(response)
+
+    def _stream_gemini(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        model: str,
+        finish: Dict[str, bool],
+    ) -> Iterator[str]:
+        gemini_model = self._ensure_gemini_model(model)
+        response = gemini_model.generate_content(
+            prompt,
+            generation_config={
+                "max_output_tokens": max_tokens,
+                "temperature": temperature,
+            },
+            stream=True,
+        )
+
+        def texts():
+            for chunk in response:
+                text = self._gemini_chunk_text(chunk, finish)
+                if text:
+                    yield text
+
+        return texts()
+
+    async def _stream_gemini_async(
+        self,
+        prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        model: str,
+        finish: Dict[str, bool],
+    ) -> AsyncIterator[str]:
+        gemini_model = self._ensure_gemini_model(model)
+        response = await gemini_model.generate_content_async(
+            prompt,
+            generation_config={
+                "max_output_tokens": max_tokens,
+                "temperature": temperature,
+            },
+            stream=True,
+        )
+
+        async def texts():
+            async for chunk in response:
+                text = self._gemini_chunk_text(chunk, finish)
+                if text:
+                    yield text
+
+        return texts()
+
+    _gemini_completed = staticmethod(gemini_completed)
 
+    @classmethod
+    def _gemini_chunk_text(cls, chunk, finish: Dict[str, bool]) -> str:
+        # The finish reason arrives on the last chunk
+        candidates = getattr(chunk, "candidates", None) or []
+        if candidates and getattr(candidates[0], "finish_reason", None):
+            finish["completed"] = cls._gemini_completed(chunk)
+        # .text raises on chunks without text parts (e.g. the final safety/finish chunk)
+        try:
+            return chunk.text or ""
+        except ValueError:
+            return ""
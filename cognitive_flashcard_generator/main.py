@@ -33,7 +33,7 @@ Usage:
 import sys
 import json
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Optional
 from datetime import datetime
 
 from config import Config
@@ -42,8 +42,11 @@ from .llm_client import LLMClient
 from .quiz_generator import QuizGenerator
 from .async_generator import AsyncCognitiveFlashcardGenerator
 from .async_quiz_generator import AsyncQuizGenerator
-from .batch_coordinator import run_batch_generation
+from .batch_coordinator import run_streaming_generation
+from .chunking import describe_chunk, pack_chunks
+from .output_writer import write_course_json
 from .renderer import DiagramRenderer
+from .split_retry import coverage_report, format_coverage, missing_flashcards
 from .utils import load_courses, get_course_by_id
 
 
@@ -74,8 +77,8 @@ def save_flashcards_json(flashcards, metadata, output_path):
         'flashcards': flashcards
     }
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # Atomic write: the backend may be serving this file right now
+    write_course_json(output_path, data)
     
     print(f"💾 Saved JSON: {output_path}")
 
@@ -87,95 +90,59 @@ def save_quiz_json(questions, metadata, output_path):
         'questions': questions
     }
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_course_json(output_path, data)
     
     print(f"💾 Saved Quiz JSON: {output_path}")
 
-# ==============================================================================
-# NEW HELPER FUNCTION FOR CHUNKING
-# ==============================================================================
 
-def chunk_content(content: str, max_chunk_size: int = 6000, overlap: int = 300) -> List[str]:
+def render_flashcard_diagrams(flashcards, diagrams_dir: Path, lecture_name: str, has_mermaid: bool) -> int:
     """
-    Splits the large content string into smaller chunks with an overlap, respecting slide boundaries.
+    Render each flashcard's Mermaid diagrams to PNG and record their paths.
+    
+    Sets card['diagram_image_paths'] (relative to the lecture directory, "" when not rendered).
     
     Args:
-        content: The full text content.
-        max_chunk_size: Maximum size of a chunk.
-        overlap: Overlap size to provide context to the next chunk.
+        flashcards: Flashcards of one lecture
+        diagrams_dir: Output directory for the PNG files
+        lecture_name: Lecture name (fallback for card file names)
+        has_mermaid: Whether Mermaid rendering is available
         
     Returns:
-        A list of content strings (chunks).
+        Number of diagrams rendered
     """
-    chunks = []
-    current_position = 0
-    total_length = len(content)
-    
-    # Find all slide boundaries (marked by "SLIDE X" patterns)
-    slide_boundaries = []
-    import re
-    slide_pattern = re.compile(r'\n={60}\nSLIDE \d+\n={60}\n')
-    for match in slide_pattern.finditer(content):
-        slide_boundaries.append(match.start())
-    
-    while current_position < total_length:
-        # Determine the end of the chunk (max size from current position)
-        end_position = min(current_position + max_chunk_size, total_length)
-        
-        # If this is not the last chunk, find a good break point
-        if end_position < total_length:
-            # First, try to break at a slide boundary
-            suitable_slide_boundary = None
-            for boundary in slide_boundaries:
-                if current_position < boundary <= end_position:
-                    # Check if breaking here would leave a reasonable chunk size
-                    if (boundary - current_position) >= max_chunk_size * 0.3:  # At least 30% of max size
-                        suitable_slide_boundary = boundary
-                        break
+    render_jobs = []
+    render_targets = []
+
+    for i, card in enumerate(flashcards, 1):
+        # Assign a unique card ID for the filename
+        card_id = card.get('source_chunk', lecture_name).replace('/', '_').replace('-', '_')
+        
+        # Initialize diagram image paths object
+        card['diagram_image_paths'] = {}
+        
+        # Process each diagram type
+        mermaid_diagrams = card.get('mermaid_diagrams', {})
+        diagram_types = ['concise', 'analogy', 'eli5', 'real_world_use_case', 'common_mistakes', 'example']
+        
+        for diagram_type in diagram_types:
+            mermaid_code = mermaid_diagrams.get(diagram_type, '').strip()
             
-            if suitable_slide_boundary:
-                chunk_end = suitable_slide_boundary
-            else:
-                # Fall back to looking for paragraph breaks
-                break_point = content.rfind('\n\n', current_position, end_position)
-                
-                # If a clean break is found, use it, otherwise stick to max size
-                if break_point != -1 and (end_position - break_point) < 1000:
-                    chunk_end = break_point
-                else:
-                    chunk_end = end_position
-        else:
-            # Last chunk
-            chunk_end = end_position
+            if mermaid_code and has_mermaid:
+                diagram_filename = f"{card_id}_card_{i:03d}_{diagram_type}.png"
+                diagram_path = diagrams_dir / diagram_filename
+                render_jobs.append(("mermaid", mermaid_code, str(diagram_path)))
+                render_targets.append((i, card, diagram_type, diagram_filename))
 
-        chunk = content[current_position:chunk_end]
-        chunks.append(chunk)
+            card['diagram_image_paths'][diagram_type] = ""
 
-        # Set up for the next chunk with an overlap
-        if chunk_end < total_length:
-            # If we broke at a slide boundary, start the next chunk there (no overlap needed)
-            if chunk_end in slide_boundaries:
-                current_position = chunk_end
-            else:
-                # Move back by overlap amount for the next start
-                next_start_potential = max(0, chunk_end - overlap)
-                
-                # Find a clean starting point near the overlap point
-                clean_start_point = content.find('\n\n', next_start_potential)
-                
-                if clean_start_point != -1 and clean_start_point < chunk_end:
-                     current_position = clean_start_point + 2 # Start after the newlines
-                else:
-                     current_position = next_start_potential
+    rendered_count = 0
+    for ok, (i, card, diagram_type, diagram_filename) in zip(DiagramRenderer.render_many(render_jobs), render_targets):
+        if ok:
+            card['diagram_image_paths'][diagram_type] = f"diagrams/{diagram_filename}"
+            rendered_count += 1
         else:
-            current_position = total_length # End loop
-            
-    return chunks
-
-# ==============================================================================
-# END NEW HELPER FUNCTION FOR CHUNKING
-# ==============================================================================
+            print(f"  ⚠️  Failed to render {diagram_type} diagram for card {i}")
+    return rendered_count
 
 
 def extract_content_from_structured_json(json_path: Path) -> str:
@@ -385,19 +352,19 @@ def process_course_flashcards(course: Dict[str, Any], slide_analysis_prefix: Opt
         # ======================================================================
         # CHUNKING AND ITERATIVE GENERATION LOGIC (MODIFIED)
         # ======================================================================
-        content_chunks = chunk_content(content, max_chunk_size=6000, overlap=300)
+        content_chunks = pack_chunks(content, Config.SLIDE_CHUNK_MAX_TOKENS)
         print(f"📦 Splitting content into {len(content_chunks)} manageable chunk(s)")
-        print(f"   📊 Reduced chunk size to 6000 characters to prevent token limit issues")
+        print(f"   📊 Packing whole slides up to {Config.SLIDE_CHUNK_MAX_TOKENS:,} tokens per chunk")
         
         all_flashcards = []
         
         # Iterate over chunks and generate flashcards for each
-        for i, chunk in enumerate(content_chunks, 1):
+        for i, manifest in enumerate(content_chunks, 1):
+            chunk = manifest['text']
             chunk_info = f"Chunk {i}/{len(content_chunks)}"
             
             print(f"\n📦 Processing {chunk_info}")
-            print(f"   📊 Chunk size: {len(chunk):,} characters")
-            print(f"   📊 Estimated tokens: ~{len(chunk) // 4:,}")
+            print(f"   📊 {describe_chunk(manifest)}")
             
             # Generate flashcards for the current chunk
             chunk_flashcards = generator.generate_flashcards(
@@ -441,37 +408,9 @@ def process_course_flashcards(course: Dict[str, Any], slide_analysis_prefix: Opt
         diagrams_dir = lecture_output_dir / "diagrams"
         diagrams_dir.mkdir(exist_ok=True)
         
-        # Render diagrams
+        # Render diagrams (collected first, then rendered concurrently by the warm render pool)
         print(f"\n🎨 Rendering diagrams...")
-        rendered_count = 0
-        
-        for i, card in enumerate(flashcards, 1):
-            # Assign a unique card ID for the filename
-            card_id = card.get('source_chunk', lecture_name).replace('/', '_').replace('-', '_')
-            
-            # Initialize diagram image paths object
-            card['diagram_image_paths'] = {}
-            
-            # Process each diagram type
-            mermaid_diagrams = card.get('mermaid_diagrams', {})
-            diagram_types = ['concise', 'analogy', 'eli5', 'real_world_use_case', 'common_mistakes', 'example']
-            
-            for diagram_type in diagram_types:
-                mermaid_code = mermaid_diagrams.get(diagram_type, '').strip()
-                
-                if mermaid_code and has_mermaid:
-                    diagram_filename = f"{card_id}_card_{i:03d}_{diagram_type}.png"
-                    diagram_path = diagrams_dir / diagram_filename
-                    
-                    if DiagramRenderer.render_diagram(mermaid_code, str(diagram_path)):
-                        card['diagram_image_paths'][diagram_type] = f"diagrams/{diagram_filename}"
-                        rendered_count += 1
-                    else:
-                        card['diagram_image_paths'][diagram_type] = ""
-                        print(f"  ⚠️  Failed to render {diagram_type} diagram for card {i}")
-                else:
-                    card['diagram_image_paths'][diagram_type] = ""
-        
+        rendered_count = render_flashcard_diagrams(flashcards, diagrams_dir, lecture_name, has_mermaid)
         if rendered_count > 0:
             print(f"✅ Rendered {rendered_count} Mermaid diagrams")
         
@@ -657,6 +596,20 @@ def process_course_quizzes(course: Dict[str, Any], slide_analysis_prefix: Option
                 else:
                     print(f"   ⚠️  No questions generated from {chunk_info}")
             
+            # Re-queue, once, exactly the flashcards that produced no questions
+            coverage = coverage_report(simplified_flashcards, all_questions)
+            retry_cards = missing_flashcards(simplified_flashcards, coverage)
+            if retry_cards:
+                print(f"\n🔁 Re-queueing {len(retry_cards)} flashcard(s) with no Level {level} questions")
+                for chunk_idx in range(0, len(retry_cards), chunk_size):
+                    all_questions.extend(quiz_generator.generate_quiz_questions(
+                        retry_cards[chunk_idx:chunk_idx + chunk_size],
+                        level=level,
+                        chunk_info=f"Re-queue {chunk_idx // chunk_size + 1}"
+                    ))
+                coverage = coverage_report(simplified_flashcards, all_questions)
+            print(f"📊 Level {level} coverage: {format_coverage(coverage)}")
+            
             if not all_questions:
                 print(f"⚠️  No Level {level} questions generated for {lecture_name}")
                 continue
@@ -764,15 +717,19 @@ def process_course_batch(course: Dict[str, Any], slide_analysis_prefix: Optional
         llm_client=async_quiz_llm,
     )
     
+    # Check if Mermaid rendering is available (diagrams are rendered as each lecture's flashcards arrive)
+    has_mermaid = DiagramRenderer.check_mermaid_cli()
+    if not has_mermaid:
+        print(f"⚠️  Mermaid CLI not found - Diagrams will be saved as code only")
+    
     # ==============================================================================
-    # PHASE 1: COLLECT ALL FLASHCARD GENERATION TASKS
+    # PHASE 1: COLLECT FLASHCARD GENERATION TASKS PER LECTURE
     # ==============================================================================
     print(f"\n{'~'*80}")
     print(f"📋 PHASE 1: Collecting flashcard generation tasks...")
     print(f"{'~'*80}\n")
     
-    flashcard_tasks = []
-    task_metadata = []  # Store metadata for each task
+    lectures = []
     
     for structured_analysis_path in structured_analysis_files:
         lecture_name = structured_analysis_path.stem.replace("_structured_analysis", "")
@@ -785,74 +742,44 @@ def process_course_batch(course: Dict[str, Any], slide_analysis_prefix: Optional
             continue
         
         # Chunk the content
-        content_chunks = chunk_content(content, max_chunk_size=6000, overlap=300)
-        print(f"📦 {lecture_name}: {len(content_chunks)} chunk(s)")
+        content_chunks = pack_chunks(content, Config.SLIDE_CHUNK_MAX_TOKENS)
+        print(f"📦 {lecture_name}: {len(content_chunks)} chunk(s), "
+              f"~{sum(chunk['tokens'] for chunk in content_chunks):,} tokens")
         
         # Create tasks for each chunk
-        for i, chunk in enumerate(content_chunks, 1):
-            task_id = f"{lecture_name}_chunk_{i}"
-            chunk_info = f"Chunk {i}/{len(content_chunks)}"
-            
+        flashcard_tasks = []
+        for i, manifest in enumerate(content_chunks, 1):
             flashcard_tasks.append({
-                'content': chunk,
+                'content': manifest['text'],
                 'source_name': lecture_name,
-                'chunk_info': chunk_info,
-                'task_id': task_id
-            })
-            
-            task_metadata.append({
-                'lecture_name': lecture_name,
+                'chunk_info': f"Chunk {i}/{len(content_chunks)}",
+                'task_id': f"{lecture_name}_chunk_{i}",
                 'chunk_index': i,
-                'total_chunks': len(content_chunks)
+                'manifest': manifest
             })
-    
-    print(f"\n✅ Collected {len(flashcard_tasks)} flashcard generation tasks")
-    
-    # ==============================================================================
-    # PHASE 2: EXECUTE FLASHCARD GENERATION IN BATCH
-    # ==============================================================================
-    print(f"\n{'~'*80}")
-    print(f"⚡ PHASE 2: Executing flashcard generation batch...")
-    print(f"{'~'*80}\n")
-    
-    # Run batch generation (no quiz tasks yet, so pass empty list)
-    flashcard_results, _ = run_batch_generation(
-        flashcard_generator,
-        quiz_generator,
-        flashcard_tasks,
-        [],  # No quiz tasks yet
-        max_concurrent=Config.MAX_CONCURRENT_REQUESTS
-    )
-    
-    # ==============================================================================
-    # PHASE 3: ORGANIZE AND SAVE FLASHCARD RESULTS
-    # ==============================================================================
-    print(f"\n{'~'*80}")
-    print(f"💾 PHASE 3: Organizing and saving flashcards...")
-    print(f"{'~'*80}\n")
-    
-    # Group results by lecture
-    lecture_flashcards = {}
-    for result, meta in zip(flashcard_results, task_metadata):
-        lecture_name = meta['lecture_name']
-        
-        if lecture_name not in lecture_flashcards:
-            lecture_flashcards[lecture_name] = []
         
-        if result['success']:
-            # Add source_chunk to each flashcard
-            for card in result['flashcards']:
-                card['source_chunk'] = f"{lecture_name}_{meta['chunk_index']}"
-            
-            lecture_flashcards[lecture_name].extend(result['flashcards'])
+        lectures.append({'lecture_name': lecture_name, 'flashcard_tasks': flashcard_tasks})
     
-    # Save flashcards for each lecture
-    flashcards_base.mkdir(exist_ok=True)
+    print(f"\n✅ Collected {sum(len(lecture['flashcard_tasks']) for lecture in lectures)} flashcard generation tasks")
     
-    for lecture_name, flashcards in lecture_flashcards.items():
+    flashcards_base.mkdir(exist_ok=True)
+    quiz_output_dir.mkdir(exist_ok=True)
+    tasks_by_lecture = {lecture['lecture_name']: lecture['flashcard_tasks'] for lecture in lectures}
+    flashcard_counts = {}
+    
+    def finish_flashcards(lecture_name: str, results):
+        """Assemble, render and save one lecture's flashcards (runs as soon as its chunks are done)."""
+        flashcards = []
+        for task, result in zip(tasks_by_lecture[lecture_name], results):
+            if result['success']:
+                # Add source_chunk to each flashcard
+                for card in result['flashcards']:
+                    card['source_chunk'] = f"{lecture_name}_{task['chunk_index']}"
+                flashcards.extend(result['flashcards'])
+        
         if not flashcards:
             print(f"⚠️  No flashcards for {lecture_name}")
-            continue
+            return []
         
         # Add unique flashcard_id
         for idx, card in enumerate(flashcards, 1):
@@ -861,6 +788,10 @@ def process_course_batch(course: Dict[str, Any], slide_analysis_prefix: Optional
         # Create lecture output directory
         lecture_output_dir = flashcards_base / lecture_name
         lecture_output_dir.mkdir(exist_ok=True)
+        diagrams_dir = lecture_output_dir / "diagrams"
+        diagrams_dir.mkdir(exist_ok=True)
+        
+        rendered_count = render_flashcard_diagrams(flashcards, diagrams_dir, lecture_name, has_mermaid)
         
         # Prepare metadata
         metadata = {
@@ -871,31 +802,19 @@ def process_course_batch(course: Dict[str, Any], slide_analysis_prefix: Optional
             'course_code': course_code,
             'textbook_reference': textbook_reference,
             'source': lecture_name,
-            'chunks_processed': max(meta['chunk_index'] for meta in task_metadata if meta['lecture_name'] == lecture_name)
+            'chunks_processed': len(tasks_by_lecture[lecture_name])
         }
         
         # Save JSON
         output_path = lecture_output_dir / f"{lecture_name}_cognitive_flashcards_only.json"
         save_flashcards_json(flashcards, metadata, str(output_path))
         
-        print(f"✅ {lecture_name}: {len(flashcards)} flashcards saved")
+        flashcard_counts[lecture_name] = len(flashcards)
+        print(f"✅ {lecture_name}: {len(flashcards)} flashcards saved ({rendered_count} diagrams rendered)")
+        return flashcards
     
-    # ==============================================================================
-    # PHASE 4: COLLECT ALL QUIZ GENERATION TASKS
-    # ==============================================================================
-    print(f"\n{'~'*80}")
-    print(f"📋 PHASE 4: Collecting quiz generation tasks...")
-    print(f"{'~'*80}\n")
-    
-    quiz_tasks = []
-    quiz_metadata = []
-    
-    quiz_output_dir.mkdir(exist_ok=True)
-    
-    for lecture_name, flashcards in lecture_flashcards.items():
-        if not flashcards:
-            continue
-        
+    def quiz_tasks_for(lecture_name: str, flashcards):
+        """Quiz tasks (4 flashcards per chunk, levels 1-4) for a lecture's saved flashcards."""
         # Simplify flashcards for quiz generation
         simplified_flashcards = []
         for card in flashcards:
@@ -916,76 +835,27 @@ def process_course_batch(course: Dict[str, Any], slide_analysis_prefix: Optional
         
         print(f"📦 {lecture_name}: {len(flashcard_chunks)} quiz chunk(s) across 4 levels")
         
-        # Create tasks for each level and chunk
+        quiz_tasks = []
         for level in range(1, 5):
             for chunk_idx, chunk in enumerate(flashcard_chunks, 1):
-                task_id = f"{lecture_name}_L{level}_chunk_{chunk_idx}"
-                chunk_info = f"Chunk {chunk_idx}/{len(flashcard_chunks)}"
-                
                 quiz_tasks.append({
                     'flashcards_chunk': chunk,
                     'level': level,
-                    'chunk_info': chunk_info,
-                    'task_id': task_id
+                    'chunk_info': f"Chunk {chunk_idx}/{len(flashcard_chunks)}",
+                    'task_id': f"{lecture_name}_L{level}_chunk_{chunk_idx}"
                 })
-                
-                quiz_metadata.append({
-                    'lecture_name': lecture_name,
-                    'level': level,
-                    'chunk_index': chunk_idx,
-                    'total_chunks': len(flashcard_chunks),
-                    'total_flashcards': len(flashcards)
-                })
-    
-    print(f"\n✅ Collected {len(quiz_tasks)} quiz generation tasks")
-    
-    # ==============================================================================
-    # PHASE 5: EXECUTE QUIZ GENERATION IN BATCH
-    # ==============================================================================
-    print(f"\n{'~'*80}")
-    print(f"⚡ PHASE 5: Executing quiz generation batch...")
-    print(f"{'~'*80}\n")
-    
-    _, quiz_results = run_batch_generation(
-        flashcard_generator,
-        quiz_generator,
-        [],  # No flashcard tasks
-        quiz_tasks,
-        max_concurrent=Config.MAX_CONCURRENT_REQUESTS
-    )
+        return quiz_tasks
     
-    # ==============================================================================
-    # PHASE 6: ORGANIZE AND SAVE QUIZ RESULTS
-    # ==============================================================================
-    print(f"\n{'~'*80}")
-    print(f"💾 PHASE 6: Organizing and saving quizzes...")
-    print(f"{'~'*80}\n")
-    
-    # Group results by lecture and level
-    lecture_level_questions = {}
-    for result, meta in zip(quiz_results, quiz_metadata):
-        lecture_name = meta['lecture_name']
-        level = meta['level']
-        key = (lecture_name, level)
-        
-        if key not in lecture_level_questions:
-            lecture_level_questions[key] = []
+    def finish_quiz_level(lecture_name: str, level: int, results):
+        """Save one lecture's quiz for one level (runs as soon as that level's chunks are done)."""
+        questions = []
+        for result in results:
+            if result['success']:
+                questions.extend(result['questions'])
         
-        if result['success']:
-            lecture_level_questions[key].extend(result['questions'])
-    
-    # Save quizzes for each lecture and level
-    for (lecture_name, level), questions in lecture_level_questions.items():
         if not questions:
             print(f"⚠️  No Level {level} questions for {lecture_name}")
-            continue
-        
-        # Get metadata for this lecture
-        lecture_meta = next((m for m in quiz_metadata 
-                           if m['lecture_name'] == lecture_name and m['level'] == level), None)
-        
-        if not lecture_meta:
-            continue
+            return
         
         # Prepare metadata
         metadata = {
@@ -997,7 +867,7 @@ def process_course_batch(course: Dict[str, Any], slide_analysis_prefix: Optional
             'textbook_reference': textbook_reference,
             'lecture': lecture_name,
             'difficulty_level': level,
-            'source_flashcards': lecture_meta['total_flashcards']
+            'source_flashcards': flashcard_counts.get(lecture_name, 0)
         }
         
         # Save quiz JSON
@@ -1007,14 +877,31 @@ def process_course_batch(course: Dict[str, Any], slide_analysis_prefix: Optional
         
         print(f"✅ {lecture_name} Level {level}: {len(questions)} questions saved")
     
+    # ==============================================================================
+    # PHASE 2: STREAM FLASHCARDS → QUIZZES PER LECTURE
+    # ==============================================================================
+    print(f"\n{'~'*80}")
+    print(f"⚡ PHASE 2: Generating flashcards and quizzes (quizzes start as each lecture finishes)...")
+    print(f"{'~'*80}\n")
+    
+    summaries = run_streaming_generation(
+        flashcard_generator,
+        quiz_generator,
+        lectures,
+        finish_flashcards,
+        quiz_tasks_for,
+        finish_quiz_level,
+        max_concurrent=Config.MAX_CONCURRENT_REQUESTS
+    )
+    
     # Final summary
     print(f"\n{'='*80}")
     print(f"✅ BATCH PROCESSING COMPLETE: {course_name}")
     print(f"{'='*80}")
     print(f"📊 Summary:")
-    print(f"  • Lectures processed: {len(lecture_flashcards)}")
-    print(f"  • Total flashcards: {sum(len(cards) for cards in lecture_flashcards.values())}")
-    print(f"  • Total quiz questions: {sum(len(questions) for questions in lecture_level_questions.values())}")
+    print(f"  • Lectures processed: {len(summaries)}")
+    print(f"  • Total flashcards: {sum(summary['flashcards'] for summary in summaries.values())}")
+    print(f"  • Total quiz questions: {sum(sum(summary['questions'].values()) for summary in summaries.values())}")
     print(f"  • Flashcard output: {flashcards_base}/")
     print(f"  • Quiz output: {quiz_output_dir}/")
     print(f"{'='*80}\n")
@@ -0,0 +1,52 @@
+// Long-lived Mermaid renderer used by render_service.py.
+//
+// Launches one headless browser and renders diagrams sent as JSON lines on
+// stdin: {"id": 1, "code": "graph TD; A-->B", "format": "png", "mermaidConfig": {}}.
+// Each reply is one JSON line on stdout: {"id": 1, "ok": true, "data": "<base64>"}
+// or {"id": 1, "ok": false, "error": "..."}. Prints {"ready": true} once the
+// browser is up. Diagnostics go to stderr.
+//
+// MERMAID_CLI_DIR must point at an installed @mermaid-js/mermaid-cli package
+// (e.g. "$(npm root -g)/@mermaid-js/mermaid-cli").
+
+import { createRequire } from "node:module";
+import { join } from "node:path";
+import { createInterface } from "node:readline";
+import { pathToFileURL } from "node:url";
+
+const cliDir = process.env.MERMAID_CLI_DIR;
+if (!cliDir) {
+  process.stdout.write(JSON.stringify({ ready: false, error: "MERMAID_CLI_DIR is not set" }) + "\n");
+  process.exit(1);
+}
+
+const requireFromCli = createRequire(join(cliDir, "package.json"));
+const { renderMermaid } = await import(pathToFileURL(join(cliDir, "src", "index.js")).href);
+const puppeteer = requireFromCli("puppeteer");
+
+const browser = await puppeteer.launch({ headless: "new", args: ["--no-sandbox"] });
+process.stdout.write(JSON.stringify({ ready: true }) + "\n");
+
+const lines = createInterface({ input: process.stdin });
+for await (const line of lines) {
+  if (!line.trim()) continue;
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (err) {
+    process.stdout.write(JSON.stringify({ id: null, ok: false, error: `bad request: ${err}` }) + "\n");
+    continue;
+  }
+  try {
+    const { data } = await renderMermaid(browser, request.code, request.format || "png", {
+      backgroundColor: request.backgroundColor || "transparent",
+      mermaidConfig: request.mermaidConfig || {},
+    });
+    const payload = Buffer.from(data).toString("base64");
+    process.stdout.write(JSON.stringify({ id: request.id, ok: true, data: payload }) + "\n");
+  } catch (err) {
+    process.stdout.write(JSON.stringify({ id: request.id, ok: false, error: String(err && err.message || err) }) + "\n");
+  }
+}
+
+await browser.close();
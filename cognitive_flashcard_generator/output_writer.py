@@ -0,0 +1,305 @@
+"""
+Crash-safe writer for generated course JSON (flashcards, quizzes, hard questions).
+
+The backend serves these files while they are regenerated, so every write
+goes to a temporary file in the same directory, is fsynced, and is renamed
+over the target: readers see either the old or the new file, never a torn one.
+The renamed file keeps the permissions of the file it replaces (or gets the
+umask default for a new file), not the temp file's private 0600.
+
+Besides the human-readable file (indent from OUTPUT_JSON_INDENT), extra
+encodings can be written to an encoded/ subdirectory next to it
+(OUTPUT_EXTRA_ENCODINGS), where globs such as quiz/*.json don't pick them up:
+
+- "min": compact JSON in encoded/<name>.min.json
+- "gz": gzip-compressed compact JSON in encoded/<name>.json.gz
+- "msgpack": MessagePack in encoded/<name>.msgpack (needs the msgpack package)
+
+Files of an encoding that is no longer configured are deleted on the next write.
+
+Each course directory (courses/<course_id>/) keeps a manifest.json recording
+the content hash, size and version of every file written through here,
+grouped into decks (lectures). The course version and a deck's version only
+change when one of its files actually changes, so a watcher can poll the
+manifest and reload just the decks whose version moved. Rewriting identical
+content is skipped entirely (the files on disk are hashed, so a hand edit is
+still overwritten).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import stat
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+from config import Config
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Subdirectory, next to each file, holding its extra encodings
+ENCODED_DIR = "encoded"
+_ENCODING_SUFFIXES = {"min": ".min.json", "gz": ".json.gz", "msgpack": ".msgpack"}
+
+# Directories inside a course directory that hold generated decks
+_CONTENT_DIRS = ("quiz", "cognitive_flashcards")
+_QUIZ_STEM_RE = re.compile(r'^(?P<deck>.+)_level_\d+(?:_quiz)?$')
+
+_manifest_lock = threading.Lock()
+_warned_encodings = set()
+_umask_lock = threading.Lock()
+_umask: Optional[int] = None
+
+
+def encode_json(data: Any, indent: Optional[int] = None) -> bytes:
+    """UTF-8 JSON; indent 0 or None gives the compact form."""
+    if indent:
+        text = json.dumps(data, indent=indent, ensure_ascii=False)
+    else:
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return text.encode("utf-8")
+
+
+def _new_file_mode() -> int:
+    """Mode a plain open() would give a new file (0666 minus the process umask)."""
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            # The umask can only be read by setting it; do that once
+            _umask = os.umask(0)
+            os.umask(_umask)
+    return 0o666 & ~_umask
+
+
+def write_atomic(path: Path, payload: bytes):
+    """Write payload to path via a fsynced temp file and rename."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = _new_file_mode()
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file 0600, which os.replace would carry over
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _file_sha256(path: Path) -> Optional[str]:
+    """Hex SHA-256 of a file on disk, or None if it cannot be read."""
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def _configured_encodings() -> list:
+    return [name.strip().lower() for name in Config.OUTPUT_EXTRA_ENCODINGS.split(",") if name.strip()]
+
+
+def _encoding_path(path: Path, encoding: str) -> Path:
+    stem = path.name[:-len(".json")] if path.name.endswith(".json") else path.name
+    return path.parent / ENCODED_DIR / (stem + _ENCODING_SUFFIXES[encoding])
+
+
+def _remove_files(paths: Iterable[Path]):
+    """Delete stale encoded files, and the encoded/ directory once it is empty."""
+    for stale_path in paths:
+        try:
+            stale_path.unlink()
+        except FileNotFoundError:
+            continue
+        if stale_path.parent.name == ENCODED_DIR:
+            try:
+                stale_path.parent.rmdir()
+            except OSError:
+                pass  # Still holds other files' encodings
+
+
+def _encode_extra(data: Any, encoding: str) -> Optional[bytes]:
+    """Payload for an extra encoding, or None if it is unknown or unavailable."""
+    if encoding == "min":
+        return encode_json(data)
+    if encoding == "gz":
+        # mtime=0 keeps the bytes (and the manifest hash) stable for identical content
+        return gzip.compress(encode_json(data), mtime=0)
+    if encoding == "msgpack":
+        try:
+            import msgpack
+        except ImportError:
+            if encoding not in _warned_encodings:
+                _warned_encodings.add(encoding)
+                print("⚠️  msgpack is not installed; skipping .msgpack output (pip install msgpack)")
+            return None
+        return msgpack.packb(data, use_bin_type=True)
+    if encoding not in _warned_encodings:
+        _warned_encodings.add(encoding)
+        print(f"⚠️  Unknown output encoding '{encoding}' (expected min, gz or msgpack)")
+    return None
+
+
+def course_dir_for(path: Path) -> Optional[Path]:
+    """The course directory containing a generated file (parent of quiz/ or cognitive_flashcards/)."""
+    for parent in Path(path).parents:
+        if parent.name in _CONTENT_DIRS:
+            return parent.parent
+    return None
+
+
+def deck_for(path: Path) -> str:
+    """Deck (lecture) a generated file belongs to."""
+    path = Path(path)
+    if path.parent.parent.name == "cognitive_flashcards":
+        return path.parent.name
+    stem = path.name[:-len(".json")] if path.name.endswith(".json") else path.stem
+    match = _QUIZ_STEM_RE.match(stem)
+    return match.group("deck") if match else stem
+
+
+def load_manifest(course_dir: Path) -> Dict[str, Any]:
+    """A course's manifest (empty skeleton if it does not exist yet)."""
+    manifest_path = Path(course_dir) / MANIFEST_NAME
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("manifest_version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, json.JSONDecodeError):
+        pass
+    return {"manifest_version": MANIFEST_VERSION, "course_id": Path(course_dir).name,
+            "version": 0, "updated_at": None, "decks": {}, "files": {}}
+
+
+class _ManifestLock:
+    """Serializes manifest updates across threads and processes (course builds run stages in parallel)."""
+
+    def __init__(self, course_dir: Path):
+        self.lock_path = Path(course_dir) / ".manifest.lock"
+        self._file = None
+
+    def __enter__(self):
+        _manifest_lock.acquire()
+        if fcntl is not None:
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.lock_path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        _manifest_lock.release()
+
+
+def write_course_json(
+    path: Path,
+    data: Any,
+    indent: Optional[int] = None,
+    encodings: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Atomically write generated course JSON, its extra encodings, and its manifest entry.
+
+    Files outside a course directory are written atomically without a manifest.
+
+    Args:
+        path: Target .json path
+        data: JSON-serializable content
+        indent: Indent of the main file (defaults to Config.OUTPUT_JSON_INDENT; 0 = compact)
+        encodings: Extra encodings to write (defaults to Config.OUTPUT_EXTRA_ENCODINGS)
+
+    Returns:
+        The file's manifest entry (sha256, size, version, deck, changed, encodings)
+    """
+    path = Path(path)
+    indent = Config.OUTPUT_JSON_INDENT if indent is None else indent
+    encodings = _configured_encodings() if encodings is None else list(encodings)
+
+    payload = encode_json(data, indent)
+    extras = {}
+    for encoding in encodings:
+        extra = _encode_extra(data, encoding)
+        if extra is not None:
+            extras[encoding] = (_encoding_path(path, encoding), extra)
+
+    course_dir = course_dir_for(path)
+    if course_dir is None:
+        write_atomic(path, payload)
+        for extra_path, extra in extras.values():
+            write_atomic(extra_path, extra)
+        _remove_files(_encoding_path(path, encoding) for encoding in _ENCODING_SUFFIXES if encoding not in extras)
+        return {"sha256": hashlib.sha256(payload).hexdigest(), "size": len(payload), "changed": True}
+
+    with _ManifestLock(course_dir):
+        manifest = load_manifest(course_dir)
+        key = path.relative_to(course_dir).as_posix()
+        previous = manifest["files"].get(key)
+        sha256 = hashlib.sha256(payload).hexdigest()
+        encoded = {
+            encoding: {"path": extra_path.relative_to(course_dir).as_posix(),
+                       "sha256": hashlib.sha256(extra).hexdigest(), "size": len(extra)}
+            for encoding, (extra_path, extra) in extras.items()
+        }
+
+        unchanged = (
+            previous is not None
+            and previous["sha256"] == sha256
+            and _file_sha256(path) == sha256
+            and previous.get("encodings", {}) == encoded
+            and all(_file_sha256(course_dir / info["path"]) == info["sha256"] for info in encoded.values())
+        )
+        if unchanged:
+            return dict(previous, changed=False)
+
+        write_atomic(path, payload)
+        for extra_path, extra in extras.values():
+            write_atomic(extra_path, extra)
+        # Encodings dropped from the config (or written to an older location) go with their entries
+        current = {info["path"] for info in encoded.values()}
+        _remove_files(
+            course_dir / info["path"]
+            for info in (previous or {}).get("encodings", {}).values()
+            if info.get("path") not in current
+        )
+
+        now = datetime.now().isoformat()
+        deck = deck_for(path)
+        manifest["version"] += 1
+        manifest["updated_at"] = now
+        deck_entry = manifest["decks"].setdefault(deck, {"version": 0})
+        deck_entry["version"] += 1
+        deck_entry["updated_at"] = now
+        entry = {
+            "deck": deck,
+            "sha256": sha256,
+            "size": len(payload),
+            "version": (previous or {}).get("version", 0) + 1,
+            "updated_at": now,
+            "encodings": encoded,
+        }
+        manifest["files"][key] = entry
+        write_atomic(course_dir / MANIFEST_NAME, encode_json(manifest, 1))
+
+    return dict(entry, changed=True)
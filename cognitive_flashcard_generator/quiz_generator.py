@@ -5,14 +5,17 @@ Enhanced with diagram generation for world-class explanations.
 
 import os
 import json
+import itertools
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
 import time
 import threading
 
 from config import Config
 from cognitive_flashcard_generator.diagram_generator import DiagramGenerator
+from cognitive_flashcard_generator.json_stream import JSONObjectStream, collect_items, parse_json_items
 from cognitive_flashcard_generator.llm_client import LLMClient
+from cognitive_flashcard_generator.split_retry import coverage_report, format_coverage, split_and_retry
 
 
 class QuizGenerator:
@@ -54,12 +57,14 @@ class QuizGenerator:
         
         self.course_name = course_name
         self.textbook_reference = textbook_reference
-        self._progress_active = False
+        self._progress_active = 0  # Requests currently waiting on the API
+        self._progress_lock = threading.Lock()
         self._progress_thread = None
+        self.last_coverage: Dict[str, Any] = {}
         self.diagram_generator = DiagramGenerator()  # Initialize diagram generator
     
     def _show_progress(self, interval: int = 15):
-        """Show periodic progress messages while waiting for API response."""
+        """Show periodic progress messages while waiting for API responses."""
         elapsed = 0
         while self._progress_active:
             time.sleep(interval)
@@ -68,16 +73,20 @@ class QuizGenerator:
                 print(f"   ⏳ Still waiting... ({elapsed} seconds elapsed)")
     
     def _start_progress_indicator(self):
-        """Start background thread to show progress."""
-        self._progress_active = True
-        self._progress_thread = threading.Thread(target=self._show_progress, daemon=True)
-        self._progress_thread.start()
+        """Start background thread to show progress (shared by concurrent split retries)."""
+        with self._progress_lock:
+            self._progress_active += 1
+            if self._progress_active == 1:
+                self._progress_thread = threading.Thread(target=self._show_progress, daemon=True)
+                self._progress_thread.start()
     
     def _stop_progress_indicator(self):
-        """Stop background progress indicator."""
-        self._progress_active = False
-        if self._progress_thread:
-            self._progress_thread.join(timeout=1)
+        """Stop background progress indicator once no request is waiting."""
+        with self._progress_lock:
+            self._progress_active = max(0, self._progress_active - 1)
+            thread = self._progress_thread if self._progress_active == 0 else None
+        if thread:
+            thread.join(timeout=1)
     
     def _load_quiz_prompt_template(self, level: int) -> str:
         """
@@ -124,179 +133,154 @@ class QuizGenerator:
         return self._generate_with_retry(flashcards_chunk, level, chunk_info)
     
     def _generate_with_retry(self, flashcards_chunk: List[Dict[str, Any]], level: int,
-                            chunk_info: str = "", max_retries: int = 3) -> List[Dict[str, Any]]:
+                            chunk_info: str = "") -> List[Dict[str, Any]]:
         """
-        Generate quiz questions with retry logic and progressive chunk size reduction.
+        Generate quiz questions, bisecting the chunk and retrying both halves on failure.
+
+        Nothing is silently dropped: flashcards that still yield no questions
+        are listed in the coverage report (see self.last_coverage).
+        """
+        questions, _ = split_and_retry(
+            flashcards_chunk,
+            lambda cards, label: self._request_questions(cards, level, label),
+            label=chunk_info or f"Level {level}",
+        )
+
+        self.last_coverage = coverage_report(flashcards_chunk, questions)
+        print(f"   📊 Coverage: {format_coverage(self.last_coverage)}")
+
+        if not questions:
+            print("⚠️  No questions generated from this chunk after all retries")
+        return questions
+
+    def _request_questions(self, flashcards_chunk: List[Dict[str, Any]], level: int,
+                           chunk_info: str = "") -> List[Dict[str, Any]]:
+        """
+        One generation request for a chunk of flashcards.
+
+        Returns:
+            Processed questions, or an empty list if the response was unusable
+            (the raw response is logged and evicted from the response cache)
         """
-        original_chunk = flashcards_chunk
-        
         # Create logs directory for raw responses
         logs_dir = Path("logs") / "llm_raw" / "quizzes"
         logs_dir.mkdir(parents=True, exist_ok=True)
-        
-        for attempt in range(max_retries):
-            try:
-                # Reduce chunk size on each retry to avoid token limits
-                if attempt > 0:
-                    reduction_factor = 0.7 ** attempt  # Reduce by 30% each attempt
-                    max_cards = max(1, int(len(original_chunk) * reduction_factor))
-                    flashcards_chunk = original_chunk[:max_cards]
-                    print(f"🔄 Retry {attempt + 1}/{max_retries}: Reduced to {len(flashcards_chunk)} flashcard(s)")
-                
-                # Convert flashcards to JSON string for the prompt
-                flashcards_json = json.dumps(flashcards_chunk, indent=2, ensure_ascii=False)
-                
-                # Load and populate template
-                prompt_template = self._load_quiz_prompt_template(level)
-                prompt = prompt_template.replace("{{COURSE_NAME}}", self.course_name)
-                prompt = prompt.replace("{{TEXTBOOK_REFERENCE}}", self.textbook_reference)
-                
-                # Replace the content placeholder with the flashcards JSON
-                # The prompt expects a JSON array of flashcards
-                prompt = prompt + f"\n\n## Input Flashcards:\n\n```json\n{flashcards_json}\n```\n\nGenerate the quiz questions now."
-                
-                print(f"🤖 Analyzing {len(flashcards_chunk)} flashcard(s) and generating Level {level} questions...")
-                
-                # Configure generation with progressive token limit reduction.
-                # With GPT-5.1 we can safely target larger completions again.
-                base_tokens = 50000
-                max_tokens = max(4096, int(base_tokens * (0.8 ** attempt)))  # Reduce tokens on retry
-                temperature = 0.8  # Slightly higher for creative question generation
-                
-                print(f"   📊 Flashcards: {len(flashcards_chunk)}")
-                print(f"   📊 Max output tokens: {max_tokens:,}")
-                print(f"   ⏳ Waiting for API response... (this may take 30-90 seconds)")
-                
-                start_time = time.time()
-                self._start_progress_indicator()
-                try:
-                    result_text = self.llm_client.generate_text(
-                        prompt,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                    )
-                    self._stop_progress_indicator()
-                    elapsed_time = time.time() - start_time
-                    print(f"   ⏱️  API response received in {elapsed_time:.1f} seconds")
-                    result_text = result_text.strip()
-                except Exception as api_error:
-                    self._stop_progress_indicator()
-                    elapsed_time = time.time() - start_time
-                    print(f"   ❌ API call failed after {elapsed_time:.1f} seconds: {api_error}")
-                    raise
-                
-                # Parse JSON response
-                questions = self._parse_quiz_response(result_text, level)
-                
-                if questions:
-                    print(f"✅ Generated {len(questions)} Level {level} questions")
-                    
-                    # Process enhanced explanations and generate diagrams
-                    questions = self._process_enhanced_explanations(questions)
-                    
-                    # Display statistics
-                    with_visuals = sum(1 for q in questions if q.get('visual_type', 'None') != 'None')
-                    enhanced_explanations = sum(1 for q in questions if isinstance(q.get('explanation'), dict))
-                    print(f"   📊 Questions with visuals: {with_visuals}")
-                    print(f"   📊 Questions with enhanced explanations: {enhanced_explanations}")
-                    print(f"   📊 Expected: {len(flashcards_chunk) * 5} questions (5 per flashcard)")
-                    
-                    return questions
-                else:
-                    # Log raw response when no questions generated
-                    chunk_safe = chunk_info.replace('/', '_').replace(' ', '_') if chunk_info else f"attempt_{attempt + 1}"
-                    log_file = logs_dir / f"level_{level}_{chunk_safe}_attempt_{attempt + 1}.txt"
-                    
-                    with open(log_file, 'w', encoding='utf-8') as f:
-                        f.write(f"=== RAW LLM RESPONSE ===\n")
-                        f.write(f"Level: {level}\n")
-                        f.write(f"Chunk: {chunk_info}\n")
-                        f.write(f"Attempt: {attempt + 1}/{max_retries}\n")
-                        f.write(f"Flashcards: {len(flashcards_chunk)}\n")
-                        f.write(f"Max tokens: {max_tokens}\n")
-                        f.write(f"\n=== RESPONSE TEXT ===\n")
-                        f.write(result_text)
-                    
-                    print(f"⚠️  No questions generated on attempt {attempt + 1}")
-                    print(f"   📝 Raw response saved to: {log_file}")
-                    if attempt < max_retries - 1:
-                        print(f"   🔄 Will retry with smaller chunk...")
-                        continue
-                    
-            except Exception as e:
-                # Log exception details
-                chunk_safe = chunk_info.replace('/', '_').replace(' ', '_') if chunk_info else f"attempt_{attempt + 1}"
-                log_file = logs_dir / f"level_{level}_{chunk_safe}_attempt_{attempt + 1}_ERROR.txt"
-                
-                with open(log_file, 'w', encoding='utf-8') as f:
-                    f.write(f"=== EXCEPTION DURING GENERATION ===\n")
-                    f.write(f"Level: {level}\n")
-                    f.write(f"Chunk: {chunk_info}\n")
-                    f.write(f"Attempt: {attempt + 1}/{max_retries}\n")
-                    f.write(f"Error: {str(e)}\n")
-                    f.write(f"\n=== TRACEBACK ===\n")
-                    import traceback
-                    f.write(traceback.format_exc())
-                
-                print(f"❌ Error on attempt {attempt + 1}: {e}")
-                print(f"   📝 Error details saved to: {log_file}")
-                if attempt < max_retries - 1:
-                    print(f"   🔄 Retrying with reduced chunk size...")
-                    continue
-                else:
-                    print(f"❌ All retry attempts failed")
-                    import traceback
-                    traceback.print_exc()
-        
-        print("⚠️  No questions generated from this chunk after all retries")
-        return []
-    
-    def _parse_quiz_response(self, response_text: str, level: int) -> List[Dict[str, Any]]:
-        """Parse the AI response into structured quiz questions with robust error handling."""
-        # Remove code fences if present
-        if response_text.startswith('```'):
-            parts = response_text.split('```')
-            if len(parts) >= 2:
-                response_text = parts[1]
-                if response_text.startswith('json'):
-                    response_text = response_text[4:].strip()
-        
-        # Find the JSON array
-        start_idx = response_text.find('[')
-        if start_idx != -1:
-            response_text = response_text[start_idx:]
-        
-        # Try to parse JSON with multiple fallback strategies
-        questions = self._try_parse_json_with_fixes(response_text)
-        
+        chunk_safe = chunk_info.replace('/', '_').replace(' ', '_') if chunk_info else "chunk"
+
+        # Convert flashcards to JSON string for the prompt
+        flashcards_json = json.dumps(flashcards_chunk, indent=2, ensure_ascii=False)
+
+        # Load and populate template
+        prompt_template = self._load_quiz_prompt_template(level)
+        prompt = prompt_template.replace("{{COURSE_NAME}}", self.course_name)
+        prompt = prompt.replace("{{TEXTBOOK_REFERENCE}}", self.textbook_reference)
+
+        # Replace the content placeholder with the flashcards JSON
+        # The prompt expects a JSON array of flashcards
+        prompt = prompt + f"\n\n## Input Flashcards:\n\n```json\n{flashcards_json}\n```\n\nGenerate the quiz questions now."
+
+        # With GPT-5.1 we can safely target larger completions again.
+        max_tokens = 50000
+        temperature = 0.8  # Slightly higher for creative question generation
+
+        print(f"🤖 Analyzing {len(flashcards_chunk)} flashcard(s) and generating Level {level} questions ({chunk_info})...")
+        print(f"   📊 Max output tokens: {max_tokens:,}")
+        print(f"   ⏳ Waiting for API response... (this may take 30-90 seconds)")
+
+        start_time = time.time()
+        self._start_progress_indicator()
+        try:
+            # Stream the completion; each question is validated as soon as it closes
+            stream = JSONObjectStream(validate=self._question_validator(level))
+            questions, result_text = collect_items(
+                self.llm_client.stream_text(
+                    prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                ),
+                stream,
+            )
+            elapsed_time = time.time() - start_time
+            print(f"   ⏱️  API response received in {elapsed_time:.1f} seconds")
+        except Exception as e:
+            elapsed_time = time.time() - start_time
+            print(f"   ❌ API call failed after {elapsed_time:.1f} seconds: {e}")
+
+            log_file = logs_dir / f"level_{level}_{chunk_safe}_ERROR.txt"
+            with open(log_file, 'w', encoding='utf-8') as f:
+                f.write(f"=== EXCEPTION DURING GENERATION ===\n")
+                f.write(f"Level: {level}\n")
+                f.write(f"Chunk: {chunk_info}\n")
+                f.write(f"Flashcards: {len(flashcards_chunk)}\n")
+                f.write(f"Error: {str(e)}\n")
+                f.write(f"\n=== TRACEBACK ===\n")
+                import traceback
+                f.write(traceback.format_exc())
+            print(f"   📝 Error details saved to: {log_file}")
+            raise
+        finally:
+            self._stop_progress_indicator()
+
         if not questions:
+            # Don't replay an unusable response from the cache on the next run
+            self.llm_client.forget(prompt, max_tokens=max_tokens, temperature=temperature)
+
+            # Log raw response when no questions generated
+            log_file = logs_dir / f"level_{level}_{chunk_safe}.txt"
+            with open(log_file, 'w', encoding='utf-8') as f:
+                f.write(f"=== RAW LLM RESPONSE ===\n")
+                f.write(f"Level: {level}\n")
+                f.write(f"Chunk: {chunk_info}\n")
+                f.write(f"Flashcards: {len(flashcards_chunk)}\n")
+                f.write(f"Max tokens: {max_tokens}\n")
+                f.write(f"\n=== RESPONSE TEXT ===\n")
+                f.write(result_text)
+
+            print(f"⚠️  No questions generated for {chunk_info}")
+            print(f"   📝 Raw response saved to: {log_file}")
             return []
+
+        print(f"✅ Generated {len(questions)} Level {level} questions")
+
+        # Process enhanced explanations and generate diagrams
+        questions = self._process_enhanced_explanations(questions)
+
+        # Display statistics
+        with_visuals = sum(1 for q in questions if q.get('visual_type', 'None') != 'None')
+        enhanced_explanations = sum(1 for q in questions if isinstance(q.get('explanation'), dict))
+        print(f"   📊 Questions with visuals: {with_visuals}")
+        print(f"   📊 Questions with enhanced explanations: {enhanced_explanations}")
+        print(f"   📊 Expected: {len(flashcards_chunk) * 5} questions (5 per flashcard)")
+
+        return questions
+    
+    def _question_validator(self, level: int) -> Callable[[Dict[str, Any]], bool]:
+        """Per-response validator for JSONObjectStream: validates and normalizes questions as they arrive."""
+        question_numbers = itertools.count(1)
         
-        # Validate structure
-        if not isinstance(questions, list):
-            print("⚠️  Response is not a JSON array")
-            return []
-        
-        # Validate and normalize each question
-        valid_questions = []
-        for i, question in enumerate(questions, 1):
-            if self._validate_question(question, i, level):
-                # Ensure all required fields exist with defaults if missing
-                if 'type' not in question:
-                    question['type'] = 'mcq'
-                if 'visual_type' not in question:
-                    question['visual_type'] = 'None'
-                if 'visual_code' not in question or question['visual_code'] is None:
-                    question['visual_code'] = ""
-                if 'alt_text' not in question or question['alt_text'] is None:
-                    question['alt_text'] = ""
-                if 'tags' not in question:
-                    question['tags'] = []
-                if 'difficulty_level' not in question:
-                    question['difficulty_level'] = level
-                valid_questions.append(question)
-        
-        return valid_questions
+        def accept(question: Dict[str, Any]) -> bool:
+            if not self._validate_question(question, next(question_numbers), level):
+                return False
+            # Ensure all required fields exist with defaults if missing
+            if 'type' not in question:
+                question['type'] = 'mcq'
+            if 'visual_type' not in question:
+                question['visual_type'] = 'None'
+            if 'visual_code' not in question or question['visual_code'] is None:
+                question['visual_code'] = ""
+            if 'alt_text' not in question or question['alt_text'] is None:
+                question['alt_text'] = ""
+            if 'tags' not in question:
+                question['tags'] = []
+            if 'difficulty_level' not in question:
+                question['difficulty_level'] = level
+            return True
+        
+        return accept
+    
+    def _parse_quiz_response(self, response_text: str, level: int) -> List[Dict[str, Any]]:
+        """Parse a complete AI response into validated quiz questions (tolerates fences and truncation)."""
+        return parse_json_items(response_text, validate=self._question_validator(level))
     
     def _process_enhanced_explanations(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -409,98 +393,6 @@ class QuizGenerator:
         print(f"✓ Question visual and explanation processing complete\n")
         return questions
     
-    def _try_parse_json_with_fixes(self, json_text: str) -> List[Dict[str, Any]]:
-        """
-        Try to parse JSON with multiple fallback strategies to handle common AI generation errors.
-        """
-        import re
-        
-        # Strategy 1: Try parsing as-is
-        try:
-            return json.loads(json_text)
-        except json.JSONDecodeError as e:
-            print(f"🔧 Initial JSON parse failed: {e}")
-            print(f"   Attempting to fix common JSON errors...")
-        
-        # Strategy 2: Fix common JSON issues
-        fixed_json = json_text
-        
-        # Fix 1: Remove trailing commas
-        try:
-            fixed_json = re.sub(r',(\s*[}\]])', r'\1', fixed_json)
-            print("   🔧 Removed trailing commas")
-        except Exception:
-            pass
-        
-        # Fix 2: Handle missing commas between objects
-        try:
-            fixed_json = re.sub(r'}\s*{', '},{', fixed_json)
-            print("   🔧 Fixed missing commas between objects")
-        except Exception:
-            pass
-        
-        # Fix 3: Handle incomplete JSON by finding the last complete object
-        try:
-            last_bracket = fixed_json.rfind(']')
-            if last_bracket == -1:
-                # No closing bracket found, try to add one
-                brace_count = 0
-                last_complete_pos = -1
-                for i, char in enumerate(fixed_json):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            last_complete_pos = i
-                
-                if last_complete_pos > 0:
-                    fixed_json = fixed_json[:last_complete_pos + 1] + ']'
-                    print("   🔧 Added missing closing bracket")
-        except Exception:
-            pass
-        
-        # Strategy 3: Try parsing the fixed JSON
-        try:
-            result = json.loads(fixed_json)
-            print("   ✅ Successfully parsed JSON after fixes")
-            return result
-        except json.JSONDecodeError as e:
-            print(f"   ⚠️  JSON still invalid after fixes: {e}")
-        
-        # Strategy 4: Try to extract partial valid JSON objects
-        try:
-            objects = []
-            brace_count = 0
-            start_pos = -1
-            
-            for i, char in enumerate(fixed_json):
-                if char == '{' and brace_count == 0:
-                    start_pos = i
-                    brace_count = 1
-                elif char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0 and start_pos != -1:
-                        # Found a complete object
-                        obj_text = fixed_json[start_pos:i+1]
-                        try:
-                            obj = json.loads(obj_text)
-                            objects.append(obj)
-                        except json.JSONDecodeError:
-                            pass  # Skip invalid objects
-                        start_pos = -1
-            
-            if objects:
-                print(f"   🔧 Extracted {len(objects)} valid objects from partial JSON")
-                return objects
-        except Exception:
-            pass
-        
-        print("   ❌ All JSON parsing strategies failed")
-        return []
-    
     def _validate_question(self, question: Dict[str, Any], question_num: int, level: int) -> bool:
         """Validate a single quiz question has all required fields."""
         required_fields = ['question_text', 'options', 'correct_answer', 'explanation']
@@ -0,0 +1,346 @@
+"""
+Shared rate limiting for LLM API calls.
+
+One token-bucket limiter per provider (requests/min and tokens/min) is shared
+by every caller in the process: flashcard and quiz generators, the slide
+analyzer, the content condenser and the enrichment scripts. A 429 halves the
+limiter's rates and pauses new requests; successful calls slowly restore them.
+Retries use jittered exponential backoff, honouring the server's retry hint.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import Config
+
+
+# Fraction of the configured rate restored per successful call after a 429
+RECOVERY_STEP = 0.05
+# Adaptive rates never drop below this fraction of the configured rate
+MIN_RATE_FRACTION = 0.1
+
+_RETRY_IN_RE = re.compile(r"retry in (\d+\.?\d*)", re.IGNORECASE)
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+_RATE_LIMIT_RE = re.compile(
+    r"\b429\b|rate[ _-]?limit|too many requests|resource[ _]?exhausted", re.IGNORECASE
+)
+# Quota errors that waiting will not fix (both can arrive as a 429)
+_PERMANENT_QUOTA_RE = re.compile(
+    r"insufficient_quota|billing[ _](?:not[ _]active|disabled|account)|enable billing|PerDay",
+    re.IGNORECASE
+)
+_TRANSIENT_RE = re.compile(r"\b50[0234]\b|overloaded|timed out|deadline exceeded|unavailable", re.IGNORECASE)
+
+
+class _Bucket:
+    """A token bucket refilled continuously at `per_minute / 60` units per second."""
+
+    def __init__(self, per_minute: float):
+        self.limit = float(per_minute)
+        self.rate = float(per_minute)
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+
+    def refill(self, elapsed: float):
+        self.available = min(self.capacity, self.available + elapsed * self.rate / 60.0)
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units (going into debt if needed); returns the seconds until the debt is repaid."""
+        self.available -= min(amount, self.capacity)
+        if self.available >= 0:
+            return 0.0
+        return -self.available * 60.0 / self.rate
+
+
+class RateLimiter:
+    """
+    Adaptive token-bucket limiter for one provider.
+
+    Thread-safe, with blocking and async acquire, so sync scripts and the async
+    batch generators can share one instance. Reservations are taken up front
+    and callers sleep outside the lock.
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Provider name (for log messages)
+            requests_per_minute: Request budget (0 disables the request bucket)
+            tokens_per_minute: Token budget (0 disables the token bucket)
+        """
+        self.name = name
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._blocked_until = 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens; returns the seconds to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_refill
+            self._last_refill = now
+
+            wait = max(0.0, self._blocked_until - now)
+            if self._requests is not None:
+                self._requests.refill(elapsed)
+                wait = max(wait, self._requests.reserve(1))
+            if self._tokens is not None and tokens > 0:
+                self._tokens.refill(elapsed)
+                wait = max(wait, self._tokens.reserve(tokens))
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        """Block until a request of `tokens` estimated tokens may be sent."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Async variant of acquire()."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_rate_limit(self, retry_after: Optional[float] = None):
+        """
+        Adapt to a 429: halve both rates, drain the buckets and pause new requests.
+
+        Args:
+            retry_after: Server-suggested delay in seconds, if any
+        """
+        with self._lock:
+            for bucket in (self._requests, self._tokens):
+                if bucket is None:
+                    continue
+                bucket.rate = max(bucket.limit * MIN_RATE_FRACTION, bucket.rate / 2)
+                bucket.available = min(bucket.available, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def on_success(self):
+        """Creep the rates back towards their configured limits."""
+        with self._lock:
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None and bucket.rate < bucket.limit:
+                    bucket.rate = min(bucket.limit, bucket.rate + bucket.limit * RECOVERY_STEP)
+
+    def describe(self) -> str:
+        """Human-readable current limits."""
+        parts = []
+        if self._requests is not None:
+            parts.append(f"{self._requests.rate:.0f}/{self._requests.limit:.0f} req/min")
+        if self._tokens is not None:
+            parts.append(f"{self._tokens.rate:,.0f}/{self._tokens.limit:,.0f} tokens/min")
+        return ", ".join(parts) or "unlimited"
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Get the process-wide limiter for a provider, sized from Config.
+
+    Args:
+        provider: "gemini" or "openai"
+
+    Returns:
+        Shared RateLimiter instance
+    """
+    provider = (provider or "gemini").lower()
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            if provider == "openai":
+                rpm, tpm = Config.OPENAI_REQUESTS_PER_MINUTE, Config.OPENAI_TOKENS_PER_MINUTE
+            else:
+                rpm, tpm = Config.GEMINI_REQUESTS_PER_MINUTE, Config.GEMINI_TOKENS_PER_MINUTE
+            limiter = RateLimiter(provider, rpm, tpm)
+            _limiters[provider] = limiter
+        return limiter
+
+
+def estimate_tokens(provider: str, prompt_chars: int, max_tokens: int = 0, images: int = 0) -> int:
+    """
+    Estimate the tokens a request counts against the provider's token budget.
+
+    OpenAI charges max_output_tokens against the limit up front; Gemini counts
+    input tokens only.
+
+    Args:
+        provider: "gemini" or "openai"
+        prompt_chars: Prompt length in characters (~4 chars per token)
+        max_tokens: Requested output token limit
+        images: Number of attached images (~258 tokens each)
+
+    Returns:
+        Estimated token cost
+    """
+    tokens = prompt_chars // 4 + images * 258
+    if (provider or "").lower() == "openai":
+        tokens += max_tokens
+    return tokens
+
+
+def is_permanent_quota_error(exc: Exception) -> bool:
+    """Whether an exception is an exhausted-credit, billing or daily-quota error (not worth retrying)."""
+    if getattr(exc, "code", None) == "insufficient_quota":
+        return True
+    return bool(_PERMANENT_QUOTA_RE.search(str(exc)))
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Whether an exception from either SDK is a retryable 429 / rate-limit error."""
+    if is_permanent_quota_error(exc):
+        return False
+    if getattr(exc, "status_code", None) == 429 or getattr(exc, "code", None) == 429:
+        return True
+    return bool(_RATE_LIMIT_RE.search(str(exc)))
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """Whether an exception is a server-side or network error worth retrying."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    return bool(_TRANSIENT_RE.search(str(exc)))
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Extract the server's suggested retry delay from an exception, if present."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    message = str(exc)
+    match = _RETRY_IN_RE.search(message) or _RETRY_DELAY_RE.search(message)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Full-jitter exponential backoff.
+
+    Args:
+        attempt: Zero-based retry attempt
+        retry_after: Server-suggested delay (used as a floor)
+
+    Returns:
+        Seconds to sleep before the next attempt
+    """
+    ceiling = min(Config.LLM_BACKOFF_MAX_SECONDS, Config.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    delay = random.uniform(0, ceiling)
+    if retry_after:
+        delay = max(delay, retry_after + random.uniform(0, 1))
+    return delay
+
+
+def _retry_delay(limiter: RateLimiter, exc: Exception, attempt: int, max_retries: int) -> Optional[float]:
+    """Decide whether to retry after an exception; returns the delay, or None to give up."""
+    if is_permanent_quota_error(exc):
+        print(f"   ❌ {limiter.name} quota or billing error, not retrying: {exc}")
+        return None
+    rate_limited = is_rate_limit_error(exc)
+    if attempt >= max_retries or not (rate_limited or is_transient_error(exc)):
+        return None
+    retry_after = retry_after_seconds(exc)
+    if rate_limited:
+        limiter.on_rate_limit(retry_after)
+    delay = backoff_delay(attempt, retry_after)
+    reason = "Rate limited" if rate_limited else "Transient error"
+    print(f"   ⏳ {reason} by {limiter.name} ({limiter.describe()}), retrying in {delay:.1f}s "
+          f"(attempt {attempt + 1}/{max_retries})")
+    return delay
+
+
+def call_with_backoff(
+    provider: str,
+    fn: Callable[[], Any],
+    *,
+    estimated_tokens: int = 0,
+    max_retries: Optional[int] = None,
+) -> Any:
+    """
+    Run a blocking API call under the provider's limiter, retrying 429s and transient errors.
+
+    Args:
+        provider: "gemini" or "openai"
+        fn: Zero-argument callable performing the request
+        estimated_tokens: Token estimate for the token bucket (see estimate_tokens)
+        max_retries: Retries after the first attempt (defaults to Config.LLM_MAX_RETRIES)
+
+    Returns:
+        Whatever fn returns
+    """
+    limiter = get_rate_limiter(provider)
+    max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        limiter.acquire(estimated_tokens)
+        try:
+            result = fn()
+        except Exception as exc:
+            delay = _retry_delay(limiter, exc, attempt, max_retries)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
+
+
+async def call_with_backoff_async(
+    provider: str,
+    fn: Callable[[], Awaitable[Any]],
+    *,
+    estimated_tokens: int = 0,
+    max_retries: Optional[int] = None,
+) -> Any:
+    """
+    Async variant of call_with_backoff.
+
+    Args:
+        provider: "gemini" or "openai"
+        fn: Zero-argument callable returning the request coroutine (called once per attempt)
+        estimated_tokens: Token estimate for the token bucket
+        max_retries: Retries after the first attempt (defaults to Config.LLM_MAX_RETRIES)
+
+    Returns:
+        The awaited result of fn()
+    """
+    limiter = get_rate_limiter(provider)
+    max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        await limiter.acquire_async(estimated_tokens)
+        try:
+            result = await fn()
+        except Exception as exc:
+            delay = _retry_delay(limiter, exc, attempt, max_retries)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
@@ -0,0 +1,539 @@
+"""
+Diagram Render Service - warm renderer pools with a content-hash render cache.
+
+Mermaid diagrams are rendered by a small pool of long-lived Node processes
+(mermaid_worker.mjs), each holding one headless browser and reading diagrams
+over stdin, so the browser start-up cost is paid once per run instead of once
+per diagram. Graphviz diagrams are piped through the layout engine's
+stdin/stdout by a thread pool. Every rendered image is stored under a hash of
+(kind, engine, format, renderer, code), where the renderer part covers the
+mermaid-cli or Graphviz version and the Mermaid theme and config, so unchanged
+diagrams are never re-rendered across runs while an upgrade or a theme change
+invalidates them.
+
+When Node or the mermaid-cli package cannot be located, Mermaid falls back to
+one `mmdc` call per diagram.
+"""
+
+import atexit
+import base64
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+WORKER_SCRIPT = Path(__file__).with_name("mermaid_worker.mjs")
+LAYOUT_ENGINES = ('dot', 'neato', 'fdp', 'circo', 'twopi', 'sfdp')
+
+_LAYOUT_COMMENT_RE = re.compile(r'/\*\s*layout\s*=\s*(\w+)\s*\*/', re.IGNORECASE)
+_LAYOUT_ATTR_RE = re.compile(r'layout\s*=\s*(\w+)', re.IGNORECASE)
+
+
+def parse_layout_engine(dot_code: str) -> str:
+    """
+    Parse the recommended layout engine from DOT code.
+
+    Looks for a `/* layout=neato */` comment first, then a `layout=` attribute.
+
+    Args:
+        dot_code: The Graphviz DOT code
+
+    Returns:
+        Layout engine name, or 'dot' if none (or an unknown one) is given
+    """
+    for pattern in (_LAYOUT_COMMENT_RE, _LAYOUT_ATTR_RE):
+        match = pattern.search(dot_code)
+        if match and match.group(1).lower() in LAYOUT_ENGINES:
+            return match.group(1).lower()
+    return 'dot'
+
+
+def render_key(kind: str, code: str, image_format: str, engine: str = "", renderer: str = "") -> str:
+    """Hex SHA-256 of everything that determines a rendered image."""
+    digest = hashlib.sha256(f"{kind}|{engine}|{image_format}|{renderer}|".encode("utf-8"))
+    digest.update(code.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write-then-rename so readers never see a partially written image."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class RenderCache:
+    """Rendered images on disk, addressed by render_key()."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, image_format: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{image_format}")
+
+    def get(self, key: str, image_format: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key, image_format), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = None
+        with self._lock:
+            if data:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return data or None
+
+    def put(self, key: str, image_format: str, data: bytes):
+        _write_atomic(self._path(key, image_format), data)
+
+
+def mermaid_config() -> Dict:
+    """Mermaid config sent with every diagram: Config.MERMAID_CONFIG_FILE plus the theme."""
+    config = {}
+    if Config.MERMAID_CONFIG_FILE:
+        with open(Config.MERMAID_CONFIG_FILE, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    config.setdefault("theme", Config.MERMAID_THEME)
+    return config
+
+
+def _command_version(command: List[str]) -> str:
+    """First line a `--version`-style command prints (stdout or stderr), or "" if it cannot run."""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=15)
+    except (subprocess.TimeoutExpired, OSError):
+        return ""
+    output = (result.stdout.strip() or result.stderr.strip()).splitlines()
+    return output[0] if output else ""
+
+
+def _find_mermaid_cli_dir() -> Optional[str]:
+    """Locate the installed @mermaid-js/mermaid-cli package (Config override, then `npm root -g`)."""
+    candidates = []
+    if Config.MERMAID_CLI_DIR:
+        candidates.append(Config.MERMAID_CLI_DIR)
+    npm = shutil.which("npm")
+    if npm:
+        try:
+            result = subprocess.run([npm, "root", "-g"], capture_output=True, text=True, timeout=15)
+            if result.returncode == 0 and result.stdout.strip():
+                candidates.append(os.path.join(result.stdout.strip(), "@mermaid-js", "mermaid-cli"))
+        except (subprocess.TimeoutExpired, OSError):
+            pass
+    for candidate in candidates:
+        if os.path.isfile(os.path.join(candidate, "package.json")):
+            return candidate
+    return None
+
+
+class _MermaidWorker:
+    """One Node process running mermaid_worker.mjs, used by one thread at a time."""
+
+    def __init__(self, node: str, cli_dir: str, timeout: float, config: Dict):
+        self.timeout = timeout
+        self.config = config
+        self._next_id = 0
+        self._lines: "queue.Queue[str]" = queue.Queue()
+        env = dict(os.environ, MERMAID_CLI_DIR=cli_dir)
+        # Node/browser diagnostics go to the render log, so crashes can be investigated
+        log_dir = os.path.dirname(os.path.abspath(Config.DIAGRAM_RENDER_LOG))
+        os.makedirs(log_dir, exist_ok=True)
+        with open(Config.DIAGRAM_RENDER_LOG, "a", encoding="utf-8") as log:
+            self.process = subprocess.Popen(
+                [node, str(WORKER_SCRIPT)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=log,
+                text=True,
+                encoding="utf-8",
+                env=env,
+            )
+        # Reader thread, so every read can time out instead of hanging on a stuck browser
+        threading.Thread(target=self._read_lines, daemon=True).start()
+
+        ready = self._read_message(timeout=max(timeout, 60))
+        if not ready.get("ready"):
+            self.close()
+            raise RuntimeError(ready.get("error") or "Mermaid worker failed to start")
+
+    def _read_lines(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        self._lines.put("")  # EOF
+
+    def _read_message(self, timeout: float) -> dict:
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Mermaid worker did not answer within {timeout:.0f}s")
+        if not line:
+            raise RuntimeError(f"Mermaid worker exited (see {Config.DIAGRAM_RENDER_LOG})")
+        return json.loads(line)
+
+    def render(self, code: str, image_format: str) -> bytes:
+        """Render one diagram; raises on failure (the worker stays usable after diagram errors)."""
+        self._next_id += 1
+        request_id = self._next_id
+        request = {
+            "id": request_id,
+            "code": code,
+            "format": image_format,
+            "backgroundColor": "transparent",
+            "mermaidConfig": self.config,
+        }
+        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.flush()
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            reply = self._read_message(timeout=max(0.0, deadline - time.monotonic()))
+            if reply.get("id") == request_id:
+                break
+            # A late answer to an earlier request is skipped; anything else means the protocol is out of step
+            if not (isinstance(reply.get("id"), int) and reply["id"] < request_id):
+                raise RuntimeError(f"Mermaid worker answered request {reply.get('id')} instead of {request_id}")
+        if not reply.get("ok"):
+            raise ValueError(reply.get("error") or "Mermaid rendering failed")
+        return base64.b64decode(reply["data"])
+
+    def close(self):
+        try:
+            if self.process.stdin:
+                self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class DiagramRenderService:
+    """Renders Mermaid and Graphviz diagrams through warm pools and a render cache."""
+
+    def __init__(
+        self,
+        mermaid_workers: Optional[int] = None,
+        graphviz_workers: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Initialize the service (renderer processes start lazily on first use).
+
+        Args:
+            mermaid_workers: Long-lived Mermaid processes (defaults to Config.MERMAID_RENDER_WORKERS)
+            graphviz_workers: Concurrent Graphviz subprocesses (defaults to Config.GRAPHVIZ_RENDER_WORKERS)
+            cache_dir: Render cache directory, "" to disable (defaults to Config.RENDER_CACHE_DIR
+                when Config.RENDER_CACHE_ENABLED)
+            timeout: Seconds allowed per diagram (defaults to Config.DIAGRAM_RENDER_TIMEOUT_SECONDS)
+        """
+        self.mermaid_workers = max(1, mermaid_workers or Config.MERMAID_RENDER_WORKERS)
+        self.graphviz_workers = max(1, graphviz_workers or Config.GRAPHVIZ_RENDER_WORKERS)
+        self.timeout = timeout or Config.DIAGRAM_RENDER_TIMEOUT_SECONDS
+        if cache_dir is None:
+            cache_dir = Config.RENDER_CACHE_DIR if Config.RENDER_CACHE_ENABLED else ""
+        self.cache = RenderCache(cache_dir) if cache_dir else None
+
+        self.rendered = 0
+        self.failed = 0
+        self._stats_lock = threading.Lock()
+
+        self._pool_lock = threading.Lock()
+        self._idle: "queue.Queue[_MermaidWorker]" = queue.Queue()
+        self._workers: List[_MermaidWorker] = []
+        self._pool_checked = False
+        self._pool_mode = None  # "worker", "mmdc" or None (no Mermaid renderer)
+        self._node = None
+        self._cli_dir = None
+        self._mermaid_config = mermaid_config()
+        self._renderer_ids: Dict[str, str] = {}
+
+    # ------------------------------------------------------------------ availability
+
+    def mermaid_available(self) -> bool:
+        """Whether Mermaid diagrams can be rendered (warm workers or the mmdc CLI)."""
+        self._detect_mermaid()
+        return self._pool_mode is not None
+
+    def graphviz_available(self) -> bool:
+        """Whether the Graphviz `dot` executable is installed."""
+        return shutil.which("dot") is not None
+
+    def _detect_mermaid(self):
+        with self._pool_lock:
+            if self._pool_checked:
+                return
+            self._pool_checked = True
+            self._node = shutil.which("node")
+            self._cli_dir = _find_mermaid_cli_dir() if self._node else None
+            if self._node and self._cli_dir and WORKER_SCRIPT.exists():
+                self._pool_mode = "worker"
+            elif shutil.which("mmdc"):
+                self._pool_mode = "mmdc"
+
+    # ------------------------------------------------------------------ mermaid
+
+    def _checkout_worker(self) -> Optional[_MermaidWorker]:
+        """Take an idle worker, starting a new one while the pool is below its size."""
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._pool_lock:
+                if self._pool_mode != "worker":
+                    return None
+                if len(self._workers) < self.mermaid_workers:
+                    try:
+                        worker = _MermaidWorker(self._node, self._cli_dir, self.timeout, self._mermaid_config)
+                    except (OSError, RuntimeError, TimeoutError, ValueError) as e:
+                        print(f"    ⚠️  Mermaid worker unavailable ({e}); falling back to mmdc")
+                        self._pool_mode = "mmdc" if shutil.which("mmdc") else None
+                        return None
+                    self._workers.append(worker)
+                    return worker
+            # Pool is full: wait for a worker to be returned (or retired, freeing a slot)
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _retire_worker(self, worker: _MermaidWorker):
+        with self._pool_lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.close()
+
+    def _render_mermaid_uncached(self, code: str, image_format: str) -> Optional[bytes]:
+        self._detect_mermaid()
+        if self._pool_mode == "worker":
+            worker = self._checkout_worker()
+            if worker is not None:
+                try:
+                    return worker.render(code, image_format)
+                except ValueError as e:
+                    print(f"    ⚠️  Mermaid rendering failed: {e}")
+                    return None
+                except (OSError, RuntimeError, TimeoutError) as e:
+                    # Worker crashed or hung: replace it on next checkout
+                    print(f"    ⚠️  Mermaid worker failed ({e}); restarting it")
+                    self._retire_worker(worker)
+                    worker = None
+                    return None
+                finally:
+                    if worker is not None:
+                        self._idle.put(worker)
+        if self._pool_mode == "mmdc":
+            return self._render_mermaid_cli(code, image_format)
+        return None
+
+    def _render_mermaid_cli(self, code: str, image_format: str) -> Optional[bytes]:
+        """Per-diagram mmdc fallback (mmdc needs real input/output files)."""
+        with tempfile.TemporaryDirectory(prefix="mmdc_") as tmp:
+            input_path = os.path.join(tmp, "diagram.mmd")
+            output_path = os.path.join(tmp, f"diagram.{image_format}")
+            config_path = os.path.join(tmp, "mermaid_config.json")
+            with open(input_path, "w", encoding="utf-8") as f:
+                f.write(code)
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump(self._mermaid_config, f)
+            try:
+                result = subprocess.run(
+                    ['mmdc', '-i', input_path, '-o', output_path, '-b', 'transparent', '-c', config_path],
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout,
+                )
+            except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+                print(f"    ⚠️  Error rendering diagram: {e}")
+                return None
+            if result.returncode != 0 or not os.path.exists(output_path):
+                return None
+            with open(output_path, "rb") as f:
+                return f.read()
+
+    def render_mermaid(self, code: str, image_format: str = "png") -> Optional[bytes]:
+        """
+        Render a Mermaid diagram.
+
+        Args:
+            code: Mermaid diagram code
+            image_format: "png" or "svg"
+
+        Returns:
+            Image bytes, or None if rendering failed
+        """
+        return self._render("mermaid", code, image_format, "", self._render_mermaid_uncached,
+                            self._renderer_id("mermaid"))
+
+    # ------------------------------------------------------------------ graphviz
+
+    def _render_graphviz_uncached(self, code: str, image_format: str, engine: str) -> Optional[bytes]:
+        command = [engine]
+        # Fixed node positions need neato's -n2 mode
+        if engine == 'neato' and 'pos=' in code:
+            command.append('-n2')
+        command.append(f'-T{image_format}')
+        try:
+            result = subprocess.run(command, input=code.encode("utf-8"), capture_output=True, timeout=self.timeout)
+        except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+            error_type = "Timeout" if isinstance(e, subprocess.TimeoutExpired) else "Graphviz not found"
+            print(f"    ⚠️  Graphviz rendering failed. Engine: {engine}. Error: {error_type}")
+            return None
+        if result.returncode != 0 or not result.stdout:
+            error_msg = result.stderr.decode("utf-8", "replace").strip() or "Unknown error"
+            print(f"    ⚠️  Graphviz rendering failed. Engine: {engine}. Error: {error_msg}")
+            return None
+        return result.stdout
+
+    def render_graphviz(self, code: str, image_format: str = "png", engine: Optional[str] = None) -> Optional[bytes]:
+        """
+        Render Graphviz DOT code.
+
+        Args:
+            code: DOT code
+            image_format: Any Graphviz output format ("png", "svg", ...)
+            engine: Layout engine (defaults to the one declared in the code, else 'dot')
+
+        Returns:
+            Image bytes, or None if rendering failed
+        """
+        engine = engine or parse_layout_engine(code)
+        return self._render("graphviz", code, image_format, engine,
+                            lambda c, f: self._render_graphviz_uncached(c, f, engine),
+                            self._renderer_id("graphviz"))
+
+    # ------------------------------------------------------------------ shared
+
+    def _renderer_id(self, kind: str) -> str:
+        """Renderer version and settings that go into the render key (computed once per kind)."""
+        with self._pool_lock:
+            if kind in self._renderer_ids:
+                return self._renderer_ids[kind]
+        if kind == "mermaid":
+            self._detect_mermaid()
+            version = ""
+            if self._pool_mode == "worker":
+                try:
+                    with open(os.path.join(self._cli_dir, "package.json"), "r", encoding="utf-8") as f:
+                        version = f"mermaid-cli {json.load(f).get('version', '')}"
+                except (OSError, ValueError):
+                    pass
+            elif self._pool_mode == "mmdc":
+                version = f"mmdc {_command_version(['mmdc', '--version'])}"
+            renderer = f"{version}|{json.dumps(self._mermaid_config, sort_keys=True)}"
+        else:
+            renderer = _command_version(["dot", "-V"])
+        with self._pool_lock:
+            self._renderer_ids[kind] = renderer
+        return renderer
+
+    def _render(
+        self, kind: str, code: str, image_format: str, engine: str, render_fn, renderer: str = ""
+    ) -> Optional[bytes]:
+        code = code.strip()
+        if not code:
+            return None
+        key = render_key(kind, code, image_format, engine, renderer)
+        if self.cache is not None:
+            data = self.cache.get(key, image_format)
+            if data is not None:
+                return data
+
+        data = render_fn(code, image_format)
+        with self._stats_lock:
+            if data:
+                self.rendered += 1
+            else:
+                self.failed += 1
+        if data and self.cache is not None:
+            self.cache.put(key, image_format, data)
+        return data or None
+
+    def render_to_file(self, kind: str, code: str, output_path: str) -> bool:
+        """
+        Render a diagram to a file; the format is taken from the file extension.
+
+        Args:
+            kind: "mermaid" or "graphviz"
+            code: Diagram code
+            output_path: Destination path (e.g. diagrams/card_001_concise.png)
+
+        Returns:
+            True if the file was written
+        """
+        image_format = os.path.splitext(output_path)[1].lstrip('.').lower() or "png"
+        if kind == "mermaid":
+            data = self.render_mermaid(code, image_format)
+        elif kind == "graphviz":
+            data = self.render_graphviz(code, image_format)
+        else:
+            raise ValueError(f"Unknown diagram kind: {kind}")
+        if not data:
+            return False
+        _write_atomic(output_path, data)
+        return True
+
+    def render_many(self, jobs: Iterable[Tuple[str, str, str]]) -> List[bool]:
+        """
+        Render many diagrams to files concurrently.
+
+        Args:
+            jobs: (kind, code, output_path) tuples
+
+        Returns:
+            Success flags in job order
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        max_workers = self.mermaid_workers + self.graphviz_workers
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+            futures = [executor.submit(self.render_to_file, kind, code, path) for kind, code, path in jobs]
+            return [future.result() for future in futures]
+
+    def stats(self) -> Dict[str, int]:
+        """Rendered/failed counts and cache hits for this process."""
+        return {
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "cache_hits": self.cache.hits if self.cache else 0,
+        }
+
+    def close(self):
+        """Stop all Mermaid worker processes."""
+        with self._pool_lock:
+            workers, self._workers = self._workers, []
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for worker in workers:
+            worker.close()
+
+
+_service: Optional[DiagramRenderService] = None
+_service_lock = threading.Lock()
+
+
+def get_render_service() -> DiagramRenderService:
+    """Get the process-wide render service (its workers are stopped at exit)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DiagramRenderService()
+            atexit.register(_service.close)
+        return _service
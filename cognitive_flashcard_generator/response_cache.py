@@ -0,0 +1,291 @@
+"""
+Persistent, content-addressed cache of LLM responses.
+
+Responses are keyed by a hash of everything that determines them (provider,
+model, prompt version, prompt text, attached images, temperature, max tokens)
+and stored in a local SQLite file, so re-running a pipeline after a crash or a
+small prompt change only pays for the prompts that actually changed. The file
+is capped in size; least-recently-used entries are evicted first.
+
+Only responses the provider reports as finished normally are stored: a
+completion cut off at the output limit or stopped by a safety filter would
+otherwise be replayed on every rerun.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+from config import Config
+from cognitive_flashcard_generator.rate_limiter import call_with_backoff, call_with_backoff_async
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    prompt: str,
+    *,
+    images: Iterable[bytes] = (),
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    prompt_version: str = "",
+) -> str:
+    """
+    Hash the inputs that determine an LLM response.
+
+    Args:
+        provider: "gemini" or "openai"
+        model: Model name
+        prompt: Full prompt text
+        images: Raw bytes of attached images, in order
+        temperature: Sampling temperature (None if the SDK default is used)
+        max_tokens: Output token limit (None if the SDK default is used)
+        prompt_version: Caller-supplied version tag for the prompt template
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    parts = {
+        "cache_version": Config.LLM_CACHE_VERSION,
+        "provider": (provider or "").lower(),
+        "model": model,
+        "prompt_version": prompt_version,
+        "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "images": [hashlib.sha256(image).hexdigest() for image in images],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response store with size-capped LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Open (creating if needed) the cache file.
+
+        Args:
+            path: SQLite database path
+            max_bytes: Total response size above which LRU entries are evicted
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared across threads, serialized by self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key (refreshing its LRU position), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a response, evicting least-recently-used entries if over the size cap."""
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        """Drop a cached response (e.g. one that turned out to be unusable)."""
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            self._total_bytes -= row[0]
+
+    def _evict(self):
+        """Delete least-recently-used entries until the cache is under 90% of its cap (caller holds the lock)."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC")
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self) -> dict:
+        """Entry count, size and hit/miss counters for this process."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache configured in Config.
+
+    Returns:
+        ResponseCache, or None when LLM_CACHE_ENABLED is false
+    """
+    global _cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(Config.LLM_CACHE_PATH, max_bytes=Config.LLM_CACHE_MAX_MB * 1024 * 1024)
+        return _cache
+
+
+def gemini_completed(response: Any) -> bool:
+    """True if a Gemini response (or its last streamed chunk) finished with STOP."""
+    # Anything else (MAX_TOKENS, SAFETY, RECITATION, ...) is a cut-off answer
+    candidates = getattr(response, "candidates", None) or []
+    if not candidates:
+        return False
+    reason = getattr(candidates[0], "finish_reason", None)
+    return getattr(reason, "name", reason) in ("STOP", 1)
+
+
+def gemini_result(response: Any) -> Tuple[str, bool]:
+    """(stripped text, finished normally) of a Gemini response, as generate_cached's fn returns it."""
+    return (response.text or "").strip(), gemini_completed(response)
+
+
+def generate_cached(
+    provider: str,
+    model: str,
+    prompt: str,
+    fn: Callable[[], Tuple[str, bool]],
+    *,
+    images: Iterable[bytes] = (),
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    prompt_version: str = "",
+    estimated_tokens: int = 0,
+) -> str:
+    """
+    Return a cached response, or call the provider (rate limited, with backoff) and cache it.
+
+    Args:
+        provider: "gemini" or "openai"
+        model: Model name
+        prompt: Full prompt text
+        fn: Zero-argument callable that performs the request and returns
+            (response text, whether the provider finished normally); see gemini_result
+        images: Raw bytes of attached images (part of the key)
+        temperature: Sampling temperature (part of the key)
+        max_tokens: Output token limit (part of the key)
+        prompt_version: Prompt template version tag (part of the key)
+        estimated_tokens: Token estimate for the rate limiter
+
+    Returns:
+        Response text
+    """
+    images = list(images)
+    cache = get_response_cache()
+    key = None
+    if cache is not None:
+        key = cache_key(provider, model, prompt, images=images, temperature=temperature,
+                        max_tokens=max_tokens, prompt_version=prompt_version)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    text, completed = call_with_backoff(provider, fn, estimated_tokens=estimated_tokens)
+    if cache is not None and text and completed:
+        cache.put(key, text)
+    return text
+
+
+async def generate_cached_async(
+    provider: str,
+    model: str,
+    prompt: str,
+    fn: Callable[[], Awaitable[Tuple[str, bool]]],
+    *,
+    images: Iterable[bytes] = (),
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    prompt_version: str = "",
+    estimated_tokens: int = 0,
+) -> str:
+    """
+    Async variant of generate_cached; fn returns the request coroutine, which
+    resolves to (response text, whether the provider finished normally).
+    """
+    images = list(images)
+    cache = get_response_cache()
+    key = None
+    if cache is not None:
+        key = cache_key(provider, model, prompt, images=images, temperature=temperature,
+                        max_tokens=max_tokens, prompt_version=prompt_version)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    text, completed = await call_with_backoff_async(provider, fn, estimated_tokens=estimated_tokens)
+    if cache is not None and text and completed:
+        cache.put(key, text)
+    return text
+
+
+def forget_cached(
+    provider: str,
+    model: str,
+    prompt: str,
+    *,
+    images: Iterable[bytes] = (),
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    prompt_version: str = "",
+):
+    """Drop the cached response for these inputs, so an unusable answer is not replayed."""
+    cache = get_response_cache()
+    if cache is None:
+        return
+    cache.delete(cache_key(provider, model, prompt, images=images, temperature=temperature,
+                           max_tokens=max_tokens, prompt_version=prompt_version))
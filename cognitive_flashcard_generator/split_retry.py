@@ -0,0 +1,246 @@
+"""
+Split-and-retry for LLM generation over a chunk of inputs.
+
+Instead of truncating a chunk that failed (which silently drops the tail), a
+failed chunk is bisected and both halves are retried concurrently; the halves
+keep splitting until they succeed or reach the minimum size. Results are
+merged in input order and the pieces that still failed are returned, so the
+caller can build a coverage report and re-queue exactly those inputs.
+
+Concurrency here only fans out the halves: each attempt can be gated by a
+caller-supplied slot (the batch coordinator's concurrency cap), and request
+pacing stays with the provider's shared rate limiter inside LLMClient.
+"""
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Separators tried (in order) when bisecting text, so halves end on natural boundaries
+_TEXT_BREAKS = ("\n\n", "\n", ". ", " ")
+
+
+def split_list(items: Sequence[Any]) -> Tuple[Sequence[Any], Sequence[Any]]:
+    """Split a list into two halves."""
+    middle = (len(items) + 1) // 2
+    return items[:middle], items[middle:]
+
+
+def split_text(text: str) -> Tuple[str, str]:
+    """Split text into two halves at the paragraph, line, sentence or word break nearest the middle."""
+    middle = len(text) // 2
+    window = max(1, len(text) // 4)
+    for separator in _TEXT_BREAKS:
+        before = text.rfind(separator, middle - window, middle + 1)
+        after = text.find(separator, middle, middle + window)
+        candidates = [pos for pos in (before, after) if pos > 0]
+        if candidates:
+            cut = min(candidates, key=lambda pos: abs(pos - middle)) + len(separator)
+            return text[:cut], text[cut:]
+    return text[:middle], text[middle:]
+
+
+def _attempt_label(label: str, path: str) -> str:
+    return f"{label} [part {path}]" if path else label
+
+
+def _path_key(path: str) -> Tuple[int, ...]:
+    """Sort key putting piece paths ("1.2", "2", ...) back in input order."""
+    return tuple(int(part) for part in path.split(".")) if path else ()
+
+
+def _child_path(path: str, half: int) -> str:
+    return f"{path}.{half}" if path else str(half)
+
+
+async def split_and_retry_async(
+    items: Any,
+    attempt: Callable[[Any, str], Awaitable[List[Any]]],
+    *,
+    label: str = "",
+    size: Callable[[Any], int] = len,
+    split: Callable[[Any], Tuple[Any, Any]] = split_list,
+    min_size: int = 1,
+    leaf_retries: int = 1,
+    slot: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+) -> Tuple[List[Any], List[Any]]:
+    """
+    Run `attempt` on items, bisecting and retrying the halves concurrently on failure.
+
+    An attempt fails if it raises or returns an empty list.
+
+    Args:
+        items: The inputs (a list of flashcards, a block of text, ...)
+        attempt: Coroutine function (items, label) -> results
+        label: Log label for this chunk; halves get " [part 1.2]" style suffixes
+        size: Size measure of items
+        split: Function returning the two halves of items
+        min_size: Items at or below this size are not split further
+        leaf_retries: Extra attempts for a piece that cannot be split further
+        slot: Returns an async context manager held around each single attempt
+            (e.g. a concurrency-cap slot), so split halves queue for their own
+            slots instead of sharing their parent's
+
+    Returns:
+        (results in input order, pieces that produced no results)
+    """
+
+    async def attempt_once(piece: Any, piece_label: str) -> List[Any]:
+        if slot is None:
+            return await attempt(piece, piece_label)
+        async with slot():
+            return await attempt(piece, piece_label)
+
+    async def run(piece: Any, path: str) -> Tuple[List[Any], List[Any]]:
+        piece_label = _attempt_label(label, path)
+        splittable = size(piece) > min_size
+        tries = 1 if splittable else 1 + leaf_retries
+        for _ in range(tries):
+            try:
+                results = await attempt_once(piece, piece_label)
+            except Exception as e:
+                print(f"   ❌ {piece_label}: {type(e).__name__} - {e}")
+                results = []
+            if results:
+                return list(results), []
+
+        if not splittable:
+            print(f"   ⚠️  {piece_label}: no results at minimum size, giving up on this piece")
+            return [], [piece]
+
+        first, second = split(piece)
+        print(f"   ✂️  {piece_label}: splitting {size(piece)} into {size(first)} + {size(second)} and retrying")
+        (results_a, failed_a), (results_b, failed_b) = await asyncio.gather(
+            run(first, _child_path(path, 1)),
+            run(second, _child_path(path, 2)),
+        )
+        return results_a + results_b, failed_a + failed_b
+
+    if not size(items):
+        return [], []
+    return await run(items, "")
+
+
+def split_and_retry(
+    items: Any,
+    attempt: Callable[[Any, str], List[Any]],
+    *,
+    label: str = "",
+    size: Callable[[Any], int] = len,
+    split: Callable[[Any], Tuple[Any, Any]] = split_list,
+    min_size: int = 1,
+    leaf_retries: int = 1,
+    max_workers: int = 2,
+) -> Tuple[List[Any], List[Any]]:
+    """
+    Blocking variant of split_and_retry_async; pieces run on one bounded thread pool.
+
+    However deep the splitting goes, at most max_workers attempts are in flight.
+
+    Args:
+        items: The inputs
+        attempt: Function (items, label) -> results
+        label: Log label for this chunk
+        size: Size measure of items
+        split: Function returning the two halves of items
+        min_size: Items at or below this size are not split further
+        leaf_retries: Extra attempts for a piece that cannot be split further
+        max_workers: Maximum number of concurrent attempts
+
+    Returns:
+        (results in input order, pieces that produced no results)
+    """
+
+    def run(piece: Any, path: str) -> List[Any]:
+        piece_label = _attempt_label(label, path)
+        tries = 1 if size(piece) > min_size else 1 + leaf_retries
+        for _ in range(tries):
+            try:
+                results = attempt(piece, piece_label)
+            except Exception as e:
+                print(f"   ❌ {piece_label}: {type(e).__name__} - {e}")
+                results = []
+            if results:
+                return list(results)
+        return []
+
+    if not size(items):
+        return [], []
+
+    results: Dict[str, List[Any]] = {}
+    failed: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(run, items, ""): (items, "")}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                piece, path = pending.pop(future)
+                piece_results = future.result()
+                if piece_results:
+                    results[path] = piece_results
+                    continue
+
+                piece_label = _attempt_label(label, path)
+                if size(piece) <= min_size:
+                    print(f"   ⚠️  {piece_label}: no results at minimum size, giving up on this piece")
+                    failed[path] = piece
+                    continue
+
+                first, second = split(piece)
+                print(f"   ✂️  {piece_label}: splitting {size(piece)} into {size(first)} + {size(second)} and retrying")
+                for half, half_items in ((1, first), (2, second)):
+                    half_path = _child_path(path, half)
+                    pending[executor.submit(run, half_items, half_path)] = (half_items, half_path)
+
+    merged = [result for path in sorted(results, key=_path_key) for result in results[path]]
+    return merged, [failed[path] for path in sorted(failed, key=_path_key)]
+
+
+def flashcard_ref(card: Dict[str, Any]) -> str:
+    """The identifier a quiz question should cite for a (simplified) flashcard."""
+    return str(card.get('flashcard_id') or card.get('id') or '')
+
+
+def coverage_report(
+    flashcards: Iterable[Dict[str, Any]],
+    questions: Iterable[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Which flashcards produced at least one quiz question.
+
+    Args:
+        flashcards: Input flashcards (with 'flashcard_id' or 'id')
+        questions: Generated questions (with 'source_flashcard_id')
+
+    Returns:
+        Dict with expected, covered, coverage (0-1) and missing_flashcard_ids (input order)
+    """
+    ids = [flashcard_ref(card) for card in flashcards]
+    ids = [card_id for card_id in ids if card_id]
+    cited = {str(q.get('source_flashcard_id')) for q in questions if q.get('source_flashcard_id')}
+    missing = [card_id for card_id in ids if card_id not in cited]
+    return {
+        'expected': len(ids),
+        'covered': len(ids) - len(missing),
+        'coverage': (len(ids) - len(missing)) / len(ids) if ids else 1.0,
+        'missing_flashcard_ids': missing,
+    }
+
+
+def missing_flashcards(
+    flashcards: Sequence[Dict[str, Any]],
+    report: Optional[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """The input flashcards listed as missing in a coverage report, for re-queueing."""
+    if not report:
+        return []
+    missing = set(report.get('missing_flashcard_ids', []))
+    return [card for card in flashcards if flashcard_ref(card) in missing]
+
+
+def format_coverage(report: Dict[str, Any]) -> str:
+    """One-line human-readable coverage summary."""
+    line = f"{report['covered']}/{report['expected']} flashcards covered ({report['coverage']:.0%})"
+    if report['missing_flashcard_ids']:
+        line += f"; missing: {', '.join(report['missing_flashcard_ids'])}"
+    return line
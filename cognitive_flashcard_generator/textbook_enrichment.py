@@ -7,20 +7,249 @@ This module handles content enrichment for courses that only have:
 
 It generates rich, detailed content that can be used with existing
 flashcard and quiz generation prompts.
+
+Prompt templates are read and compiled once per process. A lecture's topics
+are packed into batches by their estimated output tokens, and the batches of
+every lecture being enriched are synthesized concurrently (paced by the
+shared Gemini rate limiter). Each topic's section is saved as soon as its
+batch completes, so a failed run resumes with only the missing topics. A
+response cut off by the output limit or a safety stop is not cached; its
+complete sections are kept and the remaining topics are retried in smaller
+batches.
 """
 
+import asyncio
+import difflib
+import hashlib
 import json
 import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import google.generativeai as genai
 from dotenv import load_dotenv
-import time
+
+from config import Config
+from cognitive_flashcard_generator.rate_limiter import estimate_tokens
+from cognitive_flashcard_generator.response_cache import gemini_result, generate_cached, generate_cached_async
 
 # Load environment variables
 load_dotenv()
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+TOPIC_PROMPT = "textbook_content_synthesis_prompt.txt"
+BATCH_PROMPT = "textbook_content_batch_synthesis_prompt.txt"
+
+TEMPERATURE = 0.7
+TOP_P = 0.95
+
+_PLACEHOLDER_RE = re.compile(r'\{\{([A-Z_]+)\}\}')
+# Each topic of a batch response starts with a "## [TOPIC NAME]" heading
+_TOPIC_HEADING_RE = re.compile(r'^## ', re.MULTILINE)
+_TOPIC_HEADING_LINE_RE = re.compile(r'^## (?P<name>.*)$', re.MULTILINE)
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+# Similarity a "## " heading needs to the topic name to count as that topic's section
+_HEADING_MATCH_RATIO = 0.6
+_SUBTOPIC_SEPARATOR_RE = re.compile(r'[,;]')
+
+
+class PromptTemplate:
+    """A prompt file split once into literal text and {{PLACEHOLDER}} slots."""
+
+    def __init__(self, text: str):
+        self.digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        parts = _PLACEHOLDER_RE.split(text)
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+
+    def render(self, **values: Any) -> str:
+        """Fill the placeholders in one pass (unknown placeholders are left as is)."""
+        out = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            out.append(str(values[name]) if name in values else f"{{{{{name}}}}}")
+            out.append(literal)
+        return "".join(out)
+
+
+_templates: Dict[str, PromptTemplate] = {}
+_templates_lock = threading.Lock()
+
+
+def load_template(name: str) -> PromptTemplate:
+    """The compiled prompt template prompts/<name>, read from disk once per process."""
+    with _templates_lock:
+        if name not in _templates:
+            with open(PROMPTS_DIR / name, 'r', encoding='utf-8') as f:
+                _templates[name] = PromptTemplate(f.read())
+        return _templates[name]
+
+
+def estimate_topic_tokens(topic: str) -> int:
+    """
+    Output tokens a topic is expected to need.
+
+    Each subtopic listed in the topic (comma or semicolon separated) adds half
+    of the per-topic budget.
+    """
+    subtopics = len(_SUBTOPIC_SEPARATOR_RE.split(topic))
+    tokens = int(Config.ENRICHMENT_TOKENS_PER_TOPIC * (1 + 0.5 * (subtopics - 1)))
+    return min(tokens, Config.ENRICHMENT_BATCH_TOKENS)
+
+
+def plan_topic_batches(topics: List[str], max_tokens: Optional[int] = None) -> List[List[int]]:
+    """
+    Pack consecutive topics greedily into batches whose estimated output fits max_tokens.
+
+    Args:
+        topics: Topics in lecture order
+        max_tokens: Estimated output token budget per batch (defaults to
+            Config.ENRICHMENT_BATCH_TOKENS, which leaves headroom below the request's hard limit)
+
+    Returns:
+        Batches of topic indices
+    """
+    max_tokens = max_tokens or Config.ENRICHMENT_BATCH_TOKENS
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, topic in enumerate(topics):
+        tokens = estimate_topic_tokens(topic)
+        if current and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_topic_sections(text: str, count: int) -> Optional[List[str]]:
+    """
+    Split a batch response into its per-topic sections.
+
+    Returns:
+        The sections (text before the first heading stays with the first), or
+        None if the response does not have exactly count topic headings
+    """
+    starts = [match.start() for match in _TOPIC_HEADING_RE.finditer(text)]
+    if len(starts) != count:
+        return None
+    starts[0] = 0
+    ends = starts[1:] + [len(text)]
+    return [text[start:end].strip() for start, end in zip(starts, ends)]
+
+
+def _normalize_heading(text: str) -> str:
+    """Lowercase words only, without list numbering or the prompt's [brackets]."""
+    text = re.sub(r'^\s*\d+[.)]\s*', '', text)
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def match_topic_sections(text: str, topics: List[str]) -> Dict[int, str]:
+    """
+    Sections of a batch response keyed by the index of the topic their heading names.
+
+    Headings are matched to topics by name, in order, so a topic the response
+    skipped or merged does not shift the sections of the topics after it.
+    Text before the first heading stays with the first section.
+    """
+    headings = list(_TOPIC_HEADING_LINE_RE.finditer(text))
+    matched: Dict[int, str] = {}
+    next_topic = 0
+    for n, heading in enumerate(headings):
+        name = _normalize_heading(heading.group('name'))
+        best, best_ratio = None, _HEADING_MATCH_RATIO
+        for index in range(next_topic, len(topics)):
+            ratio = difflib.SequenceMatcher(None, name, _normalize_heading(topics[index])).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = index, ratio
+        if best is None:
+            continue
+        start = 0 if n == 0 else heading.start()
+        end = headings[n + 1].start() if n + 1 < len(headings) else len(text)
+        matched[best] = text[start:end].strip()
+        next_topic = best + 1
+    return matched
+
+
+def _placeholder(topic: str) -> str:
+    """Stand-in section for a topic whose synthesis failed."""
+    return f"# {topic}\n\n[Content synthesis failed for this topic]"
+
+
+def _write_text_atomic(path: Path, text: str):
+    """Write-then-rename so readers never see a partially written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class TopicPartStore:
+    """
+    Synthesized topic sections of one lecture, saved as their batches complete.
+
+    index.json maps each topic key to the file holding its section; a complete
+    batch response without any topic headings is stored once for all its topics.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.index_path = directory / "index.json"
+        self.index: Dict[str, str] = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.index = {}
+
+    def lookup(self, key: str) -> Optional[str]:
+        """File name of the section holding a topic, if it was saved."""
+        filename = self.index.get(key)
+        if filename and (self.directory / filename).exists():
+            return filename
+        return None
+
+    def read(self, filename: str) -> str:
+        with open(self.directory / filename, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def save(self, keys: List[str], sections: List[str]):
+        """Save one section per key, or a single section shared by all keys."""
+        if len(sections) == len(keys):
+            entries = [(key, f"{key}.md", section) for key, section in zip(keys, sections)]
+        else:
+            shared = f"{keys[0]}+{len(keys) - 1}.md"
+            entries = [(key, shared, sections[0]) for key in keys]
+        written = set()
+        for key, filename, section in entries:
+            if filename not in written:
+                _write_text_atomic(self.directory / filename, section)
+                written.add(filename)
+            self.index[key] = filename
+        _write_text_atomic(self.index_path, json.dumps(self.index, indent=1, sort_keys=True))
+
+    def clear(self):
+        """Remove the saved sections once the lecture file is written."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        try:
+            self.directory.parent.rmdir()  # The course's .parts directory, once empty
+        except OSError:
+            pass
+
 
 class TextbookContentEnricher:
     """
@@ -38,7 +267,16 @@ class TextbookContentEnricher:
             self.courses_data = json.load(f)
         
         # Initialize Gemini model for content synthesis
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model_name = 'gemini-2.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
+        self.generation_config = genai.GenerationConfig(
+            temperature=TEMPERATURE,
+            top_p=TOP_P,
+            max_output_tokens=Config.ENRICHMENT_MAX_OUTPUT_TOKENS
+        )
+        
+        # Lectures of the last run that still have topics without content
+        self.incomplete_lectures: List[str] = []
         
     def get_course(self, course_id: str) -> Optional[Dict]:
         """Get course by ID."""
@@ -140,36 +378,15 @@ class TextbookContentEnricher:
         Returns:
             Synthesized, structured content for the topic
         """
+        context = self._template_context(textbook_title, authors, course_name, course_description)
+        prompt = self._build_prompt([topic], context)
         
-        # Load the synthesis prompt
-        prompt_path = Path(__file__).parent.parent / "prompts" / "textbook_content_synthesis_prompt.txt"
-        
-        with open(prompt_path, 'r') as f:
-            prompt_template = f.read()
-        
-        # Fill in the template
-        prompt = prompt_template.replace("{{TOPIC}}", topic)
-        prompt = prompt.replace("{{TEXTBOOK_TITLE}}", textbook_title)
-        prompt = prompt.replace("{{AUTHORS}}", authors)
-        prompt = prompt.replace("{{COURSE_NAME}}", course_name)
-        prompt = prompt.replace("{{COURSE_DESCRIPTION}}", course_description)
-        
-        # Generate content using Gemini
+        # Generate content using Gemini (cached and paced by the shared rate limiter)
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.95,
-                    max_output_tokens=15000
-                )
-            )
-            
-            return response.text
-            
+            return self._generate(prompt)
         except Exception as e:
             print(f"Error synthesizing content for topic '{topic}': {e}")
-            return f"# {topic}\n\n[Content synthesis failed for this topic]"
+            return _placeholder(topic)
     
     def synthesize_topic_batch(
         self,
@@ -193,41 +410,104 @@ class TextbookContentEnricher:
         Returns:
             Synthesized, structured content for all topics combined
         """
+        context = self._template_context(textbook_title, authors, course_name, course_description)
+        prompt = self._build_prompt(topics, context)
         
-        # Load the batch synthesis prompt
-        prompt_path = Path(__file__).parent.parent / "prompts" / "textbook_content_batch_synthesis_prompt.txt"
-        
-        with open(prompt_path, 'r') as f:
-            prompt_template = f.read()
-        
-        # Create a formatted list of topics
-        topics_list = "\n".join([f"{i+1}. {topic}" for i, topic in enumerate(topics)])
-        
-        # Fill in the template
-        prompt = prompt_template.replace("{{TOPICS_LIST}}", topics_list)
-        prompt = prompt.replace("{{TOPIC_COUNT}}", str(len(topics)))
-        prompt = prompt.replace("{{TEXTBOOK_TITLE}}", textbook_title)
-        prompt = prompt.replace("{{AUTHORS}}", authors)
-        prompt = prompt.replace("{{COURSE_NAME}}", course_name)
-        prompt = prompt.replace("{{COURSE_DESCRIPTION}}", course_description)
-        
-        # Generate content using Gemini with higher token limit for batch
+        # Generate content using Gemini with the same output limit for the whole batch
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.95,
-                    max_output_tokens=15000  # Same limit but for multiple topics
-                )
-            )
-            
-            return response.text
-            
+            return self._generate(prompt)
         except Exception as e:
             print(f"Error synthesizing batch content for {len(topics)} topics: {e}")
             # Fallback: return placeholder for each topic
-            return "\n\n".join([f"# {topic}\n\n[Content synthesis failed for this topic]" for topic in topics])
+            return "\n\n".join([_placeholder(topic) for topic in topics])
+    
+    def _template_context(
+        self,
+        textbook_title: str,
+        authors: str,
+        course_name: str,
+        course_description: str
+    ) -> Dict[str, str]:
+        """Template values shared by every topic of a course."""
+        return {
+            'TEXTBOOK_TITLE': textbook_title,
+            'AUTHORS': authors,
+            'COURSE_NAME': course_name,
+            'COURSE_DESCRIPTION': course_description,
+        }
+    
+    def _course_context(self, course: Dict) -> Dict[str, str]:
+        """Template values for a course, with the textbook parsed from "Title by Authors"."""
+        textbook_title = course['reference_textbooks'][0] if course.get('reference_textbooks') else "Unknown"
+        if ' by ' in textbook_title:
+            title_part, authors_part = textbook_title.split(' by ', 1)
+        else:
+            title_part = textbook_title
+            authors_part = "Unknown"
+        return self._template_context(
+            title_part, authors_part, course['course_name'], course.get('course_description', '')
+        )
+    
+    def _build_prompt(self, topics: List[str], context: Dict[str, str]) -> str:
+        """Single-topic prompt for one topic, batch prompt for several."""
+        if len(topics) == 1:
+            return load_template(TOPIC_PROMPT).render(TOPIC=topics[0], **context)
+        topics_list = "\n".join([f"{i+1}. {topic}" for i, topic in enumerate(topics)])
+        return load_template(BATCH_PROMPT).render(
+            TOPICS_LIST=topics_list, TOPIC_COUNT=len(topics), **context
+        )
+    
+    def _topic_key(self, topic: str, context: Dict[str, str]) -> str:
+        """Names a topic's saved section; changes with the topic, course context, model or templates."""
+        payload = json.dumps([
+            topic,
+            context,
+            self.model_name,
+            load_template(TOPIC_PROMPT).digest,
+            load_template(BATCH_PROMPT).digest,
+        ], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    
+    def _parts_dir(self, course_id: str, lecture_id: str) -> Path:
+        return self.output_dir / course_id / ".parts" / lecture_id
+    
+    def _generate(self, prompt: str) -> str:
+        """Blocking Gemini request (cached and paced by the shared rate limiter)."""
+        return generate_cached(
+            "gemini",
+            self.model_name,
+            prompt,
+            lambda: gemini_result(self.model.generate_content(prompt, generation_config=self.generation_config)),
+            temperature=TEMPERATURE,
+            max_tokens=Config.ENRICHMENT_MAX_OUTPUT_TOKENS,
+            estimated_tokens=estimate_tokens("gemini", len(prompt)),
+        )
+    
+    async def _generate_async(self, prompt: str) -> Tuple[str, bool]:
+        """
+        Async variant of _generate.
+        
+        Returns:
+            (response text, whether Gemini finished normally rather than at the
+            output limit or a safety stop; cached responses always did)
+        """
+        finish = {'completed': True}
+        
+        async def request() -> Tuple[str, bool]:
+            response = await self.model.generate_content_async(prompt, generation_config=self.generation_config)
+            text, finish['completed'] = gemini_result(response)
+            return text, finish['completed']
+        
+        text = await generate_cached_async(
+            "gemini",
+            self.model_name,
+            prompt,
+            request,
+            temperature=TEMPERATURE,
+            max_tokens=Config.ENRICHMENT_MAX_OUTPUT_TOKENS,
+            estimated_tokens=estimate_tokens("gemini", len(prompt)),
+        )
+        return text, finish['completed']
     
     def enrich_single_lecture(
         self,
@@ -270,20 +550,12 @@ class TextbookContentEnricher:
         print(f"Course ID: {course_id} | Lecture: {lecture_number}")
         print(f"{'='*80}\n")
         
-        # Enrich the lecture
-        enriched_content = self.enrich_lecture(course, lecture)
-        
-        # Save to output directory
+        # Enrich the lecture and save it to the output directory
         lecture_id = f"{course_id}_lecture_{lecture_number}"
         output_path = self.output_dir / course_id / f"{lecture_id}_enhanced.txt"
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(enriched_content)
+        [(_, saved_path)] = self._run_lectures([(course, lecture, output_path)])
         
-        print(f"\n✓ Saved enriched content to: {output_path}\n")
-        
-        return output_path
+        return saved_path
     
     def enrich_lecture(
         self,
@@ -298,32 +570,129 @@ class TextbookContentEnricher:
             lecture: The lecture dictionary
             
         Returns:
-            Comprehensive lecture content combining all topics
+            Comprehensive lecture content combining all topics (failed topics
+            are replaced by placeholders)
         """
-        # Extract course metadata
-        course_name = course['course_name']
-        course_description = course.get('course_description', '')
-        textbook_title = course['reference_textbooks'][0] if course['reference_textbooks'] else "Unknown"
+        async def run() -> str:
+            semaphore = asyncio.Semaphore(Config.ENRICHMENT_CONCURRENCY)
+            content, _ = await self._enrich_lecture_async(course, lecture, semaphore)
+            return content
         
-        # Parse textbook title to extract authors
-        # Format: "Title by Authors"
-        if ' by ' in textbook_title:
-            title_part, authors_part = textbook_title.split(' by ', 1)
-        else:
-            title_part = textbook_title
-            authors_part = "Unknown"
+        return asyncio.run(run())
+    
+    async def _enrich_lecture_async(
+        self,
+        course: Dict,
+        lecture: Dict,
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[str, List[str]]:
+        """
+        Synthesize the topics of a lecture, skipping topics saved by an earlier run.
+        
+        Batches run concurrently; the semaphore bounds the batches in flight
+        across every lecture sharing it.
+        
+        Args:
+            course: The course dictionary
+            lecture: The lecture dictionary
+            semaphore: Shared bound on concurrent synthesis requests
+            
+        Returns:
+            (lecture content, topics that still have no content)
+        """
+        context = self._course_context(course)
+        course_name = context['COURSE_NAME']
+        title_part = context['TEXTBOOK_TITLE']
+        authors_part = context['AUTHORS']
         
         lecture_name = lecture.get('lecture_name', 'Unknown Lecture')
         lecture_number = lecture.get('lecture_number', 'N/A')
         topics = lecture.get('topics', [])
+        lecture_id = f"{course['course_id']}_lecture_{lecture_number}"
+        
+        store = TopicPartStore(self._parts_dir(course['course_id'], lecture_id))
+        keys = [self._topic_key(topic, context) for topic in topics]
+        pending = [i for i, key in enumerate(keys) if store.lookup(key) is None]
+        
+        # Batch by estimated output tokens, so short topics share a request and long ones get their own
+        topic_batches = [
+            [pending[j] for j in batch]
+            for batch in plan_topic_batches([topics[i] for i in pending])
+        ]
         
         print(f"\n{'='*80}")
         print(f"Enriching: {lecture_name}")
         print(f"Topics to process: {len(topics)}")
         print(f"Textbook: {title_part} by {authors_part}")
         print(f"{'='*80}\n")
-        
-        # Build the lecture document
+        if len(pending) < len(topics):
+            print(f"♻️  {len(topics) - len(pending)} topic(s) already synthesized, reusing saved sections")
+        print(f"📦 {len(pending)} topic(s) batched into {len(topic_batches)} batch(es) by estimated output tokens\n")
+        
+        async def run_batch(batch_info: str, batch: List[int]):
+            batch_topics = [topics[i] for i in batch]
+            batch_keys = [keys[i] for i in batch]
+            prompt = self._build_prompt(batch_topics, context)
+            async with semaphore:
+                topic_names = ", ".join([t[:40] + "..." if len(t) > 40 else t for t in batch_topics])
+                print(f"Processing {batch_info}: {topic_names}")
+                try:
+                    text, completed = await self._generate_async(prompt)
+                except Exception as e:
+                    print(f"Error synthesizing {batch_info} ({len(batch)} topic(s)): {e}")
+                    return
+            text = (text or "").strip()
+            if not text:
+                print(f"Error synthesizing {batch_info}: empty response")
+                return
+            
+            # Save each topic's section right away so it survives a later failure
+            if completed:
+                sections = split_topic_sections(text, len(batch)) if len(batch) > 1 else [text]
+                if sections is not None or not _TOPIC_HEADING_RE.search(text):
+                    store.save(batch_keys, sections or [text])
+                    print(f"✓ Completed {batch_info}: {len(batch)} topic(s)")
+                    return
+            
+            matched = match_topic_sections(text, batch_topics) if len(batch) > 1 else {}
+            if not completed and matched:
+                # The section cut off by the output limit is the last one in the response
+                matched.pop(max(matched))
+            if matched:
+                store.save([batch_keys[j] for j in sorted(matched)], [matched[j] for j in sorted(matched)])
+            missing = [i for j, i in enumerate(batch) if j not in matched]
+            
+            if completed and not missing:
+                print(f"✓ Completed {batch_info}: {len(batch)} topic(s)")
+                return
+            if completed:
+                print(f"⚠️  {batch_info}: response covered {len(matched)} of {len(batch)} topic(s); "
+                      f"{len(missing)} left for the next run")
+                return
+            if len(batch) == 1:
+                print(f"⚠️  {batch_info}: response was cut off (output limit or safety stop); "
+                      f"topic left for the next run")
+                return
+            
+            # Retry what the cut-off response did not finish: as one batch if it
+            # made progress, otherwise in two halves
+            print(f"✂️  {batch_info}: response was cut off after {len(matched)} of {len(batch)} topic(s), "
+                  f"retrying the remaining {len(missing)}")
+            if len(missing) < len(batch):
+                retries = [missing]
+            else:
+                middle = (len(missing) + 1) // 2
+                retries = [missing[:middle], missing[middle:]]
+            await asyncio.gather(*(
+                run_batch(f"{batch_info}.{n}", retry) for n, retry in enumerate(retries, 1)
+            ))
+        
+        await asyncio.gather(*(
+            run_batch(f"{lecture_id} batch {i}/{len(topic_batches)}", batch)
+            for i, batch in enumerate(topic_batches, 1)
+        ))
+        
+        # Build the lecture document in topic order
         enriched_content = []
         
         # Add lecture header
@@ -333,67 +702,72 @@ class TextbookContentEnricher:
         enriched_content.append(f"**Reference Textbook:** {title_part} by {authors_part}")
         enriched_content.append("\n" + "="*80 + "\n")
         
-        # Batch topics for efficient processing (2-3 topics per batch)
-        batch_size = 2  # Conservative batch size to maintain quality
-        topic_batches = [topics[i:i + batch_size] for i in range(0, len(topics), batch_size)]
-        
-        print(f"📦 Topics batched into {len(topic_batches)} batch(es) of ~{batch_size} topics each\n")
-        
-        # Process each batch
-        for batch_idx, topic_batch in enumerate(topic_batches, 1):
-            batch_info = f"Batch {batch_idx}/{len(topic_batches)}"
-            topic_names = ", ".join([t[:40] + "..." if len(t) > 40 else t for t in topic_batch])
-            print(f"Processing {batch_info}: {topic_names}")
-            
-            # Use batch synthesis for multiple topics, single synthesis for one topic
-            if len(topic_batch) > 1:
-                batch_content = self.synthesize_topic_batch(
-                    topics=topic_batch,
-                    textbook_title=title_part,
-                    authors=authors_part,
-                    course_name=course_name,
-                    course_description=course_description
-                )
-                enriched_content.append(batch_content)
+        failed_topics = []
+        seen_sections = set()
+        for topic, key in zip(topics, keys):
+            filename = store.lookup(key)
+            if filename is None:
+                failed_topics.append(topic)
+                section = _placeholder(topic)
+            elif filename in seen_sections:
+                continue  # Batch section shared with the previous topic
             else:
-                # Single topic - use original method
-                topic_content = self.synthesize_topic_content(
-                    topic=topic_batch[0],
-                    textbook_title=title_part,
-                    authors=authors_part,
-                    course_name=course_name,
-                    course_description=course_description
-                )
-                enriched_content.append(topic_content)
-            
+                seen_sections.add(filename)
+                section = store.read(filename)
+            enriched_content.append(section)
             enriched_content.append("\n" + "-"*80 + "\n")
-            print(f"✓ Completed {batch_info}: {len(topic_batch)} topic(s)\n")
-            
-            # Rate limiting: pause between API calls
-            time.sleep(2)
         
-        return "\n".join(enriched_content)
+        return "\n".join(enriched_content), failed_topics
     
-    def enrich_course(self, course_id: str) -> Dict[str, str]:
+    async def _enrich_and_save_async(
+        self,
+        course: Dict,
+        lecture: Dict,
+        output_path: Path,
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[str, Optional[Path]]:
         """
-        Enrich all lectures in a course that lack PDF slides.
+        Enrich a lecture and write it to output_path once every topic has content.
         
-        Args:
-            course_id: The course ID (e.g., "MS5031")
-            
         Returns:
-            Dictionary mapping lecture identifiers to enriched content
+            (lecture content, output_path or None if topics failed)
         """
-        # Find the course
-        course = None
-        for c in self.courses_data:
-            if c['course_id'] == course_id:
-                course = c
-                break
+        content, failed_topics = await self._enrich_lecture_async(course, lecture, semaphore)
+        lecture_id = f"{course['course_id']}_lecture_{lecture.get('lecture_number', 'N/A')}"
+        parts_dir = self._parts_dir(course['course_id'], lecture_id)
+        
+        if failed_topics:
+            self.incomplete_lectures.append(lecture_id)
+            print(f"\n⚠️  {lecture_id}: {len(failed_topics)} topic(s) failed, not writing {output_path.name}")
+            print(f"   Completed topics are saved in {parts_dir}; re-run to synthesize only the rest.\n")
+            return content, None
+        
+        _write_text_atomic(output_path, content)
+        TopicPartStore(parts_dir).clear()
+        print(f"\n✓ Saved enriched content to: {output_path}\n")
+        return content, output_path
+    
+    def _run_lectures(self, jobs: List[Tuple[Dict, Dict, Path]]) -> List[Tuple[str, Optional[Path]]]:
+        """
+        Enrich and save (course, lecture, output_path) jobs concurrently.
         
-        if not course:
-            raise ValueError(f"Course {course_id} not found")
+        Returns:
+            (content, saved path or None) per job, in job order
+        """
+        self.incomplete_lectures = []
         
+        async def run():
+            semaphore = asyncio.Semaphore(Config.ENRICHMENT_CONCURRENCY)
+            return await asyncio.gather(*(
+                self._enrich_and_save_async(course, lecture, output_path, semaphore)
+                for course, lecture, output_path in jobs
+            ))
+        
+        return asyncio.run(run())
+    
+    def _course_jobs(self, course: Dict) -> List[Tuple[Dict, Dict, Path]]:
+        """(course, lecture, output_path) for every lecture of a course without a PDF."""
+        course_id = course['course_id']
         if not course.get('reference_textbooks'):
             raise ValueError(f"Course {course_id} has no reference textbooks")
         
@@ -402,9 +776,7 @@ class TextbookContentEnricher:
         print(f"# Course ID: {course_id}")
         print(f"{'#'*80}\n")
         
-        enriched_lectures = {}
-        
-        # Process each lecture
+        jobs = []
         for lecture in course.get('lecture_slides', []):
             # Check if lecture needs enrichment
             if 'pdf_path' in lecture and lecture['pdf_path']:
@@ -412,25 +784,43 @@ class TextbookContentEnricher:
                 continue
             
             lecture_id = f"{course_id}_lecture_{lecture.get('lecture_number', 'unknown')}"
+            jobs.append((course, lecture, self.output_dir / course_id / f"{lecture_id}.txt"))
+        return jobs
+    
+    def enrich_course(self, course_id: str) -> Dict[str, str]:
+        """
+        Enrich all lectures in a course that lack PDF slides, concurrently.
+        
+        Args:
+            course_id: The course ID (e.g., "MS5031")
             
-            # Enrich the lecture
-            enriched_content = self.enrich_lecture(course, lecture)
-            enriched_lectures[lecture_id] = enriched_content
-            
-            # Save individual lecture content
-            output_path = self.output_dir / course_id / f"{lecture_id}.txt"
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(enriched_content)
-            
-            print(f"✓ Saved enriched content to: {output_path}\n")
+        Returns:
+            Dictionary mapping lecture identifiers to enriched content
+        """
+        course = self.get_course(course_id)
+        if not course:
+            raise ValueError(f"Course {course_id} not found")
+        
+        jobs = self._course_jobs(course)
+        results = self._run_lectures(jobs)
         
-        return enriched_lectures
+        return {
+            output_path.stem: content
+            for (_, _, output_path), (content, _) in zip(jobs, results)
+        }
+    
+    def identify_courses_needing_enrichment(self) -> List[Dict]:
+        """Courses with a reference textbook and at least one lecture without a PDF."""
+        return [
+            course for course in self.courses_data
+            if course.get('reference_textbooks')
+            and any(not lecture.get('pdf_path') for lecture in course.get('lecture_slides', []))
+        ]
     
     def enrich_all_courses(self) -> Dict[str, Dict[str, str]]:
         """
-        Enrich all courses that need content enrichment.
+        Enrich all courses that need content enrichment; lectures of every
+        course share the same pool of concurrent requests.
         
         Returns:
             Nested dictionary: {course_id: {lecture_id: enriched_content}}
@@ -442,12 +832,14 @@ class TextbookContentEnricher:
             print(f"  - {course['course_id']}: {course['course_name']}")
         print()
         
-        all_enriched_content = {}
-        
+        jobs = []
         for course in courses_needing_enrichment:
-            course_id = course['course_id']
-            enriched_lectures = self.enrich_course(course_id)
-            all_enriched_content[course_id] = enriched_lectures
+            jobs.extend(self._course_jobs(course))
+        results = self._run_lectures(jobs)
+        
+        all_enriched_content = {}
+        for (course, _, output_path), (content, _) in zip(jobs, results):
+            all_enriched_content.setdefault(course['course_id'], {})[output_path.stem] = content
         
         return all_enriched_content
 
@@ -467,8 +859,7 @@ def main():
     )
     parser.add_argument(
         "--lecture",
-        required=True,
-        help="Lecture number (e.g., 2)"
+        help="Lecture number (e.g., 2); omit to enrich every lecture of the course"
     )
     parser.add_argument(
         "--courses-json",
@@ -487,9 +878,16 @@ def main():
         output_dir="enriched_content"
     )
     
-    # Enrich the single lecture
     print("Starting textbook-based content enrichment...")
-    output_path = enricher.enrich_single_lecture(args.course, args.lecture)
+    if args.lecture is None:
+        enricher.enrich_course(args.course)
+        output_path = enricher.output_dir / args.course
+    else:
+        output_path = enricher.enrich_single_lecture(args.course, args.lecture)
+    
+    if enricher.incomplete_lectures:
+        print(f"\n❌ Incomplete lectures: {', '.join(enricher.incomplete_lectures)}")
+        sys.exit(1)
     
     if output_path:
         print(f"\n{'#'*80}")
@@ -27,6 +27,7 @@ from config import Config
 from cognitive_flashcard_generator.textbook_enrichment import TextbookContentEnricher
 from cognitive_flashcard_generator.generator import CognitiveFlashcardGenerator
 from cognitive_flashcard_generator.llm_client import LLMClient
+from cognitive_flashcard_generator.output_writer import write_course_json
 from cognitive_flashcard_generator.quiz_generator import QuizGenerator
 
 
@@ -152,8 +153,7 @@ class TextbookToLearningMaterials:
         output_dir.mkdir(parents=True, exist_ok=True)
         flashcards_path = output_dir / f"{course_code}_lec_{lecture_number}.json"
         
-        with open(flashcards_path, 'w', encoding='utf-8') as f:
-            json.dump(flashcards, f, indent=2, ensure_ascii=False)
+        write_course_json(flashcards_path, flashcards)
         
         print(f"✓ Flashcards saved to: {flashcards_path}\n")
         
@@ -184,8 +184,7 @@ class TextbookToLearningMaterials:
             quiz_output_dir.mkdir(parents=True, exist_ok=True)
             quiz_path = quiz_output_dir / f"{course_code}_lec_{lecture_number}_level_{level}.json"
             
-            with open(quiz_path, 'w', encoding='utf-8') as f:
-                json.dump(quiz_questions, f, indent=2, ensure_ascii=False)
+            write_course_json(quiz_path, quiz_questions)
             
             quiz_paths[f"level_{level}"] = str(quiz_path)
             print(f"✓ Level {level} quiz saved to: {quiz_path}")
@@ -8,6 +8,10 @@ for flashcard JSON files using Claude AI in "beast mode" for maximum quality.
 Usage:
     python update_diagrams_batch.py MS5150                    # Update all flashcards in course
     python update_diagrams_batch.py MS5150 SI_Pricing         # Update specific lecture
+    python update_diagrams_batch.py MS5150 --backup           # Keep a timestamped .bak of each file
+
+Files are replaced atomically, so a crash mid-run never leaves a half-written
+file; timestamped backups are only kept with --backup.
 """
 
 import os
@@ -21,6 +25,10 @@ from typing import List, Dict, Any, Optional
 import anthropic
 import dotenv
 
+# Allow running as a script from this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cognitive_flashcard_generator.output_writer import write_course_json
+
 dotenv.load_dotenv()
 
 # ============================================================================
@@ -404,7 +412,7 @@ def merge_diagrams(flashcards: List[Dict[str, Any]], generated_data: List[Dict[s
     return updated_count
 
 
-def process_file(file_path: Path) -> bool:
+def process_file(file_path: Path, backup: bool = False) -> bool:
     """
     Process a single flashcard file.
     
@@ -431,8 +439,9 @@ def process_file(file_path: Path) -> bool:
     print(f"{'='*80}")
     
     try:
-        # Create backup
-        create_backup(file_path)
+        # Create backup (the save below is atomic, so this is only for undoing changes)
+        if backup:
+            create_backup(file_path)
         
         # Load the file
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -494,8 +503,7 @@ def process_file(file_path: Path) -> bool:
         
         # Save the updated file
         print(f"\n→ Saving updated file...")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        write_course_json(file_path, data)
         
         print(f"✓ Successfully updated {file_path.name}")
         return True
@@ -514,17 +522,20 @@ def process_file(file_path: Path) -> bool:
 def main():
     """Main execution function."""
     # Parse arguments
-    if len(sys.argv) < 2:
+    args = [arg for arg in sys.argv[1:] if arg != "--backup"]
+    backup = len(args) < len(sys.argv) - 1
+    if not args:
         print("Usage:")
         print("  python update_diagrams_batch.py <course_code>                    # Update all")
         print("  python update_diagrams_batch.py <course_code> <lecture_prefix>   # Update one")
+        print("  Add --backup to keep a timestamped .bak copy of each file")
         print("\nExamples:")
         print("  python update_diagrams_batch.py MS5150")
         print("  python update_diagrams_batch.py MS5150 SI_Pricing")
         sys.exit(1)
     
-    course_code = sys.argv[1]
-    lecture_prefix = sys.argv[2] if len(sys.argv) > 2 else None
+    course_code = args[0]
+    lecture_prefix = args[1] if len(args) > 1 else None
     
     # Find target files
     print(f"\n🔍 Searching for target files...")
@@ -540,7 +551,7 @@ def main():
     failure_count = 0
     
     for file_path in target_files:
-        if process_file(file_path):
+        if process_file(file_path, backup):
             success_count += 1
         else:
             failure_count += 1
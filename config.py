@@ -37,6 +37,9 @@ class Config:
     
     # ==================== Processing Configuration ====================
     MAX_CHUNK_SIZE: int = int(os.getenv("MAX_CHUNK_SIZE", "4000"))
+    # Token budgets for generation input chunks (whole slides / sections are packed up to these)
+    SLIDE_CHUNK_MAX_TOKENS: int = int(os.getenv("SLIDE_CHUNK_MAX_TOKENS", "1500"))
+    TEXTBOOK_CHUNK_MAX_TOKENS: int = int(os.getenv("TEXTBOOK_CHUNK_MAX_TOKENS", "3000"))
     
     # ==================== Batch Processing Configuration ====================
     # Enable batch processing for concurrent API calls
@@ -45,6 +48,86 @@ class Config:
     MAX_CONCURRENT_REQUESTS: int = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
     # Batch size for grouping tasks (0 = no limit, process all at once)
     BATCH_SIZE: int = int(os.getenv("BATCH_SIZE", "0"))
+
+    # ==================== Rate Limiting Configuration ====================
+    # Per-provider budgets shared by every LLM caller in the process (0 = unlimited)
+    GEMINI_REQUESTS_PER_MINUTE: int = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1000"))
+    GEMINI_TOKENS_PER_MINUTE: int = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+    OPENAI_REQUESTS_PER_MINUTE: int = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+    OPENAI_TOKENS_PER_MINUTE: int = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "500000"))
+    # Retries for 429s and transient errors, with jittered exponential backoff
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "2"))
+    LLM_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "60"))
+
+    # ==================== LLM Response Cache ====================
+    # Content-addressed SQLite cache so reruns only pay for changed prompts
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "./.cache/llm_responses.sqlite")
+    LLM_CACHE_MAX_MB: int = int(os.getenv("LLM_CACHE_MAX_MB", "1024"))
+    # Bump to invalidate every cached response at once
+    LLM_CACHE_VERSION: str = os.getenv("LLM_CACHE_VERSION", "1")
+
+    # ==================== Slide Rendering Configuration ====================
+    # Image format for rendered slides: png, jpeg or webp
+    SLIDE_IMAGE_FORMAT: str = os.getenv("SLIDE_IMAGE_FORMAT", "jpeg").lower()
+    SLIDE_IMAGE_QUALITY: int = int(os.getenv("SLIDE_IMAGE_QUALITY", "85"))
+    # Pixel budget per slide (0 = render at full DPI); vision models downscale larger images anyway
+    SLIDE_MAX_PIXELS: int = int(os.getenv("SLIDE_MAX_PIXELS", "2000000"))
+    SLIDE_RENDER_WORKERS: int = int(os.getenv("SLIDE_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+    
+    # ==================== Diagram Rendering Configuration ====================
+    # Long-lived Mermaid renderer processes (one headless browser each)
+    MERMAID_RENDER_WORKERS: int = int(os.getenv("MERMAID_RENDER_WORKERS", "2"))
+    # Concurrent Graphviz subprocesses
+    GRAPHVIZ_RENDER_WORKERS: int = int(os.getenv("GRAPHVIZ_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+    DIAGRAM_RENDER_TIMEOUT_SECONDS: float = float(os.getenv("DIAGRAM_RENDER_TIMEOUT_SECONDS", "30"))
+    # Path to the @mermaid-js/mermaid-cli package (default: found via `npm root -g`)
+    MERMAID_CLI_DIR: str = os.getenv("MERMAID_CLI_DIR", "")
+    # Mermaid theme, and an optional mermaid config JSON file (same format as `mmdc -c`)
+    MERMAID_THEME: str = os.getenv("MERMAID_THEME", "default")
+    MERMAID_CONFIG_FILE: str = os.getenv("MERMAID_CONFIG_FILE", "")
+    # Mermaid worker (Node/browser) stderr is appended here
+    DIAGRAM_RENDER_LOG: str = os.getenv("DIAGRAM_RENDER_LOG", "./logs/render/mermaid_worker.log")
+    # Content-hash cache of rendered diagrams, so unchanged diagrams are never re-rendered
+    RENDER_CACHE_ENABLED: bool = os.getenv("RENDER_CACHE_ENABLED", "true").lower() == "true"
+    RENDER_CACHE_DIR: str = os.getenv("RENDER_CACHE_DIR", "./.cache/diagrams")
+    
+    # ==================== Slide Analysis Configuration ====================
+    # Gemini Vision batches in flight at once (throughput is paced by the rate limiter)
+    SLIDE_ANALYSIS_CONCURRENCY: int = int(os.getenv("SLIDE_ANALYSIS_CONCURRENCY", "4"))
+    # USD per million tokens, for the cost estimate printed after analysis
+    GEMINI_INPUT_COST_PER_MTOK: float = float(os.getenv("GEMINI_INPUT_COST_PER_MTOK", "0.30"))
+    GEMINI_OUTPUT_COST_PER_MTOK: float = float(os.getenv("GEMINI_OUTPUT_COST_PER_MTOK", "2.50"))
+    
+    # ==================== Course Build Configuration ====================
+    # Stages run concurrently by course_build (rate-limit budgets are split between them)
+    BUILD_JOBS: int = int(os.getenv("BUILD_JOBS", "4"))
+    # Per-stage logs of course builds
+    BUILD_LOG_DIR: str = os.getenv("BUILD_LOG_DIR", "./logs/build")
+    
+    # ==================== Textbook Enrichment Configuration ====================
+    # Topic batches synthesized at once, across all lectures being enriched
+    ENRICHMENT_CONCURRENCY: int = int(os.getenv("ENRICHMENT_CONCURRENCY", "4"))
+    # Estimated output tokens topics are packed into one synthesis batch up to
+    ENRICHMENT_BATCH_TOKENS: int = int(os.getenv("ENRICHMENT_BATCH_TOKENS", "15000"))
+    # Hard output token limit of one synthesis request; kept above ENRICHMENT_BATCH_TOKENS so a
+    # batch that runs longer than estimated still finishes instead of being cut off
+    ENRICHMENT_MAX_OUTPUT_TOKENS: int = int(os.getenv("ENRICHMENT_MAX_OUTPUT_TOKENS", "24000"))
+    # Expected output tokens of one topic (topics listing several subtopics get more)
+    ENRICHMENT_TOKENS_PER_TOPIC: int = int(os.getenv("ENRICHMENT_TOKENS_PER_TOPIC", "5000"))
+    
+    # ==================== Output Files Configuration ====================
+    # Indent of generated flashcard / quiz JSON (0 = compact single line)
+    OUTPUT_JSON_INDENT: int = int(os.getenv("OUTPUT_JSON_INDENT", "2"))
+    # Extra encodings written to an encoded/ subdirectory next to each file: comma-separated min, gz, msgpack
+    OUTPUT_EXTRA_ENCODINGS: str = os.getenv("OUTPUT_EXTRA_ENCODINGS", "")
+    
+    # ==================== Validation Configuration ====================
+    # Worker processes used by content_validation to parse and check files
+    VALIDATION_WORKERS: int = int(os.getenv("VALIDATION_WORKERS", str(min(8, os.cpu_count() or 1))))
+    # Per-file validation results, reused while a file's content hash is unchanged
+    VALIDATION_CACHE_PATH: str = os.getenv("VALIDATION_CACHE_PATH", "./.cache/validation.json")
     
     # ==================== LaTeX Configuration ====================
     LATEX_ENABLED: bool = os.getenv("LATEX_ENABLED", "true").lower() == "true"
@@ -79,6 +162,15 @@ class Config:
         if cls.MAX_CHUNK_SIZE < 100:
             return False, "MAX_CHUNK_SIZE must be at least 100 characters."
         
+        if cls.SLIDE_CHUNK_MAX_TOKENS < 100 or cls.TEXTBOOK_CHUNK_MAX_TOKENS < 100:
+            return False, "SLIDE_CHUNK_MAX_TOKENS and TEXTBOOK_CHUNK_MAX_TOKENS must be at least 100 tokens."
+        
+        if cls.ENRICHMENT_CONCURRENCY < 1 or cls.ENRICHMENT_TOKENS_PER_TOPIC < 1:
+            return False, "ENRICHMENT_CONCURRENCY and ENRICHMENT_TOKENS_PER_TOPIC must be at least 1."
+        
+        if not 1 <= cls.ENRICHMENT_BATCH_TOKENS < cls.ENRICHMENT_MAX_OUTPUT_TOKENS:
+            return False, "ENRICHMENT_BATCH_TOKENS must be at least 1 and below ENRICHMENT_MAX_OUTPUT_TOKENS."
+        
         return True, None
     
     @classmethod
@@ -96,10 +188,17 @@ class Config:
         print(f"  • Input Directory: {cls.INPUT_DIR}")
         print(f"  • Output Directory: {cls.OUTPUT_DIR}")
         print(f"  • Max Chunk Size: {cls.MAX_CHUNK_SIZE} chars")
+        print(f"  • Chunk Token Budget: {cls.SLIDE_CHUNK_MAX_TOKENS:,} (slides), {cls.TEXTBOOK_CHUNK_MAX_TOKENS:,} (textbook)")
         print(f"  • Batch Processing: {'Enabled' if cls.BATCH_PROCESSING_ENABLED else 'Disabled'}")
         if cls.BATCH_PROCESSING_ENABLED:
             print(f"  • Max Concurrent Requests: {cls.MAX_CONCURRENT_REQUESTS}")
             print(f"  • Batch Size: {cls.BATCH_SIZE if cls.BATCH_SIZE > 0 else 'Unlimited'}")
+        print(f"  • Gemini Rate Limit: {cls.GEMINI_REQUESTS_PER_MINUTE} req/min, {cls.GEMINI_TOKENS_PER_MINUTE:,} tokens/min")
+        print(f"  • OpenAI Rate Limit: {cls.OPENAI_REQUESTS_PER_MINUTE} req/min, {cls.OPENAI_TOKENS_PER_MINUTE:,} tokens/min")
+        print(f"  • Textbook Enrichment: {cls.ENRICHMENT_CONCURRENCY} batches in flight, "
+              f"~{cls.ENRICHMENT_BATCH_TOKENS:,} estimated output tokens per batch "
+              f"(limit {cls.ENRICHMENT_MAX_OUTPUT_TOKENS:,})")
+        print(f"  • LLM Response Cache: {cls.LLM_CACHE_PATH if cls.LLM_CACHE_ENABLED else 'Disabled'}")
         print(f"  • LaTeX Enabled: {cls.LATEX_ENABLED}")
         print(f"  • Anki Enabled: {cls.ANKI_ENABLED}")
         provider = (cls.LLM_PROVIDER or 'gemini').lower()
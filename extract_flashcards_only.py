@@ -13,6 +13,8 @@ import os
 import glob
 from pathlib import Path
 
+from cognitive_flashcard_generator.output_writer import write_course_json
+
 
 def find_cognitive_flashcard_files(courses_dir: str) -> list:
     """Find all *_cognitive_flashcards.json files in the courses directory."""
@@ -49,8 +51,7 @@ def process_flashcard_file(file_path: str) -> None:
     output_path = input_path.with_name(output_filename)
 
     # Save the flashcards-only data
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(flashcards_only_data, f, indent=2, ensure_ascii=False)
+    write_course_json(output_path, flashcards_only_data)
 
     print(f"Created: {output_path}")
 
@@ -4,27 +4,47 @@ Hard Quiz Questions Generator - CLI Tool
 Generates challenging, tricky quiz questions from structured slide analysis JSON files.
 
 Usage:
-    python generate_hard_questions.py [course_id] [lecture_name]
+    python generate_hard_questions.py [course_id] [lecture_name] [--force] [--jobs N]
     
     If course_id is not provided, all courses will be processed.
     If lecture_name is provided, only that specific lecture will be processed.
+    Existing hard question files are kept while the structured analysis they
+    were generated from (and the prompt) is unchanged; with --force they are
+    always regenerated, bypassing the LLM response cache.
+    Exits with status 1 if any lecture fails.
+    With --jobs N, up to N lectures (across all selected courses) are generated
+    at once, paced by the shared Gemini rate limiter.
     
 Examples:
     python generate_hard_questions.py MS5260
     python generate_hard_questions.py MS5260 MIS_lec_4
-    python generate_hard_questions.py
+    python generate_hard_questions.py --jobs 4
 """
 
-import sys
+import argparse
+import asyncio
+import hashlib
 import json
-import os
-import re # Import re module
+import sys
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import google.generativeai as genai
 
 from config import Config
+from cognitive_flashcard_generator.json_stream import JSONObjectStream
+from cognitive_flashcard_generator.output_writer import write_course_json
+from cognitive_flashcard_generator.rate_limiter import estimate_tokens, get_rate_limiter
+from cognitive_flashcard_generator.response_cache import (
+    forget_cached,
+    gemini_result,
+    generate_cached,
+    generate_cached_async,
+)
+
+# process_lecture outcomes
+GENERATED = "generated"
+CACHED = "cached"
 
 
 class HardQuestionGenerator:
@@ -40,7 +60,9 @@ class HardQuestionGenerator:
         """
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel(model)
+        self.model_name = model
         self.prompt_template = self._load_prompt_template()
+        self.prompt_hash = hashlib.sha256(self.prompt_template.encode('utf-8')).hexdigest()
     
     def _load_prompt_template(self) -> str:
         """Load the hard questions prompt template."""
@@ -164,7 +186,86 @@ class HardQuestionGenerator:
             traceback.print_exc()
             return ""
     
-    def generate_questions(self, content: str, lecture_name: str, max_retries: int = 3) -> Optional[Dict[str, Any]]:
+    def _build_prompt(self, content: str, lecture_name: str) -> str:
+        return f"{self.prompt_template}\n\n# LECTURE CONTENT\n\nLecture Name: {lecture_name}\n\n{content}"
+    
+    def _parse_response(
+        self,
+        raw_text: str,
+        full_prompt: str,
+        lecture_name: str,
+        completed: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Parse the question objects of a response and report their type distribution.
+        
+        Args:
+            raw_text: Response text
+            full_prompt: Prompt the response answers (to evict it from the cache)
+            lecture_name: Name of the lecture, for logging
+            completed: Whether Gemini finished normally (not at MAX_TOKENS or a safety stop)
+        
+        Returns:
+            Dictionary with questions list, or None if the response had no
+            questions or was cut off (a partial set must not be saved as the lecture's)
+        """
+        if not raw_text:
+            print(f"⚠️  [{lecture_name}] Empty response from Gemini")
+            return None
+        
+        print(f"📥 [{lecture_name}] Received response from Gemini")
+        
+        # Parse the question objects (tolerates fences and trailing commas)
+        stream = JSONObjectStream()
+        stream.feed(raw_text)
+        truncated = stream.truncated
+        questions = stream.close()
+        
+        if truncated or not completed:
+            reason = "ends mid-JSON" if truncated else "stopped before finishing (output limit or safety stop)"
+            print(f"⚠️  [{lecture_name}] Response {reason}; discarding {len(questions)} complete question(s)")
+            # Don't replay the partial response on the next attempt
+            forget_cached("gemini", self.model_name, full_prompt)
+            return None
+        
+        if not questions:
+            print(f"⚠️  [{lecture_name}] No questions generated")
+            print(f"   RAW RESPONSE (first 500 chars): {raw_text[:500]}...")
+            # Don't replay the unparseable response on the next attempt
+            forget_cached("gemini", self.model_name, full_prompt)
+            return None
+        
+        print(f"✅ [{lecture_name}] Successfully generated {len(questions)} questions")
+        
+        # Validate question types distribution
+        type_counts = {}
+        for q in questions:
+            q_type = q.get('type', 'unknown')
+            type_counts[q_type] = type_counts.get(q_type, 0) + 1
+        
+        print(f"\n📊 [{lecture_name}] Question Type Distribution:")
+        for q_type, count in sorted(type_counts.items()):
+            percentage = (count / len(questions)) * 100
+            print(f"   • {q_type}: {count} ({percentage:.1f}%)")
+        
+        return {'questions': questions}
+    
+    def _announce(self, content: str, lecture_name: str):
+        print(f"\n{'='*70}")
+        print(f"🧠 Generating Hard Quiz Questions")
+        print(f"📚 Lecture: {lecture_name}")
+        print(f"{'='*70}")
+        print(f"📤 Sending request to Gemini...")
+        print(f"   📊 Content length: {len(content):,} characters")
+        print(f"   📊 Estimated tokens: ~{len(content) // 4:,}")
+    
+    def generate_questions(
+        self,
+        content: str,
+        lecture_name: str,
+        max_retries: int = 3,
+        force: bool = False
+    ) -> Optional[Dict[str, Any]]:
         """
         Generate hard questions from slide content with retry logic.
         
@@ -172,107 +273,149 @@ class HardQuestionGenerator:
             content: Formatted slide content
             lecture_name: Name of the lecture (e.g., 'MIS_lec_4')
             max_retries: Maximum number of retry attempts
+            force: Drop the cached response for this prompt and ask the model again
             
         Returns:
             Dictionary with questions list or None if generation fails
         """
-        print(f"\n{'='*70}")
-        print(f"🧠 Generating Hard Quiz Questions")
-        print(f"📚 Lecture: {lecture_name}")
-        print(f"{'='*70}")
+        self._announce(content, lecture_name)
+        full_prompt = self._build_prompt(content, lecture_name)
+        if force:
+            forget_cached("gemini", self.model_name, full_prompt)
+        
+        finish = {}
+        
+        def request() -> Tuple[str, bool]:
+            text, finish['completed'] = gemini_result(self.model.generate_content(full_prompt))
+            return text, finish['completed']
         
         for attempt in range(max_retries):
             try:
-                print(f"\n🔄 Attempt {attempt + 1}/{max_retries}")
-                
-                # Prepare the full prompt
-                full_prompt = f"{self.prompt_template}\n\n# LECTURE CONTENT\n\nLecture Name: {lecture_name}\n\n{content}"
-                
-                print(f"📤 Sending request to Gemini...")
-                print(f"   📊 Content length: {len(content):,} characters")
-                print(f"   📊 Estimated tokens: ~{len(content) // 4:,}")
-                
-                # Generate content
-                response = self.model.generate_content(full_prompt)
-                
-                if not response or not response.text:
-                    print(f"⚠️  Empty response from Gemini")
-                    continue
-                
-                print(f"📥 Received response from Gemini")
-                
-                # Parse JSON response
-                response_text = response.text.strip()
-                
-                # Remove markdown code blocks if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                
-                response_text = response_text.strip()
-                
-                # NEW: Clean up trailing commas from objects and arrays
-                response_text = re.sub(r",(\s*[}\]])", r"\1", response_text)
+                print(f"\n🔄 [{lecture_name}] Attempt {attempt + 1}/{max_retries}")
+                finish['completed'] = True  # Cached responses finished normally
                 
-                # Parse JSON
-                questions_data = json.loads(response_text)
+                # Generate content (served from the response cache when the prompt is unchanged)
+                raw_text = generate_cached(
+                    "gemini",
+                    self.model_name,
+                    full_prompt,
+                    request,
+                    estimated_tokens=estimate_tokens("gemini", len(full_prompt)),
+                )
                 
-                # Validate structure
-                if not isinstance(questions_data, dict) or 'questions' not in questions_data:
-                    print(f"⚠️  Invalid response structure (missing 'questions' key)")
-                    continue
+                questions_data = self._parse_response(raw_text, full_prompt, lecture_name, finish['completed'])
+                if questions_data:
+                    return questions_data
                 
-                questions = questions_data['questions']
-                
-                if not isinstance(questions, list) or len(questions) == 0:
-                    print(f"⚠️  No questions generated")
-                    continue
-                
-                print(f"✅ Successfully generated {len(questions)} questions")
-                
-                # Validate question types distribution
-                type_counts = {}
-                for q in questions:
-                    q_type = q.get('type', 'unknown')
-                    type_counts[q_type] = type_counts.get(q_type, 0) + 1
-                
-                print(f"\n📊 Question Type Distribution:")
-                for q_type, count in sorted(type_counts.items()):
-                    percentage = (count / len(questions)) * 100
-                    print(f"   • {q_type}: {count} ({percentage:.1f}%)")
-                
-                return questions_data
+            except Exception as e:
+                print(f"❌ [{lecture_name}] Error generating questions: {e}")
+            if attempt < max_retries - 1:
+                print(f"   Retrying...")
+        
+        print(f"❌ [{lecture_name}] Failed to generate questions after {max_retries} attempts")
+        return None
+    
+    async def generate_questions_async(
+        self,
+        content: str,
+        lecture_name: str,
+        max_retries: int = 3,
+        force: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Async variant of generate_questions, paced by the shared Gemini rate limiter.
+        
+        Args:
+            content: Formatted slide content
+            lecture_name: Name of the lecture (e.g., 'MIS_lec_4')
+            max_retries: Maximum number of retry attempts
+            force: Drop the cached response for this prompt and ask the model again
+            
+        Returns:
+            Dictionary with questions list or None if generation fails
+        """
+        self._announce(content, lecture_name)
+        full_prompt = self._build_prompt(content, lecture_name)
+        if force:
+            forget_cached("gemini", self.model_name, full_prompt)
+        
+        finish = {}
+        
+        async def request() -> Tuple[str, bool]:
+            response = await self.model.generate_content_async(full_prompt)
+            text, finish['completed'] = gemini_result(response)
+            return text, finish['completed']
+        
+        for attempt in range(max_retries):
+            try:
+                print(f"\n🔄 [{lecture_name}] Attempt {attempt + 1}/{max_retries}")
+                finish['completed'] = True  # Cached responses finished normally
+                raw_text = await generate_cached_async(
+                    "gemini",
+                    self.model_name,
+                    full_prompt,
+                    request,
+                    estimated_tokens=estimate_tokens("gemini", len(full_prompt)),
+                )
                 
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON parsing error: {e}")
-                # Log the problematic text for easier debugging
-                print(f"   RAW RESPONSE (first 500 chars): {response.text[:500]}...")
-                if attempt < max_retries - 1:
-                    print(f"   Retrying...")
-                continue
+                questions_data = self._parse_response(raw_text, full_prompt, lecture_name, finish['completed'])
+                if questions_data:
+                    return questions_data
                 
             except Exception as e:
-                print(f"❌ Error generating questions: {e}")
-                if attempt < max_retries - 1:
-                    print(f"   Retrying...")
-                continue
+                print(f"❌ [{lecture_name}] Error generating questions: {e}")
+            if attempt < max_retries - 1:
+                print(f"   Retrying...")
         
-        print(f"❌ Failed to generate questions after {max_retries} attempts")
+        print(f"❌ [{lecture_name}] Failed to generate questions after {max_retries} attempts")
         return None
 
 
-def save_hard_questions(questions_data: Dict[str, Any], output_path: Path, lecture_name: str, course_id: str):
+def file_hash(path: Path) -> str:
+    """Hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def lecture_paths(course_id: str, lecture_name: str) -> Tuple[Path, Path]:
+    """
+    Input and output paths of a lecture.
+    
+    Returns:
+        (structured analysis JSON path, hard questions JSON path)
+    """
+    course_base_dir = Path(f"./courses/{course_id}")
+    structured_json_path = course_base_dir / "slide_analysis" / f"{lecture_name}_structured_analysis.json"
+    output_path = course_base_dir / "cognitive_flashcards" / lecture_name / f"{lecture_name}_hard_questions.json"
+    return structured_json_path, output_path
+
+
+def save_hard_questions(
+    questions_data: Dict[str, Any],
+    output_path: Path,
+    lecture_name: str,
+    course_id: str,
+    source_hash: str = "",
+    prompt_hash: str = "",
+    model: str = ""
+):
     """
     Save hard questions to JSON file with metadata.
     
+    The file is written to a temporary file and renamed into place, so readers
+    (the backend's quiz router) never see a partially written file.
+    
     Args:
         questions_data: Dictionary containing questions list
         output_path: Path to save the JSON file
         lecture_name: Name of the lecture
         course_id: Course identifier
+        source_hash: SHA-256 of the structured analysis the questions were generated from
+        prompt_hash: SHA-256 of the prompt template
+        model: Gemini model used
     """
     # Add metadata
     output_data = {
@@ -282,121 +425,207 @@ def save_hard_questions(questions_data: Dict[str, Any], output_path: Path, lectu
             'course_id': course_id,
             'lecture_name': lecture_name,
             'difficulty': 'hard',
-            'generator_version': '1.0.0'
+            'generator_version': '1.1.0',
+            'source_hash': source_hash,
+            'prompt_hash': prompt_hash,
+            'model': model
         },
         'questions': questions_data.get('questions', [])
     }
     
-    # Ensure output directory exists
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Save to file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+    # Save to a temporary file in the same directory, then atomically replace
+    write_course_json(output_path, output_data)
     
     print(f"💾 Saved hard questions: {output_path}")
 
 
-def check_cache(output_path: Path) -> bool:
+def check_cache(
+    output_path: Path,
+    source_path: Optional[Path] = None,
+    source_hash: str = "",
+    prompt_hash: str = "",
+    model: str = ""
+) -> bool:
     """
-    Check if hard questions already exist for this lecture.
+    Check if up-to-date hard questions already exist for this lecture.
+    
+    Questions are up to date when they were generated from a structured
+    analysis with the same content hash, with the same prompt and model.
+    Files written before hashes were recorded count as up to date unless the
+    analysis was modified after them.
     
     Args:
         output_path: Path where questions would be saved
+        source_path: Structured analysis JSON the questions are generated from
+        source_hash: Current SHA-256 of source_path
+        prompt_hash: Current SHA-256 of the prompt template
+        model: Gemini model that would be used
         
     Returns:
-        True if cache exists, False otherwise
+        True if the cached questions can be reused, False otherwise
     """
-    if output_path.exists():
-        print(f"✅ Cache found: {output_path}")
-        print(f"   Skipping generation (delete file to regenerate)")
-        return True
-    return False
+    if not output_path.exists():
+        return False
+    
+    try:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f).get('metadata', {})
+    except (OSError, json.JSONDecodeError, AttributeError):
+        print(f"♻️  Unreadable hard questions file, regenerating: {output_path}")
+        return False
+    
+    if metadata.get('source_hash'):
+        stale = [
+            what for what, recorded, current in (
+                ("structured analysis", metadata.get('source_hash'), source_hash),
+                ("prompt", metadata.get('prompt_hash'), prompt_hash),
+                ("model", metadata.get('model'), model),
+            )
+            if current and recorded != current
+        ]
+    elif source_path is not None and source_path.stat().st_mtime > output_path.stat().st_mtime:
+        stale = ["structured analysis"]
+    else:
+        stale = []
+    
+    if stale:
+        print(f"♻️  {', '.join(stale).capitalize()} changed since {output_path.name} was generated, regenerating")
+        return False
+    
+    print(f"✅ Cache found: {output_path}")
+    print(f"   Skipping generation (analysis unchanged; use --force to regenerate)")
+    return True
 
 
-def process_lecture(course_id: str, lecture_name: str, generator: HardQuestionGenerator, force_regenerate: bool = False):
+def _prepare_lecture(
+    course_id: str,
+    lecture_name: str,
+    generator: HardQuestionGenerator,
+    force_regenerate: bool
+) -> Tuple[Any, Optional[str], str, Path]:
     """
-    Process a single lecture to generate hard questions.
+    Check inputs and cache for a lecture and extract its content.
     
-    Args:
-        course_id: Course identifier (e.g., 'MS5260')
-        lecture_name: Lecture name (e.g., 'MIS_lec_4')
-        generator: HardQuestionGenerator instance
-        force_regenerate: If True, regenerate even if cache exists
+    Returns:
+        (outcome if no generation is needed else None, content, source hash, output path)
     """
     print(f"\n{'─'*70}")
     print(f"📄 Processing: {lecture_name}")
     print(f"{'─'*70}")
     
-    # Define paths
-    course_base_dir = Path(f"./courses/{course_id}")
-    analysis_dir = course_base_dir / "slide_analysis"
-    structured_json_path = analysis_dir / f"{lecture_name}_structured_analysis.json"
-    
-    # Output path
-    output_dir = course_base_dir / "cognitive_flashcards" / lecture_name
-    output_path = output_dir / f"{lecture_name}_hard_questions.json"
+    structured_json_path, output_path = lecture_paths(course_id, lecture_name)
     
     # Check if structured analysis exists
     if not structured_json_path.exists():
         print(f"❌ Structured analysis not found: {structured_json_path}")
-        return False
+        return False, None, "", output_path
     
     # Check cache
-    if not force_regenerate and check_cache(output_path):
-        return True
+    source_hash = file_hash(structured_json_path)
+    if not force_regenerate and check_cache(
+        output_path, structured_json_path, source_hash, generator.prompt_hash, generator.model_name
+    ):
+        return CACHED, None, source_hash, output_path
     
     # Extract content
     content = generator._extract_slide_content(structured_json_path)
     
     if not content:
         print(f"⚠️  No content extracted from {lecture_name}")
-        return False
+        return False, None, source_hash, output_path
     
     print(f"📄 Extracted {len(content):,} characters of content")
-    
-    # Generate questions
-    questions_data = generator.generate_questions(content, lecture_name)
-    
+    return None, content, source_hash, output_path
+
+
+def _finish_lecture(
+    course_id: str,
+    lecture_name: str,
+    generator: HardQuestionGenerator,
+    questions_data: Optional[Dict[str, Any]],
+    source_hash: str,
+    output_path: Path
+):
     if not questions_data:
         print(f"❌ Failed to generate questions for {lecture_name}")
         return False
     
     # Save questions
-    save_hard_questions(questions_data, output_path, lecture_name, course_id)
+    save_hard_questions(
+        questions_data, output_path, lecture_name, course_id,
+        source_hash=source_hash, prompt_hash=generator.prompt_hash, model=generator.model_name
+    )
     
     print(f"✅ Successfully processed {lecture_name}")
-    return True
+    return GENERATED
 
 
-def process_course(course_id: str, lecture_name: Optional[str] = None, force_regenerate: bool = False):
+def process_lecture(course_id: str, lecture_name: str, generator: HardQuestionGenerator, force_regenerate: bool = False):
     """
-    Process a course to generate hard questions for all or specific lectures.
+    Process a single lecture to generate hard questions.
     
     Args:
         course_id: Course identifier (e.g., 'MS5260')
-        lecture_name: Optional specific lecture to process
-        force_regenerate: If True, regenerate even if cache exists
+        lecture_name: Lecture name (e.g., 'MIS_lec_4')
+        generator: HardQuestionGenerator instance
+        force_regenerate: If True, regenerate even if cache is up to date
+        
+    Returns:
+        GENERATED, CACHED, or False on failure
     """
-    print(f"\n{'='*80}")
-    print(f"📚 Generating Hard Questions for Course: {course_id}")
-    print(f"{'='*80}")
+    outcome, content, source_hash, output_path = _prepare_lecture(
+        course_id, lecture_name, generator, force_regenerate
+    )
+    if content is None:
+        return outcome
     
-    # Initialize generator
-    generator = HardQuestionGenerator(
-        api_key=Config.GEMINI_API_KEY,
-        model=Config.GEMINI_MODEL
+    # Generate questions
+    questions_data = generator.generate_questions(content, lecture_name, force=force_regenerate)
+    return _finish_lecture(course_id, lecture_name, generator, questions_data, source_hash, output_path)
+
+
+async def process_lecture_async(
+    course_id: str,
+    lecture_name: str,
+    generator: HardQuestionGenerator,
+    force_regenerate: bool = False
+):
+    """
+    Async variant of process_lecture; file work runs in a worker thread.
+    
+    Returns:
+        GENERATED, CACHED, or False on failure
+    """
+    outcome, content, source_hash, output_path = await asyncio.to_thread(
+        _prepare_lecture, course_id, lecture_name, generator, force_regenerate
     )
+    if content is None:
+        return outcome
     
-    # Define paths
-    course_base_dir = Path(f"./courses/{course_id}")
-    analysis_dir = course_base_dir / "slide_analysis"
+    questions_data = await generator.generate_questions_async(content, lecture_name, force=force_regenerate)
+    return await asyncio.to_thread(
+        _finish_lecture, course_id, lecture_name, generator, questions_data, source_hash, output_path
+    )
+
+
+def find_lectures(course_id: str, lecture_name: Optional[str] = None) -> List[str]:
+    """
+    Lectures of a course that have a structured analysis.
+    
+    Args:
+        course_id: Course identifier (e.g., 'MS5260')
+        lecture_name: Optional specific lecture to process
+        
+    Returns:
+        Lecture names (empty if there is nothing to process)
+    """
+    analysis_dir = Path(f"./courses/{course_id}") / "slide_analysis"
     
     # Check if analysis directory exists
     if not analysis_dir.exists():
         print(f"⚠️  No slide analysis found for course: {course_id}")
         print(f"   Please run: python -m pdf_slide_processor.main {course_id}")
-        return
+        return []
     
     # Find lectures to process
     if lecture_name:
@@ -407,70 +636,129 @@ def process_course(course_id: str, lecture_name: Optional[str] = None, force_reg
             print(f"   Available lectures in {analysis_dir}:")
             for f in analysis_dir.glob("*_structured_analysis.json"):
                 print(f"      • {f.stem.replace('_structured_analysis', '')}")
-            return
+            return []
         
-        lectures = [lecture_name]
         print(f"\n🎯 Processing specific lecture: {lecture_name}")
-    else:
-        # Find all lectures
-        structured_files = list(analysis_dir.glob("*_structured_analysis.json"))
-        if not structured_files:
-            print(f"⚠️  No structured analysis files found in {analysis_dir}")
-            return
-        
-        lectures = [f.stem.replace("_structured_analysis", "") for f in structured_files]
-        print(f"\n📊 Found {len(lectures)} lecture(s) to process")
+        return [lecture_name]
     
-    # Process each lecture
-    success_count = 0
-    skip_count = 0
-    fail_count = 0
+    # Find all lectures
+    structured_files = sorted(analysis_dir.glob("*_structured_analysis.json"))
+    if not structured_files:
+        print(f"⚠️  No structured analysis files found in {analysis_dir}")
+        return []
     
-    for i, lec_name in enumerate(lectures, 1):
-        print(f"\n{'#'*80}")
-        print(f"# Lecture {i}/{len(lectures)}")
-        print(f"{'#'*80}")
+    lectures = [f.stem.replace("_structured_analysis", "") for f in structured_files]
+    print(f"\n📊 Found {len(lectures)} lecture(s) to process in {course_id}")
+    return lectures
+
+
+def new_generator() -> HardQuestionGenerator:
+    """HardQuestionGenerator for the configured Gemini model."""
+    return HardQuestionGenerator(
+        api_key=Config.GEMINI_API_KEY,
+        model=Config.GEMINI_MODEL
+    )
+
+
+def run_lectures(
+    targets: List[Tuple[str, str]],
+    generator: HardQuestionGenerator,
+    force_regenerate: bool = False,
+    jobs: int = 1
+) -> List[Any]:
+    """
+    Process (course_id, lecture_name) targets, up to `jobs` at once.
+    
+    With jobs > 1 the lectures run concurrently on one event loop; every
+    request still goes through the shared Gemini rate limiter, which paces
+    and backs off for all of them together.
+    
+    Returns:
+        Outcome per target (GENERATED, CACHED or False), in target order
+    """
+    if jobs <= 1:
+        results = []
+        for i, (course_id, lec_name) in enumerate(targets, 1):
+            print(f"\n{'#'*80}")
+            print(f"# Lecture {i}/{len(targets)}")
+            print(f"{'#'*80}")
+            try:
+                results.append(process_lecture(course_id, lec_name, generator, force_regenerate))
+            except Exception as e:
+                print(f"❌ Error processing {lec_name}: {e}")
+                import traceback
+                traceback.print_exc()
+                print(f"⏭️  Skipping {lec_name} and continuing...")
+                results.append(False)
+        return results
+    
+    print(f"\n⚡ Generating {len(targets)} lecture(s), {jobs} at a time")
+    print(f"   Rate limit: {get_rate_limiter('gemini').describe()}")
+    
+    async def run_all():
+        semaphore = asyncio.Semaphore(jobs)
         
-        try:
-            result = process_lecture(course_id, lec_name, generator, force_regenerate)
-            if result:
-                # Check if it was cached or newly generated
-                output_path = course_base_dir / "cognitive_flashcards" / lec_name / f"{lec_name}_hard_questions.json"
-                if output_path.exists():
-                    with open(output_path, 'r') as f:
-                        data = json.load(f)
-                        generated_at = data.get('metadata', {}).get('generated_at', '')
-                        # Simple heuristic: if generated in last 5 seconds, it's new
-                        from datetime import datetime, timedelta
-                        if generated_at:
-                            gen_time = datetime.fromisoformat(generated_at)
-                            if datetime.now() - gen_time < timedelta(seconds=5):
-                                success_count += 1
-                            else:
-                                skip_count += 1
-                        else:
-                            success_count += 1
-            else:
-                fail_count += 1
-        except Exception as e:
-            print(f"❌ Error processing {lec_name}: {e}")
-            import traceback
-            traceback.print_exc()
-            fail_count += 1
-            print(f"⏭️  Skipping {lec_name} and continuing...")
+        async def run_one(course_id: str, lec_name: str):
+            async with semaphore:
+                try:
+                    return await process_lecture_async(course_id, lec_name, generator, force_regenerate)
+                except Exception as e:
+                    print(f"❌ Error processing {course_id}/{lec_name}: {type(e).__name__}: {e}")
+                    return False
+        
+        return await asyncio.gather(*(run_one(course_id, lec_name) for course_id, lec_name in targets))
     
-    # Summary
+    return asyncio.run(run_all())
+
+
+def print_summary(title: str, results: List[Any], output_hint: str):
+    """Print generated / cached / failed counts."""
     print(f"\n{'='*80}")
-    print(f"✅ COURSE COMPLETE: {course_id}")
+    print(f"✅ {title}")
     print(f"{'='*80}")
     print(f"📊 Summary:")
-    print(f"   • Total lectures: {len(lectures)}")
-    print(f"   • Successfully generated: {success_count}")
-    print(f"   • Skipped (cached): {skip_count}")
-    print(f"   • Failed: {fail_count}")
-    print(f"\n💡 Output location: {course_base_dir}/cognitive_flashcards/[lecture_name]/")
+    print(f"   • Total lectures: {len(results)}")
+    print(f"   • Successfully generated: {sum(1 for r in results if r == GENERATED)}")
+    print(f"   • Skipped (up to date): {sum(1 for r in results if r == CACHED)}")
+    print(f"   • Failed: {sum(1 for r in results if not r)}")
+    print(f"\n💡 Output location: {output_hint}")
 
 
+def process_course(
+    course_id: str,
+    lecture_name: Optional[str] = None,
+    force_regenerate: bool = False,
+    jobs: int = 1
+):
+    """
+    Process a course to generate hard questions for all or specific lectures.
+    
+    Args:
+        course_id: Course identifier (e.g., 'MS5260')
+        lecture_name: Optional specific lecture to process
+        force_regenerate: If True, regenerate even if cache is up to date
+        jobs: Lectures generated at once
+        
+    Returns:
+        Outcome per lecture (GENERATED, CACHED or False)
+    """
+    print(f"\n{'='*80}")
+    print(f"📚 Generating Hard Questions for Course: {course_id}")
+    print(f"{'='*80}")
+    
+    lectures = find_lectures(course_id, lecture_name)
+    if not lectures:
+        return []
+    
+    results = run_lectures(
+        [(course_id, lec_name) for lec_name in lectures], new_generator(), force_regenerate, jobs
+    )
+    print_summary(
+        f"COURSE COMPLETE: {course_id}", results,
+        f"./courses/{course_id}/cognitive_flashcards/[lecture_name]/"
+    )
+    return results
+
 def load_courses() -> List[Dict[str, Any]]:
     """Load courses from courses.json."""
     courses_file = Path("courses.json")
@@ -489,8 +777,13 @@ def load_courses() -> List[Dict[str, Any]]:
         return []
 
 
-def main():
-    """Main execution function."""
+def main() -> int:
+    """
+    Main execution function.
+    
+    Returns:
+        Process exit code: 1 if the configuration is invalid or any lecture failed
+    """
     
     print("🎓 Hard Quiz Questions Generator\n")
     
@@ -498,30 +791,40 @@ def main():
     is_valid, error_msg = Config.validate()
     if not is_valid:
         print(f"❌ Configuration Error: {error_msg}")
-        return
+        return 1
     
     # Parse command-line arguments
-    target_course_id = None
-    lecture_name = None
+    parser = argparse.ArgumentParser(description="Generate hard quiz questions from structured slide analysis")
+    parser.add_argument("course_id", nargs="?", help="Course to process (default: all courses in courses.json)")
+    parser.add_argument("lecture_name", nargs="?", help="Single lecture to process (requires course_id)")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the analysis is unchanged")
+    parser.add_argument("--jobs", type=int, default=1, help="Lectures to generate at once (default: 1)")
+    args = parser.parse_args()
+    
+    target_course_id = args.course_id
+    lecture_name = args.lecture_name
+    force_regenerate = args.force
+    jobs = max(1, args.jobs)
     
-    if len(sys.argv) > 1:
-        target_course_id = sys.argv[1]
+    if target_course_id:
         print(f"🎯 Target course: {target_course_id}")
     
-    if len(sys.argv) > 2:
-        lecture_name = sys.argv[2]
+    if lecture_name:
         print(f"🎯 Target lecture: {lecture_name}")
     
+    if force_regenerate:
+        print(f"♻️  Regenerating existing hard questions")
+    
     # Process courses
     if target_course_id:
         # Process specific course
-        process_course(target_course_id, lecture_name)
+        results = process_course(target_course_id, lecture_name, force_regenerate, jobs)
     else:
         # Process all courses
         courses = load_courses()
         if not courses:
             print(f"⚠️  No courses found. Please ensure courses.json exists.")
-            return
+            return 1
         
         print(f"📚 Loaded {len(courses)} course(s) from courses.json")
         
@@ -531,23 +834,22 @@ def main():
         
         print(f"\n🔄 Processing all courses...\n")
         
-        for i, course in enumerate(courses, 1):
+        # Fan out lectures of every course together, so --jobs spans course boundaries
+        targets = []
+        for course in courses:
             course_id = course.get('course_id')
             if not course_id:
                 print(f"⚠️  Skipping course without course_id")
                 continue
-            
-            print(f"\n{'#'*80}")
-            print(f"# Course {i}/{len(courses)}")
-            print(f"{'#'*80}")
-            
-            process_course(course_id)
+            targets.extend((course_id, lec_name) for lec_name in find_lectures(course_id))
         
-        print(f"\n{'='*80}")
-        print(f"✅ ALL COURSES COMPLETE!")
-        print(f"{'='*80}")
-
+        results = run_lectures(targets, new_generator(), force_regenerate, jobs)
+        print_summary("ALL COURSES COMPLETE!", results, "./courses/[course_id]/cognitive_flashcards/[lecture_name]/")
+    
+    if lecture_name and target_course_id and not results:
+        return 1  # The requested lecture has no structured analysis
+    return 1 if any(not result for result in results) else 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
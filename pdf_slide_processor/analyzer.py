@@ -1,11 +1,70 @@
 """
 Gemini Vision Analyzer - Extracts information from slide images using AI.
+
+Slides are analyzed in batches by an async pipeline: the slide source (e.g.
+the renderer's generator) is consumed in a worker thread, images are loaded
+off the event loop, several batches are in flight at once under the shared
+rate limiter, and a batch whose response is unusable is split in half and
+retried rather than degrading to one call per slide.
 """
 
+import asyncio
+import itertools
 import json
-import re
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+
+from config import Config
+from cognitive_flashcard_generator.rate_limiter import estimate_tokens, get_rate_limiter, is_rate_limit_error
+from cognitive_flashcard_generator.response_cache import (
+    forget_cached,
+    gemini_result,
+    generate_cached,
+    generate_cached_async,
+)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _take(iterator: Iterator[Dict[str, Any]], n: int) -> List[Dict[str, Any]]:
+    """Pull up to n items from an iterator (runs in a worker thread while slides render)."""
+    return list(itertools.islice(iterator, n))
+
+
+def _image_mime(data: bytes) -> str:
+    """MIME type of a rendered slide image from its magic bytes (PNG, JPEG or WebP)."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def _error_analysis(slide_number: int, error: str) -> Dict[str, Any]:
+    """Placeholder analysis for a slide that could not be analyzed."""
+    return {
+        "title": f"Slide {slide_number}",
+        "main_text": "",
+        "key_concepts": [],
+        "diagrams": [],
+        "examples": [],
+        "definitions": [],
+        "error": error,
+    }
+
+
+def _strip_code_fences(text: str) -> str:
+    """Remove a leading ``` / ```json fence from a model response."""
+    if text.startswith("```"):
+        parts = text.split("```")
+        if len(parts) >= 2:
+            text = parts[1]
+            if text.startswith("json"):
+                text = text[4:]
+    return text.strip()
 
 
 class GeminiVisionAnalyzer:
@@ -31,128 +90,120 @@ class GeminiVisionAnalyzer:
             self.genai = genai
             self.genai.configure(api_key=api_key)
             self.model = self.genai.GenerativeModel(model)
+            self.model_name = model
             self.course_context = course_context or {}
+            self._stats: Dict[str, int] = {
+                "requests": 0, "api_calls": 0, "splits": 0, "failed_slides": 0,
+                "image_bytes": 0, "prompt_tokens": 0, "output_tokens": 0,
+            }
         except ImportError:
             raise ImportError(
                 "Please install google-generativeai: pip install google-generativeai"
             )
 
-    def analyze_slide(
-        self, image_path: str, slide_number: int, max_retries: int = 3
-    ) -> Dict[str, Any]:
+    def _generate(self, prompt: str, images: Optional[List[bytes]] = None) -> str:
         """
-        Analyze a single slide image and extract structured information with retry logic.
+        Send a prompt (and slide images) to Gemini, via the shared response cache and rate limiter.
+
+        Args:
+            prompt: Prompt text
+            images: Raw image bytes to attach after the prompt
+
+        Returns:
+            Stripped response text
+        """
+        images = images or []
+        content = [prompt] + [{"mime_type": _image_mime(data), "data": data} for data in images]
+        text = generate_cached(
+            "gemini",
+            self.model_name,
+            prompt,
+            lambda: gemini_result(self.model.generate_content(content if images else prompt)),
+            images=images,
+            estimated_tokens=estimate_tokens("gemini", len(prompt), images=len(images)),
+        )
+        return text.strip()
+
+    async def _generate_async(self, prompt: str, images: List[bytes]) -> str:
+        """
+        Async variant of _generate that also records request, call and token counts.
+
+        Args:
+            prompt: Prompt text
+            images: Raw image bytes to attach after the prompt
+
+        Returns:
+            Stripped response text
+        """
+        content = [prompt] + [{"mime_type": _image_mime(data), "data": data} for data in images]
+
+        async def request() -> Tuple[str, bool]:
+            self._stats["api_calls"] += 1
+            self._stats["image_bytes"] += sum(len(data) for data in images)
+            response = await self.model.generate_content_async(content)
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                self._stats["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+                self._stats["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+            return gemini_result(response)
+
+        self._stats["requests"] += 1
+        text = await generate_cached_async(
+            "gemini",
+            self.model_name,
+            prompt,
+            request,
+            images=images,
+            estimated_tokens=estimate_tokens("gemini", len(prompt), images=len(images)),
+        )
+        return text.strip()
+
+    def _forget(self, prompt: str, images: Optional[List[bytes]] = None):
+        """Drop a cached response that could not be used, so it is not replayed."""
+        forget_cached("gemini", self.model_name, prompt, images=images or [])
+
+    def analyze_slide(self, image_path: str, slide_number: int) -> Dict[str, Any]:
+        """
+        Analyze a single slide image and extract structured information.
+
+        Rate limits and transient errors are retried with backoff by the shared
+        rate limiter; anything that still fails is reported in the result.
 
         Args:
             image_path: Path to the slide image
             slide_number: Slide number (for context)
-            max_retries: Maximum number of retry attempts for rate limits
 
         Returns:
             Dictionary with extracted information
         """
         print(f"  🔍 Analyzing slide {slide_number}...", end=" ", flush=True)
 
-        # Load the image
-        with open(image_path, "rb") as f:
-            image_data = f.read()
-
-        # Create the analysis prompt
-        prompt = self._get_analysis_prompt()
-
-        for attempt in range(max_retries):
-            try:
-                # Send image to Gemini Vision
-                response = self.model.generate_content(
-                    [prompt, {"mime_type": "image/png", "data": image_data}]
-                )
-
-                result_text = response.text.strip()
-
-                # Try to parse as JSON
-                try:
-                    if result_text.startswith("```"):
-                        # Remove code fences
-                        parts = result_text.split("```")
-                        if len(parts) >= 2:
-                            result_text = parts[1]
-                            if result_text.startswith("json"):
-                                result_text = result_text[4:].strip()
-
-                    structured_data = json.loads(result_text)
-                    print("✓")
-                    return structured_data
-
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, return raw text
-                    print("⚠️  (raw text)")
-                    return {
-                        "title": "Slide Content",
-                        "main_text": result_text,
-                        "key_concepts": [],
-                        "diagrams": [],
-                        "examples": [],
-                        "definitions": [],
-                    }
+        try:
+            image_data = _read_bytes(image_path)
+            # Send image to Gemini Vision (cached, paced and retried)
+            result_text = self._generate(self._get_analysis_prompt(), [image_data])
+        except Exception as e:
+            if is_rate_limit_error(e):
+                print("❌ Max retries reached")
+                return _error_analysis(slide_number, "Rate limit exceeded after retries")
+            print(f"❌ Error: {e}")
+            return _error_analysis(slide_number, str(e))
 
-            except Exception as e:
-                error_str = str(e)
-
-                # Check if it's a rate limit error (429)
-                if "429" in error_str or "quota" in error_str.lower():
-                    # Extract retry delay from error message if available
-                    retry_delay = 60  # Default to 60 seconds
-
-                    if "retry in" in error_str.lower():
-                        match = re.search(r"retry in (\d+\.?\d*)", error_str.lower())
-                        if match:
-                            retry_delay = (
-                                float(match.group(1)) + 1
-                            )  # Add 1 second buffer
-
-                    if attempt < max_retries - 1:
-                        print(
-                            f"⏳ Rate limit hit, waiting {retry_delay:.0f}s...",
-                            end=" ",
-                            flush=True,
-                        )
-                        time.sleep(retry_delay)
-                        print("retrying...", end=" ", flush=True)
-                        continue
-                    else:
-                        print(f"❌ Max retries reached")
-                        return {
-                            "title": f"Slide {slide_number}",
-                            "main_text": "",
-                            "key_concepts": [],
-                            "diagrams": [],
-                            "examples": [],
-                            "definitions": [],
-                            "error": "Rate limit exceeded after retries",
-                        }
-                else:
-                    # Non-rate-limit error
-                    print(f"❌ Error: {e}")
-                    return {
-                        "title": f"Slide {slide_number}",
-                        "main_text": "",
-                        "key_concepts": [],
-                        "diagrams": [],
-                        "examples": [],
-                        "definitions": [],
-                        "error": error_str,
-                    }
-
-        # Fallback if all retries exhausted (shouldn't reach here normally)
-        return {
-            "title": f"Slide {slide_number}",
-            "main_text": "",
-            "key_concepts": [],
-            "diagrams": [],
-            "examples": [],
-            "definitions": [],
-            "error": "Analysis failed after all retries",
-        }
+        try:
+            structured_data = json.loads(_strip_code_fences(result_text))
+            print("✓")
+            return structured_data
+        except json.JSONDecodeError:
+            # If JSON parsing fails, return raw text
+            print("⚠️  (raw text)")
+            return {
+                "title": "Slide Content",
+                "main_text": result_text,
+                "key_concepts": [],
+                "diagrams": [],
+                "examples": [],
+                "definitions": [],
+            }
 
     def _get_analysis_prompt(self) -> str:
         """Get the comprehensive prompt for slide analysis with course context."""
@@ -227,102 +278,107 @@ class GeminiVisionAnalyzer:
 - Output ONLY valid JSON, no additional text
 - Do not escape special characters like $, %, or # inside the JSON string values."""
 
-    def analyze_slide_batch(
-        self, slide_batch: List[Dict[str, Any]], max_retries: int = 3
-    ) -> List[Dict[str, Any]]:
+    def analyze_slide_batch(self, slide_batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Analyze multiple slides in a single API call to reduce costs.
 
+        Retries are handled by the shared rate limiter and by splitting the batch.
+
         Args:
             slide_batch: List of slide metadata dictionaries
-            max_retries: Maximum number of retry attempts for rate limits
 
         Returns:
             List of analysis results for each slide
         """
-        batch_size = len(slide_batch)
-        slide_numbers = [s["page_number"] for s in slide_batch]
-        print(f"  🔍 Analyzing batch of {batch_size} slides ({slide_numbers})...", end=" ", flush=True)
+        async def run():
+            images = [await asyncio.to_thread(_read_bytes, slide["path"]) for slide in slide_batch]
+            return await self.analyze_slide_batch_async(slide_batch, images)
 
-        # Load all images in the batch
-        image_parts = []
-        for slide in slide_batch:
-            with open(slide["path"], "rb") as f:
-                image_data = f.read()
-                image_parts.append({"mime_type": "image/png", "data": image_data})
+        return asyncio.run(run())
 
-        # Create the batch analysis prompt
-        prompt = self._get_batch_analysis_prompt(batch_size)
+    async def analyze_slide_batch_async(
+        self, slide_batch: List[Dict[str, Any]], images: List[bytes]
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze a batch of slides in one call; on failure split it in half and retry each half.
 
-        for attempt in range(max_retries):
-            try:
-                # Send all images to Gemini Vision in one call
-                content = [prompt] + image_parts
-                response = self.model.generate_content(content)
-
-                result_text = response.text.strip()
-
-                # Try to parse as JSON
-                try:
-                    if result_text.startswith("```"):
-                        # Remove code fences
-                        parts = result_text.split("```")
-                        if len(parts) >= 2:
-                            result_text = parts[1]
-                            if result_text.startswith("json"):
-                                result_text = result_text[4:].strip()
-
-                    structured_data = json.loads(result_text)
-                    
-                    # Validate that we got results for all slides
-                    if "slides" in structured_data and len(structured_data["slides"]) == batch_size:
-                        print("✓")
-                        return structured_data["slides"]
-                    else:
-                        print(f"⚠️  Expected {batch_size} results, got {len(structured_data.get('slides', []))}")
-                        # Fall back to individual analysis
-                        return self._fallback_individual_analysis(slide_batch)
+        A batch of one slide that still fails is analyzed with the single-slide
+        prompt, which accepts raw-text answers.
 
-                except json.JSONDecodeError as e:
-                    print(f"⚠️  JSON parse error: {e}")
-                    # Fall back to individual analysis
-                    return self._fallback_individual_analysis(slide_batch)
+        Args:
+            slide_batch: Slide metadata dictionaries
+            images: Raw image bytes of each slide, in the same order
 
-            except Exception as e:
-                error_str = str(e)
-
-                # Check if it's a rate limit error (429)
-                if "429" in error_str or "quota" in error_str.lower():
-                    retry_delay = 60  # Default to 60 seconds
-
-                    if "retry in" in error_str.lower():
-                        match = re.search(r"retry in (\d+\.?\d*)", error_str.lower())
-                        if match:
-                            retry_delay = float(match.group(1)) + 1
-
-                    if attempt < max_retries - 1:
-                        print(f"⏳ Rate limit, waiting {retry_delay:.0f}s...", end=" ", flush=True)
-                        time.sleep(retry_delay)
-                        print("retrying...", end=" ", flush=True)
-                        continue
-                    else:
-                        print(f"❌ Max retries reached")
-                        return self._fallback_individual_analysis(slide_batch)
-                else:
-                    print(f"❌ Error: {e}")
-                    return self._fallback_individual_analysis(slide_batch)
+        Returns:
+            One analysis dictionary per slide, in order
+        """
+        if len(slide_batch) == 1:
+            return [await self._analyze_single_async(slide_batch[0], images[0])]
+
+        slide_numbers = [s["page_number"] for s in slide_batch]
+        prompt = self._get_batch_analysis_prompt(len(slide_batch))
 
-        # Fallback if all retries exhausted
-        return self._fallback_individual_analysis(slide_batch)
+        problem = None
+        try:
+            result_text = await self._generate_async(prompt, images)
+            analyses = self._parse_batch_response(result_text, len(slide_batch))
+            if analyses is not None:
+                print(f"  ✓ Slides {slide_numbers}")
+                return analyses
+            problem = "unusable response"
+            self._forget(prompt, images)
+        except Exception as e:
+            # 429s and transient errors were already retried with backoff
+            problem = f"{type(e).__name__}: {e}"
+
+        mid = len(slide_batch) // 2
+        self._stats["splits"] += 1
+        print(f"  ✂️  Slides {slide_numbers}: {problem}; splitting into {mid} + {len(slide_batch) - mid}")
+        left, right = await asyncio.gather(
+            self.analyze_slide_batch_async(slide_batch[:mid], images[:mid]),
+            self.analyze_slide_batch_async(slide_batch[mid:], images[mid:]),
+        )
+        return left + right
+
+    async def _analyze_single_async(self, slide: Dict[str, Any], image: bytes) -> Dict[str, Any]:
+        """Analyze one slide with the single-slide prompt (raw text is kept if it is not JSON)."""
+        prompt = self._get_analysis_prompt()
+        try:
+            result_text = await self._generate_async(prompt, [image])
+        except Exception as e:
+            self._stats["failed_slides"] += 1
+            print(f"  ❌ Slide {slide['page_number']}: {e}")
+            return _error_analysis(
+                slide["page_number"],
+                "Rate limit exceeded after retries" if is_rate_limit_error(e) else str(e),
+            )
 
-    def _fallback_individual_analysis(self, slide_batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Fallback to analyzing slides individually if batch fails."""
-        print("\n  ⚠️  Falling back to individual slide analysis...")
-        results = []
-        for slide in slide_batch:
-            analysis = self.analyze_slide(slide["path"], slide["page_number"])
-            results.append(analysis)
-        return results
+        try:
+            analysis = json.loads(_strip_code_fences(result_text))
+            print(f"  ✓ Slide {slide['page_number']}")
+            return analysis
+        except json.JSONDecodeError:
+            print(f"  ⚠️  Slide {slide['page_number']} (raw text)")
+            return {
+                "title": "Slide Content",
+                "main_text": result_text,
+                "key_concepts": [],
+                "diagrams": [],
+                "examples": [],
+                "definitions": [],
+            }
+
+    @staticmethod
+    def _parse_batch_response(result_text: str, batch_size: int) -> Optional[List[Dict[str, Any]]]:
+        """Parse a batch response; None unless it is JSON with exactly one analysis per slide."""
+        try:
+            structured_data = json.loads(_strip_code_fences(result_text))
+        except json.JSONDecodeError:
+            return None
+        slides = structured_data.get("slides") if isinstance(structured_data, dict) else None
+        if not isinstance(slides, list) or len(slides) != batch_size:
+            return None
+        return slides
 
     def _get_batch_analysis_prompt(self, num_slides: int) -> str:
         """Get the prompt for batch slide analysis."""
@@ -394,61 +450,142 @@ class GeminiVisionAnalyzer:
 
     def analyze_all_slides(
         self,
-        slides: List[Dict[str, Any]],
-        delay_seconds: float = 10,
+        slides: Iterable[Dict[str, Any]],
         slides_per_batch: int = 5,
+        max_concurrent_batches: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
         Analyze all slides using batching to reduce API costs.
 
         Args:
-            slides: List of slide metadata dictionaries
-            delay_seconds: Delay between batch API calls (default 10s)
+            slides: Slide metadata dictionaries (a list, or a generator such as
+                SlideRenderer.iter_pdf_images so analysis overlaps rendering)
             slides_per_batch: Number of slides to send in each API call (default 5)
+            max_concurrent_batches: Batches in flight at once (defaults to
+                Config.SLIDE_ANALYSIS_CONCURRENCY)
+
+        Returns:
+            List of analyzed slide data, in slide order
+        """
+        return asyncio.run(
+            self.analyze_all_slides_async(slides, slides_per_batch, max_concurrent_batches)
+        )
+
+    async def analyze_all_slides_async(
+        self,
+        slides: Iterable[Dict[str, Any]],
+        slides_per_batch: int = 5,
+        max_concurrent_batches: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Pipelined analysis: pull slides from `slides` (rendering in a worker
+        thread), load each batch's images off the event loop and keep several
+        batches in flight. Throughput is paced by the shared Gemini rate
+        limiter, which backs off when the API reports 429s.
+
+        Args:
+            slides: Slide metadata dictionaries (list or generator)
+            slides_per_batch: Number of slides to send in each API call
+            max_concurrent_batches: Batches in flight at once
 
         Returns:
-            List of analyzed slide data
+            List of analyzed slide data, in slide order
         """
+        max_concurrent_batches = max_concurrent_batches or Config.SLIDE_ANALYSIS_CONCURRENCY
+        self._stats = {
+            "slides": 0,
+            "batches": 0,
+            "requests": 0,
+            "api_calls": 0,
+            "splits": 0,
+            "failed_slides": 0,
+            "image_bytes": 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+        }
+
         print(f"\n{'='*70}")
-        print(f"🤖 Analyzing {len(slides)} slides with Gemini Vision (BATCHED)")
+        print(f"🤖 Analyzing slides with Gemini Vision (BATCHED, PIPELINED)")
         print(f"   Batch size: {slides_per_batch} slides per API call")
-        print(f"   Estimated API calls: {(len(slides) + slides_per_batch - 1) // slides_per_batch}")
-        print(f"   Cost savings: ~{slides_per_batch}x compared to individual calls")
+        print(f"   Concurrent batches: {max_concurrent_batches}")
+        print(f"   Rate limit: {get_rate_limiter('gemini').describe()}")
         print(f"{'='*70}")
 
-        analyzed_slides = []
-        total_batches = (len(slides) + slides_per_batch - 1) // slides_per_batch
+        start_time = time.monotonic()
+        semaphore = asyncio.Semaphore(max_concurrent_batches)
+        slide_iter = iter(slides)
 
-        for batch_idx in range(total_batches):
-            start_idx = batch_idx * slides_per_batch
-            end_idx = min(start_idx + slides_per_batch, len(slides))
-            slide_batch = slides[start_idx:end_idx]
-
-            print(f"\n📦 Batch {batch_idx + 1}/{total_batches} (slides {start_idx + 1}-{end_idx})")
-            
-            # Analyze the batch
-            batch_analyses = self.analyze_slide_batch(slide_batch)
+        def failed(slide: Dict[str, Any], error: str) -> Dict[str, Any]:
+            self._stats["failed_slides"] += 1
+            print(f"  ❌ Slide {slide['page_number']}: {error}")
+            return {**slide, "analysis": _error_analysis(slide["page_number"], error)}
 
-            # Combine slide metadata with analysis results
-            for slide, analysis in zip(slide_batch, batch_analyses):
-                analyzed_slide = {**slide, "analysis": analysis}
-                analyzed_slides.append(analyzed_slide)
+        async def run_batch(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            try:
+                # An unreadable image fails its own slide, not the batch or the lecture
+                images = await asyncio.gather(
+                    *(asyncio.to_thread(_read_bytes, s["path"]) for s in batch), return_exceptions=True
+                )
+                results = {}
+                readable = []
+                for slide, image in zip(batch, images):
+                    if isinstance(image, Exception):
+                        results[slide["page_number"]] = failed(slide, f"Could not read slide image: {image}")
+                    else:
+                        readable.append((slide, image))
+                if readable:
+                    slides, data = zip(*readable)
+                    analyses = await self.analyze_slide_batch_async(list(slides), list(data))
+                    for slide, analysis in zip(slides, analyses):
+                        results[slide["page_number"]] = {**slide, "analysis": analysis}
+                return [results[slide["page_number"]] for slide in batch]
+            finally:
+                semaphore.release()
+
+        batches = []
+        tasks = []
+        while True:
+            # Next batch from the (possibly still rendering) slide source
+            batch = await asyncio.to_thread(_take, slide_iter, slides_per_batch)
+            if not batch:
+                break
+            self._stats["slides"] += len(batch)
+            self._stats["batches"] += 1
+            await semaphore.acquire()
+            batches.append(batch)
+            tasks.append(asyncio.create_task(run_batch(batch)))
 
-            # Rate limiting between batches
-            if batch_idx < total_batches - 1:
-                print(f"  ⏸️  Waiting {delay_seconds}s before next batch...")
-                time.sleep(delay_seconds)
+        analyzed_slides = []
+        for batch, outcome in zip(batches, await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(outcome, Exception):
+                analyzed_slides.extend(failed(slide, f"{type(outcome).__name__}: {outcome}") for slide in batch)
+            else:
+                analyzed_slides.extend(outcome)
+        analyzed_slides.sort(key=lambda s: s["page_number"])
+
+        self._report_analysis_stats(analyzed_slides, time.monotonic() - start_time)
+        return analyzed_slides
 
-        print(f"\n✅ Analysis complete for {len(analyzed_slides)} slides")
-        print(f"   Total API calls made: {total_batches} (vs {len(slides)} without batching)")
+    def _report_analysis_stats(self, analyzed_slides: List[Dict[str, Any]], elapsed: float):
+        """Print progress and cost accounting for the last analyze_all_slides run."""
+        stats = self._stats
+        cache_hits = stats["requests"] - stats["api_calls"]
+        cost = (
+            stats["prompt_tokens"] * Config.GEMINI_INPUT_COST_PER_MTOK
+            + stats["output_tokens"] * Config.GEMINI_OUTPUT_COST_PER_MTOK
+        ) / 1_000_000
+
+        print(f"\n✅ Analysis complete for {len(analyzed_slides)} slides in {elapsed:.1f}s")
+        print(f"   Batches: {stats['batches']} (splits after failures: {stats['splits']})")
+        print(f"   Requests: {stats['requests']} ({stats['api_calls']} API calls, {max(0, cache_hits)} from cache)")
+        print(f"   Images uploaded: {stats['image_bytes'] / (1024 * 1024):.1f} MB")
+        print(f"   Tokens: {stats['prompt_tokens']:,} in / {stats['output_tokens']:,} out (≈ ${cost:.4f})")
 
         # Report any errors
         errors = [s for s in analyzed_slides if s["analysis"].get("error")]
         if errors:
             print(f"⚠️  {len(errors)} slides had errors during analysis")
 
-        return analyzed_slides
-
     def generate_lecture_summary(
         self, analyzed_slides: List[Dict[str, Any]], max_retries: int = 3
     ) -> Dict[str, Any]:
@@ -551,10 +688,7 @@ Be precise, academic, and focus on the most critical information a student would
         for attempt in range(max_retries):
             try:
                 print(f"  📡 Calling Gemini API (attempt {attempt + 1}/{max_retries})...")
-                response = self.model.generate_content(prompt)
-                
-                # Extract JSON from response
-                response_text = response.text.strip()
+                response_text = self._generate(prompt)
                 
                 # Remove markdown code blocks if present
                 if response_text.startswith("```"):
@@ -573,27 +707,22 @@ Be precise, academic, and focus on the most critical information a student would
                     return result
                 else:
                     print(f"  ⚠️  Invalid response structure, retrying...")
+                    self._forget(prompt)
                     
             except json.JSONDecodeError as e:
                 print(f"  ⚠️  JSON parsing error: {e}")
+                self._forget(prompt)
                 if attempt < max_retries - 1:
                     time.sleep(2)
                     continue
             except Exception as e:
-                error_msg = str(e)
-                if "429" in error_msg or "quota" in error_msg.lower():
-                    wait_time = 30 * (attempt + 1)
-                    print(f"  ⚠️  Rate limit hit, waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                elif "500" in error_msg or "503" in error_msg:
-                    wait_time = 10 * (attempt + 1)
-                    print(f"  ⚠️  Server error, waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"  ❌ Error: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(5)
-                        continue
+                # 429s and server errors were already retried with backoff
+                print(f"  ❌ Error: {e}")
+                if is_rate_limit_error(e):
+                    break
+                if attempt < max_retries - 1:
+                    time.sleep(5)
+                    continue
         
         # If all retries failed, return a fallback
         print(f"  ⚠️  Failed to generate summary after {max_retries} attempts")
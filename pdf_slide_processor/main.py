@@ -107,7 +107,8 @@ def process_course(course: dict, target_pdf_name: str = None) -> None:
             pdf_name = Path(pdf_path).stem
             lecture_images_dir = f"{slide_images_dir}/{pdf_name}"
             renderer = SlideRenderer(output_dir=lecture_images_dir)
-            slides = renderer.render_pdf_to_images(pdf_path)
+            # Generator: analysis of the first batches overlaps rendering of the rest
+            slides = renderer.iter_pdf_images(pdf_path)
             
             # Step 2: Analyze slides with Gemini Vision (with course context)
             course_context = {
@@ -124,8 +125,8 @@ def process_course(course: dict, target_pdf_name: str = None) -> None:
                 course_context=course_context
             )
             
-            # Use batching to reduce API costs: 5 slides per call, 10s delay between batches
-            analyzed_slides = analyzer.analyze_all_slides(slides, delay_seconds=10, slides_per_batch=5)
+            # Use batching to reduce API costs: 5 slides per call, several batches in flight
+            analyzed_slides = analyzer.analyze_all_slides(slides, slides_per_batch=5)
             all_analyzed_slides.extend(analyzed_slides)
             
             # Generate lecture summary and key concepts for AI Tutor
@@ -1,80 +1,316 @@
 """
-Slide Renderer - Converts PDF pages to high-quality images.
+Slide Renderer - Converts PDF pages to images for AI analysis.
+
+Pages are rendered in parallel by a process pool (each worker opens its own
+fitz document over a page range) to PNG, JPEG or WebP under a maximum pixel
+budget. A per-directory manifest records a content hash of each page and the
+render settings, so unchanged pages are skipped on re-runs while edited pages
+(or changed settings) are re-rendered even though their filenames are reused.
+After a complete render, images of the PDF that the run did not produce (an
+old format, or pages the PDF no longer has) are deleted with their manifest
+entries.
 """
 
+import hashlib
+import json
+import math
 import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 import fitz  # PyMuPDF
 
+from config import Config
+
+MANIFEST_FILENAME = ".render_manifest.json"
+
+IMAGE_FORMATS = {
+    "png": ("png", "image/png"),
+    "jpeg": ("jpg", "image/jpeg"),
+    "jpg": ("jpg", "image/jpeg"),
+    "webp": ("webp", "image/webp"),
+}
+
+
+def _page_hash(doc: "fitz.Document", page: "fitz.Page", settings: str) -> str:
+    """Hash a page's content stream, its embedded images and the render settings."""
+    digest = hashlib.sha256(settings.encode("utf-8"))
+    digest.update(page.read_contents())
+    for img in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(img[0]) or b"")
+    return digest.hexdigest()
+
+
+def _page_zoom(page: "fitz.Page", dpi: int, max_pixels: int) -> float:
+    """Zoom factor for a page at `dpi`, reduced so width * height stays within max_pixels."""
+    zoom = dpi / 72.0
+    pixels = page.rect.width * zoom * page.rect.height * zoom
+    if max_pixels > 0 and pixels > max_pixels:
+        zoom *= math.sqrt(max_pixels / pixels)
+    return zoom
+
+
+def _encode_pixmap(pix: "fitz.Pixmap", image_format: str, quality: int) -> bytes:
+    """Encode a pixmap as PNG, JPEG or WebP."""
+    if image_format == "png":
+        return pix.tobytes("png")
+    if image_format in ("jpeg", "jpg"):
+        return pix.tobytes("jpeg", jpg_quality=quality)
+
+    # PyMuPDF has no WebP writer
+    try:
+        from io import BytesIO
+        from PIL import Image
+    except ImportError as exc:
+        raise ImportError("WebP slide images need Pillow: pip install pillow") from exc
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    buffer = BytesIO()
+    img.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def _render_page_range(
+    pdf_path: str,
+    start: int,
+    stop: int,
+    output_dir: str,
+    pdf_name: str,
+    dpi: int,
+    image_format: str,
+    quality: int,
+    max_pixels: int,
+    known: Dict[str, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Render pages [start, stop) of a PDF (process-pool entry point; opens its own document).
+
+    Args:
+        known: Manifest entries by filename; pages whose hash matches an
+            existing file are skipped
+
+    Returns:
+        One slide dict per page (with page_hash and 'skipped')
+    """
+    extension, mime_type = IMAGE_FORMATS[image_format]
+    settings = f"{dpi}|{image_format}|{quality}|{max_pixels}"
+    slides = []
+
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, min(stop, len(doc))):
+            page = doc[page_num]
+            image_filename = f"{pdf_name}_slide_{page_num + 1:03d}.{extension}"
+            image_path = os.path.join(output_dir, image_filename)
+            page_hash = _page_hash(doc, page, settings)
+
+            entry = known.get(image_filename)
+            if entry and entry.get("page_hash") == page_hash and os.path.exists(image_path):
+                slides.append({
+                    'page_number': page_num + 1,
+                    'filename': image_filename,
+                    'path': image_path,
+                    'width': entry.get('width', 0),
+                    'height': entry.get('height', 0),
+                    'mime_type': mime_type,
+                    'page_hash': page_hash,
+                    'skipped': True,
+                })
+                continue
+
+            zoom = _page_zoom(page, dpi, max_pixels)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            data = _encode_pixmap(pix, image_format, quality)
+
+            # Write-then-rename so a crash never leaves a truncated image behind
+            tmp_path = f"{image_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, image_path)
+
+            slides.append({
+                'page_number': page_num + 1,
+                'filename': image_filename,
+                'path': image_path,
+                'width': pix.width,
+                'height': pix.height,
+                'mime_type': mime_type,
+                'page_hash': page_hash,
+                'bytes': len(data),
+                'skipped': False,
+            })
+
+    return slides
+
 
 class SlideRenderer:
-    """Renders PDF pages as high-quality images for AI analysis."""
-    
-    def __init__(self, output_dir: str = "./slide_images"):
+    """Renders PDF pages as images for AI analysis."""
+
+    def __init__(
+        self,
+        output_dir: str = "./slide_images",
+        image_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+        workers: Optional[int] = None,
+        pages_per_task: int = 4,
+    ):
+        """
+        Initialize the renderer.
+
+        Args:
+            output_dir: Directory for rendered slide images
+            image_format: "png", "jpeg" or "webp" (defaults to Config.SLIDE_IMAGE_FORMAT)
+            quality: JPEG/WebP quality (defaults to Config.SLIDE_IMAGE_QUALITY)
+            max_pixels: Pixel budget per slide, 0 for none (defaults to Config.SLIDE_MAX_PIXELS)
+            workers: Rendering processes, 1 = in-process (defaults to Config.SLIDE_RENDER_WORKERS)
+            pages_per_task: Pages per worker task
+        """
         self.output_dir = output_dir
+        self.image_format = (image_format or Config.SLIDE_IMAGE_FORMAT).lower()
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported slide image format: {self.image_format} (use png, jpeg or webp)")
+        self.quality = quality if quality is not None else Config.SLIDE_IMAGE_QUALITY
+        self.max_pixels = max_pixels if max_pixels is not None else Config.SLIDE_MAX_PIXELS
+        self.workers = max(1, workers if workers is not None else Config.SLIDE_RENDER_WORKERS)
+        self.pages_per_task = max(1, pages_per_task)
         os.makedirs(output_dir, exist_ok=True)
-    
+
     def render_pdf_to_images(self, pdf_path: str, dpi: int = 200, skip_existing: bool = True) -> List[Dict[str, Any]]:
         """
-        Render each page of a PDF as a high-resolution image.
-        
+        Render each page of a PDF as an image.
+
         Args:
             pdf_path: Path to the PDF file
-            dpi: Resolution (higher = better quality but larger files)
-            skip_existing: Skip rendering if image already exists
-            
+            dpi: Resolution before the pixel budget is applied
+            skip_existing: Skip pages whose content hash matches the existing image
+
         Returns:
             List of dictionaries with slide metadata
         """
+        return list(self.iter_pdf_images(pdf_path, dpi=dpi, skip_existing=skip_existing))
+
+    def iter_pdf_images(self, pdf_path: str, dpi: int = 200, skip_existing: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Render a PDF, yielding slides in page order as soon as they are on disk.
+
+        Lets the analyzer start on the first batches while later pages are
+        still rendering.
+
+        Args:
+            pdf_path: Path to the PDF file
+            dpi: Resolution before the pixel budget is applied
+            skip_existing: Skip pages whose content hash matches the existing image
+
+        Yields:
+            Slide metadata dictionaries (page_number, filename, path, width,
+            height, mime_type, page_hash)
+        """
         pdf_path = Path(pdf_path)
         pdf_name = pdf_path.stem
-        
+
         print(f"\n{'='*70}")
         print(f"🖼️  Rendering slides: {pdf_path.name}")
+        print(f"   Format: {self.image_format} (quality {self.quality}), "
+              f"max {self.max_pixels:,} px, {self.workers} worker(s)")
         print(f"{'='*70}")
-        
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
+
+        with fitz.open(pdf_path) as doc:
+            total_pages = len(doc)
         print(f"📊 Total slides: {total_pages}")
-        
-        slides = []
-        
-        for page_num in range(total_pages):
-            page = doc[page_num]
-            image_filename = f"{pdf_name}_slide_{page_num + 1:03d}.png"
-            image_path = os.path.join(self.output_dir, image_filename)
-            
-            # Skip if image already exists (efficiency optimization)
-            if skip_existing and os.path.exists(image_path):
-                slide_info = {
-                    'page_number': page_num + 1,
-                    'filename': image_filename,
-                    'path': image_path,
-                    'width': 0,
-                    'height': 0
-                }
-                slides.append(slide_info)
-                print(f"  ⏭️  Slide {page_num + 1}/{total_pages} (already exists)")
-                continue
-            
-            # Render page as image
-            pix = page.get_pixmap(dpi=dpi)
-            pix.save(image_path)
-            
-            slide_info = {
-                'page_number': page_num + 1,
-                'filename': image_filename,
-                'path': image_path,
-                'width': pix.width,
-                'height': pix.height
-            }
-            
-            slides.append(slide_info)
-            print(f"  ✓ Slide {page_num + 1}/{total_pages} rendered")
-        
-        doc.close()
-        
-        print(f"✅ Rendered {len(slides)} slides to {self.output_dir}/")
-        return slides
 
+        manifest = self._load_manifest() if skip_existing else {}
+        ranges = [(start, start + self.pages_per_task) for start in range(0, total_pages, self.pages_per_task)]
+
+        rendered = skipped = written_bytes = 0
+        current = set()
+        try:
+            for slides in self._iter_ranges(str(pdf_path), pdf_name, dpi, ranges, manifest):
+                for slide in slides:
+                    current.add(slide['filename'])
+                    manifest[slide['filename']] = {
+                        'page_hash': slide['page_hash'],
+                        'width': slide['width'],
+                        'height': slide['height'],
+                    }
+                    if slide.pop('skipped'):
+                        skipped += 1
+                        print(f"  ⏭️  Slide {slide['page_number']}/{total_pages} (unchanged)")
+                    else:
+                        rendered += 1
+                        written_bytes += slide.pop('bytes', 0)
+                        print(f"  ✓ Slide {slide['page_number']}/{total_pages} rendered")
+                    yield slide
+            # Only reached when every page was rendered (not if the consumer stopped early)
+            removed = self._remove_orphans(pdf_name, current, manifest)
+        finally:
+            self._save_manifest(manifest)
+
+        if removed:
+            print(f"🧹 Removed {removed} stale image(s) from an earlier format or page count")
+
+        print(f"✅ {rendered} slides rendered, {skipped} unchanged, in {self.output_dir}/")
+        if rendered:
+            print(f"   📦 {written_bytes / (1024 * 1024):.1f} MB written "
+                  f"({written_bytes / rendered / 1024:.0f} KB per slide)")
+
+    def _iter_ranges(
+        self,
+        pdf_path: str,
+        pdf_name: str,
+        dpi: int,
+        ranges: List[Tuple[int, int]],
+        manifest: Dict[str, Dict[str, Any]],
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Render page ranges in order, keeping at most 2 * workers ranges in flight."""
+        args = (self.output_dir, pdf_name, dpi, self.image_format, self.quality, self.max_pixels, manifest)
+        if self.workers == 1 or len(ranges) <= 1:
+            for start, stop in ranges:
+                yield _render_page_range(pdf_path, start, stop, *args)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            remaining = iter(ranges)
+            for start, stop in remaining:
+                pending.append(executor.submit(_render_page_range, pdf_path, start, stop, *args))
+                if len(pending) >= self.workers * 2:
+                    break
+            while pending:
+                slides = pending.popleft().result()
+                next_range = next(remaining, None)
+                if next_range is not None:
+                    pending.append(executor.submit(_render_page_range, pdf_path, next_range[0], next_range[1], *args))
+                yield slides
+
+    def _remove_orphans(self, pdf_name: str, current: set, manifest: Dict[str, Dict[str, Any]]) -> int:
+        """Delete this PDF's slide images (and manifest entries) that the last render did not produce."""
+        extensions = "|".join(sorted({extension for extension, _ in IMAGE_FORMATS.values()}))
+        pattern = re.compile(rf"{re.escape(pdf_name)}_slide_\d{{3,}}\.(?:{extensions})")
+        removed = 0
+        for filename in os.listdir(self.output_dir):
+            if pattern.fullmatch(filename) and filename not in current:
+                os.remove(os.path.join(self.output_dir, filename))
+                removed += 1
+        for filename in [name for name in manifest if pattern.fullmatch(name) and name not in current]:
+            del manifest[filename]
+        return removed
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.output_dir, MANIFEST_FILENAME)
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Load page hashes of previously rendered images (empty if none)."""
+        try:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, Dict[str, Any]]):
+        """Persist page hashes atomically."""
+        tmp_path = f"{self._manifest_path()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path())
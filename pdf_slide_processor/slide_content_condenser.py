@@ -18,6 +18,8 @@ from textwrap import dedent
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from config import Config
+from cognitive_flashcard_generator.rate_limiter import estimate_tokens
+from cognitive_flashcard_generator.response_cache import forget_cached, gemini_result, generate_cached
 from .utils import get_course_by_id, load_courses
 
 
@@ -34,6 +36,8 @@ class SlideContentCondenser:
 
         genai.configure(api_key=api_key)
         self._genai = genai
+        self._model_name = model
+        self._temperature = temperature
         self._model = genai.GenerativeModel(
             model,
             generation_config={
@@ -60,13 +64,24 @@ class SlideContentCondenser:
             raise ValueError("No slides provided for condensation.")
 
         prompt = self._build_prompt(slides, course_context, lecture_context)
-        response = self._model.generate_content(prompt)
-
-        result_text = (response.text or "").strip()
+        result_text = generate_cached(
+            "gemini",
+            self._model_name,
+            prompt,
+            lambda: gemini_result(self._model.generate_content(prompt)),
+            temperature=self._temperature,
+            max_tokens=4096,
+            estimated_tokens=estimate_tokens("gemini", len(prompt)),
+        )
         if not result_text:
             raise RuntimeError("Received empty response from Gemini.")
 
-        parsed = self._parse_response(result_text)
+        try:
+            parsed = self._parse_response(result_text)
+        except Exception:
+            # Don't replay an unparseable response on the next run
+            forget_cached("gemini", self._model_name, prompt, temperature=self._temperature, max_tokens=4096)
+            raise
         normalized = self._normalize_output(parsed, lecture_context)
         return normalized
 